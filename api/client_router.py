@@ -0,0 +1,56 @@
+"""
+Router per il registro dei client del servizio di logging.
+Definisce gli endpoint per consultare i client (progetto, modulo, API key) che inviano log.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+from core.log_manager import LogManager
+from core.auth import get_api_key
+
+router = APIRouter()
+log_manager = LogManager()
+
+@router.get("/", response_model=Dict[str, Any])
+async def list_clients(
+    project: Optional[str] = None,
+    module: Optional[str] = None,
+    api_key_id: Optional[str] = None,
+    active_since: Optional[datetime] = None,
+    sort_by: str = "last_seen",
+    sort_order: str = "desc",
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Elenca i client che hanno inviato log, una riga per progetto, modulo e API key.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - project, module: Filtri esatti
+    - api_key_id: Identificativo dell'API key ("" per i log senza API key)
+    - active_since: Solo i client con un log successivo a questa data
+    - sort_by: last_seen, first_seen, total_logs, bytes, project o module
+    - sort_order: asc o desc
+    
+    Ogni client riporta prima e ultima occorrenza, numero di log ricevuti e
+    dimensione complessiva in byte. Il registro viene aggiornato a ogni
+    scrittura, quindi la risposta non dipende dal numero di log.
+    """
+    try:
+        return log_manager.get_clients(
+            project=project,
+            module=module,
+            api_key_id=api_key_id,
+            active_since=active_since,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit,
+            offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
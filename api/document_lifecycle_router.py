@@ -3,294 +3,487 @@ Router per il tracciamento del ciclo di vita dei documenti.
 Definisce gli endpoint per filtrare e visualizzare i log relativi al ciclo di vita di documenti specifici.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body, Query
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Body, Query
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import json
 
-from core.models import LogLevel, LogProject
-from core.log_manager import LogManager
+from core.models import LogLevel, LogProject, LifecycleBatchRequest
+from core.log_manager import LogManager, LOG_FIELDS, parse_fields
 from core.auth import get_api_key
+from core.raw_json import RawJSONResponse, json_valid_columns, render_row, render_rows
+from core.document_events import document_events_subquery, document_events_batch_query
+from core.document_lineage import find_lineages, lineage_identifiers, lineage_events_subquery
+from core.document_state import build_state_query, state_to_dict
+from core.config import get_settings
+from core.query_cache import LIFECYCLE_SCOPE, filter_fingerprint
+from core.conditional import make_etag, is_not_modified, not_modified
+from core.timestamps import normalize_timestamp
 
 router = APIRouter()
 log_manager = LogManager()
 
+def _select_columns(fields: Optional[str], summary: bool) -> str:
+    """
+    Costruisce l'elenco delle colonne da selezionare in base alla proiezione richiesta.
+    
+    Solleva HTTPException 400 se viene richiesto un campo inesistente.
+    """
+    try:
+        selected_fields = parse_fields(fields, summary)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    columns = ", ".join(selected_fields) if selected_fields else "*"
+    valid_columns = json_valid_columns(selected_fields)
+    if valid_columns:
+        columns += f", {valid_columns}"
+    return columns
+
+def _repair_row(row) -> Dict[str, Any]:
+    """
+    Converte in dizionario una riga con JSON non valido in details o context.
+    """
+    log_dict = dict(row)
+    
+    # Parse JSON fields (solo quelli selezionati dalla proiezione)
+    try:
+        if log_dict.get("details"):
+            log_dict["details"] = json.loads(log_dict["details"])
+    except Exception:
+        log_dict["details"] = {"error": "Invalid JSON", "raw": log_dict["details"]}
+        
+    try:
+        if log_dict.get("context"):
+            log_dict["context"] = json.loads(log_dict["context"])
+    except Exception:
+        log_dict["context"] = {"error": "Invalid JSON", "raw": log_dict["context"]}
+    
+    return log_dict
+
+def _lifecycle_etag(
+    request: Request,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    **extra
+) -> str:
+    """
+    Calcola l'ETag di una risposta del ciclo di vita.
+    
+    L'ETag cambia solo quando vengono scritti eventi di documento nell'intervallo
+    richiesto (o con cancellazioni e ricostruzioni), non a ogni nuovo log.
+    
+    Args:
+        request: Richiesta HTTP (percorso e query string identificano la risposta)
+        start_date: Data di inizio degli eventi interrogati (opzionale)
+        end_date: Data di fine degli eventi interrogati (opzionale)
+        extra: Altri valori da cui dipende la risposta
+    """
+    fingerprint = filter_fingerprint(
+        path=request.url.path,
+        query=sorted(request.query_params.multi_items()),
+        db_path=log_manager.db_path,
+        **extra
+    )
+    return make_etag(
+        fingerprint,
+        LIFECYCLE_SCOPE,
+        normalize_timestamp(start_date) if start_date else None,
+        normalize_timestamp(end_date) if end_date else None
+    )
+
+def _lifecycle_rows(
+    subquery: str,
+    params: List[Any],
+    level: Optional[str],
+    limit: int,
+    offset: int,
+    fields: Optional[str],
+    summary: bool
+) -> str:
+    """
+    Recupera i log del ciclo di vita selezionati da una subquery su document_events.
+    
+    Gli ID dei log vengono letti dalla tabella document_events tramite i suoi
+    indici; dalla vista log_rows vengono lette solo le righe della pagina
+    richiesta, ordinate per timestamp intero (l'ora locale testuale si ripete
+    al ritorno dall'ora legale).
+    
+    Args:
+        subquery: Subquery che restituisce gli ID dei log
+        params: Parametri della subquery
+        level: Livello di log (opzionale, "all" per tutti)
+        limit: Numero massimo di log
+        offset: Offset per la paginazione
+        fields: Campi da restituire separati da virgola
+        summary: Restituisce solo i campi delle viste a elenco
+        
+    Returns:
+        Array JSON dei log
+    """
+    # Colonne richieste (proiezione)
+    columns = _select_columns(fields, summary)
+    
+    if columns.startswith("*"):
+        # log_rows contiene anche codici e timestamp interi: si selezionano solo i campi dei log
+        columns = ", ".join(LOG_FIELDS) + columns[1:]
+    
+    params = list(params)
+    query_parts = [
+        f"SELECT {columns} FROM log_rows",
+        f"WHERE id IN ({subquery})"
+    ]
+    
+    # Aggiungi filtro per livello di log se specificato (un livello mai registrato non ha codice)
+    if level and level != "all":
+        query_parts.append("AND level_id = ?")
+        params.append(log_manager.dictionary.code("level", level))
+    
+    query_parts.extend([
+        "ORDER BY timestamp_us ASC",
+        "LIMIT ? OFFSET ?"
+    ])
+    params.extend([limit, offset])
+    
+    # Connessione al database
+    conn = log_manager._get_connection()
+    try:
+        rows = conn.execute("\n".join(query_parts), params).fetchall()
+        
+        # Il JSON memorizzato viene copiato nella risposta senza decodificarlo
+        return render_rows(rows, _repair_row)
+    finally:
+        conn.close()
+
+def _lifecycle_logs(
+    request: Request,
+    conditions: List[Tuple[str, str]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    level: Optional[str],
+    limit: int,
+    offset: int,
+    fields: Optional[str],
+    summary: bool
+) -> RawJSONResponse:
+    """
+    Recupera i log del ciclo di vita che corrispondono agli identificativi indicati.
+    
+    Con If-None-Match risponde 304 se non sono stati scritti eventi nell'intervallo.
+    
+    Args:
+        request: Richiesta HTTP
+        conditions: Coppie (colonna di document_events, valore) combinate in OR
+        start_date: Data di inizio (opzionale)
+        end_date: Data di fine (opzionale)
+    """
+    etag = _lifecycle_etag(request, start_date, end_date)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    subquery, params = document_events_subquery(conditions, start_date, end_date)
+    return RawJSONResponse(
+        content=_lifecycle_rows(subquery, params, level, limit, offset, fields, summary),
+        headers={"ETag": etag}
+    )
+
 @router.get("/document/{document_id}", response_model=List[Dict[str, Any]])
 async def get_document_lifecycle(
+    request: Request,
     document_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     level: Optional[str] = None,  # Aggiunto parametro per filtrare per livello di log
     limit: int = 100,
     offset: int = 0,
+    fields: Optional[str] = None,  # Campi da restituire separati da virgola
+    summary: bool = False,  # Restituisce solo i campi delle viste a elenco
     api_key: str = Depends(get_api_key)
 ):
     """
     Recupera tutti i log del ciclo di vita relativi a un documento specifico.
     
-    Il documento viene identificato tramite document_id.
-    Può essere filtrato per livello di log (es. lifecycle, error, info, ecc.)
+    Il documento viene identificato tramite document_id (o tramite file_hash,
+    per i documenti rinominati).
+    Può essere filtrato per intervallo di date e per livello di log.
     """
-    # Se non è specificata una data di inizio, usa gli ultimi 30 giorni
-    if not start_date:
-        start_date = datetime.now() - timedelta(days=30)
-    
-    # Se non è specificata una data di fine, usa la data attuale
-    if not end_date:
-        end_date = datetime.now()
-    
-    # Connessione al database
-    conn = log_manager._get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Costruisci la query di base
-        query_parts = [
-            "SELECT * FROM logs",
-            "WHERE (",
-            "   -- Cerca nei log che hanno il campo document_id nel JSON dei dettagli",
-            "   (details LIKE ? OR details LIKE ?)",
-            "   -- O che hanno file_hash nei dettagli (per documenti rinominati)",
-            "   OR (details LIKE ?)",
-            ")",
-            "AND timestamp BETWEEN ? AND ?"
-        ]
-        
-        # Parametri base per la query
-        params = [
-            f'%"document_id":"{document_id}"%',  # Cerca document_id come stringa
-            f'%"document_id":{document_id}%',    # Cerca document_id come numero
-            f'%"file_hash":"{document_id}"%',    # Cerca il document_id come file_hash
-            start_date.isoformat(),
-            end_date.isoformat()
-        ]
-        
-        # Aggiungi filtro per livello di log se specificato
-        if level and level != "all":
-            query_parts.append("AND level = ?")
-            params.append(level)
-            
-        # Completa la query
-        query_parts.extend([
-            "ORDER BY timestamp ASC",
-            "LIMIT ? OFFSET ?"
-        ])
-        
-        # Aggiungi parametri per limit e offset
-        params.append(str(limit))
-        params.append(str(offset))
-        
-        # Componi la query finale
-        query = "\n".join(query_parts)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        # Converti righe in dizionari
-        logs = []
-        for row in rows:
-            log_dict = dict(row)
-            
-            # Parse JSON fields
-            try:
-                if log_dict["details"]:
-                    log_dict["details"] = json.loads(log_dict["details"])
-            except Exception:
-                log_dict["details"] = {"error": "Invalid JSON", "raw": log_dict["details"]}
-                
-            try:
-                if log_dict["context"]:
-                    log_dict["context"] = json.loads(log_dict["context"])
-            except Exception:
-                log_dict["context"] = {"error": "Invalid JSON", "raw": log_dict["context"]}
-                
-            logs.append(log_dict)
-            
-        return logs
-    
-    finally:
-        conn.close()
+    return _lifecycle_logs(
+        request,
+        [("document_id", document_id), ("file_hash", document_id)],
+        start_date, end_date, level, limit, offset, fields, summary
+    )
 
 @router.get("/file/{file_name}", response_model=List[Dict[str, Any]])
 async def get_file_lifecycle(
+    request: Request,
     file_name: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     level: Optional[str] = None,  # Aggiunto parametro per filtrare per livello di log
     limit: int = 100,
     offset: int = 0,
+    fields: Optional[str] = None,  # Campi da restituire separati da virgola
+    summary: bool = False,  # Restituisce solo i campi delle viste a elenco
     api_key: str = Depends(get_api_key)
 ):
     """
     Recupera tutti i log del ciclo di vita relativi a un file specifico.
     
     Il file viene identificato tramite nome file.
-    Può essere filtrato per livello di log (es. lifecycle, error, info, ecc.)
+    Può essere filtrato per intervallo di date e per livello di log.
     """
-    # Se non è specificata una data di inizio, usa gli ultimi 30 giorni
-    if not start_date:
-        start_date = datetime.now() - timedelta(days=30)
-    
-    # Se non è specificata una data di fine, usa la data attuale
-    if not end_date:
-        end_date = datetime.now()
-    
-    # Connessione al database
-    conn = log_manager._get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Costruisci la query di base
-        query_parts = [
-            "SELECT * FROM logs",
-            "WHERE (",
-            "   -- Cerca nei log che hanno il campo file_name nel JSON dei dettagli",
-            "   details LIKE ?",
-            "   -- O che contengono il nome file nel messaggio",
-            "   OR message LIKE ?",
-            ")",
-            "AND timestamp BETWEEN ? AND ?"
-        ]
-        
-        # Parametri base per la query
-        params = [
-            f'%"file_name":"{file_name}"%',  # Cerca file_name nei dettagli
-            f'%{file_name}%',                # Cerca il nome file nel messaggio
-            start_date.isoformat(),
-            end_date.isoformat()
-        ]
-        
-        # Aggiungi filtro per livello di log se specificato
-        if level and level != "all":
-            query_parts.append("AND level = ?")
-            params.append(level)
-            
-        # Completa la query
-        query_parts.extend([
-            "ORDER BY timestamp ASC",
-            "LIMIT ? OFFSET ?"
-        ])
-        
-        # Aggiungi parametri per limit e offset
-        params.append(str(limit))
-        params.append(str(offset))
-        
-        # Componi la query finale
-        query = "\n".join(query_parts)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        # Converti righe in dizionari
-        logs = []
-        for row in rows:
-            log_dict = dict(row)
-            
-            # Parse JSON fields
-            try:
-                if log_dict["details"]:
-                    log_dict["details"] = json.loads(log_dict["details"])
-            except Exception:
-                log_dict["details"] = {"error": "Invalid JSON", "raw": log_dict["details"]}
-                
-            try:
-                if log_dict["context"]:
-                    log_dict["context"] = json.loads(log_dict["context"])
-            except Exception:
-                log_dict["context"] = {"error": "Invalid JSON", "raw": log_dict["context"]}
-                
-            logs.append(log_dict)
-            
-        return logs
-    
-    finally:
-        conn.close()
+    return _lifecycle_logs(
+        request,
+        [("file_name", file_name)],
+        start_date, end_date, level, limit, offset, fields, summary
+    )
 
 @router.get("/hash/{file_hash}", response_model=List[Dict[str, Any]])
 async def get_lifecycle_by_hash(
+    request: Request,
     file_hash: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     level: Optional[str] = None,  # Aggiunto parametro per filtrare per livello di log
     limit: int = 100,
     offset: int = 0,
+    fields: Optional[str] = None,  # Campi da restituire separati da virgola
+    summary: bool = False,  # Restituisce solo i campi delle viste a elenco
     api_key: str = Depends(get_api_key)
 ):
     """
     Recupera tutti i log del ciclo di vita relativi a un file specifico tramite il suo hash.
     
     Utile per tracciare documenti che sono stati rinominati.
-    Può essere filtrato per livello di log (es. lifecycle, error, info, ecc.)
+    Può essere filtrato per intervallo di date e per livello di log.
     """
-    # Se non è specificata una data di inizio, usa gli ultimi 30 giorni
-    if not start_date:
-        start_date = datetime.now() - timedelta(days=30)
+    return _lifecycle_logs(
+        request,
+        [("file_hash", file_hash)],
+        start_date, end_date, level, limit, offset, fields, summary
+    )
+
+@router.get("/lineage/{identifier}", response_model=Dict[str, Any])
+async def get_document_lineage(
+    request: Request,
+    identifier: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    level: Optional[str] = None,
+    limit: int = 500,
+    offset: int = 0,
+    fields: Optional[str] = None,  # Campi da restituire separati da virgola
+    summary: bool = False,  # Restituisce solo i campi delle viste a elenco
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Recupera la storia completa di un documento a partire da un suo identificativo qualsiasi.
     
-    # Se non è specificata una data di fine, usa la data attuale
-    if not end_date:
-        end_date = datetime.now()
+    L'identificativo può essere un document_id, un file_hash o un file_name: la
+    risposta include tutti gli identificativi collegati (ad esempio i nomi
+    assunti dal documento dopo le rinomine) e gli eventi in ordine cronologico.
+    """
+    # Gli identificativi collegati dipendono da tutti gli eventi, non solo da quelli dell'intervallo
+    etag = _lifecycle_etag(request)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
     
-    # Connessione al database
     conn = log_manager._get_connection()
-    cursor = conn.cursor()
+    try:
+        cursor = conn.cursor()
+        lineage_ids = find_lineages(cursor, identifier)
+        identifiers = lineage_identifiers(cursor, lineage_ids)
+    finally:
+        conn.close()
+    
+    if not lineage_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nessun evento del ciclo di vita per l'identificativo {identifier}"
+        )
+    
+    subquery, params = lineage_events_subquery(lineage_ids, start_date, end_date)
+    events = _lifecycle_rows(subquery, params, level, limit, offset, fields, summary)
     
+    header = json.dumps({"identifier": identifier, "identifiers": identifiers})
+    return RawJSONResponse(content=header[:-1] + f', "events": {events}}}', headers={"ETag": etag})
+
+def _document_states(**filters) -> Dict[str, Any]:
+    """
+    Legge una pagina della tabella document_state con il totale dei documenti filtrati.
+    
+    Solleva HTTPException 400 se l'ordinamento richiesto non è valido.
+    """
     try:
-        # Costruisci la query di base
-        query_parts = [
-            "SELECT * FROM logs",
-            "WHERE details LIKE ?",
-            "AND timestamp BETWEEN ? AND ?"
-        ]
-        
-        # Parametri base per la query
-        params = [
-            f'%"file_hash":"{file_hash}"%',  # Cerca file_hash nei dettagli
-            start_date.isoformat(),
-            end_date.isoformat()
-        ]
-        
-        # Aggiungi filtro per livello di log se specificato
-        if level and level != "all":
-            query_parts.append("AND level = ?")
-            params.append(level)
-            
-        # Completa la query
-        query_parts.extend([
-            "ORDER BY timestamp ASC",
-            "LIMIT ? OFFSET ?"
-        ])
-        
-        # Aggiungi parametri per limit e offset
-        params.append(str(limit))
-        params.append(str(offset))
-        
-        # Componi la query finale
-        query = "\n".join(query_parts)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        # Converti righe in dizionari
-        logs = []
-        for row in rows:
-            log_dict = dict(row)
-            
-            # Parse JSON fields
-            try:
-                if log_dict["details"]:
-                    log_dict["details"] = json.loads(log_dict["details"])
-            except Exception:
-                log_dict["details"] = {"error": "Invalid JSON", "raw": log_dict["details"]}
-                
-            try:
-                if log_dict["context"]:
-                    log_dict["context"] = json.loads(log_dict["context"])
-            except Exception:
-                log_dict["context"] = {"error": "Invalid JSON", "raw": log_dict["context"]}
-                
-            logs.append(log_dict)
-            
-        return logs
+        query, params, count_query, count_params = build_state_query(**filters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
+    conn = log_manager._get_connection()
+    try:
+        total = conn.execute(count_query, count_params).fetchone()[0]
+        documents = [state_to_dict(row) for row in conn.execute(query, params).fetchall()]
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+    
+    return {
+        "total": total,
+        "limit": filters.get("limit"),
+        "offset": filters.get("offset"),
+        "documents": documents
+    }
+
+@router.get("/documents", response_model=Dict[str, Any])
+async def list_document_states(
+    request: Request,
+    response: Response,
+    document_id: Optional[str] = None,
+    file_name: Optional[str] = None,  # Corrispondenza parziale sul nome file
+    event: Optional[str] = None,  # Ultimo evento (corrispondenza esatta)
+    stage: Optional[str] = None,  # Fasi separate da virgola contenute nell'ultimo evento
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    has_error: Optional[bool] = None,
+    sort_by: str = "last_timestamp",
+    sort_order: str = "desc",
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Elenca lo stato corrente dei documenti (una riga per documento).
+    
+    Ogni documento riporta l'ultimo evento del ciclo di vita, i conteggi per tipo
+    di evento e l'ultimo errore. I documenti rinominati compaiono una sola volta,
+    con gli identificativi più recenti.
+    """
+    etag = _lifecycle_etag(request)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    return _document_states(
+        document_id=document_id,
+        file_name=file_name,
+        event=event,
+        stages=[item.strip() for item in stage.split(",") if item.strip()] if stage else None,
+        updated_after=updated_after,
+        updated_before=updated_before,
+        has_error=has_error,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset
+    )
+
+@router.get("/documents/stuck", response_model=Dict[str, Any])
+async def list_stuck_documents(
+    request: Request,
+    response: Response,
+    minutes: Optional[int] = Query(None, ge=1),
+    stage: Optional[str] = None,  # Fasi separate da virgola (predefinite da lifecycle_stuck_stages)
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Elenca i documenti fermi in una fase intermedia (es. upload o delete) da più di N minuti.
+    
+    I documenti più vecchi vengono restituiti per primi. La soglia è arrotondata
+    al minuto, così le richieste in polling possono ricevere 304 entro il minuto.
+    """
+    settings = get_settings()
+    if minutes is None:
+        minutes = settings.lifecycle_stuck_minutes
+    stages = [item.strip() for item in stage.split(",") if item.strip()] if stage else settings.lifecycle_stuck_stages
+    updated_before = (datetime.now() - timedelta(minutes=minutes)).replace(second=0, microsecond=0)
+    
+    etag = _lifecycle_etag(request, updated_before=updated_before)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    return _document_states(
+        stages=stages,
+        updated_before=updated_before,
+        sort_by="last_timestamp",
+        sort_order="asc",
+        limit=limit,
+        offset=offset
+    )
+
+# Colonne ausiliarie della query batch, escluse dagli oggetti dei log
+BATCH_GROUP_COLUMNS = ("group_kind", "group_value", "group_total")
+
+@router.post("/documents/batch", response_model=Dict[str, Any])
+async def get_documents_lifecycle_batch(
+    batch: LifecycleBatchRequest,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Recupera il ciclo di vita di più documenti con una sola richiesta.
+    
+    Accetta document_id, file_hash e nomi file (fino a lifecycle_batch_max_identifiers
+    in totale) e li risolve con un'unica query sugli indici di document_events.
+    I risultati sono raggruppati per identificativo, nell'ordine della richiesta;
+    limit e offset si applicano a ciascun gruppo e group["total"] riporta il
+    numero complessivo di log del gruppo.
+    """
+    identifiers = list(dict.fromkeys(
+        [("document_id", value) for value in batch.document_ids]
+        + [("file_hash", value) for value in batch.file_hashes]
+        + [("file_name", value) for value in batch.file_names]
+    ))
+    
+    max_identifiers = get_settings().lifecycle_batch_max_identifiers
+    if not identifiers:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specificare almeno un document_id, file_hash o file_name"
+        )
+    if len(identifiers) > max_identifiers:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Troppi identificativi: {len(identifiers)} (massimo {max_identifiers})"
+        )
+    
+    # Colonne richieste (proiezione), qualificate per la join con document_events
+    columns = _select_columns(batch.fields, batch.summary)
+    if columns.startswith("*"):
+        columns = "logs." + columns
+    
+    query, params = document_events_batch_query(
+        identifiers,
+        columns,
+        start_date=batch.start_date,
+        end_date=batch.end_date,
+        level=batch.level,
+        limit=batch.limit,
+        offset=batch.offset
+    )
+    
+    conn = log_manager._get_connection()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    
+    # Raggruppa le righe per identificativo mantenendo l'ordine della richiesta
+    groups = {identifier: {"total": 0, "logs": []} for identifier in identifiers}
+    for row in rows:
+        group = groups[(row["group_kind"], row["group_value"])]
+        group["total"] = row["group_total"]
+        group["logs"].append(render_row(row, _repair_row, exclude=BATCH_GROUP_COLUMNS))
+    
+    results = []
+    for (kind, value), group in groups.items():
+        header = json.dumps({
+            "type": kind,
+            "identifier": value,
+            "total": group["total"],
+            "limit": batch.limit,
+            "offset": batch.offset
+        })
+        results.append(header[:-1] + f', "logs": [{", ".join(group["logs"])}]}}')
+    
+    return RawJSONResponse(content='{"results": [' + ", ".join(results) + "]}")
@@ -3,19 +3,53 @@ Router per le API di logging.
 Definisce gli endpoint per l'invio e la gestione dei log.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Body, WebSocket
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple
 from datetime import datetime
 import uuid
 import json
+import csv
+import io
+import zlib
 
 from core.models import LogEntry, LogLevel, LogProject
-from core.log_manager import LogManager
-from core.auth import get_api_key
+from core.log_manager import LogManager, parse_fields
+from core.auth import get_api_key, get_api_key_id, get_api_key_info
+from core.query_cache import ALL_PROJECTS, bump_generation, filter_fingerprint, get_result_cache, get_watermark
+from core.raw_json import RawJSONResponse, JSON_VALID_COLUMNS, render_row
+from core.conditional import make_etag, is_not_modified, not_modified
+from core.live_tail import TailHub, TailSubscription, TailWebSocketSession
+from core.config import get_settings
+from core.timestamps import normalize_timestamp
 
 router = APIRouter()
 log_manager = LogManager()
 
+def _attribute_filters(request: Request) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Estrae dalla query string i filtri context.<chiave>=valore e details.<chiave>=valore.
+    
+    Solleva HTTPException 400 se una chiave non è valida.
+    
+    Returns:
+        Tupla (filtri sul context, filtri sui details)
+    """
+    context_filter = {}
+    details_filter = {}
+    for name, value in request.query_params.items():
+        if name.startswith("context."):
+            context_filter[name[len("context."):]] = value
+        elif name.startswith("details."):
+            details_filter[name[len("details."):]] = value
+    
+    try:
+        log_manager._attribute_filters(context_filter, details_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return context_filter, details_filter
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_log(
     log_entry: LogEntry = Body(...),
@@ -26,7 +60,7 @@ async def create_log(
     
     Richiede un API key valido per l'autenticazione.
     """
-    log_id = log_manager.add_log(log_entry)
+    log_id = log_manager.add_log(log_entry, api_key_id=get_api_key_id(api_key))
     return {"id": log_id, "message": "Log registrato con successo"}
 
 @router.post("/batch", status_code=status.HTTP_201_CREATED)
@@ -40,11 +74,12 @@ async def create_logs_batch(
     Utile per l'invio di log in batch in caso di connessione intermittente.
     Richiede un API key valido per l'autenticazione.
     """
-    log_ids = log_manager.add_logs_batch(log_entries)
+    log_ids = log_manager.add_logs_batch(log_entries, api_key_id=get_api_key_id(api_key))
     return {"ids": log_ids, "count": len(log_ids), "message": "Logs registrati con successo"}
 
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_logs(
+    request: Request,
     project: Optional[LogProject] = None,
     level: Optional[LogLevel] = None,
     module: Optional[str] = None,
@@ -56,6 +91,8 @@ async def get_logs(
     sort_order: str = "desc",
     limit: int = 100,
     offset: int = 0,
+    fields: Optional[str] = None,
+    summary: bool = False,
     api_key: str = Depends(get_api_key)
 ):
     """
@@ -75,8 +112,28 @@ async def get_logs(
     - sort_order: Ordine di ordinamento (asc, desc)
     - limit: Numero massimo di log da restituire
     - offset: Offset per la paginazione
+    - fields: Campi da restituire separati da virgola (es. timestamp,level,message); l'id è sempre incluso
+    - summary: Se True restituisce solo id, timestamp, project, level, module e message
+    - context.<chiave>, details.<chiave>: Filtra per valore di una chiave di context o details
+      (es. context.request_id=abc123, details.document_id=42; le chiavi annidate usano il punto)
+    
+    Il numero totale di log che soddisfano i filtri è restituito negli header
+    X-Total-Count e X-Total-Count-Approximate ("true" se il totale è stimato).
+    La risposta include un ETag: con If-None-Match, se nessun log del progetto
+    è stato scritto nell'intervallo richiesto, l'endpoint risponde 304.
     """
-    logs = log_manager.get_logs(
+    try:
+        selected_fields = parse_fields(fields, summary)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    context_filter, details_filter = _attribute_filters(request)
+    
+    # Le query identiche (es. integrazioni in polling) sono servite dalla cache dei
+    # risultati finché non arrivano log del progetto nel loro intervallo temporale
+    cache = get_result_cache()
+    cache_key = filter_fingerprint(
+        db_path=log_manager.db_path,
         project=project,
         level=level,
         module=module,
@@ -87,61 +144,501 @@ async def get_logs(
         sort_by=sort_by,
         sort_order=sort_order,
         limit=limit,
-        offset=offset
+        offset=offset,
+        fields=selected_fields,
+        context_filter=context_filter or None,
+        details_filter=details_filter or None
+    )
+    scope = project.value if project else ALL_PROJECTS
+    # Gli estremi vanno confrontati con la cronologia delle scritture (ora locale senza fuso)
+    start = normalize_timestamp(start_date) if start_date else None
+    end = normalize_timestamp(end_date) if end_date else None
+    
+    # Se il client ha già la versione corrente risponde 304 senza eseguire la query
+    etag = make_etag(cache_key, scope, start, end)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    cached = cache.get(cache_key)
+    if cached is None:
+        watermark = get_watermark()
+        cached = _query_logs(
+            project, level, module, document_id, file_name, start_date, end_date,
+            sort_by, sort_order, limit, offset, selected_fields, context_filter, details_filter
+        )
+        cache.set(
+            cache_key,
+            cached,
+            size=len(cached[0]),
+            watermark=watermark,
+            scope=scope,
+            start=start,
+            end=end
+        )
+    content, total, approximate = cached
+    
+    return RawJSONResponse(
+        content=content,
+        headers={
+            "X-Total-Count": str(total),
+            "X-Total-Count-Approximate": "true" if approximate else "false",
+            "ETag": etag
+        }
     )
-    return logs
 
-@router.get("/{log_id}", response_model=Dict[str, Any])
-async def get_log_by_id(
-    log_id: str,
+def _query_logs(
+    project: Optional[LogProject],
+    level: Optional[LogLevel],
+    module: Optional[str],
+    document_id: Optional[str],
+    file_name: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    sort_by: str,
+    sort_order: str,
+    limit: int,
+    offset: int,
+    selected_fields: Optional[List[str]],
+    context_filter: Dict[str, str],
+    details_filter: Dict[str, str]
+) -> Tuple[str, int, bool]:
+    """
+    Esegue la query di GET /api/logs.
+    
+    Returns:
+        Tupla (array JSON dei log, totale dei log filtrati, True se il totale è stimato)
+    """
+    count = log_manager.count_logs(
+        project=project,
+        level=level,
+        module=module,
+        document_id=document_id,
+        file_name=file_name,
+        start_date=start_date,
+        end_date=end_date,
+        context_filter=context_filter,
+        details_filter=details_filter
+    )
+    
+    # I campi details e context vengono copiati nella risposta senza decodificarli
+    content = log_manager.get_logs_json(
+        project=project,
+        level=level,
+        module=module,
+        document_id=document_id,
+        file_name=file_name,
+        start_date=start_date,
+        end_date=end_date,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset,
+        fields=selected_fields,
+        context_filter=context_filter,
+        details_filter=details_filter
+    )
+    return content, count["total"], count["approximate"]
+
+@router.get("/export")
+async def export_logs(
+    request: Request,
+    project: Optional[LogProject] = None,
+    level: Optional[LogLevel] = None,
+    module: Optional[str] = None,
+    document_id: Optional[str] = None,
+    file_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    sort_order: str = "asc",
+    format: str = "ndjson",
+    compress: bool = False,
+    include_archives: bool = True,
     api_key: str = Depends(get_api_key)
 ):
     """
-    Recupera una voce di log specifica in base all'ID.
+    Esporta in streaming tutti i log che soddisfano i filtri.
     
     Richiede un API key valido per l'autenticazione.
-    """
-    # Aggiungiamo il metodo get_log_by_id al LogManager
-    conn = log_manager._get_connection()
-    cursor = conn.cursor()
     
-    # Esegui la query per trovare il log con l'ID specificato
-    cursor.execute("SELECT * FROM logs WHERE id = ?", (log_id,))
-    row = cursor.fetchone()
+    A differenza di GET /api/logs non applica limiti di paginazione: le righe vengono
+    lette dal database a blocchi e inviate man mano, quindi la memoria usata resta
+    costante. Se l'intervallo comprende log già compressi vengono letti anche gli archivi.
     
-    if not row:
-        conn.close()
+    Parametri:
+    - project, level, module, document_id, file_name, start_date, end_date: come GET /api/logs
+    - context.<chiave>, details.<chiave>: come GET /api/logs
+    - sort_order: Ordine cronologico (asc, desc)
+    - format: Formato di output (ndjson, csv)
+    - compress: Se True restituisce un file gzip
+    - include_archives: Include i log presenti negli archivi compressi
+    """
+    if format not in ("ndjson", "csv"):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Log con ID {log_id} non trovato"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato non supportato. Valori ammessi: ndjson, csv"
         )
     
-    # Converti in dizionario
-    log_dict = dict(row)
+    context_filter, details_filter = _attribute_filters(request)
     
-    # Converti JSON in dizionari con gestione degli errori
-    if log_dict["details"]:
-        try:
-            log_dict["details"] = json.loads(log_dict["details"])
-        except Exception as e:
-            import logging
-            logging.error(f"Errore durante il parsing JSON dei dettagli per il log {log_id}: {str(e)}")
-            # Invece di avere valori undefined, manteniamo almeno i dati originali
-            log_dict["details"] = {"error": "Formato JSON non valido", "raw_data": log_dict["details"]}
+    logs = log_manager.iter_logs(
+        project=project,
+        level=level,
+        module=module,
+        document_id=document_id,
+        file_name=file_name,
+        start_date=start_date,
+        end_date=end_date,
+        sort_order=sort_order,
+        include_archives=include_archives,
+        context_filter=context_filter,
+        details_filter=details_filter
+    )
     
-    if log_dict["context"]:
-        try:
-            log_dict["context"] = json.loads(log_dict["context"])
-        except Exception as e:
-            import logging
-            logging.error(f"Errore durante il parsing JSON del contesto per il log {log_id}: {str(e)}")
-            log_dict["context"] = {"error": "Formato JSON non valido", "raw_data": log_dict["context"]}
+    chunks = _export_ndjson(logs) if format == "ndjson" else _export_csv(logs)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"logs_export.{format}"
     
-    conn.close()
-    return log_dict
+    if compress:
+        chunks = _gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Numero di log accumulati prima di inviare un blocco al client
+EXPORT_CHUNK_SIZE = 500
+EXPORT_CSV_FIELDS = ["id", "timestamp", "project", "level", "module", "message", "details", "context"]
+
+def _export_ndjson(logs: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Serializza i log in formato NDJSON (un oggetto JSON per riga).
+    """
+    lines = []
+    for log in logs:
+        lines.append(json.dumps(log, default=str))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def _export_csv(logs: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Serializza i log in formato CSV; details e context sono inclusi come testo JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_FIELDS)
+    
+    rows = 0
+    for log in logs:
+        writer.writerow([
+            json.dumps(log.get(field), default=str) if field in ("details", "context") and log.get(field) is not None
+            else log.get(field)
+            for field in EXPORT_CSV_FIELDS
+        ])
+        rows += 1
+        if rows >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows = 0
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Comprime in gzip un flusso di blocchi senza accumularlo in memoria.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@router.get("/histogram", response_model=Dict[str, Any])
+async def get_log_histogram(
+    request: Request,
+    interval: str = "5m",
+    group_by: Optional[str] = None,
+    project: Optional[LogProject] = None,
+    level: Optional[LogLevel] = None,
+    module: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    document_id: Optional[str] = None,
+    file_name: Optional[str] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Restituisce il volume dei log nel tempo, pronto per un grafico.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - interval: Ampiezza dei bucket (1m, 5m, 1h)
+    - group_by: Serie per level, project o module (opzionale)
+    - project, level, module, start_date, end_date, document_id, file_name: Filtri come in GET /api/logs
+    - context.<chiave>, details.<chiave>: Filtri chiave/valore su context e details
+    
+    La risposta contiene l'elenco dei bucket e, per ciascuna serie, un array
+    con un valore per bucket (zero compreso). Il numero di bucket è limitato
+    da histogram_max_buckets.
+    """
+    context_filter, details_filter = _attribute_filters(request)
+    
+    try:
+        return log_manager.get_histogram(
+            interval=interval,
+            group_by=group_by,
+            project=project,
+            level=level,
+            module=module,
+            start_date=start_date,
+            end_date=end_date,
+            document_id=document_id,
+            file_name=file_name,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/facets", response_model=Dict[str, Any])
+async def get_log_facets(
+    request: Request,
+    facets: Optional[str] = None,
+    limit: int = 20,
+    project: Optional[LogProject] = None,
+    level: Optional[LogLevel] = None,
+    module: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    document_id: Optional[str] = None,
+    file_name: Optional[str] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Restituisce i conteggi per livello, progetto e modulo dei log che soddisfano i filtri.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - facets: Faccette da calcolare separate da virgola (level, project, module; predefinite tutte)
+    - limit: Numero massimo di valori per faccetta
+    - project, level, module, start_date, end_date, document_id, file_name: Filtri come in GET /api/logs
+    - context.<chiave>, details.<chiave>: Filtri chiave/valore su context e details
+    
+    Tutte le faccette sono calcolate con una sola query; il risultato resta in
+    cache finché non vengono scritti o eliminati dei log.
+    """
+    context_filter, details_filter = _attribute_filters(request)
+    facet_list = [facet.strip() for facet in facets.split(",") if facet.strip()] if facets else None
+    
+    try:
+        return log_manager.get_facets(
+            facets=facet_list,
+            project=project,
+            level=level,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter,
+            facet_limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/groups", response_model=Dict[str, Any])
+async def get_log_groups(
+    project: Optional[LogProject] = None,
+    level: Optional[LogLevel] = None,
+    module: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 20,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Restituisce i gruppi di messaggi (modelli con le parti variabili sostituite da <*>) più frequenti.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - project, level, module: Filtri come in GET /api/logs (es. level=error)
+    - start_date, end_date: Intervallo (predefinito: l'ultima ora)
+    - limit: Numero massimo di gruppi
+    
+    I conteggi provengono dalla tabella dei modelli aggiornata all'inserimento,
+    con la risoluzione di un minuto; ogni gruppo riporta il fingerprint_id,
+    il modello, il conteggio nell'intervallo e un messaggio di esempio.
+    """
+    return log_manager.get_groups(
+        project=project,
+        level=level,
+        module=module,
+        start_date=start_date,
+        end_date=end_date,
+        limit=limit
+    )
+
+@router.get("/top/{dimension}", response_model=Dict[str, Any])
+async def get_log_top(
+    dimension: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    k: int = 10,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Restituisce i valori più frequenti di una dimensione (stima approssimata).
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - dimension: module, fingerprint (modello del messaggio), document (details.document_id) o api_key
+    - start_date, end_date: Intervallo (predefinito: le ultime 24 ore), considerato per ore intere
+    - k: Numero di valori restituiti
+    
+    I valori sono letti dagli sketch orari mantenuti all'inserimento, quindi il
+    costo non dipende dal numero di log; ogni conteggio è una sovrastima di al
+    più "error".
+    """
+    try:
+        return log_manager.get_top(dimension, start_date=start_date, end_date=end_date, k=k)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/distinct/{dimension}", response_model=Dict[str, Any])
+async def get_log_distinct(
+    dimension: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Stima il numero di valori distinti di una dimensione in un intervallo.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - dimension: client (progetto:modulo), module o document (details.document_id)
+    - start_date, end_date: Intervallo, esteso alle ore intere; senza entrambi
+      vengono contati tutti i valori mai ricevuti
+    
+    Il conteggio è ottenuto unendo sketch HyperLogLog per giorno e per ora
+    (errore tipico intorno al 2%), senza leggere la tabella dei log.
+    """
+    try:
+        return log_manager.count_distinct(dimension, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/tail")
+async def tail_logs(
+    request: Request,
+    project: Optional[LogProject] = None,
+    level: Optional[LogLevel] = None,
+    module: Optional[str] = None,
+    document_id: Optional[str] = None,
+    text: Optional[str] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Segue in tempo reale i log scritti (Server-Sent Events).
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    Parametri:
+    - project, level, module: Filtrano per valore esatto
+    - document_id: Filtra per details.document_id o context.document_id
+    - text: Testo contenuto nel messaggio (senza distinzione di maiuscole)
+    
+    Eventi inviati:
+    - subscribed: identificativo e filtri della sottoscrizione
+    - log: un log nel formato di GET /api/logs
+    - lag: il client non ha letto abbastanza in fretta e sono stati scartati
+      dei log ({"dropped": persi dall'ultimo evento, "total_dropped": ...})
+    
+    I filtri vengono valutati una sola volta per log, al momento della
+    scrittura; ogni client ha una coda di tail_queue_size log, quindi un
+    client lento perde i log più vecchi ma non rallenta la scrittura.
+    """
+    settings = get_settings()
+    hub = log_manager.tail
+    if hub.subscriber_count >= settings.tail_max_subscribers:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Troppi client collegati al live tail (massimo {settings.tail_max_subscribers})"
+        )
+    
+    subscription = hub.subscribe(
+        {
+            "project": project.value if project else None,
+            "level": level.value if level else None,
+            "module": module,
+            "document_id": document_id
+        },
+        text
+    )
+    return StreamingResponse(
+        _tail_events(request, hub, subscription, settings.tail_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _tail_events(request: Request, hub: TailHub, subscription: TailSubscription, heartbeat: float) -> AsyncIterator[str]:
+    """
+    Genera gli eventi SSE di una sottoscrizione finché il client resta collegato.
+    """
+    try:
+        yield f"event: subscribed\ndata: {json.dumps(subscription.describe())}\n\n"
+        while not await request.is_disconnected():
+            await subscription.wait(heartbeat)
+            payloads, dropped = subscription.drain()
+            if dropped:
+                lag = {"dropped": dropped, "total_dropped": subscription.total_dropped}
+                yield f"event: lag\ndata: {json.dumps(lag)}\n\n"
+            if payloads:
+                yield "".join(f"event: log\ndata: {payload}\n\n" for payload in payloads)
+            elif not dropped:
+                # Commento SSE: mantiene aperta la connessione attraverso i proxy
+                yield ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+@router.websocket("/ws")
+async def tail_logs_websocket(websocket: WebSocket, api_key: Optional[str] = None):
+    """
+    Segue in tempo reale i log scritti su WebSocket, con più sottoscrizioni per connessione.
+    
+    L'API key si passa nell'header X-API-Key o, dai browser, nel parametro
+    api_key. Sulla connessione il client può aprire sottoscrizioni (subscribe),
+    cambiarne filtri e opzioni (update) e chiuderle (unsubscribe); i log
+    arrivano a blocchi, un frame ogni batch_ms millisecondi o ogni batch_size
+    log (vedi TailWebSocketSession per il protocollo).
+    """
+    key = websocket.headers.get("x-api-key") or api_key
+    if not key or not get_api_key_info(key):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    await TailWebSocketSession(websocket, log_manager.tail).run()
 
 @router.get("/stats")
 async def get_log_stats(
+    request: Request,
+    response: Response,
     project: Optional[LogProject] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
@@ -151,7 +648,21 @@ async def get_log_stats(
     Recupera statistiche sui log.
     
     Richiede un API key valido per l'autenticazione.
+    
+    Dichiarato prima di /{log_id}, che altrimenti intercetterebbe il percorso.
+    Supporta le richieste condizionali (If-None-Match): se nessun log del
+    progetto è stato scritto nell'intervallo risponde 304.
     """
+    etag = make_etag(
+        filter_fingerprint(endpoint="stats", db_path=log_manager.db_path, project=project, start_date=start_date, end_date=end_date),
+        project.value if project else ALL_PROJECTS,
+        normalize_timestamp(start_date) if start_date else None,
+        normalize_timestamp(end_date) if end_date else None
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
     stats = log_manager.get_stats(
         project=project,
         start_date=start_date,
@@ -159,6 +670,72 @@ async def get_log_stats(
     )
     return stats
 
+@router.get("/trace/{correlation_id}", response_model=Dict[str, Any])
+async def get_trace(
+    correlation_id: str,
+    key: Optional[str] = None,
+    limit: int = 1000,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Restituisce la cronologia di una richiesta attraverso tutti i progetti.
+    
+    Richiede un API key valido per l'autenticazione.
+    
+    I log vengono trovati tramite l'indice di correlazione popolato in fase di
+    inserimento (request_id e le altre chiavi configurate in correlation_keys).
+    
+    Parametri:
+    - correlation_id: Identificativo da cercare (es. il request_id)
+    - key: Limita la ricerca a una chiave di correlazione (es. context.request_id)
+    - limit: Numero massimo di log da restituire
+    """
+    trace = log_manager.get_trace(
+        correlation_id=correlation_id,
+        correlation_key=key,
+        limit=limit
+    )
+    
+    if trace["count"] == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nessun log trovato per l'identificativo {correlation_id}"
+        )
+    
+    return trace
+
+@router.get("/{log_id}", response_model=Dict[str, Any])
+async def get_log_by_id(
+    log_id: str,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Recupera una voce di log specifica in base all'ID.
+    
+    Richiede un API key valido per l'autenticazione.
+    """
+    # Aggiungiamo il metodo get_log_by_id al LogManager
+    conn = log_manager._get_connection()
+    cursor = conn.cursor()
+    
+    # Esegui la query per trovare il log con l'ID specificato
+    cursor.execute(f"SELECT *, {JSON_VALID_COLUMNS} FROM logs WHERE id = ?", (log_id,))
+    row = cursor.fetchone()
+    
+    if not row:
+        conn.close()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Log con ID {log_id} non trovato"
+        )
+    
+    # Il JSON memorizzato viene inserito nella risposta senza decodificarlo;
+    # le righe con JSON non valido vengono riparate da LogManager
+    content = render_row(row, log_manager._row_to_dict)
+    
+    conn.close()
+    return RawJSONResponse(content=content)
+
 @router.delete("/cleanup")
 async def cleanup_logs(
     days_to_keep: int = 30,
@@ -247,10 +824,11 @@ async def cleanup_unarchived(
     if not cursor.fetchone():
         # Se non esiste, allora non ci sono log archiviati: cancella tutto
         try:
-            cursor.execute("DELETE FROM logs")
+            cursor.execute("DELETE FROM log_records")
             deleted_count = cursor.rowcount
             conn.commit()
             conn.close()
+            bump_generation()
             return {"deleted_count": deleted_count, "message": f"Eliminati {deleted_count} log (nessun archivio trovato)"}
         except Exception as e:
             conn.rollback()
@@ -259,10 +837,11 @@ async def cleanup_unarchived(
 
     # Se la tabella esiste, elimina i log il cui id non è presente in compressed_logs
     try:
-        cursor.execute("DELETE FROM logs WHERE id NOT IN (SELECT log_id FROM compressed_logs)")
+        cursor.execute("DELETE FROM log_records WHERE id NOT IN (SELECT log_id FROM compressed_logs)")
         deleted_count = cursor.rowcount
         conn.commit()
         conn.close()
+        bump_generation()
         return {"deleted_count": deleted_count, "message": f"Eliminati {deleted_count} log non archiviati"}
     except Exception as e:
         conn.rollback()
@@ -300,10 +879,11 @@ async def cleanup_all(
             pass
 
         # 2) elimina tutti i logs
-        cursor.execute("DELETE FROM logs")
+        cursor.execute("DELETE FROM log_records")
         deleted_logs = cursor.rowcount
 
         conn.commit()
+        bump_generation()
     except Exception as e:
         conn.rollback()
         conn.close()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Fixture comuni dei test: LogManager su database temporanei, client HTTP dell'app e fuso orario locale
+"""
+
+import sys
+import os
+import time
+import tempfile
+from datetime import timedelta, timezone
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.log_manager import LogManager
+from core.hot_tier import HotTier
+
+HEADERS = {"X-API-Key": "pramaiaadmin_api_key_123456"}
+
+# Fusi dei parametri di data nei test (UTC, offset negativo e offset positivo non intero)
+UTC_OFFSETS = {
+    "Z": timezone.utc,
+    "-02:00": timezone(timedelta(hours=-2)),
+    "+05:30": timezone(timedelta(hours=5, minutes=30))
+}
+
+
+@pytest.fixture
+def make_log_manager():
+    """
+    Crea LogManager su database temporanei.
+
+    La funzione restituita accetta db_path (predefinito: un nuovo database
+    temporaneo) e hot_tier_bytes (0 disabilita l'hot tier, così le letture
+    vengono servite da SQLite).
+    """
+    def make(db_path=None, hot_tier_bytes=None):
+        if db_path is None:
+            db_path = os.path.join(tempfile.mkdtemp(), "test_logs.db")
+        log_manager = LogManager(db_path=db_path)
+        if hot_tier_bytes is not None:
+            log_manager.hot_tier = HotTier(max_bytes=hot_tier_bytes)
+            conn = log_manager._get_connection()
+            log_manager.hot_tier.load(conn)
+            conn.close()
+        return log_manager
+
+    return make
+
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager su un database temporaneo con la configurazione predefinita"""
+    return make_log_manager()
+
+
+@pytest.fixture
+def headers():
+    """Header con l'API key di amministrazione"""
+    return dict(HEADERS)
+
+
+@pytest.fixture
+def use_log_manager(monkeypatch):
+    """
+    Installa un LogManager in tutti i router dell'app e restituisce un TestClient.
+
+    I router originali vengono ripristinati alla fine del test.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+    from api import log_router, document_lifecycle_router, client_router
+    from web import search_router
+
+    def use(log_manager):
+        for module in (log_router, document_lifecycle_router, client_router, search_router):
+            monkeypatch.setattr(module, "log_manager", log_manager)
+        return TestClient(main.app)
+
+    return use
+
+
+@pytest.fixture
+def client(use_log_manager, log_manager):
+    """TestClient dell'app servita dal LogManager della fixture log_manager"""
+    return use_log_manager(log_manager)
+
+
+@pytest.fixture(params=list(UTC_OFFSETS))
+def aware_iso(request):
+    """
+    Converte un datetime locale nel testo ISO con fuso inviato dai client.
+
+    Il test viene eseguito una volta per fuso di UTC_OFFSETS; in UTC il
+    testo termina con Z, come nelle date JavaScript.
+    """
+    offset = UTC_OFFSETS[request.param]
+
+    def convert(moment):
+        text = moment.astimezone(offset).isoformat()
+        return text[:-len("+00:00")] + "Z" if request.param == "Z" else text
+
+    return convert
+
+
+@pytest.fixture
+def local_timezone():
+    """
+    Imposta il fuso locale del processo (variabile TZ) per la durata del test.
+
+    La funzione restituita accetta il nome del fuso (es. "Europe/Rome").
+    """
+    previous = os.environ.get("TZ")
+
+    def set_timezone(name):
+        os.environ["TZ"] = name
+        time.tzset()
+
+    yield set_timezone
+    if previous is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
@@ -0,0 +1,123 @@
+"""
+Lettura incrementale dei log contenuti negli archivi compressi.
+
+Ogni file JSON di un archivio contiene un array di log. Per esportare archivi
+di qualsiasi dimensione con memoria costante, gli elementi dell'array vengono
+decodificati uno alla volta da un buffer di dimensione limitata invece di
+caricare il file intero con json.load. Per l'ordine decrescente i log vengono
+riversati in un file temporaneo (una riga JSON per log) e riletti dalla fine.
+"""
+
+import io
+import json
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator
+
+# Caratteri letti per volta dal file dell'archivio
+READ_CHUNK_SIZE = 64 * 1024
+
+# Caratteri tra un elemento e l'altro dell'array
+_SEPARATORS = " \t\r\n,"
+
+
+def iter_json_array(stream: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Decodifica uno alla volta gli oggetti di un array JSON.
+    
+    La memoria usata è limitata a un oggetto più un blocco di lettura.
+    
+    Args:
+        stream: File binario con l'array JSON (es. membro di un archivio ZIP)
+        chunk_size: Caratteri letti per volta
+    
+    Yields:
+        Oggetti dell'array nell'ordine del file
+    
+    Raises:
+        ValueError: Se il contenuto non è un array JSON di oggetti
+    """
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        yield from _decode_array(reader, chunk_size)
+    finally:
+        # Il file resta aperto per chi lo ha passato, anche se l'iterazione si interrompe
+        reader.detach()
+
+
+def _decode_array(reader: io.TextIOWrapper, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Decodifica gli oggetti dell'array JSON letto dal file di testo (vedi iter_json_array).
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            raise ValueError("Il file dell'archivio è vuoto")
+        buffer = chunk.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Il file dell'archivio non contiene un array JSON")
+    position = 1
+    eof = False
+    
+    while True:
+        while position < len(buffer) and buffer[position] in _SEPARATORS:
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Array JSON non terminato")
+            buffer = reader.read(chunk_size)
+            position = 0
+            eof = not buffer
+            continue
+        if buffer[position] == "]":
+            return
+        
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Oggetto incompleto: si legge il blocco successivo
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if not isinstance(item, dict):
+            raise ValueError("Gli elementi dell'array JSON devono essere oggetti")
+        
+        yield item
+        position = end
+
+
+def iter_reversed(items: Iterable[Dict[str, Any]], chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Restituisce gli oggetti in ordine inverso usando un file temporaneo invece della memoria.
+    
+    Args:
+        items: Oggetti da invertire
+        chunk_size: Byte letti per volta dalla fine del file temporaneo
+    
+    Yields:
+        Oggetti dall'ultimo al primo
+    """
+    with tempfile.TemporaryFile() as spool:
+        for item in items:
+            # json.dumps non produce a capo: una riga per oggetto
+            spool.write(json.dumps(item).encode("utf-8") + b"\n")
+        
+        end = spool.tell()
+        tail = b""
+        while end > 0:
+            start = max(end - chunk_size, 0)
+            spool.seek(start)
+            block = spool.read(end - start) + tail
+            end = start
+            lines = block.split(b"\n")
+            # La prima riga del blocco può continuare nel blocco precedente
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield json.loads(line)
+        if tail:
+            yield json.loads(tail)
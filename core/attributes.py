@@ -0,0 +1,63 @@
+"""
+Funzioni di supporto per gli attributi chiave/valore di context e details.
+
+Usate dai filtri per attributo e dagli indici popolati al momento dell'inserimento.
+"""
+
+import re
+import logging
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger("LogManager")
+
+# Colonne JSON su cui è possibile filtrare per chiave/valore
+ATTRIBUTE_SOURCES = ("context", "details")
+
+# Chiavi ammesse nei filtri per attributo (eventualmente annidate con il punto, es. user.id)
+ATTRIBUTE_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+(\.[A-Za-z0-9_\-]+)*$")
+
+def attribute_path(key: str) -> str:
+    """
+    Converte una chiave (anche annidata) nel percorso JSON usato da json_extract.
+    """
+    return "$" + "".join(f'."{part}"' for part in key.split("."))
+
+def attribute_value(value: Any) -> Optional[str]:
+    """
+    Normalizza il valore di un attributo come testo, con le stesse regole di
+    CAST(json_extract(...) AS TEXT) in SQLite. Restituisce None per valori non scalari.
+    """
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    return None
+
+def extract_attribute(data: Optional[Dict[str, Any]], key: str) -> Any:
+    """
+    Estrae il valore di una chiave (anche annidata) da un dizionario di context o details.
+    """
+    value = data
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def parse_attribute_keys(names: Iterable[str]) -> Set[Tuple[str, str]]:
+    """
+    Converte nomi di configurazione come "context.request_id" in coppie (sorgente, chiave).
+    
+    I nomi non validi vengono ignorati con un avviso.
+    
+    Returns:
+        Insieme di tuple (sorgente, chiave)
+    """
+    attributes = set()
+    for name in names:
+        source, _, key = name.partition(".")
+        if source in ATTRIBUTE_SOURCES and ATTRIBUTE_KEY_PATTERN.match(key):
+            attributes.add((source, key))
+        else:
+            logger.warning(f"Chiave di attributo non valida ignorata: {name}")
+    return attributes
@@ -112,6 +112,24 @@ def get_api_key_info(api_key: str) -> Optional[Dict]:
     logger.debug(f"API key non trovata: {mask_api_key(api_key)}")
     return None
 
+def get_api_key_id(api_key: str) -> Optional[str]:
+    """
+    Restituisce l'identificativo (nome nel file di configurazione) di un'API key.
+    
+    L'identificativo permette di attribuire i log a una chiave senza memorizzarla.
+    Per le chiavi di sviluppo restituisce il nome della chiave.
+    """
+    api_keys = load_api_keys()
+    
+    for key_id, key_info in api_keys.items():
+        if isinstance(key_info, dict) and key_info.get("key") == api_key:
+            return key_id
+        if isinstance(key_info, str) and key_info == api_key:
+            return key_id
+    
+    key_info = get_api_key_info(api_key)
+    return key_info.get("name") if key_info else None
+
 async def get_api_key(api_key: str = Security(API_KEY_HEADER)) -> str:
     """
     Dipendenza per verificare l'API key nelle richieste.
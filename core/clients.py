@@ -0,0 +1,150 @@
+"""
+Registro dei client che inviano log (progetto, modulo e API key).
+
+La tabella clients contiene una riga per ogni combinazione di progetto, modulo
+e API key con la prima e l'ultima occorrenza, il numero di log ricevuti e la
+loro dimensione. Il writer accumula i valori di un batch e aggiorna ogni
+client una sola volta, nella stessa transazione dei log, quindi la pagina del
+LogService e l'endpoint /api/clients non devono più aggregare la tabella logs.
+
+I log scritti senza API key (eventi interni e log anteriori al registro) sono
+registrati con api_key_id vuoto. Le cancellazioni non modificano il registro:
+i totali indicano i log ricevuti.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.timestamps import normalize_timestamp
+
+logger = logging.getLogger("LogManager")
+
+# Campi per cui è possibile ordinare l'elenco dei client
+CLIENT_SORT_FIELDS = ("last_seen", "first_seen", "total_logs", "bytes", "project", "module")
+
+def initialize_clients(cursor: sqlite3.Cursor):
+    """
+    Crea la tabella clients, popolandola dai log esistenti alla creazione.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='clients'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS clients (
+        project TEXT NOT NULL,
+        module TEXT NOT NULL,
+        api_key_id TEXT NOT NULL DEFAULT '',
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        total_logs INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        PRIMARY KEY (project, module, api_key_id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_last_seen ON clients (last_seen)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_api_key ON clients (api_key_id, last_seen)')
+    
+    if created:
+        cursor.execute('''
+        INSERT INTO clients (project, module, api_key_id, first_seen, last_seen, total_logs, bytes)
+        SELECT project, module, '', MIN(timestamp), MAX(timestamp), COUNT(*),
+               SUM(length(CAST(message AS BLOB)) + IFNULL(length(CAST(details AS BLOB)), 0)
+                   + IFNULL(length(CAST(context AS BLOB)), 0))
+        FROM logs
+        GROUP BY project, module
+        ''')
+        if cursor.rowcount:
+            logger.info(f"Registro dei client popolato dai log esistenti: {cursor.rowcount} client")
+
+def accumulate_client(usage: Dict[Tuple[str, str, str], List[Any]], row: Dict[str, Any], api_key_id: Optional[str]):
+    """
+    Aggiunge un log scritto ai totali per client del batch corrente.
+    
+    Args:
+        usage: Totali del batch ((project, module, api_key_id) -> [first_seen, last_seen, logs, bytes])
+        row: Riga memorizzata nella tabella logs
+        api_key_id: Identificativo dell'API key che ha inviato il log (opzionale)
+    """
+    size = sum(len(row[field].encode("utf-8")) for field in ("message", "details", "context") if row[field])
+    key = (row["project"], row["module"], api_key_id or "")
+    totals = usage.get(key)
+    if totals is None:
+        usage[key] = [row["timestamp"], row["timestamp"], 1, size]
+    else:
+        totals[0] = min(totals[0], row["timestamp"])
+        totals[1] = max(totals[1], row["timestamp"])
+        totals[2] += 1
+        totals[3] += size
+
+def upsert_clients(cursor: sqlite3.Cursor, usage: Dict[Tuple[str, str, str], List[Any]]):
+    """
+    Aggiorna il registro con i totali di un batch (una riga per client).
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        usage: Totali accumulati con accumulate_client
+    """
+    cursor.executemany('''
+    INSERT INTO clients (project, module, api_key_id, first_seen, last_seen, total_logs, bytes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (project, module, api_key_id) DO UPDATE SET
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen),
+        total_logs = total_logs + excluded.total_logs,
+        bytes = bytes + excluded.bytes
+    ''', [key + tuple(totals) for key, totals in usage.items()])
+
+def build_clients_query(
+    project: Optional[str] = None,
+    module: Optional[str] = None,
+    api_key_id: Optional[str] = None,
+    active_since: Optional[datetime] = None,
+    sort_by: str = "last_seen",
+    sort_order: str = "desc",
+    limit: int = 100,
+    offset: int = 0
+) -> Tuple[str, List[Any], str, List[Any]]:
+    """
+    Costruisce la query paginata sul registro dei client e quella del totale.
+    
+    Args:
+        project: Filtra per progetto
+        module: Filtra per modulo
+        api_key_id: Filtra per API key
+        active_since: Solo i client con un log successivo a questa data
+        sort_by: Campo di ordinamento (vedi CLIENT_SORT_FIELDS)
+        sort_order: asc o desc
+        limit: Numero massimo di client
+        offset: Offset per la paginazione
+    
+    Returns:
+        Tupla (query, parametri, query del totale, parametri del totale)
+    
+    Raises:
+        ValueError: Se il campo di ordinamento non è valido
+    """
+    if sort_by not in CLIENT_SORT_FIELDS:
+        raise ValueError(f"Ordinamento non valido: {sort_by}. Valori ammessi: {', '.join(CLIENT_SORT_FIELDS)}")
+    order = "ASC" if sort_order.lower() == "asc" else "DESC"
+    
+    clauses = []
+    params: List[Any] = []
+    for column, value in (("project", project), ("module", module), ("api_key_id", api_key_id)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    
+    if active_since:
+        # last_seen contiene l'ora locale senza fuso
+        clauses.append("last_seen >= ?")
+        params.append(normalize_timestamp(active_since))
+    
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT * FROM clients{where} ORDER BY {sort_by} {order}, project, module LIMIT ? OFFSET ?"
+    count_query = f"SELECT COUNT(*) FROM clients{where}"
+    return query, params + [limit, offset], count_query, list(params)
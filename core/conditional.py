@@ -0,0 +1,70 @@
+"""
+Richieste condizionali (ETag / If-None-Match) per gli endpoint di interrogazione.
+
+L'ETag di una risposta combina l'impronta dei filtri con la versione dei dati
+dell'ambito interrogato (vedi query_cache.data_version): se un client in
+polling ripresenta l'ETag e nessun log rilevante è stato scritto, l'endpoint
+risponde 304 senza eseguire la query.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.query_cache import ALL_PROJECTS, data_version
+
+
+def make_etag(fingerprint: str, scope: str = ALL_PROJECTS, start: Optional[str] = None, end: Optional[str] = None) -> str:
+    """
+    Calcola l'ETag (debole) di una risposta.
+    
+    Args:
+        fingerprint: Impronta dell'endpoint e dei filtri (filter_fingerprint)
+        scope: Ambito dei dati interrogati (progetto, LIFECYCLE_SCOPE o ALL_PROJECTS)
+        start: Inizio dell'intervallo temporale interrogato (ISO, opzionale)
+        end: Fine dell'intervallo temporale interrogato (ISO, opzionale)
+    
+    Returns:
+        Valore dell'header ETag
+    """
+    version = data_version(scope, start, end)
+    digest = hashlib.sha1(f"{fingerprint}:{version}".encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Verifica se l'header If-None-Match della richiesta corrisponde all'ETag.
+    
+    Il confronto è debole, come previsto per If-None-Match: il prefisso W/ viene ignorato.
+    
+    Args:
+        request: Richiesta HTTP
+        etag: ETag corrente della risposta
+    
+    Returns:
+        True se il client possiede già la versione corrente
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Risposta 304 senza corpo per una richiesta condizionale soddisfatta.
+    """
+    return Response(status_code=304, headers={"ETag": etag})
@@ -51,6 +51,79 @@ class LogServiceSettings(BaseSettings):
     max_logs_per_request: int = 1000
     retention_days: int = 90  # Durata massima dei log in giorni
     
+    # Configurazione dei conteggi filtrati
+    count_time_budget_ms: int = 200  # Tempo massimo per un conteggio esatto prima di passare alla stima
+    count_sample_size: int = 5000  # Righe campionate per stimare i conteggi sui filtri testuali
+    count_cache_size: int = 256  # Combinazioni di filtri mantenute nella cache dei conteggi
+    facet_cache_size: int = 128  # Combinazioni di filtri mantenute nella cache delle faccette
+    result_cache_bytes: int = 32 * 1024 * 1024  # Dimensione massima dei risultati di /api/logs in cache
+    hot_tier_bytes: int = 64 * 1024 * 1024  # Memoria per i log più recenti serviti da get_logs (0 disabilita)
+    
+    # Chiavi di context/details indicizzate al momento dell'inserimento (le altre usano json_extract)
+    indexed_attribute_keys: List[str] = [
+        "context.request_id",
+        "context.user_id",
+        "details.document_id",
+        "details.file_hash",
+        "details.file_name"
+    ]
+    
+    # Chiavi che identificano la stessa richiesta tra progetti diversi (endpoint /api/logs/trace)
+    correlation_keys: List[str] = [
+        "context.request_id",
+        "context.correlation_id",
+        "context.trace_id"
+    ]
+    
+    # Fasi intermedie del ciclo di vita: un documento fermo in una di queste fasi
+    # è segnalato dall'endpoint /api/lifecycle/documents/stuck
+    lifecycle_stuck_stages: List[str] = ["upload", "delete"]
+    lifecycle_stuck_minutes: int = 30
+    
+    # Numero massimo di identificativi accettati da /api/lifecycle/documents/batch
+    lifecycle_batch_max_identifiers: int = 500
+    
+    # Istogrammi (/api/logs/histogram): bucket restituiti in assenza di start_date,
+    # numero massimo di bucket e di serie per risposta
+    histogram_default_buckets: int = 60
+    histogram_max_buckets: int = 1440
+    histogram_max_series: int = 20
+    
+    # Estrazione dei modelli di messaggio (fingerprint) all'inserimento:
+    # similarità minima per unire un messaggio a un modello esistente, token
+    # iniziali usati per instradare il messaggio nell'albero, token considerati
+    fingerprint_similarity: float = 0.5
+    fingerprint_depth: int = 2
+    fingerprint_max_tokens: int = 64
+    
+    # Sketch top-K per finestra oraria (/api/logs/top): contatori Space-Saving,
+    # dimensioni degli sketch Count-Min e intervallo di salvataggio su database
+    sketch_capacity: int = 200
+    sketch_cms_width: int = 1024
+    sketch_cms_depth: int = 4
+    sketch_flush_seconds: int = 30
+    
+    # Precisione degli sketch HyperLogLog dei valori distinti (2^N registri,
+    # errore standard circa 1.04 / sqrt(2^N): 2.3% con 11)
+    distinct_precision: int = 11
+    
+    # Snapshot delle viste della dashboard aggiornati in background: intervallo
+    # di aggiornamento, età massima servita (oltre viene ricalcolato nella
+    # richiesta) e inattività dopo cui uno snapshot non viene più aggiornato
+    snapshot_refresh_seconds: int = 5
+    snapshot_max_age_seconds: int = 15
+    snapshot_idle_seconds: int = 300
+    
+    # Live tail (/api/logs/tail): log in coda per client (oltre vengono scartati
+    # i più vecchi), intervallo dei messaggi di keepalive, client contemporanei
+    tail_queue_size: int = 1000
+    tail_heartbeat_seconds: int = 15
+    tail_max_subscribers: int = 100
+    # Invio a blocchi predefinito per i WebSocket del live tail (/api/logs/ws):
+    # un frame ogni tail_batch_ms millisecondi o ogni tail_batch_size log
+    tail_batch_ms: int = 250
+    tail_batch_size: int = 100
+    
     # Configurazione della compressione
     enable_log_compression: bool = True  # Attiva/disattiva la compressione dei log
     compress_logs_older_than_days: int = 1  # Comprimi i log più vecchi di X giorni
@@ -0,0 +1,144 @@
+"""
+Indice di correlazione tra log di progetti diversi.
+
+Associa gli identificativi di correlazione (request_id e le altre chiavi
+configurate) agli ID dei log, così che la cronologia di una singola richiesta
+attraverso PramaIAServer, PDK e Agents possa essere ricostruita con una
+ricerca sull'indice invece di una scansione completa della tabella logs.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from core.models import LogEntry
+from core.attributes import attribute_path, attribute_value, extract_attribute
+
+logger = logging.getLogger("LogManager")
+
+def initialize_correlation_index(cursor: sqlite3.Cursor, correlation_keys: Set[Tuple[str, str]]):
+    """
+    Crea le tabelle dell'indice di correlazione e lo allinea alle chiavi configurate.
+    
+    Le chiavi aggiunte alla configurazione vengono popolate dai log esistenti,
+    quelle rimosse vengono eliminate dall'indice.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+        correlation_keys: Coppie (sorgente, chiave) da indicizzare
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_correlations (
+        correlation_id TEXT NOT NULL,
+        correlation_key TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        log_id TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_correlations_lookup ON log_correlations (correlation_id, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_correlations_log ON log_correlations (log_id)')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_logs_delete_correlations AFTER DELETE ON log_records
+    BEGIN
+        DELETE FROM log_correlations WHERE log_id = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS correlation_keys (
+        correlation_key TEXT PRIMARY KEY,
+        indexed_at TEXT NOT NULL
+    )
+    ''')
+    
+    configured = {f"{source}.{key}": (source, key) for source, key in correlation_keys}
+    cursor.execute("SELECT correlation_key FROM correlation_keys")
+    registered = {row[0] for row in cursor.fetchall()}
+    
+    for name in registered - set(configured):
+        cursor.execute("DELETE FROM log_correlations WHERE correlation_key = ?", (name,))
+        cursor.execute("DELETE FROM correlation_keys WHERE correlation_key = ?", (name,))
+        logger.info(f"Rimossa dall'indice di correlazione la chiave {name}")
+    
+    for name in set(configured) - registered:
+        source, key = configured[name]
+        path = attribute_path(key)
+        cursor.execute(f'''
+        INSERT INTO log_correlations (correlation_id, correlation_key, timestamp, log_id)
+        SELECT CAST(json_extract({source}, ?) AS TEXT), ?, timestamp, id
+        FROM logs
+        WHERE json_valid({source})
+          AND json_type({source}, ?) IN ('text', 'integer', 'real')
+        ''', (path, name, path))
+        backfilled = cursor.rowcount
+        cursor.execute(
+            "INSERT INTO correlation_keys (correlation_key, indexed_at) VALUES (?, ?)",
+            (name, datetime.now().isoformat())
+        )
+        logger.info(f"Aggiunta all'indice di correlazione la chiave {name} ({backfilled} log esistenti)")
+
+def index_correlations(
+    cursor: sqlite3.Cursor,
+    log_entry: LogEntry,
+    timestamp: str,
+    correlation_keys: Set[Tuple[str, str]]
+):
+    """
+    Registra gli identificativi di correlazione di un log appena inserito.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        log_entry: LogEntry inserita
+        timestamp: Timestamp memorizzato nella tabella logs
+        correlation_keys: Coppie (sorgente, chiave) da indicizzare
+    """
+    correlations = []
+    for source, key in correlation_keys:
+        data = log_entry.context if source == "context" else log_entry.details
+        value = extract_attribute(data, key)
+        if isinstance(value, bool):
+            continue
+        value = attribute_value(value)
+        if value:
+            correlations.append((value, f"{source}.{key}", timestamp, log_entry.id))
+    
+    if correlations:
+        cursor.executemany(
+            "INSERT INTO log_correlations (correlation_id, correlation_key, timestamp, log_id) VALUES (?, ?, ?, ?)",
+            correlations
+        )
+
+def fetch_trace_rows(
+    cursor: sqlite3.Cursor,
+    columns: List[str],
+    correlation_id: str,
+    correlation_key: Optional[str] = None,
+    limit: int = 1000
+) -> List[sqlite3.Row]:
+    """
+    Recupera in ordine cronologico i log associati a un identificativo di correlazione.
+    
+    L'ordine segue il timestamp intero: l'ora locale testuale si ripete al
+    ritorno dall'ora legale.
+    
+    Args:
+        cursor: Cursore del database
+        columns: Colonne della vista log_rows da restituire
+        correlation_id: Identificativo da cercare (es. un request_id)
+        correlation_key: Limita la ricerca a una chiave (es. "context.request_id")
+        limit: Numero massimo di log restituiti
+    
+    Returns:
+        Righe della vista log_rows
+    """
+    subquery = "SELECT log_id FROM log_correlations WHERE correlation_id = ?"
+    params = [correlation_id]
+    if correlation_key:
+        subquery += " AND correlation_key = ?"
+        params.append(correlation_key)
+    
+    cursor.execute(
+        f"SELECT {', '.join(columns)} FROM log_rows WHERE id IN ({subquery}) ORDER BY timestamp_us ASC LIMIT ?",
+        params + [limit]
+    )
+    return cursor.fetchall()
@@ -0,0 +1,356 @@
+"""
+Dizionari di progetto, livello e modulo dei log.
+
+Progetto, livello e modulo assumono pochi valori distinti ma comparivano in
+ogni riga di log e in ogni indice come testo ripetuto. I valori sono ora
+registrati una sola volta nelle tabelle log_projects, log_levels e
+log_modules con un identificativo intero, e la tabella fisica log_records
+memorizza solo i codici.
+
+La vista logs mantiene le colonne originali (con i nomi) per le API e gli
+strumenti esterni. È in sola lettura, salvo le cancellazioni che un trigger
+INSTEAD OF inoltra a log_records: i log vanno scritti tramite il LogManager,
+che aggiorna anche le tabelle derivate. La vista log_rows espone
+anche i codici, così il LogManager filtra sugli indici interi e restituisce
+i nomi.
+
+Il writer mantiene in memoria la corrispondenza nome -> codice
+(LogDictionary) e registra i valori nuovi prima della transazione di
+inserimento. Un database con la vecchia tabella logs viene convertito
+all'avvio.
+
+Il timestamp è memorizzato in microsecondi UTC (timestamp_us) insieme
+all'istante di scrittura (ingested_us); le viste lo espongono come testo ISO.
+"""
+
+import sys
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from core.timestamps import sql_iso_timestamp, sql_micros
+
+logger = logging.getLogger("LogManager")
+
+# Tabelle dei dizionari per dimensione e colonna del codice in log_records
+DICTIONARY_TABLES = {
+    "project": "log_projects",
+    "level": "log_levels",
+    "module": "log_modules"
+}
+
+_VIEW_SELECT = f'''
+SELECT r.id AS id, {sql_iso_timestamp("r.timestamp_us")} AS timestamp,
+       p.name AS project, l.name AS level, m.name AS module,
+       r.message AS message, r.details AS details, r.context AS context,
+       r.fingerprint_id AS fingerprint_id{{extra}}
+FROM log_records r
+LEFT JOIN log_projects p ON p.id = r.project_id
+LEFT JOIN log_levels l ON l.id = r.level_id
+LEFT JOIN log_modules m ON m.id = r.module_id
+'''
+
+# Colonne aggiuntive della vista log_rows: codici e timestamp interi
+_ROW_COLUMNS = (
+    ", r.timestamp_us AS timestamp_us, r.ingested_us AS ingested_us"
+    ", r.project_id AS project_id, r.level_id AS level_id, r.module_id AS module_id"
+)
+
+# Istante di scrittura in microsecondi UTC (precisione al millisecondo)
+_NOW_MICROS = "(CAST(strftime('%s', 'now') AS INTEGER) * 1000000 + CAST(substr(strftime('%f', 'now'), 4) AS INTEGER) * 1000)"
+
+def code_column(kind: str) -> str:
+    """
+    Colonna di log_records con il codice di una dimensione (project_id, level_id, module_id).
+    """
+    return f"{kind}_id"
+
+def name_expression(kind: str, code: str) -> str:
+    """
+    Espressione SQL che restituisce il nome associato a un codice (es. nei trigger).
+    
+    Args:
+        kind: Dimensione (project, level, module)
+        code: Espressione SQL del codice (es. old.project_id)
+    """
+    return f"(SELECT name FROM {DICTIONARY_TABLES[kind]} WHERE id = {code})"
+
+def initialize_dictionaries(cursor: sqlite3.Cursor):
+    """
+    Crea i dizionari, la tabella log_records e le viste logs e log_rows.
+    
+    Se il database contiene ancora la tabella logs con i nomi in chiaro, le
+    righe vengono copiate in log_records (mantenendo il rowid) e la tabella
+    viene sostituita dalla vista. Allo stesso modo una tabella log_records
+    con i timestamp testuali viene ricostruita con i timestamp interi. I
+    trigger e gli indici delle vecchie tabelle vengono eliminati con esse e
+    ricreati su log_records dai rispettivi moduli.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'logs'")
+    row = cursor.fetchone()
+    legacy = row is not None and row[0] == "table"
+    
+    cursor.execute("PRAGMA table_info(log_records)")
+    text_timestamps = "timestamp" in {row[1] for row in cursor.fetchall()}
+    if text_timestamps:
+        # Le viste vengono ricreate sulla nuova tabella
+        cursor.execute("DROP VIEW IF EXISTS logs")
+        cursor.execute("DROP VIEW IF EXISTS log_rows")
+        cursor.execute("ALTER TABLE log_records RENAME TO log_records_text")
+    
+    for table in DICTIONARY_TABLES.values():
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        ''')
+    
+    # timestamp_us e ingested_us: microsecondi UTC dall'epoch (vedi core.timestamps)
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS log_records (
+        id TEXT PRIMARY KEY,
+        timestamp_us INTEGER NOT NULL,
+        ingested_us INTEGER NOT NULL DEFAULT {_NOW_MICROS},
+        project_id INTEGER NOT NULL,
+        level_id INTEGER NOT NULL,
+        module_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        details TEXT,
+        context TEXT,
+        fingerprint_id TEXT
+    )
+    ''')
+    
+    if legacy:
+        _migrate_legacy_table(cursor)
+    if text_timestamps:
+        _migrate_text_timestamps(cursor)
+    
+    # Indici sui codici e sui timestamp interi (il progetto è coperto dal prefisso dell'indice composto)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_timestamp ON log_records (timestamp_us)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_level ON log_records (level_id, timestamp_us)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_module ON log_records (module_id, timestamp_us)')
+    # Indice composto che copre i conteggi filtrati senza accedere alla tabella
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_filters ON log_records (project_id, level_id, module_id, timestamp_us)')
+    
+    cursor.execute(f"CREATE VIEW IF NOT EXISTS logs AS {_VIEW_SELECT.format(extra='')}")
+    cursor.execute(f"CREATE VIEW IF NOT EXISTS log_rows AS {_VIEW_SELECT.format(extra=_ROW_COLUMNS)}")
+    
+    # La vista è in sola lettura per inserimenti e modifiche: le tabelle derivate
+    # (aggregazioni, attributi, correlazioni, eventi, fingerprint) sono mantenute
+    # dal writer, non da SQL. I database creati in precedenza avevano questi trigger.
+    cursor.execute("DROP TRIGGER IF EXISTS trg_logs_view_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_logs_view_update")
+    
+    # Le cancellazioni restano ammesse: i trigger AFTER DELETE su log_records aggiornano le tabelle derivate
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_logs_view_delete INSTEAD OF DELETE ON logs
+    BEGIN
+        DELETE FROM log_records WHERE id = old.id;
+    END
+    ''')
+
+def _migrate_legacy_table(cursor: sqlite3.Cursor):
+    """
+    Copia la vecchia tabella logs in log_records e la elimina.
+    
+    L'istante di scrittura dei log migrati non è noto: viene usato il loro timestamp.
+    """
+    cursor.execute("PRAGMA table_info(logs)")
+    fingerprint = "l.fingerprint_id" if "fingerprint_id" in {row[1] for row in cursor.fetchall()} else "NULL"
+    
+    for kind, table in DICTIONARY_TABLES.items():
+        cursor.execute(f"INSERT OR IGNORE INTO {table} (name) SELECT DISTINCT {kind} FROM logs")
+    
+    micros = sql_micros("l.timestamp")
+    cursor.execute(f'''
+    INSERT INTO log_records (rowid, id, timestamp_us, ingested_us, project_id, level_id, module_id, message, details, context, fingerprint_id)
+    SELECT l.rowid, l.id, {micros}, {micros}, p.id, v.id, m.id, l.message, l.details, l.context, {fingerprint}
+    FROM logs l
+    JOIN log_projects p ON p.name = l.project
+    JOIN log_levels v ON v.name = l.level
+    JOIN log_modules m ON m.name = l.module
+    ''')
+    migrated = cursor.rowcount
+    
+    cursor.execute("DROP TABLE logs")
+    logger.info(f"Tabella logs convertita ai dizionari di progetto, livello e modulo: {migrated} log")
+
+def _migrate_text_timestamps(cursor: sqlite3.Cursor):
+    """
+    Copia i log con timestamp testuale (log_records_text) nella nuova tabella log_records.
+    """
+    micros = sql_micros("timestamp")
+    cursor.execute(f'''
+    INSERT INTO log_records (rowid, id, timestamp_us, ingested_us, project_id, level_id, module_id, message, details, context, fingerprint_id)
+    SELECT rowid, id, {micros}, {micros}, project_id, level_id, module_id, message, details, context, fingerprint_id
+    FROM log_records_text
+    ''')
+    migrated = cursor.rowcount
+    
+    cursor.execute("DROP TABLE log_records_text")
+    logger.info(f"Timestamp dei log convertiti in microsecondi UTC: {migrated} log")
+
+class LogDictionary:
+    """
+    Corrispondenza in memoria tra nomi e codici dei dizionari di un database.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Inizializza il dizionario (vuoto fino a load).
+        
+        Args:
+            db_path: Percorso del database
+        """
+        self.db_path = db_path
+        self._codes: Dict[str, Dict[str, int]] = {kind: {} for kind in DICTIONARY_TABLES}
+        self._names: Dict[str, Dict[int, str]] = {kind: {} for kind in DICTIONARY_TABLES}
+        # Codice più alto letto per dimensione: i codici sono assegnati in ordine crescente e mai eliminati
+        self._max_codes: Dict[str, int] = {kind: 0 for kind in DICTIONARY_TABLES}
+        self._lock = threading.Lock()
+    
+    def load(self, cursor: sqlite3.Cursor):
+        """
+        Legge dal database tutti i valori registrati.
+        
+        Args:
+            cursor: Cursore sul database
+        """
+        for kind, table in DICTIONARY_TABLES.items():
+            cursor.execute(f"SELECT id, name FROM {table}")
+            codes = {sys.intern(row[1]): row[0] for row in cursor.fetchall()}
+            with self._lock:
+                # Le nuove mappe sostituiscono le precedenti: le letture non richiedono il lock
+                self._codes[kind] = codes
+                self._names[kind] = {code: name for name, code in codes.items()}
+                self._max_codes[kind] = max(codes.values(), default=0)
+    
+    def _refresh(self, kind: str):
+        """
+        Legge i valori di una dimensione registrati dopo l'ultima lettura (ad esempio da un altro processo).
+        
+        Se il codice più alto nel database non è cambiato non viene letto altro:
+        i filtri su valori mai registrati costano una sola query sulla chiave primaria.
+        
+        Args:
+            kind: Dimensione (project, level, module)
+        """
+        table = DICTIONARY_TABLES[kind]
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MAX(id) FROM {table}")
+            max_code = cursor.fetchone()[0] or 0
+            known = self._max_codes[kind]
+            if max_code <= known:
+                return
+            cursor.execute(f"SELECT id, name FROM {table} WHERE id > ?", (known,))
+            added = {sys.intern(row[1]): row[0] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+        
+        with self._lock:
+            codes = dict(self._codes[kind], **added)
+            self._codes[kind] = codes
+            self._names[kind] = {code: name for name, code in codes.items()}
+            self._max_codes[kind] = max(self._max_codes[kind], max_code)
+    
+    def ensure(self, conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]):
+        """
+        Registra i nomi non ancora presenti nei dizionari.
+        
+        Va chiamato prima della transazione di inserimento: i nuovi valori
+        vengono confermati subito, così i codici in memoria restano validi
+        anche se la scrittura dei log viene annullata.
+        
+        Args:
+            conn: Connessione senza transazioni in corso
+            rows: Righe da scrivere (con project, level e module)
+        """
+        missing = {
+            (kind, row[kind])
+            for row in rows
+            for kind in DICTIONARY_TABLES
+            if row[kind] not in self._codes[kind]
+        }
+        if not missing:
+            return
+        
+        cursor = conn.cursor()
+        for kind, name in sorted(missing):
+            cursor.execute(f"INSERT OR IGNORE INTO {DICTIONARY_TABLES[kind]} (name) VALUES (?)", (name,))
+        conn.commit()
+        self.load(cursor)
+    
+    def code(self, kind: str, name: str) -> Optional[int]:
+        """
+        Restituisce il codice di un nome.
+        
+        I valori sconosciuti vengono cercati tra quelli registrati nel database
+        dopo l'ultima lettura (possono essere stati registrati da un altro
+        processo).
+        
+        Args:
+            kind: Dimensione (project, level, module)
+            name: Nome da convertire
+        
+        Returns:
+            Codice intero, oppure None se il nome non è mai stato registrato
+        """
+        code = self._codes[kind].get(name)
+        if code is None:
+            self._refresh(kind)
+            code = self._codes[kind].get(name)
+        return code
+    
+    def name(self, kind: str, code: int) -> Optional[str]:
+        """
+        Restituisce il nome associato a un codice.
+        
+        Args:
+            kind: Dimensione (project, level, module)
+            code: Codice intero
+        
+        Returns:
+            Nome, oppure None se il codice è sconosciuto
+        """
+        name = self._names[kind].get(code)
+        if name is None:
+            self._refresh(kind)
+            name = self._names[kind].get(code)
+        return name
+    
+    def encode(self, row: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Codici di progetto, livello e modulo di una riga già registrata con ensure.
+        
+        Returns:
+            Dizionario {colonna del codice: codice}
+        """
+        return {code_column(kind): self._codes[kind][row[kind]] for kind in DICTIONARY_TABLES}
+
+
+# Dizionari per database, condivisi dai LogManager dello stesso database
+_dictionaries: Dict[str, LogDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+def get_log_dictionary(db_path: str) -> LogDictionary:
+    """
+    Ottiene il dizionario condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        LogDictionary
+    """
+    with _dictionaries_lock:
+        if db_path not in _dictionaries:
+            _dictionaries[db_path] = LogDictionary(db_path)
+        return _dictionaries[db_path]
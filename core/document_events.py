@@ -0,0 +1,324 @@
+"""
+Tabella materializzata degli eventi del ciclo di vita dei documenti.
+
+Ogni log di livello LIFECYCLE (o con details.log_type == "lifecycle") che
+riporta un document_id, un file_hash o un file_name viene registrato nella
+tabella document_events con colonne tipizzate e indicizzate, nella stessa
+transazione in cui viene scritto il log. Gli endpoint del ciclo di vita
+interrogano questa tabella invece di scandire la tabella logs con LIKE.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.models import LogEntry, LogLevel
+from core.attributes import attribute_value
+from core.timestamps import normalize_timestamp, sql_iso_timestamp
+
+logger = logging.getLogger("LogManager")
+
+# Colonne identificative del documento, lette dai details del log
+DOCUMENT_IDENTIFIERS = ("document_id", "file_hash", "file_name")
+
+# Numero di righe della tabella log_records esaminate per ogni transazione di backfill
+BACKFILL_BATCH_SIZE = 5000
+
+def initialize_document_events(cursor: sqlite3.Cursor):
+    """
+    Crea la tabella document_events con i relativi indici.
+    
+    Se la tabella viene creata su un database che contiene già dei log, viene
+    registrato un backfill da eseguire con backfill_document_events.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='document_events'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_events (
+        log_id TEXT PRIMARY KEY,
+        document_id TEXT,
+        file_hash TEXT,
+        file_name TEXT,
+        lifecycle_event TEXT,
+        timestamp TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_events_document ON document_events (document_id, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_events_hash ON document_events (file_hash, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_events_file ON document_events (file_name, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_events_timestamp ON document_events (timestamp)')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_logs_delete_document_events AFTER DELETE ON log_records
+    BEGIN
+        DELETE FROM document_events WHERE log_id = old.id;
+    END
+    ''')
+    
+    # Avanzamento del backfill: last_rowid è l'ultima riga di log_records già esaminata
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_events_backfill (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_rowid INTEGER NOT NULL,
+        completed_at TEXT
+    )
+    ''')
+    if created:
+        cursor.execute("SELECT MAX(rowid) FROM log_records")
+        max_rowid = cursor.fetchone()[0]
+        if max_rowid:
+            # I log scritti da ora in poi vengono registrati in fase di inserimento
+            cursor.execute(
+                "INSERT OR REPLACE INTO document_events_backfill (id, last_rowid, completed_at) VALUES (1, 0, NULL)"
+            )
+            logger.info("Tabella document_events creata: backfill dei log esistenti in attesa")
+
+def document_event_row(log_entry: LogEntry, timestamp: str) -> Optional[Tuple]:
+    """
+    Estrae da un log la riga da registrare in document_events.
+    
+    Args:
+        log_entry: LogEntry inserita
+        timestamp: Timestamp memorizzato nella tabella logs
+    
+    Returns:
+        Tupla con i valori delle colonne, None se il log non è un evento di documento
+    """
+    details = log_entry.details if isinstance(log_entry.details, dict) else {}
+    level = log_entry.level.value if isinstance(log_entry.level, LogLevel) else log_entry.level
+    
+    if level != LogLevel.LIFECYCLE.value and details.get("log_type") != "lifecycle":
+        return None
+    
+    identifiers = [
+        None if isinstance(details.get(name), bool) else attribute_value(details.get(name))
+        for name in DOCUMENT_IDENTIFIERS
+    ]
+    if not any(identifiers):
+        return None
+    
+    lifecycle_event = attribute_value(details.get("lifecycle_event"))
+    return (log_entry.id, *identifiers, lifecycle_event, timestamp)
+
+def index_document_event(cursor: sqlite3.Cursor, log_entry: LogEntry, timestamp: str) -> Optional[Tuple]:
+    """
+    Registra in document_events un log appena inserito, se è un evento di documento.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        log_entry: LogEntry inserita
+        timestamp: Timestamp memorizzato nella tabella logs
+    
+    Returns:
+        Riga registrata in document_events, None se il log non è un evento di documento
+    """
+    row = document_event_row(log_entry, timestamp)
+    if row:
+        cursor.execute('''
+        INSERT OR REPLACE INTO document_events (log_id, document_id, file_hash, file_name, lifecycle_event, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', row)
+    return row
+
+def _scalar_column(name: str) -> str:
+    """
+    Espressione SQL che estrae un valore scalare da details come testo (NULL altrimenti).
+    """
+    return (
+        f"CASE WHEN json_type(details, '$.{name}') IN ('text', 'integer', 'real') "
+        f"THEN CAST(json_extract(details, '$.{name}') AS TEXT) END"
+    )
+
+def backfill_document_events(conn: sqlite3.Connection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Popola document_events con gli eventi dei log scritti prima della sua creazione.
+    
+    I log vengono esaminati per intervalli di rowid, con una transazione per
+    intervallo, così da non bloccare a lungo le scritture. L'avanzamento viene
+    salvato e un backfill interrotto riprende dall'ultimo intervallo completato.
+    
+    Args:
+        conn: Connessione al database
+        batch_size: Numero di righe di log_records esaminate per transazione
+    
+    Returns:
+        Numero di eventi registrati
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_rowid FROM document_events_backfill WHERE id = 1 AND completed_at IS NULL")
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    
+    last_rowid = row[0]
+    cursor.execute("SELECT MAX(rowid) FROM log_records")
+    max_rowid = cursor.fetchone()[0] or 0
+    
+    identifiers = [_scalar_column(name) for name in DOCUMENT_IDENTIFIERS]
+    total = 0
+    
+    while last_rowid < max_rowid:
+        upper = min(last_rowid + batch_size, max_rowid)
+        cursor.execute(f'''
+        INSERT OR IGNORE INTO document_events (log_id, document_id, file_hash, file_name, lifecycle_event, timestamp)
+        SELECT id, document_id, file_hash, file_name, lifecycle_event, timestamp
+        FROM (
+            SELECT id, {sql_iso_timestamp('timestamp_us')} AS timestamp,
+                   {identifiers[0]} AS document_id,
+                   {identifiers[1]} AS file_hash,
+                   {identifiers[2]} AS file_name,
+                   {_scalar_column("lifecycle_event")} AS lifecycle_event
+            FROM log_records
+            WHERE rowid > ? AND rowid <= ?
+              AND json_valid(details)
+              AND (level_id = (SELECT id FROM log_levels WHERE name = ?) OR json_extract(details, '$.log_type') = 'lifecycle')
+        )
+        WHERE document_id IS NOT NULL OR file_hash IS NOT NULL OR file_name IS NOT NULL
+        ''', (last_rowid, upper, LogLevel.LIFECYCLE.value))
+        total += cursor.rowcount
+        last_rowid = upper
+        cursor.execute("UPDATE document_events_backfill SET last_rowid = ? WHERE id = 1", (last_rowid,))
+        conn.commit()
+    
+    cursor.execute(
+        "UPDATE document_events_backfill SET completed_at = ? WHERE id = 1",
+        (datetime.now().isoformat(),)
+    )
+    conn.commit()
+    
+    logger.info(f"Backfill di document_events completato: {total} eventi registrati")
+    return total
+
+def document_events_subquery(
+    conditions: List[Tuple[str, str]],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce la subquery che seleziona gli ID dei log di un documento.
+    
+    Ogni condizione usa l'indice (colonna, timestamp) corrispondente; più
+    condizioni vengono combinate in OR.
+    
+    Args:
+        conditions: Coppie (colonna, valore), con colonna in DOCUMENT_IDENTIFIERS
+        start_date: Data di inizio (opzionale)
+        end_date: Data di fine (opzionale)
+    
+    Returns:
+        Tupla (subquery SQL, parametri)
+    """
+    clauses = []
+    params: List[Any] = []
+    for column, value in conditions:
+        if column not in DOCUMENT_IDENTIFIERS:
+            raise ValueError(f"Identificativo di documento non valido: {column}")
+        clauses.append(f"{column} = ?")
+        params.append(value)
+    
+    query = f"SELECT log_id FROM document_events WHERE ({' OR '.join(clauses)})"
+    
+    # La colonna timestamp contiene l'ora locale senza fuso: gli estremi vengono convertiti
+    if start_date:
+        query += " AND timestamp >= ?"
+        params.append(normalize_timestamp(start_date))
+    
+    if end_date:
+        query += " AND timestamp <= ?"
+        params.append(normalize_timestamp(end_date))
+    
+    return query, params
+
+def document_events_batch_query(
+    identifiers: List[Tuple[str, str]],
+    columns: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    level: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce una query unica che restituisce i log di più identificativi, paginati per identificativo.
+    
+    Gli identificativi richiesti vengono passati come tabella VALUES e uniti a
+    document_events tramite gli indici (colonna, timestamp); la paginazione di
+    ciascun gruppo usa ROW_NUMBER() partizionato per identificativo. Un
+    document_id trova anche gli eventi con file_hash uguale, come l'endpoint
+    /document/{document_id}.
+    
+    Args:
+        identifiers: Coppie (tipo, valore), con tipo in DOCUMENT_IDENTIFIERS
+        columns: Colonne della tabella logs da selezionare
+        start_date: Data di inizio (opzionale)
+        end_date: Data di fine (opzionale)
+        level: Livello di log (opzionale, "all" per tutti)
+        limit: Numero massimo di log per identificativo
+        offset: Offset all'interno di ciascun identificativo
+    
+    Returns:
+        Tupla (query SQL, parametri). Ogni riga contiene, oltre alle colonne
+        richieste, group_kind, group_value e group_total.
+    """
+    for kind, _ in identifiers:
+        if kind not in DOCUMENT_IDENTIFIERS:
+            raise ValueError(f"Identificativo di documento non valido: {kind}")
+    
+    params: List[Any] = []
+    values = ", ".join("(?, ?)" for _ in identifiers)
+    for kind, value in identifiers:
+        params.extend([kind, value])
+    
+    time_clauses = ""
+    time_params: List[Any] = []
+    if start_date:
+        time_clauses += " AND e.timestamp >= ?"
+        time_params.append(normalize_timestamp(start_date))
+    if end_date:
+        time_clauses += " AND e.timestamp <= ?"
+        time_params.append(normalize_timestamp(end_date))
+    
+    # Una SELECT per colonna identificativa, ognuna risolta con il proprio indice
+    joins = []
+    for column, kinds in (
+        ("document_id", ("document_id",)),
+        ("file_hash", ("document_id", "file_hash")),
+        ("file_name", ("file_name",)),
+    ):
+        kind_list = ", ".join(f"'{kind}'" for kind in kinds)
+        joins.append(
+            f"SELECT r.kind AS group_kind, r.value AS group_value, e.log_id, e.timestamp AS event_timestamp "
+            f"FROM requested r JOIN document_events e ON e.{column} = r.value "
+            f"WHERE r.kind IN ({kind_list}){time_clauses}"
+        )
+        params.extend(time_params)
+    
+    level_join = ""
+    if level and level != "all":
+        level_join = "JOIN logs lv ON lv.id = m.log_id AND lv.level = ?"
+        params.append(level)
+    
+    query = f'''
+    WITH requested(kind, value) AS (VALUES {values}),
+    matches AS (
+        {" UNION ".join(joins)}
+    ),
+    ranked AS (
+        SELECT m.group_kind, m.group_value, m.log_id,
+               ROW_NUMBER() OVER (PARTITION BY m.group_kind, m.group_value ORDER BY m.event_timestamp, m.log_id) AS group_rank,
+               COUNT(*) OVER (PARTITION BY m.group_kind, m.group_value) AS group_total
+        FROM matches m
+        {level_join}
+    )
+    SELECT ranked.group_kind, ranked.group_value, ranked.group_total, {columns}
+    FROM ranked
+    JOIN logs ON logs.id = ranked.log_id
+    WHERE ranked.group_rank > ? AND ranked.group_rank <= ?
+    ORDER BY ranked.group_kind, ranked.group_value, ranked.group_rank
+    '''
+    params.extend([offset, offset + limit])
+    return query, params
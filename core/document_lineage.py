@@ -0,0 +1,232 @@
+"""
+Genealogia dei documenti: collega document_id, file_hash e file_name.
+
+Ogni identificativo visto in un evento del ciclo di vita è un nodo della
+tabella document_lineage_nodes; gli identificativi che compaiono nello stesso
+evento appartengono alla stessa genealogia (lineage_id). Quando un evento
+collega due genealogie esistenti (ad esempio una rinomina che riporta lo
+stesso file_hash con un nuovo file_name) le genealogie vengono unite
+rietichettando la più piccola, come in una union-find con unione per
+dimensione. Ogni riga di document_events riporta il lineage_id, quindi la
+storia completa di un documento si ottiene con due ricerche su indice.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.document_events import DOCUMENT_IDENTIFIERS
+from core.timestamps import normalize_timestamp
+
+logger = logging.getLogger("LogManager")
+
+# Numero di eventi collegati per ogni transazione del backfill
+LINEAGE_BACKFILL_BATCH_SIZE = 1000
+
+def initialize_document_lineage(cursor: sqlite3.Cursor):
+    """
+    Crea la tabella dei nodi della genealogia e la colonna lineage_id di document_events.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_lineage_nodes (
+        value TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        lineage_id TEXT NOT NULL,
+        PRIMARY KEY (value, kind)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_lineage_nodes_lineage ON document_lineage_nodes (lineage_id)')
+    
+    # Gli eventi registrati prima della genealogia restano con lineage_id NULL
+    # finché non vengono collegati da backfill_document_lineage
+    cursor.execute("PRAGMA table_info(document_events)")
+    if "lineage_id" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE document_events ADD COLUMN lineage_id TEXT")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_events_lineage ON document_events (lineage_id, timestamp)')
+
+def link_document_event(cursor: sqlite3.Cursor, event: Sequence[Any]) -> Tuple[str, List[str]]:
+    """
+    Collega gli identificativi di un evento alla loro genealogia, unendo quelle già esistenti.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        event: Riga di document_events (log_id, document_id, file_hash, file_name, ...)
+    
+    Returns:
+        Tupla (lineage_id assegnato all'evento, genealogie unite in lineage_id)
+    """
+    log_id = event[0]
+    nodes = [
+        (value, kind)
+        for kind, value in zip(DOCUMENT_IDENTIFIERS, event[1:1 + len(DOCUMENT_IDENTIFIERS)])
+        if value is not None
+    ]
+    
+    placeholders = " OR ".join("(value = ? AND kind = ?)" for _ in nodes)
+    params = [item for node in nodes for item in node]
+    cursor.execute(
+        f"SELECT value, kind, lineage_id FROM document_lineage_nodes WHERE {placeholders}",
+        params
+    )
+    existing = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+    lineages = set(existing.values())
+    
+    absorbed: List[str] = []
+    if not lineages:
+        lineage_id = log_id
+    elif len(lineages) == 1:
+        lineage_id = next(iter(lineages))
+    else:
+        lineage_id, absorbed = _merge_lineages(cursor, lineages)
+    
+    missing = [(value, kind, lineage_id) for value, kind in nodes if (value, kind) not in existing]
+    if missing:
+        cursor.executemany(
+            "INSERT INTO document_lineage_nodes (value, kind, lineage_id) VALUES (?, ?, ?)",
+            missing
+        )
+    
+    cursor.execute("UPDATE document_events SET lineage_id = ? WHERE log_id = ?", (lineage_id, log_id))
+    return lineage_id, absorbed
+
+def _merge_lineages(cursor: sqlite3.Cursor, lineages: set) -> Tuple[str, List[str]]:
+    """
+    Unisce più genealogie in quella con più nodi, rietichettando le altre.
+    
+    Returns:
+        Tupla (lineage_id della genealogia risultante, genealogie rietichettate)
+    """
+    lineage_list = sorted(lineages)
+    placeholders = ", ".join("?" for _ in lineage_list)
+    cursor.execute(f'''
+    SELECT lineage_id, COUNT(*) FROM document_lineage_nodes
+    WHERE lineage_id IN ({placeholders})
+    GROUP BY lineage_id
+    ''', lineage_list)
+    sizes = dict(cursor.fetchall())
+    root = max(lineage_list, key=lambda lineage: (sizes.get(lineage, 0), lineage))
+    
+    others = [lineage for lineage in lineage_list if lineage != root]
+    placeholders = ", ".join("?" for _ in others)
+    cursor.execute(
+        f"UPDATE document_lineage_nodes SET lineage_id = ? WHERE lineage_id IN ({placeholders})",
+        [root] + others
+    )
+    cursor.execute(
+        f"UPDATE document_events SET lineage_id = ? WHERE lineage_id IN ({placeholders})",
+        [root] + others
+    )
+    return root, others
+
+def backfill_document_lineage(conn: sqlite3.Connection, batch_size: int = LINEAGE_BACKFILL_BATCH_SIZE) -> int:
+    """
+    Collega alla genealogia gli eventi di document_events che non hanno ancora un lineage_id.
+    
+    Gli eventi vengono elaborati in ordine cronologico, una transazione per blocco.
+    
+    Args:
+        conn: Connessione al database
+        batch_size: Numero di eventi collegati per transazione
+    
+    Returns:
+        Numero di eventi collegati
+    """
+    cursor = conn.cursor()
+    total = 0
+    
+    while True:
+        cursor.execute('''
+        SELECT log_id, document_id, file_hash, file_name FROM document_events
+        WHERE lineage_id IS NULL
+        ORDER BY timestamp
+        LIMIT ?
+        ''', (batch_size,))
+        events = cursor.fetchall()
+        if not events:
+            break
+        
+        for event in events:
+            link_document_event(cursor, tuple(event))
+        conn.commit()
+        total += len(events)
+    
+    if total:
+        logger.info(f"Backfill della genealogia dei documenti completato: {total} eventi collegati")
+    return total
+
+def find_lineages(cursor: sqlite3.Cursor, identifier: str) -> List[str]:
+    """
+    Restituisce le genealogie che contengono un identificativo (document_id, file_hash o file_name).
+    
+    Args:
+        cursor: Cursore del database
+        identifier: Identificativo da cercare
+    
+    Returns:
+        Elenco dei lineage_id (vuoto se l'identificativo non è noto)
+    """
+    cursor.execute(
+        "SELECT DISTINCT lineage_id FROM document_lineage_nodes WHERE value = ?",
+        (identifier,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def lineage_identifiers(cursor: sqlite3.Cursor, lineage_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    Restituisce tutti gli identificativi delle genealogie indicate, raggruppati per tipo.
+    
+    Args:
+        cursor: Cursore del database
+        lineage_ids: Genealogie da leggere
+    
+    Returns:
+        Dizionario {"document_id": [...], "file_hash": [...], "file_name": [...]}
+    """
+    identifiers: Dict[str, List[str]] = {kind: [] for kind in DOCUMENT_IDENTIFIERS}
+    if not lineage_ids:
+        return identifiers
+    
+    placeholders = ", ".join("?" for _ in lineage_ids)
+    cursor.execute(f'''
+    SELECT kind, value FROM document_lineage_nodes
+    WHERE lineage_id IN ({placeholders})
+    ORDER BY kind, value
+    ''', lineage_ids)
+    for kind, value in cursor.fetchall():
+        identifiers[kind].append(value)
+    return identifiers
+
+def lineage_events_subquery(
+    lineage_ids: List[str],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce la subquery che seleziona gli ID dei log delle genealogie indicate.
+    
+    Args:
+        lineage_ids: Genealogie da leggere
+        start_date: Data di inizio (opzionale)
+        end_date: Data di fine (opzionale)
+    
+    Returns:
+        Tupla (subquery SQL, parametri)
+    """
+    placeholders = ", ".join("?" for _ in lineage_ids)
+    query = f"SELECT log_id FROM document_events WHERE lineage_id IN ({placeholders})"
+    params: List[Any] = list(lineage_ids)
+    
+    # La colonna timestamp contiene l'ora locale senza fuso: gli estremi vengono convertiti
+    if start_date:
+        query += " AND timestamp >= ?"
+        params.append(normalize_timestamp(start_date))
+    
+    if end_date:
+        query += " AND timestamp <= ?"
+        params.append(normalize_timestamp(end_date))
+    
+    return query, params
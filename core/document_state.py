@@ -0,0 +1,318 @@
+"""
+Stato corrente di ogni documento.
+
+La tabella document_state contiene una riga per genealogia (vedi
+core/document_lineage.py) con l'ultimo evento, i conteggi per tipo di evento
+e l'ultimo errore. Viene aggiornata nella transazione di scrittura di ogni
+evento del ciclo di vita, così che le viste "stato attuale dei documenti"
+leggano una riga per documento invece di tutti gli eventi.
+"""
+
+import json
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.timestamps import normalize_timestamp
+
+logger = logging.getLogger("LogManager")
+
+# Colonne della tabella document_state restituite dagli endpoint
+STATE_FIELDS = [
+    "lineage_id", "document_id", "file_hash", "file_name",
+    "last_event", "last_timestamp", "last_log_id", "first_timestamp",
+    "event_count", "event_counts", "last_error", "last_error_timestamp"
+]
+
+# Colonne ammesse per l'ordinamento dell'elenco degli stati
+STATE_SORT_FIELDS = ("last_timestamp", "first_timestamp", "event_count", "last_error_timestamp")
+
+# Valori di details.status che indicano un errore
+ERROR_STATUSES = ("error", "failed", "failure")
+
+def initialize_document_state(cursor: sqlite3.Cursor):
+    """
+    Crea la tabella document_state con i relativi indici.
+    
+    Se la tabella viene creata su un database che contiene già degli eventi,
+    viene ricostruita subito a partire da document_events.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='document_state'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_state (
+        lineage_id TEXT PRIMARY KEY,
+        document_id TEXT,
+        file_hash TEXT,
+        file_name TEXT,
+        last_event TEXT,
+        last_timestamp TEXT NOT NULL,
+        last_log_id TEXT NOT NULL,
+        first_timestamp TEXT NOT NULL,
+        event_count INTEGER NOT NULL,
+        event_counts TEXT NOT NULL,
+        last_error TEXT,
+        last_error_timestamp TEXT
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_state_last ON document_state (last_timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_state_event ON document_state (last_event, last_timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_state_document ON document_state (document_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_state_file ON document_state (file_name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_state_error ON document_state (last_error_timestamp)')
+    
+    if created:
+        rebuilt = rebuild_document_state(cursor)
+        if rebuilt:
+            logger.info(f"Tabella document_state creata dagli eventi esistenti: {rebuilt} documenti")
+
+def event_error(details: Optional[Dict[str, Any]], lifecycle_event: Optional[str], message: str) -> Optional[str]:
+    """
+    Determina se un evento del ciclo di vita segnala un errore.
+    
+    Args:
+        details: Dettagli del log
+        lifecycle_event: Nome dell'evento
+        message: Messaggio del log
+    
+    Returns:
+        Descrizione dell'errore, None se l'evento non è un errore
+    """
+    details = details if isinstance(details, dict) else {}
+    for key in ("error", "error_message"):
+        if details.get(key):
+            error = details[key]
+            return error if isinstance(error, str) else json.dumps(error, default=str)
+    
+    status = details.get("status")
+    event = (lifecycle_event or "").lower()
+    if (isinstance(status, str) and status.lower() in ERROR_STATUSES) or "error" in event or "fail" in event:
+        return message
+    return None
+
+def apply_document_event(
+    cursor: sqlite3.Cursor,
+    lineage_id: str,
+    event: Sequence[Any],
+    error: Optional[str] = None,
+    absorbed: Sequence[str] = ()
+):
+    """
+    Aggiorna lo stato di un documento con un nuovo evento.
+    
+    Gli eventi arrivati in ritardo (timestamp precedente all'ultimo evento)
+    aggiornano i conteggi ma non l'ultimo evento.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        lineage_id: Genealogia del documento
+        event: Riga di document_events (log_id, document_id, file_hash, file_name, lifecycle_event, timestamp)
+        error: Descrizione dell'errore segnalato dall'evento (vedi event_error)
+        absorbed: Genealogie unite a lineage_id da questo evento
+    """
+    if absorbed:
+        _merge_states(cursor, lineage_id, absorbed)
+    
+    log_id, document_id, file_hash, file_name, lifecycle_event, timestamp = event[:6]
+    
+    cursor.execute(f"SELECT {', '.join(STATE_FIELDS)} FROM document_state WHERE lineage_id = ?", (lineage_id,))
+    row = cursor.fetchone()
+    state = dict(zip(STATE_FIELDS, row)) if row else {
+        "lineage_id": lineage_id,
+        "document_id": None,
+        "file_hash": None,
+        "file_name": None,
+        "last_event": None,
+        "last_timestamp": timestamp,
+        "last_log_id": log_id,
+        "first_timestamp": timestamp,
+        "event_count": 0,
+        "event_counts": "{}",
+        "last_error": None,
+        "last_error_timestamp": None
+    }
+    
+    counts = json.loads(state["event_counts"])
+    event_name = lifecycle_event or "unknown"
+    counts[event_name] = counts.get(event_name, 0) + 1
+    state["event_counts"] = json.dumps(counts, sort_keys=True)
+    state["event_count"] += 1
+    state["first_timestamp"] = min(state["first_timestamp"], timestamp)
+    
+    if row is None or timestamp >= state["last_timestamp"]:
+        state["last_event"] = lifecycle_event
+        state["last_timestamp"] = timestamp
+        state["last_log_id"] = log_id
+        # Gli identificativi più recenti sostituiscono i precedenti (es. dopo una rinomina)
+        for name, value in (("document_id", document_id), ("file_hash", file_hash), ("file_name", file_name)):
+            if value is not None:
+                state[name] = value
+    else:
+        for name, value in (("document_id", document_id), ("file_hash", file_hash), ("file_name", file_name)):
+            if state[name] is None:
+                state[name] = value
+    
+    if error and (state["last_error_timestamp"] is None or timestamp >= state["last_error_timestamp"]):
+        state["last_error"] = error
+        state["last_error_timestamp"] = timestamp
+    
+    placeholders = ", ".join("?" for _ in STATE_FIELDS)
+    cursor.execute(
+        f"INSERT OR REPLACE INTO document_state ({', '.join(STATE_FIELDS)}) VALUES ({placeholders})",
+        [state[field] for field in STATE_FIELDS]
+    )
+
+def _merge_states(cursor: sqlite3.Cursor, lineage_id: str, absorbed: Sequence[str]):
+    """
+    Unisce gli stati delle genealogie assorbite in quello di lineage_id.
+    """
+    lineages = [lineage_id] + list(absorbed)
+    placeholders = ", ".join("?" for _ in lineages)
+    cursor.execute(f"SELECT {', '.join(STATE_FIELDS)} FROM document_state WHERE lineage_id IN ({placeholders})", lineages)
+    states = [dict(zip(STATE_FIELDS, row)) for row in cursor.fetchall()]
+    cursor.execute(f"DELETE FROM document_state WHERE lineage_id IN ({placeholders})", lineages)
+    if not states:
+        return
+    
+    latest = max(states, key=lambda state: state["last_timestamp"])
+    merged = dict(latest, lineage_id=lineage_id)
+    merged["first_timestamp"] = min(state["first_timestamp"] for state in states)
+    merged["event_count"] = sum(state["event_count"] for state in states)
+    
+    counts: Dict[str, int] = {}
+    for state in states:
+        for name, count in json.loads(state["event_counts"]).items():
+            counts[name] = counts.get(name, 0) + count
+    merged["event_counts"] = json.dumps(counts, sort_keys=True)
+    
+    for name in ("document_id", "file_hash", "file_name"):
+        if merged[name] is None:
+            merged[name] = next((state[name] for state in states if state[name] is not None), None)
+    
+    errors = [state for state in states if state["last_error_timestamp"]]
+    if errors:
+        last_error = max(errors, key=lambda state: state["last_error_timestamp"])
+        merged["last_error"] = last_error["last_error"]
+        merged["last_error_timestamp"] = last_error["last_error_timestamp"]
+    
+    placeholders = ", ".join("?" for _ in STATE_FIELDS)
+    cursor.execute(
+        f"INSERT INTO document_state ({', '.join(STATE_FIELDS)}) VALUES ({placeholders})",
+        [merged[field] for field in STATE_FIELDS]
+    )
+
+def rebuild_document_state(cursor: sqlite3.Cursor) -> int:
+    """
+    Ricostruisce document_state da document_events (usato dopo i backfill).
+    
+    Args:
+        cursor: Cursore della transazione in cui eseguire la ricostruzione
+    
+    Returns:
+        Numero di documenti ricostruiti
+    """
+    cursor.execute("DELETE FROM document_state")
+    cursor.execute('''
+    SELECT e.lineage_id, e.log_id, e.document_id, e.file_hash, e.file_name, e.lifecycle_event, e.timestamp,
+           CASE WHEN json_valid(l.details) THEN l.details END AS details, l.message
+    FROM document_events e
+    JOIN logs l ON l.id = e.log_id
+    WHERE e.lineage_id IS NOT NULL
+    ORDER BY e.timestamp
+    ''')
+    rows = cursor.fetchall()
+    
+    for row in rows:
+        details = json.loads(row[7]) if row[7] else None
+        apply_document_event(cursor, row[0], tuple(row[1:7]), event_error(details, row[5], row[8]))
+    
+    cursor.execute("SELECT COUNT(*) FROM document_state")
+    return cursor.fetchone()[0]
+
+def state_to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Converte una riga di document_state in dizionario, decodificando i conteggi per evento.
+    """
+    state = dict(zip(STATE_FIELDS, row))
+    state["event_counts"] = json.loads(state["event_counts"])
+    return state
+
+def build_state_query(
+    document_id: Optional[str] = None,
+    file_name: Optional[str] = None,
+    event: Optional[str] = None,
+    stages: Optional[List[str]] = None,
+    updated_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    has_error: Optional[bool] = None,
+    sort_by: str = "last_timestamp",
+    sort_order: str = "desc",
+    limit: int = 100,
+    offset: int = 0
+) -> Tuple[str, List[Any], str, List[Any]]:
+    """
+    Costruisce le query per l'elenco paginato degli stati dei documenti.
+    
+    Args:
+        document_id: Filtra per document_id
+        file_name: Filtra per nome file (corrispondenza parziale)
+        event: Filtra per ultimo evento (corrispondenza esatta)
+        stages: Filtra gli ultimi eventi che contengono una di queste fasi (es. upload, delete)
+        updated_before: Ultimo evento precedente a questa data
+        updated_after: Ultimo evento successivo a questa data
+        has_error: Filtra i documenti con (o senza) un errore registrato
+        sort_by: Colonna di ordinamento (vedi STATE_SORT_FIELDS)
+        sort_order: asc o desc
+        limit: Numero massimo di righe
+        offset: Offset per la paginazione
+    
+    Returns:
+        Tupla (query, parametri, query di conteggio, parametri del conteggio)
+    """
+    if sort_by not in STATE_SORT_FIELDS:
+        raise ValueError(f"Ordinamento non valido: {sort_by}. Valori ammessi: {', '.join(STATE_SORT_FIELDS)}")
+    if sort_order.lower() not in ("asc", "desc"):
+        raise ValueError(f"Direzione di ordinamento non valida: {sort_order}")
+    
+    clauses = []
+    params: List[Any] = []
+    
+    if document_id:
+        clauses.append("document_id = ?")
+        params.append(document_id)
+    
+    if file_name:
+        clauses.append("file_name LIKE ?")
+        params.append(f"%{file_name}%")
+    
+    if event:
+        clauses.append("last_event = ?")
+        params.append(event)
+    
+    if stages:
+        clauses.append("(" + " OR ".join("last_event LIKE ?" for _ in stages) + ")")
+        params.extend(f"%{stage}%" for stage in stages)
+    
+    # last_timestamp contiene l'ora locale senza fuso: gli estremi vengono convertiti
+    if updated_before:
+        clauses.append("last_timestamp < ?")
+        params.append(normalize_timestamp(updated_before))
+    
+    if updated_after:
+        clauses.append("last_timestamp >= ?")
+        params.append(normalize_timestamp(updated_after))
+    
+    if has_error is not None:
+        clauses.append("last_error_timestamp IS NOT NULL" if has_error else "last_error_timestamp IS NULL")
+    
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = (
+        f"SELECT {', '.join(STATE_FIELDS)} FROM document_state{where} "
+        f"ORDER BY {sort_by} {sort_order.upper()} LIMIT ? OFFSET ?"
+    )
+    return query, params + [limit, offset], f"SELECT COUNT(*) FROM document_state{where}", params
@@ -0,0 +1,390 @@
+"""
+Estrazione online dei modelli di messaggio (fingerprint) in stile Drain.
+
+Ogni messaggio viene diviso in token; i token che contengono cifre, percorsi o
+identificativi esadecimali vengono sostituiti dal segnaposto <*>. Il messaggio
+viene instradato in un albero a profondità fissa (numero di token, poi i primi
+token) fino a una foglia che contiene i modelli candidati: se uno di essi è
+abbastanza simile il messaggio gli viene assegnato e le posizioni diverse
+diventano <*>, altrimenti nasce un nuovo modello. L'identificativo di un
+modello (fingerprint_id) resta lo stesso anche quando il modello si
+generalizza.
+
+I modelli sono memorizzati nella tabella log_fingerprints insieme al numero di
+log, alla prima e all'ultima occorrenza; la tabella log_fingerprint_counts
+contiene i conteggi per minuto, progetto, livello e modulo e permette di
+ottenere i gruppi più frequenti di un intervallo senza leggere i messaggi.
+Entrambe vengono aggiornate dal writer nella transazione di inserimento e
+decrementate da un trigger quando i log vengono eliminati.
+
+Le foglie dell'albero vengono caricate dal database alla prima occorrenza e
+rilette quando nessun modello in memoria corrisponde, così che più processi
+che scrivono sullo stesso database condividano i modelli.
+"""
+
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.dictionaries import name_expression
+from core.timestamps import normalize_timestamp, sql_iso_timestamp
+
+logger = logging.getLogger("LogManager")
+
+# Segnaposto per i token variabili
+WILDCARD = "<*>"
+
+# Lunghezza del prefisso del timestamp usato come bucket dei conteggi (minuto)
+FINGERPRINT_BUCKET_PREFIX = 16
+
+# Log elaborati per ogni transazione del backfill
+FINGERPRINT_BACKFILL_BATCH_SIZE = 5000
+
+# Token considerati variabili: numeri e identificativi, percorsi, esadecimali
+_VARIABLE_TOKEN = re.compile(r"\d|[/\\]|^(0x)?[0-9a-fA-F]{8,}$")
+
+class _Template:
+    """
+    Modello di messaggio di una foglia dell'albero.
+    """
+    __slots__ = ("fingerprint_id", "tokens")
+    
+    def __init__(self, fingerprint_id: str, tokens: List[str]):
+        self.fingerprint_id = fingerprint_id
+        self.tokens = tokens
+
+def message_tokens(message: str, max_tokens: int) -> List[str]:
+    """
+    Divide un messaggio in token sostituendo quelli variabili con il segnaposto.
+    
+    Args:
+        message: Testo del messaggio
+        max_tokens: Numero massimo di token considerati
+    
+    Returns:
+        Lista dei token
+    """
+    return [
+        WILDCARD if _VARIABLE_TOKEN.search(token) else token
+        for token in (message or "").split()[:max_tokens]
+    ]
+
+class FingerprintTree:
+    """
+    Albero di instradamento dei messaggi verso i rispettivi modelli.
+    
+    L'albero a profondità fissa è rappresentato da un dizionario indicizzato
+    dal percorso (numero di token e primi token); ogni foglia contiene la
+    lista dei modelli che condividono quel percorso.
+    """
+    
+    def __init__(self, similarity: float = 0.5, depth: int = 2, max_tokens: int = 64):
+        """
+        Inizializza l'albero.
+        
+        Args:
+            similarity: Frazione minima di token uguali per assegnare un messaggio a un modello
+            depth: Numero di token iniziali usati per instradare il messaggio
+            max_tokens: Numero massimo di token considerati per messaggio
+        """
+        self.similarity = similarity
+        self.depth = depth
+        self.max_tokens = max_tokens
+        self._leaves: Dict[str, List[_Template]] = {}
+        self._lock = threading.Lock()
+    
+    def route(self, tokens: List[str]) -> str:
+        """
+        Restituisce il percorso della foglia di un messaggio.
+        """
+        return " ".join([str(len(tokens))] + tokens[:self.depth])
+    
+    def assign(self, cursor: sqlite3.Cursor, message: str) -> Tuple[str, str, str]:
+        """
+        Assegna un messaggio al modello più simile, creandone uno nuovo se necessario.
+        
+        Args:
+            cursor: Cursore usato per leggere le foglie non ancora in memoria
+            message: Testo del messaggio
+        
+        Returns:
+            Tupla (fingerprint_id, percorso della foglia, modello aggiornato)
+        """
+        tokens = message_tokens(message, self.max_tokens)
+        route = self.route(tokens)
+        
+        with self._lock:
+            templates = self._leaves.get(route)
+            if templates is None:
+                templates = self._load_leaf(cursor, route)
+            
+            template = self._best_match(templates, tokens)
+            if template is None:
+                # Il modello può essere stato creato da un altro processo
+                template = self._best_match(self._load_leaf(cursor, route), tokens)
+            
+            if template is None:
+                fingerprint_id = hashlib.sha1(f"{route}\n{' '.join(tokens)}".encode("utf-8")).hexdigest()[:16]
+                template = _Template(fingerprint_id, tokens)
+                self._leaves[route].append(template)
+            else:
+                template.tokens = [
+                    current if current == token else WILDCARD
+                    for current, token in zip(template.tokens, tokens)
+                ]
+            
+            return template.fingerprint_id, route, " ".join(template.tokens)
+    
+    def _best_match(self, templates: List[_Template], tokens: List[str]) -> Optional[_Template]:
+        """
+        Restituisce il modello più simile ai token se supera la soglia di similarità.
+        
+        A parità di similarità si preferisce il modello con più segnaposto.
+        """
+        best = None
+        best_score = (-1.0, -1)
+        for template in templates:
+            same = sum(1 for current, token in zip(template.tokens, tokens) if current == token)
+            similarity = same / len(tokens) if tokens else 1.0
+            score = (similarity, template.tokens.count(WILDCARD))
+            if score > best_score:
+                best, best_score = template, score
+        
+        if best is not None and best_score[0] >= self.similarity:
+            return best
+        return None
+    
+    def _load_leaf(self, cursor: sqlite3.Cursor, route: str) -> List[_Template]:
+        """
+        Legge dal database i modelli di una foglia, aggiungendo quelli non ancora in memoria.
+        """
+        templates = self._leaves.setdefault(route, [])
+        known = {template.fingerprint_id for template in templates}
+        cursor.execute(
+            "SELECT fingerprint_id, template FROM log_fingerprints WHERE route = ?",
+            (route,)
+        )
+        for fingerprint_id, template in cursor.fetchall():
+            if fingerprint_id not in known:
+                templates.append(_Template(fingerprint_id, template.split()))
+        return templates
+
+# Alberi dei modelli, uno per database
+_trees: Dict[str, FingerprintTree] = {}
+_trees_lock = threading.Lock()
+
+def get_fingerprint_tree(db_path: str) -> FingerprintTree:
+    """
+    Ottiene l'albero dei modelli condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        FingerprintTree
+    """
+    with _trees_lock:
+        if db_path not in _trees:
+            from core.config import get_settings
+            settings = get_settings()
+            _trees[db_path] = FingerprintTree(
+                similarity=settings.fingerprint_similarity,
+                depth=settings.fingerprint_depth,
+                max_tokens=settings.fingerprint_max_tokens
+            )
+        return _trees[db_path]
+
+def initialize_fingerprints(cursor: sqlite3.Cursor):
+    """
+    Crea le tabelle dei modelli, l'indice su fingerprint_id e il trigger di eliminazione.
+    
+    I log scritti prima della creazione restano con fingerprint_id NULL
+    finché non vengono elaborati da backfill_fingerprints.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_fingerprints (
+        fingerprint_id TEXT PRIMARY KEY,
+        route TEXT NOT NULL,
+        template TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_fingerprints_route ON log_fingerprints (route)')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_fingerprint_counts (
+        bucket TEXT NOT NULL,
+        fingerprint_id TEXT NOT NULL,
+        project TEXT NOT NULL,
+        level TEXT NOT NULL,
+        module TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (bucket, fingerprint_id, project, level, module)
+    )
+    ''')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_fingerprint ON log_records (fingerprint_id, timestamp_us)')
+    
+    # Il bucket è il prefisso del timestamp testuale (ora locale), come nel writer
+    bucket = f"substr({sql_iso_timestamp('old.timestamp_us')}, 1, {FINGERPRINT_BUCKET_PREFIX})"
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_logs_delete_fingerprints AFTER DELETE ON log_records
+    WHEN old.fingerprint_id IS NOT NULL
+    BEGIN
+        UPDATE log_fingerprints SET count = count - 1 WHERE fingerprint_id = old.fingerprint_id;
+        UPDATE log_fingerprint_counts SET count = count - 1
+        WHERE bucket = {bucket}
+          AND fingerprint_id = old.fingerprint_id
+          AND project = {name_expression('project', 'old.project_id')}
+          AND level = {name_expression('level', 'old.level_id')}
+          AND module = {name_expression('module', 'old.module_id')};
+        DELETE FROM log_fingerprint_counts
+        WHERE bucket = {bucket}
+          AND fingerprint_id = old.fingerprint_id AND count <= 0;
+    END
+    ''')
+
+def index_fingerprint(cursor: sqlite3.Cursor, tree: FingerprintTree, row: dict) -> str:
+    """
+    Assegna un log al suo modello e aggiorna i contatori.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        tree: Albero dei modelli del database
+        row: Riga della tabella logs (timestamp, project, level, module, message)
+    
+    Returns:
+        fingerprint_id da memorizzare nella riga del log
+    """
+    fingerprint_id, route, template = tree.assign(cursor, row["message"])
+    timestamp = row["timestamp"]
+    
+    # L'upsert ricrea anche la riga di un modello la cui transazione di creazione è stata annullata
+    cursor.execute('''
+    INSERT INTO log_fingerprints (fingerprint_id, route, template, count, first_seen, last_seen)
+    VALUES (?, ?, ?, 1, ?, ?)
+    ON CONFLICT (fingerprint_id) DO UPDATE SET
+        template = excluded.template,
+        count = count + 1,
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen)
+    ''', (fingerprint_id, route, template, timestamp, timestamp))
+    
+    cursor.execute('''
+    INSERT INTO log_fingerprint_counts (bucket, fingerprint_id, project, level, module, count)
+    VALUES (?, ?, ?, ?, ?, 1)
+    ON CONFLICT (bucket, fingerprint_id, project, level, module) DO UPDATE SET count = count + 1
+    ''', (timestamp[:FINGERPRINT_BUCKET_PREFIX], fingerprint_id, row["project"], row["level"], row["module"]))
+    
+    return fingerprint_id
+
+def backfill_fingerprints(
+    conn: sqlite3.Connection,
+    tree: FingerprintTree,
+    batch_size: int = FINGERPRINT_BACKFILL_BATCH_SIZE
+) -> int:
+    """
+    Assegna un modello ai log scritti prima della creazione delle tabelle dei modelli.
+    
+    I log vengono elaborati in ordine cronologico, una transazione per blocco;
+    l'operazione può essere interrotta e ripresa.
+    
+    Args:
+        conn: Connessione al database
+        tree: Albero dei modelli del database
+        batch_size: Numero di log elaborati per transazione
+    
+    Returns:
+        Numero di log elaborati
+    """
+    cursor = conn.cursor()
+    total = 0
+    
+    while True:
+        cursor.execute('''
+        SELECT id, timestamp, project, level, module, message FROM log_rows
+        WHERE fingerprint_id IS NULL
+        ORDER BY timestamp_us
+        LIMIT ?
+        ''', (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        
+        for row in rows:
+            row = dict(zip(("id", "timestamp", "project", "level", "module", "message"), row))
+            fingerprint_id = index_fingerprint(cursor, tree, row)
+            cursor.execute("UPDATE log_records SET fingerprint_id = ? WHERE id = ?", (fingerprint_id, row["id"]))
+        conn.commit()
+        total += len(rows)
+    
+    if total:
+        logger.info(f"Backfill dei modelli di messaggio completato: {total} log elaborati")
+    return total
+
+def fingerprint_groups_query(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project: Optional[str] = None,
+    level: Optional[str] = None,
+    module: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce la query dei modelli più frequenti nell'intervallo indicato.
+    
+    L'intervallo ha la risoluzione dei bucket (un minuto): sono contati tutti
+    i minuti che intersecano [start_date, end_date].
+    
+    Args:
+        start_date: Inizio dell'intervallo (opzionale)
+        end_date: Fine dell'intervallo (opzionale)
+        project: Filtra per progetto
+        level: Filtra per livello di log
+        module: Filtra per modulo
+        limit: Numero massimo di modelli restituiti
+    
+    Returns:
+        Tupla (query SQL, parametri); la query restituisce fingerprint_id,
+        template, count, first_bucket, last_bucket, total_count, first_seen, last_seen
+    """
+    clauses = []
+    params: List[Any] = []
+    
+    # I bucket sono prefissi dell'ora locale senza fuso: gli estremi vengono convertiti
+    if start_date:
+        clauses.append("c.bucket >= ?")
+        params.append(normalize_timestamp(start_date)[:FINGERPRINT_BUCKET_PREFIX])
+    
+    if end_date:
+        clauses.append("c.bucket <= ?")
+        params.append(normalize_timestamp(end_date)[:FINGERPRINT_BUCKET_PREFIX])
+    
+    for column, value in (("project", project), ("level", level), ("module", module)):
+        if value:
+            clauses.append(f"c.{column} = ?")
+            params.append(value)
+    
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f'''
+    SELECT c.fingerprint_id, f.template, SUM(c.count) AS count,
+           MIN(c.bucket) AS first_bucket, MAX(c.bucket) AS last_bucket,
+           f.count AS total_count, f.first_seen, f.last_seen
+    FROM log_fingerprint_counts c
+    JOIN log_fingerprints f ON f.fingerprint_id = c.fingerprint_id
+    {where}
+    GROUP BY c.fingerprint_id
+    ORDER BY count DESC, c.fingerprint_id
+    LIMIT ?
+    '''
+    params.append(limit)
+    return query, params
@@ -0,0 +1,453 @@
+"""
+Livello in memoria dei log più recenti (hot tier).
+
+Quasi tutte le query della dashboard e della ricerca riguardano gli ultimi
+minuti di log. L'HotTier mantiene in memoria, entro un budget in byte, le
+righe più recenti scritte dal writer in colonne ordinate per timestamp:
+get_logs risponde da qui alle query sul periodo coperto e legge da SQLite
+solo la parte più vecchia.
+
+Il livello copre tutti i log con timestamp successivo a covered_after: quando
+il budget è superato vengono scartati i log più vecchi e covered_after avanza
+al loro timestamp; i log retrodatati che arrivano sotto la copertura restano
+solo su disco. Progetto, livello e modulo sono stringhe condivise
+(sys.intern), quindi occupano memoria una sola volta.
+
+Cancellazioni, compressione e ricostruzioni (bump_generation senza intervalli)
+svuotano il livello, che riparte dai log scritti successivamente.
+
+Il writer di questo processo registra le righe dopo il commit, ma altri
+processi (altri worker con un proprio LogManager) scrivono direttamente nel
+database. Prima di ogni query il livello confronta il
+rowid massimo di log_records con quello che conosce (sync) e legge le righe
+mancanti; se il rowid massimo è diminuito il livello viene ricaricato. Le
+cancellazioni eseguite da altri processi che non toccano il rowid massimo
+non vengono rilevate.
+"""
+
+import sys
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+from core.models import LogLevel, LogProject
+from core.query_cache import get_epoch
+from core.raw_json import RAW_JSON_FIELDS
+from core.timestamps import EPOCH, to_micros
+
+logger = logging.getLogger("PramaIA-LogService.HotTier")
+
+# Colonne della vista logs nell'ordine di SELECT *
+HOT_TIER_COLUMNS = ("id", "timestamp", "project", "level", "module", "message", "details", "context", "fingerprint_id")
+
+# Conversione in minuscolo delle sole lettere ASCII, come LIKE di SQLite
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# Occupazione di un record oltre alle stringhe (oggetto, slot nelle colonne)
+_RECORD_OVERHEAD = 150
+
+# Righe scritte da altri processi oltre le quali sync ricarica il livello invece di leggerle
+SYNC_MAX_ROWS = 10000
+
+# Colonne lette dal database: quelle della vista, il timestamp intero e la validità del JSON
+_LOAD_SELECT = (
+    f"SELECT {', '.join(HOT_TIER_COLUMNS)}, timestamp_us, "
+    "json_valid(details) AS details_valid, json_valid(context) AS context_valid FROM log_rows"
+)
+
+
+class HotRecord:
+    """
+    Riga della tabella logs mantenuta in memoria.
+    """
+    
+    __slots__ = HOT_TIER_COLUMNS + ("timestamp_us", "details_valid", "context_valid", "size")
+    
+    def __init__(self, row: Dict[str, Any]):
+        self.id = row["id"]
+        self.timestamp = row["timestamp"]
+        self.timestamp_us = row["timestamp_us"]
+        self.project = sys.intern(row["project"])
+        self.level = sys.intern(row["level"])
+        self.module = sys.intern(row["module"])
+        self.message = row["message"]
+        self.details = row["details"]
+        self.context = row["context"]
+        self.fingerprint_id = row.get("fingerprint_id")
+        # Validità del JSON letta da SQLite al caricamento; il writer produce JSON valido
+        self.details_valid = row.get("details_valid", 1)
+        self.context_valid = row.get("context_valid", 1)
+        self.size = _RECORD_OVERHEAD + sum(
+            sys.getsizeof(value)
+            for value in (self.id, self.timestamp, self.message, self.details, self.context, self.fingerprint_id)
+            if value is not None
+        )
+    
+    def row(self, fields: Optional[List[str]] = None, json_valid: bool = False) -> Dict[str, Any]:
+        """
+        Restituisce la riga come dizionario con le colonne richieste.
+        
+        Args:
+            fields: Colonne richieste (None per tutte)
+            json_valid: Aggiunge le colonne details_valid e context_valid dei campi
+                JSON selezionati, come JSON_VALID_COLUMNS per render_row
+        """
+        fields = fields or HOT_TIER_COLUMNS
+        row = {field: getattr(self, field) for field in fields}
+        if json_valid:
+            for field in RAW_JSON_FIELDS:
+                if field in fields:
+                    row[f"{field}_valid"] = getattr(self, f"{field}_valid")
+        return row
+
+
+class HotSelection:
+    """
+    Risultato di una query sul livello in memoria e parte da leggere su disco.
+    """
+    
+    def __init__(self, rows: List[Dict[str, Any]], disk_limit: int = 0, disk_offset: int = 0, disk_end: Optional[datetime] = None):
+        """
+        Args:
+            rows: Righe trovate in memoria, già ordinate e paginate
+            disk_limit: Righe da leggere su disco dopo quelle in memoria (0 se nessuna)
+            disk_offset: Offset della query su disco
+            disk_end: Fine dell'intervallo della query su disco (fine della copertura, in UTC)
+        """
+        self.rows = rows
+        self.disk_limit = disk_limit
+        self.disk_offset = disk_offset
+        self.disk_end = disk_end
+
+
+class HotTier:
+    """
+    Log più recenti in memoria, ordinati per timestamp, entro un budget in byte.
+    """
+    
+    def __init__(self, max_bytes: int):
+        """
+        Inizializza il livello.
+        
+        Args:
+            max_bytes: Memoria massima occupata dai log (0 disabilita il livello)
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        # Colonne parallele ordinate per timestamp (microsecondi UTC); _head è il primo elemento valido
+        self._timestamps: List[int] = []
+        self._records: List[HotRecord] = []
+        self._head = 0
+        # Tutti i log con timestamp (microsecondi UTC) successivo sono in memoria (None: tutti i log)
+        self.covered_after: Optional[int] = None
+        # Rowid massimo di log_records le cui righe sono state tutte viste dal livello
+        self.rowid_mark = 0
+        self.loaded = False
+        self._epoch = get_epoch()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """
+        True se il budget consente di mantenere log in memoria.
+        """
+        return self.max_bytes > 0
+    
+    def __len__(self) -> int:
+        """
+        Numero di log in memoria.
+        """
+        return len(self._records) - self._head
+    
+    def load(self, conn):
+        """
+        Carica dal database i log più recenti che rientrano nel budget.
+        
+        Args:
+            conn: Connessione al database
+        """
+        with self._lock:
+            if self.loaded or not self.enabled:
+                return
+            self._epoch = get_epoch()
+            cursor = conn.cursor()
+            # Letto prima delle righe: quelle scritte nel frattempo verranno rilette da sync
+            cursor.execute("SELECT MAX(rowid) FROM log_records")
+            rowid_mark = cursor.fetchone()[0] or 0
+            cursor.execute(f"{_LOAD_SELECT} ORDER BY timestamp_us DESC")
+            records = []
+            size = 0
+            covered_after = None
+            for row in cursor:
+                record = HotRecord(dict(row))
+                if size + record.size > self.max_bytes:
+                    covered_after = record.timestamp_us
+                    break
+                records.append(record)
+                size += record.size
+            cursor.close()
+            
+            # I log con lo stesso timestamp del primo escluso restano su disco
+            if covered_after is not None:
+                records = [record for record in records if record.timestamp_us > covered_after]
+            records.reverse()
+            self._records = records
+            self._timestamps = [record.timestamp_us for record in records]
+            self._head = 0
+            self.size = sum(record.size for record in records)
+            self.covered_after = covered_after
+            self.rowid_mark = rowid_mark
+            self.loaded = True
+        logger.info(f"Hot tier caricato: {len(records)} log, {self.size} byte")
+    
+    def record(self, rows: List[Dict[str, Any]]):
+        """
+        Aggiunge i log appena scritti (dopo il commit).
+        
+        Args:
+            rows: Righe scritte dal writer (con timestamp_us e rowid)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self.loaded:
+                return
+            self._check_epoch()
+            for row in rows:
+                # Il rowid avanza solo se nessun altro processo ha scritto righe intermedie
+                if row.get("rowid") == self.rowid_mark + 1:
+                    self.rowid_mark = row["rowid"]
+            self._insert(rows)
+            self._evict()
+    
+    def sync(self, cursor):
+        """
+        Aggiunge i log scritti nel database da altri processi dall'ultima verifica.
+        
+        Confronta il rowid massimo di log_records con rowid_mark: le righe
+        successive vengono lette e inserite (quelle già presenti sono ignorate),
+        oltre SYNC_MAX_ROWS righe o se il rowid massimo è diminuito il livello
+        viene ricaricato.
+        
+        Args:
+            cursor: Cursore del database
+        """
+        if not self.enabled or not self.loaded:
+            return
+        cursor.execute("SELECT MAX(rowid) FROM log_records")
+        watermark = cursor.fetchone()[0] or 0
+        mark = self.rowid_mark
+        if watermark == mark:
+            return
+        
+        if watermark < mark or watermark - mark > SYNC_MAX_ROWS:
+            logger.info(f"Hot tier ricaricato: rowid massimo {watermark}, noto {mark}")
+            self.clear()
+            self.load(cursor.connection)
+            return
+        
+        cursor.execute(
+            f"{_LOAD_SELECT} WHERE id IN (SELECT id FROM log_records WHERE rowid > ? AND rowid <= ?)",
+            (mark, watermark)
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+        with self._lock:
+            if not self.loaded:
+                return
+            self._check_epoch()
+            self._insert(rows)
+            self._evict()
+            self.rowid_mark = max(self.rowid_mark, watermark)
+    
+    def _insert(self, rows: List[Dict[str, Any]]):
+        """
+        Inserisce le righe nella posizione del loro timestamp, ignorando quelle già presenti.
+        """
+        for row in rows:
+            timestamp = row["timestamp_us"]
+            if self.covered_after is not None and timestamp <= self.covered_after:
+                continue
+            # Un log scritto durante il caricamento o riletto da sync può essere già presente
+            low = bisect_left(self._timestamps, timestamp, self._head)
+            position = bisect_right(self._timestamps, timestamp, low)
+            if any(self._records[index].id == row["id"] for index in range(low, position)):
+                continue
+            
+            record = HotRecord(row)
+            if position == len(self._timestamps):
+                self._timestamps.append(timestamp)
+                self._records.append(record)
+            else:
+                # Log fuori ordine: inserito nella posizione del suo timestamp
+                self._timestamps.insert(position, timestamp)
+                self._records.insert(position, record)
+            self.size += record.size
+    
+    def _evict(self):
+        """
+        Scarta i log più vecchi finché l'occupazione supera il budget.
+        """
+        timestamps = self._timestamps
+        while self.size > self.max_bytes and self._head < len(timestamps):
+            self.covered_after = timestamps[self._head]
+            # Anche i log con lo stesso timestamp, che su disco non sarebbero distinguibili
+            while self._head < len(timestamps) and timestamps[self._head] == self.covered_after:
+                self.size -= self._records[self._head].size
+                self._records[self._head] = None
+                self._head += 1
+        
+        # Compatta le colonne quando la parte scartata supera quella valida
+        if self._head > 1024 and self._head * 2 > len(timestamps):
+            del self._timestamps[:self._head]
+            del self._records[:self._head]
+            self._head = 0
+    
+    def _check_epoch(self):
+        """
+        Svuota il livello dopo un'invalidazione completa dei dati (cancellazioni, compressione).
+        """
+        epoch = get_epoch()
+        if epoch == self._epoch:
+            return
+        self._epoch = epoch
+        if len(self):
+            last = self._timestamps[-1]
+            self.covered_after = last if self.covered_after is None else max(self.covered_after, last)
+        self._timestamps = []
+        self._records = []
+        self._head = 0
+        self.size = 0
+    
+    def clear(self):
+        """
+        Svuota il livello: verrà ricaricato dal database al prossimo LogManager.
+        """
+        with self._lock:
+            self._timestamps = []
+            self._records = []
+            self._head = 0
+            self.size = 0
+            self.covered_after = None
+            self.rowid_mark = 0
+            self.loaded = False
+    
+    def select(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        sort_by: str = "timestamp",
+        sort_order: str = "desc",
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[List[str]] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None,
+        json_valid: bool = False
+    ) -> Optional[HotSelection]:
+        """
+        Risponde a una query di get_logs con i log in memoria.
+        
+        Sono supportati l'ordinamento per timestamp e i filtri per progetto,
+        livello, modulo, intervallo, document_id e file_name (con la stessa
+        semantica di LIKE). In ordine decrescente i log in memoria vengono
+        completati con quelli su disco fino alla fine della copertura; in ordine
+        crescente la query deve ricadere interamente nel periodo coperto.
+        
+        Con json_valid le righe includono la validità di details e context
+        (vedi HotRecord.row), come le righe lette con JSON_VALID_COLUMNS.
+        
+        Returns:
+            HotSelection, oppure None se la query va eseguita su disco
+        """
+        if not self.enabled or not self.loaded or sort_by != "timestamp" or context_filter or details_filter:
+            return None
+        needles = [
+            value.translate(_ASCII_LOWER) for value in (document_id, file_name) if value
+        ]
+        if any("%" in needle or "_" in needle for needle in needles):
+            return None
+        
+        project = project.value if isinstance(project, LogProject) else project
+        level = level.value if isinstance(level, LogLevel) else level
+        start = to_micros(start_date) if start_date else None
+        end = to_micros(end_date) if end_date else None
+        descending = sort_order.lower() != "asc"
+        
+        with self._lock:
+            self._check_epoch()
+            covered_after = self.covered_after
+            complete = covered_after is None or (start is not None and start > covered_after)
+            if not complete and (not descending or (end is not None and end <= covered_after)):
+                return None
+            
+            timestamps = self._timestamps
+            low = self._head
+            if start is not None:
+                low = bisect_left(timestamps, start, low)
+            high = len(timestamps) if end is None else bisect_right(timestamps, end, low)
+            
+            wanted = offset + limit
+            matched = []
+            positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+            for position in positions:
+                record = self._records[position]
+                if project and record.project != project:
+                    continue
+                if level and record.level != level:
+                    continue
+                if module and record.module != module:
+                    continue
+                if needles and not _contains_all(record, needles):
+                    continue
+                matched.append(record)
+                if len(matched) == wanted:
+                    break
+        
+        rows = [record.row(fields, json_valid) for record in matched[offset:]]
+        if complete or len(matched) == wanted:
+            return HotSelection(rows)
+        
+        # La parte più vecchia dei risultati è su disco, fino alla fine della copertura
+        return HotSelection(
+            rows,
+            disk_limit=limit - len(rows),
+            disk_offset=max(offset - len(matched), 0),
+            disk_end=EPOCH + timedelta(microseconds=covered_after)
+        )
+
+
+def _contains_all(record: HotRecord, needles: List[str]) -> bool:
+    """
+    Verifica che ogni testo compaia in details o context (come LIKE '%testo%').
+    """
+    details = record.details.translate(_ASCII_LOWER) if record.details else ""
+    context = record.context.translate(_ASCII_LOWER) if record.context else ""
+    return all(needle in details or needle in context for needle in needles)
+
+
+# Livelli in memoria per database, condivisi dai LogManager dello stesso database
+_tiers: Dict[str, HotTier] = {}
+_tiers_lock = threading.Lock()
+
+def get_hot_tier(db_path: str) -> HotTier:
+    """
+    Ottiene il livello in memoria condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        HotTier
+    """
+    with _tiers_lock:
+        if db_path not in _tiers:
+            from core.config import get_settings
+            _tiers[db_path] = HotTier(max_bytes=get_settings().hot_tier_bytes)
+        return _tiers[db_path]
@@ -0,0 +1,359 @@
+"""
+Conteggi approssimati dei valori distinti (HyperLogLog) per ora, giorno e totale.
+
+Per ogni dimensione (client project:modulo, modulo, documento) viene mantenuto
+uno sketch HyperLogLog per ogni ora, uno per ogni giorno e uno complessivo.
+Gli sketch sono unibili senza perdita (massimo dei registri), quindi il numero
+di valori distinti in un intervallo si ottiene unendo i giorni interi e le ore
+residue, con un costo che dipende solo dal numero di bucket letti.
+
+Come per gli sketch top-K, gli aggiornamenti vengono accumulati in memoria
+dopo il commit e riversati periodicamente nella tabella log_distinct,
+unendoli a quelli già memorizzati. Le cancellazioni non vengono sottratte: il
+totale complessivo conta i valori visti almeno una volta.
+"""
+
+import math
+import time
+import zlib
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("LogManager")
+
+# Dimensioni per cui vengono contati i valori distinti
+DISTINCT_DIMENSIONS = ("client", "module", "document")
+
+# Bucket complessivo (tutti i log mai ricevuti)
+DISTINCT_ALL = "*"
+
+# Lunghezze dei prefissi del timestamp per i bucket orari e giornalieri
+DISTINCT_HOUR_PREFIX = 13
+DISTINCT_DAY_PREFIX = 10
+
+# Valori di 2^-r per i registri (r <= 64)
+_POWERS = [2.0 ** -rank for rank in range(65)]
+
+def distinct_hash(value: str) -> int:
+    """
+    Hash a 64 bit di un valore, stabile tra processi diversi.
+    """
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog con 2^precision registri di un byte.
+    """
+    __slots__ = ("precision", "registers")
+    
+    def __init__(self, precision: int = 11, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+    
+    def add_hash(self, value_hash: int):
+        """
+        Registra un valore a partire dal suo hash (vedi distinct_hash).
+        """
+        index = value_hash >> (64 - self.precision)
+        remainder = value_hash & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self) -> int:
+        """
+        Stima il numero di valori distinti (errore standard circa 1.04 / sqrt(registri)).
+        """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(_POWERS[rank] for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Correzione per cardinalità piccole (linear counting)
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+    
+    def to_bytes(self) -> bytes:
+        return zlib.compress(bytes(self.registers))
+    
+    @classmethod
+    def from_bytes(cls, precision: int, data: bytes) -> Optional["HyperLogLog"]:
+        registers = bytearray(zlib.decompress(data))
+        if len(registers) != 1 << precision:
+            # Sketch creato con una precisione diversa
+            return None
+        return cls(precision, registers)
+
+def distinct_buckets(start_date: datetime, end_date: datetime) -> List[str]:
+    """
+    Scompone un intervallo nei bucket da unire: giorni interi e ore residue.
+    
+    Sono incluse tutte le ore che intersecano [start_date, end_date].
+    
+    Returns:
+        Lista di bucket ("YYYY-MM-DD" per i giorni, "YYYY-MM-DDTHH" per le ore)
+    """
+    buckets = []
+    moment = start_date.replace(minute=0, second=0, microsecond=0)
+    while moment <= end_date:
+        if moment.hour == 0 and moment + timedelta(hours=23) <= end_date:
+            buckets.append(moment.isoformat()[:DISTINCT_DAY_PREFIX])
+            moment += timedelta(days=1)
+        else:
+            buckets.append(moment.isoformat()[:DISTINCT_HOUR_PREFIX])
+            moment += timedelta(hours=1)
+    return buckets
+
+class DistinctStore:
+    """
+    Sketch HyperLogLog per dimensione e bucket di un database, con gli aggiornamenti non ancora riversati.
+    """
+    
+    def __init__(self, db_path: str, precision: int = 11, flush_seconds: int = 30):
+        """
+        Inizializza l'archivio.
+        
+        Args:
+            db_path: Percorso del database
+            precision: Bit di indice dei registri (2^precision registri per sketch)
+            flush_seconds: Intervallo minimo tra due scritture su database
+        """
+        self.db_path = db_path
+        self.precision = precision
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[Tuple[str, str], HyperLogLog] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _add(self, sketches: Dict[Tuple[str, str], HyperLogLog], timestamp: str, dimension: str, value: str):
+        value_hash = distinct_hash(value)
+        for bucket in (timestamp[:DISTINCT_HOUR_PREFIX], timestamp[:DISTINCT_DAY_PREFIX], DISTINCT_ALL):
+            sketch = sketches.get((dimension, bucket))
+            if sketch is None:
+                sketch = sketches[(dimension, bucket)] = HyperLogLog(self.precision)
+            sketch.add_hash(value_hash)
+    
+    def record(self, values: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Aggiorna gli sketch con i log appena scritti e li riversa se è trascorso flush_seconds.
+        
+        Args:
+            values: Coppie (timestamp, {dimensione: valore}) dei log scritti
+        """
+        with self._lock:
+            for timestamp, dimensions in values:
+                for dimension, value in dimensions.items():
+                    if value is not None and value != "":
+                        self._add(self._pending, timestamp, dimension, str(value))
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """
+        Unisce gli sketch in memoria a quelli memorizzati nella tabella log_distinct.
+        
+        Returns:
+            Numero di sketch scritti
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            self._write(cursor, pending)
+            conn.commit()
+            return len(pending)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Errore durante il salvataggio degli sketch dei valori distinti: {str(e)}")
+            # Gli aggiornamenti non salvati tornano in memoria per il prossimo tentativo
+            with self._lock:
+                for key, sketch in pending.items():
+                    if key in self._pending:
+                        sketch.merge(self._pending[key])
+                    self._pending[key] = sketch
+            return 0
+        finally:
+            conn.close()
+    
+    def _write(self, cursor: sqlite3.Cursor, sketches: Dict[Tuple[str, str], HyperLogLog]):
+        """
+        Unisce e scrive gli sketch nella transazione corrente.
+        """
+        for (dimension, bucket), sketch in sketches.items():
+            stored = self._load(cursor, dimension, [bucket])
+            if stored:
+                sketch.merge(stored[0])
+            cursor.execute('''
+            INSERT OR REPLACE INTO log_distinct (dimension, bucket, registers, updated_at)
+            VALUES (?, ?, ?, ?)
+            ''', (dimension, bucket, sketch.to_bytes(), datetime.now().isoformat()))
+    
+    def _load(self, cursor: sqlite3.Cursor, dimension: str, buckets: List[str]) -> List[HyperLogLog]:
+        """
+        Legge gli sketch memorizzati di una dimensione per i bucket indicati.
+        """
+        placeholders = ", ".join("?" for _ in buckets)
+        cursor.execute(
+            f"SELECT registers FROM log_distinct WHERE dimension = ? AND bucket IN ({placeholders})",
+            [dimension] + buckets
+        )
+        sketches = [HyperLogLog.from_bytes(self.precision, row[0]) for row in cursor.fetchall()]
+        return [sketch for sketch in sketches if sketch is not None]
+    
+    def count(
+        self,
+        dimension: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> int:
+        """
+        Stima il numero di valori distinti di una dimensione.
+        
+        Args:
+            dimension: Dimensione (vedi DISTINCT_DIMENSIONS)
+            start_date: Inizio dell'intervallo (None con end_date None: tutti i log)
+            end_date: Fine dell'intervallo
+        
+        Returns:
+            Numero stimato di valori distinti
+        """
+        if start_date is None and end_date is None:
+            buckets = [DISTINCT_ALL]
+        else:
+            end_date = end_date or datetime.now()
+            buckets = distinct_buckets(start_date or end_date - timedelta(hours=24), end_date)
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            sketches = self._load(conn.cursor(), dimension, buckets)
+        finally:
+            conn.close()
+        
+        merged = HyperLogLog(self.precision)
+        for sketch in sketches:
+            merged.merge(sketch)
+        
+        # Aggiornamenti non ancora riversati
+        with self._lock:
+            for bucket in buckets:
+                pending = self._pending.get((dimension, bucket))
+                if pending is not None:
+                    merged.merge(pending)
+        
+        return merged.count()
+    
+    def backfill(self, cursor: sqlite3.Cursor):
+        """
+        Popola gli sketch dai log già presenti nel database (una sola lettura della tabella logs).
+        
+        Args:
+            cursor: Cursore della transazione di inizializzazione
+        """
+        cursor.execute('''
+        SELECT DISTINCT substr(timestamp, 1, ?), project, module,
+               CASE WHEN json_valid(details) THEN json_extract(details, '$.document_id') END
+        FROM logs
+        ''', (DISTINCT_HOUR_PREFIX,))
+        sketches: Dict[Tuple[str, str], HyperLogLog] = {}
+        for hour, project, module, document_id in cursor.fetchall():
+            self._add(sketches, hour, "client", f"{project}:{module}")
+            self._add(sketches, hour, "module", module)
+            if document_id is not None and document_id != "":
+                self._add(sketches, hour, "document", str(document_id))
+        
+        self._write(cursor, sketches)
+        if sketches:
+            logger.info(f"Sketch dei valori distinti popolati dai log esistenti: {len(sketches)} bucket")
+    
+    def prune(self, before: datetime) -> int:
+        """
+        Elimina gli sketch orari e giornalieri precedenti a before (il totale resta).
+        
+        Returns:
+            Numero di sketch eliminati
+        """
+        day = before.isoformat()[:DISTINCT_DAY_PREFIX]
+        with self._lock:
+            for key in [key for key in self._pending if key[1] != DISTINCT_ALL and key[1] < day]:
+                del self._pending[key]
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute("DELETE FROM log_distinct WHERE bucket != ? AND bucket < ?", (DISTINCT_ALL, day))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+# Archivi degli sketch dei valori distinti, uno per database
+_stores: Dict[str, DistinctStore] = {}
+_stores_lock = threading.Lock()
+
+@atexit.register
+def _flush_stores():
+    """
+    Riversa su database gli sketch ancora in memoria alla chiusura del processo.
+    """
+    for store in list(_stores.values()):
+        store.flush()
+
+def get_distinct_store(db_path: str) -> DistinctStore:
+    """
+    Ottiene l'archivio degli sketch dei valori distinti condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        DistinctStore
+    """
+    with _stores_lock:
+        if db_path not in _stores:
+            from core.config import get_settings
+            settings = get_settings()
+            _stores[db_path] = DistinctStore(
+                db_path,
+                precision=settings.distinct_precision,
+                flush_seconds=settings.sketch_flush_seconds
+            )
+        return _stores[db_path]
+
+def initialize_distinct(cursor: sqlite3.Cursor, store: DistinctStore):
+    """
+    Crea la tabella degli sketch dei valori distinti, popolandola dai log esistenti alla creazione.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+        store: Archivio degli sketch del database
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='log_distinct'")
+    created = cursor.fetchone() is None
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_distinct (
+        dimension TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        registers BLOB NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (dimension, bucket)
+    )
+    ''')
+    
+    if created:
+        store.backfill(cursor)
@@ -0,0 +1,533 @@
+"""
+Distribuzione in tempo reale dei log scritti (live tail) ai client sottoscritti.
+
+Il writer pubblica i log appena salvati su un TailHub (uno per database). Ogni
+sottoscrizione registra filtri di uguaglianza (project, level, module,
+document_id) e un testo da cercare nel messaggio: i filtri di uguaglianza sono
+compilati in un indice valore -> sottoscrizioni, così ogni log viene valutato
+una sola volta per tutte le sottoscrizioni, e il testo viene confrontato solo
+per quelle che hanno superato l'indice.
+
+Ogni sottoscrizione ha una coda limitata: se il client non legge abbastanza in
+fretta vengono scartati i log più vecchi e il numero di log persi viene
+riportato al client. La pubblicazione non attende mai i client.
+
+I client WebSocket (TailWebSocketSession) possono aprire più sottoscrizioni
+sulla stessa connessione, cambiarne i filtri e ricevere i log a blocchi: un
+frame ogni batch_ms millisecondi o ogni batch_size log.
+"""
+
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from core.models import LogEntry
+from core.attributes import attribute_value
+from core.raw_json import render_row
+
+logger = logging.getLogger("LogManager")
+
+# Campi filtrabili per uguaglianza
+TAIL_FILTER_FIELDS = ("project", "level", "module", "document_id")
+
+# Campi dei log inviati ai client
+TAIL_FIELDS = ("id", "timestamp", "project", "level", "module", "message", "details", "context", "fingerprint_id")
+
+class TailSubscription:
+    """
+    Sottoscrizione al live tail con coda limitata e conteggio dei log scartati.
+    """
+    
+    def __init__(self, filters: Dict[str, Optional[str]], text: Optional[str], queue_size: int, loop: asyncio.AbstractEventLoop):
+        """
+        Inizializza la sottoscrizione.
+        
+        Args:
+            filters: Valori richiesti per i campi di TAIL_FILTER_FIELDS (None = qualsiasi)
+            text: Testo da cercare nel messaggio, senza distinzione di maiuscole (opzionale)
+            queue_size: Numero massimo di log in attesa di essere letti
+            loop: Event loop del client, risvegliato quando arrivano log
+        """
+        self.id = str(uuid.uuid4())
+        self.queue_size = queue_size
+        self.filters: Dict[str, str] = {}
+        self.text: Optional[str] = None
+        self.set_filters(filters, text)
+        self.delivered = 0
+        self.dropped = 0
+        self.total_dropped = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._event = asyncio.Event()
+    
+    def set_filters(self, filters: Dict[str, Optional[str]], text: Optional[str] = None):
+        """
+        Imposta i filtri (l'indice del TailHub va ricompilato, vedi TailHub.update).
+        
+        Raises:
+            ValueError: Se un campo non è filtrabile
+        """
+        unknown = set(filters) - set(TAIL_FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Filtri non validi: {', '.join(sorted(unknown))}. Valori ammessi: {', '.join(TAIL_FILTER_FIELDS)}")
+        self.filters = {field: str(value) for field, value in filters.items() if value}
+        self.text = text.lower() if text else None
+    
+    def describe(self) -> Dict[str, Any]:
+        """
+        Descrive la sottoscrizione (filtri e contatori).
+        """
+        return {
+            "id": self.id,
+            "filters": dict(self.filters),
+            "text": self.text,
+            "queued": self.queued,
+            "delivered": self.delivered,
+            "dropped": self.total_dropped
+        }
+    
+    @property
+    def queued(self) -> int:
+        """
+        Numero di log in attesa di essere letti.
+        """
+        return len(self._queue)
+    
+    def push(self, payload: str):
+        """
+        Accoda un log serializzato, scartando il più vecchio se la coda è piena.
+        """
+        with self._lock:
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+                self.total_dropped += 1
+            self._queue.append(payload)
+    
+    def notify(self):
+        """
+        Risveglia il client (chiamabile da qualsiasi thread).
+        """
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Event loop già chiuso: il client si è disconnesso
+            pass
+    
+    async def wait(self, timeout: float) -> bool:
+        """
+        Attende nuovi log per al massimo timeout secondi.
+        
+        Returns:
+            True se sono arrivati log (o log scartati), False allo scadere del timeout
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+        return True
+    
+    def drain(self) -> Tuple[List[str], int]:
+        """
+        Preleva i log in coda e il numero di log scartati dall'ultima lettura.
+        
+        Returns:
+            Tupla (log serializzati in JSON, log scartati)
+        """
+        with self._lock:
+            payloads = list(self._queue)
+            self._queue.clear()
+            dropped = self.dropped
+            self.dropped = 0
+        self.delivered += len(payloads)
+        return payloads, dropped
+
+class TailHub:
+    """
+    Distribuzione dei log appena scritti alle sottoscrizioni di un database.
+    """
+    
+    def __init__(self, queue_size: int = 1000):
+        """
+        Inizializza l'hub.
+        
+        Args:
+            queue_size: Dimensione della coda di ogni sottoscrizione
+        """
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, TailSubscription] = {}
+        self._lock = threading.Lock()
+        # Indice compilato: (campo -> valore -> sottoscrizioni, sottoscrizioni senza filtri)
+        self._index: Tuple[Dict[str, Dict[str, List[TailSubscription]]], List[TailSubscription]] = ({}, [])
+    
+    @property
+    def subscriber_count(self) -> int:
+        """
+        Numero di sottoscrizioni attive.
+        """
+        return len(self._subscriptions)
+    
+    def subscribe(
+        self,
+        filters: Dict[str, Optional[str]],
+        text: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> TailSubscription:
+        """
+        Registra una sottoscrizione.
+        
+        Args:
+            filters: Valori richiesti per i campi di TAIL_FILTER_FIELDS
+            text: Testo da cercare nel messaggio (opzionale)
+            loop: Event loop del client (predefinito: quello in esecuzione)
+        
+        Returns:
+            TailSubscription
+        
+        Raises:
+            ValueError: Se un filtro non è valido
+        """
+        subscription = TailSubscription(filters, text, self.queue_size, loop or asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[subscription.id] = subscription
+            self._compile()
+        return subscription
+    
+    def update(self, subscription: TailSubscription, filters: Dict[str, Optional[str]], text: Optional[str] = None):
+        """
+        Cambia i filtri di una sottoscrizione.
+        
+        Raises:
+            ValueError: Se un filtro non è valido
+        """
+        with self._lock:
+            subscription.set_filters(filters, text)
+            self._compile()
+    
+    def unsubscribe(self, subscription: TailSubscription):
+        """
+        Rimuove una sottoscrizione.
+        """
+        with self._lock:
+            if self._subscriptions.pop(subscription.id, None) is not None:
+                self._compile()
+    
+    def subscriptions(self) -> List[Dict[str, Any]]:
+        """
+        Descrive le sottoscrizioni attive.
+        """
+        return [subscription.describe() for subscription in list(self._subscriptions.values())]
+    
+    def _compile(self):
+        """
+        Ricostruisce l'indice dei filtri (con il lock acquisito).
+        
+        L'indice viene sostituito in blocco: publish lo legge senza lock.
+        """
+        index = {field: {} for field in TAIL_FILTER_FIELDS}
+        unfiltered = []
+        for subscription in self._subscriptions.values():
+            if not subscription.filters:
+                unfiltered.append(subscription)
+            for field, value in subscription.filters.items():
+                index[field].setdefault(value, []).append(subscription)
+        self._index = (index, unfiltered)
+    
+    def _match(self, values: Dict[str, Iterable[str]], message: str) -> List[TailSubscription]:
+        """
+        Sottoscrizioni i cui filtri sono soddisfatti da un log.
+        
+        Args:
+            values: Valori del log per ciascun campo filtrabile
+            message: Messaggio del log
+        """
+        index, unfiltered = self._index
+        matched = list(unfiltered)
+        counts: Dict[TailSubscription, int] = {}
+        for field, field_values in values.items():
+            candidates = index.get(field)
+            if not candidates:
+                continue
+            for value in field_values:
+                for subscription in candidates.get(value, ()):
+                    count = counts.get(subscription, 0) + 1
+                    counts[subscription] = count
+                    if count == len(subscription.filters):
+                        matched.append(subscription)
+        
+        if any(subscription.text for subscription in matched):
+            lowered = message.lower()
+            matched = [subscription for subscription in matched if not subscription.text or subscription.text in lowered]
+        return matched
+    
+    def publish(self, written: List[Tuple[LogEntry, Dict[str, Any]]]):
+        """
+        Distribuisce i log appena scritti alle sottoscrizioni interessate.
+        
+        Ogni log viene serializzato al più una volta e ogni client viene
+        risvegliato una sola volta per batch.
+        
+        Args:
+            written: Coppie (LogEntry, riga memorizzata nella tabella logs)
+        """
+        if not self._subscriptions:
+            return
+        
+        notified = {}
+        for log_entry, row in written:
+            document_ids = {
+                value for value in (
+                    attribute_value((log_entry.details or {}).get("document_id")),
+                    attribute_value((log_entry.context or {}).get("document_id"))
+                ) if value
+            }
+            values = {
+                "project": (row["project"],),
+                "level": (row["level"],),
+                "module": (row["module"],),
+                "document_id": document_ids
+            }
+            matched = self._match(values, row["message"])
+            if not matched:
+                continue
+            
+            # Il JSON di details e context è già serializzato e valido: viene copiato così com'è
+            payload = render_row(
+                dict({field: row.get(field) for field in TAIL_FIELDS}, details_valid=1, context_valid=1),
+                None
+            )
+            for subscription in matched:
+                subscription.push(payload)
+                notified[subscription.id] = subscription
+        
+        for subscription in notified.values():
+            subscription.notify()
+
+# Azioni accettate sui WebSocket del live tail
+TAIL_WEBSOCKET_ACTIONS = ("subscribe", "update", "unsubscribe")
+
+# Intervallo ammesso per batch_ms (millisecondi tra due frame)
+TAIL_BATCH_MS_RANGE = (10, 10000)
+
+class TailWebSocketSession:
+    """
+    Connessione WebSocket al live tail con più sottoscrizioni e invio a blocchi.
+    
+    Messaggi del client (JSON):
+    - {"action": "subscribe", "id": "...", "filters": {...}, "text": "...",
+       "batch_ms": 250, "batch_size": 100, "coalesce": false}
+    - {"action": "update", "id": "...", ...campi da cambiare}
+    - {"action": "unsubscribe", "id": "..."}
+    
+    Messaggi del server: subscribed, updated, unsubscribed, error e
+    {"type": "logs", "id": ..., "dropped": n, "coalesced": n, "logs": [...]}.
+    Con coalesce attivo, se tra due frame arrivano più di batch_size log
+    vengono inviati solo i più recenti e gli altri sono contati in coalesced.
+    """
+    
+    def __init__(self, websocket: WebSocket, hub: TailHub):
+        """
+        Inizializza la sessione.
+        
+        Args:
+            websocket: Connessione già accettata
+            hub: Hub del live tail del database
+        """
+        from core.config import get_settings
+        self.settings = get_settings()
+        self.websocket = websocket
+        self.hub = hub
+        # id del client -> (sottoscrizione, opzioni di invio, task di invio)
+        self.subscriptions: Dict[str, Tuple[TailSubscription, Dict[str, Any], asyncio.Task]] = {}
+        self._send_lock = asyncio.Lock()
+    
+    async def run(self):
+        """
+        Gestisce i messaggi del client fino alla disconnessione.
+        """
+        try:
+            while True:
+                message = await self.websocket.receive_text()
+                try:
+                    request = json.loads(message)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    await self._send({"type": "error", "detail": "Messaggio JSON non valido"})
+                    continue
+                await self._handle(request)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for client_id in list(self.subscriptions):
+                self._close(client_id)
+    
+    async def _handle(self, request: Dict[str, Any]):
+        """
+        Esegue un'azione del client, rispondendo con un messaggio di errore se non è valida.
+        """
+        action = request.get("action")
+        client_id = str(request.get("id") or "default")
+        try:
+            if action == "subscribe":
+                await self._subscribe(client_id, request)
+            elif action == "update":
+                await self._update(client_id, request)
+            elif action == "unsubscribe":
+                if client_id not in self.subscriptions:
+                    raise ValueError(f"Sottoscrizione {client_id} non trovata")
+                self._close(client_id)
+                await self._send({"type": "unsubscribed", "id": client_id})
+            else:
+                raise ValueError(f"Azione non valida: {action}. Valori ammessi: {', '.join(TAIL_WEBSOCKET_ACTIONS)}")
+        except ValueError as e:
+            await self._send({"type": "error", "id": client_id, "detail": str(e)})
+    
+    def _options(self, request: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Legge le opzioni di invio (batch_ms, batch_size, coalesce) di una richiesta.
+        
+        Raises:
+            ValueError: Se un'opzione è fuori dall'intervallo ammesso
+        """
+        options = dict(current or {
+            "batch_ms": self.settings.tail_batch_ms,
+            "batch_size": self.settings.tail_batch_size,
+            "coalesce": False
+        })
+        try:
+            if request.get("batch_ms") is not None:
+                options["batch_ms"] = int(request["batch_ms"])
+            if request.get("batch_size") is not None:
+                options["batch_size"] = int(request["batch_size"])
+        except (TypeError, ValueError):
+            raise ValueError("batch_ms e batch_size devono essere numeri interi")
+        if request.get("coalesce") is not None:
+            options["coalesce"] = bool(request["coalesce"])
+        
+        low, high = TAIL_BATCH_MS_RANGE
+        if not low <= options["batch_ms"] <= high:
+            raise ValueError(f"batch_ms deve essere compreso tra {low} e {high}")
+        if not 1 <= options["batch_size"] <= self.hub.queue_size:
+            raise ValueError(f"batch_size deve essere compreso tra 1 e {self.hub.queue_size}")
+        return options
+    
+    async def _subscribe(self, client_id: str, request: Dict[str, Any]):
+        """
+        Apre una sottoscrizione e il relativo task di invio.
+        """
+        if client_id in self.subscriptions:
+            raise ValueError(f"Sottoscrizione {client_id} già attiva: usare update")
+        if self.hub.subscriber_count >= self.settings.tail_max_subscribers:
+            raise ValueError(f"Troppi client collegati al live tail (massimo {self.settings.tail_max_subscribers})")
+        
+        options = self._options(request)
+        subscription = self.hub.subscribe(request.get("filters") or {}, request.get("text"))
+        task = asyncio.create_task(self._pump(client_id, subscription, options))
+        self.subscriptions[client_id] = (subscription, options, task)
+        await self._send({"type": "subscribed", "id": client_id, "subscription": subscription.describe(), "options": options})
+    
+    async def _update(self, client_id: str, request: Dict[str, Any]):
+        """
+        Cambia filtri e opzioni di invio di una sottoscrizione aperta.
+        """
+        if client_id not in self.subscriptions:
+            raise ValueError(f"Sottoscrizione {client_id} non trovata")
+        subscription, options, _ = self.subscriptions[client_id]
+        
+        updated = self._options(request, options)
+        if "filters" in request or "text" in request:
+            self.hub.update(
+                subscription,
+                request["filters"] if "filters" in request else subscription.filters,
+                request["text"] if "text" in request else subscription.text
+            )
+        # Le opzioni sono lette dal task di invio a ogni frame
+        options.update(updated)
+        await self._send({"type": "updated", "id": client_id, "subscription": subscription.describe(), "options": options})
+    
+    def _close(self, client_id: str):
+        """
+        Chiude una sottoscrizione e ferma il suo task di invio.
+        """
+        subscription, _, task = self.subscriptions.pop(client_id)
+        task.cancel()
+        self.hub.unsubscribe(subscription)
+    
+    async def _pump(self, client_id: str, subscription: TailSubscription, options: Dict[str, Any]):
+        """
+        Invia i log di una sottoscrizione a blocchi: ogni batch_ms o ogni batch_size log.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await subscription.wait(self.settings.tail_heartbeat_seconds)
+                if not subscription.queued and not subscription.dropped:
+                    continue
+                
+                # Attende altri log fino allo scadere del blocco o al raggiungimento di batch_size
+                deadline = loop.time() + options["batch_ms"] / 1000
+                while subscription.queued < options["batch_size"]:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    await subscription.wait(remaining)
+                
+                payloads, dropped = subscription.drain()
+                size = options["batch_size"]
+                coalesced = 0
+                if options["coalesce"] and len(payloads) > size:
+                    coalesced = len(payloads) - size
+                    payloads = payloads[-size:]
+                
+                for start in range(0, max(len(payloads), 1), size):
+                    header = json.dumps({"type": "logs", "id": client_id, "dropped": dropped, "coalesced": coalesced})
+                    await self._send_text(header[:-1] + ', "logs": [' + ", ".join(payloads[start:start + size]) + "]}")
+                    dropped = coalesced = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Connessione chiusa durante l'invio: la sessione rimuove la sottoscrizione
+            logger.debug(f"Invio del live tail interrotto per {client_id}: {str(e)}")
+    
+    async def _send(self, message: Dict[str, Any]):
+        """
+        Invia un messaggio JSON al client.
+        """
+        await self._send_text(json.dumps(message))
+    
+    async def _send_text(self, text: str):
+        """
+        Invia un frame di testo, serializzando gli invii dei diversi task.
+        """
+        async with self._send_lock:
+            await self.websocket.send_text(text)
+
+# Hub del live tail, uno per database
+_hubs: Dict[str, TailHub] = {}
+_hubs_lock = threading.Lock()
+
+def get_tail_hub(db_path: str) -> TailHub:
+    """
+    Ottiene l'hub del live tail condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        TailHub
+    """
+    with _hubs_lock:
+        if db_path not in _hubs:
+            from core.config import get_settings
+            _hubs[db_path] = TailHub(queue_size=get_settings().tail_queue_size)
+        return _hubs[db_path]
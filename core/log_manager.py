@@ -5,17 +5,86 @@ Sistema di gestione dei log.
 import os
 import json
 import sqlite3
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
 from datetime import datetime, timedelta
 import uuid
+import time
 import logging
 
 from core.models import LogEntry, LogLevel, LogProject, LogStats
+from core.query_cache import (
+    LIFECYCLE_SCOPE, bump_generation, get_generation, note_ingest, filter_fingerprint, get_count_cache, get_facet_cache
+)
+from core.raw_json import json_valid_columns, render_rows
+from core.attributes import (
+    ATTRIBUTE_KEY_PATTERN, attribute_path, attribute_value, extract_attribute, parse_attribute_keys
+)
+from core.correlation import initialize_correlation_index, index_correlations, fetch_trace_rows
+from core.document_events import initialize_document_events, index_document_event, backfill_document_events
+from core.document_lineage import initialize_document_lineage, link_document_event, backfill_document_lineage
+from core.document_state import initialize_document_state, apply_document_event, event_error, rebuild_document_state
+from core.rollups import (
+    initialize_rollups, index_rollups, rollup_counts_query,
+    HISTOGRAM_INTERVALS, histogram_slot, histogram_slot_key, histogram_query
+)
+from core.fingerprints import (
+    get_fingerprint_tree, initialize_fingerprints, index_fingerprint,
+    backfill_fingerprints, fingerprint_groups_query
+)
+from core.sketches import SKETCH_DIMENSIONS, get_sketch_store, initialize_sketches
+from core.hyperloglog import DISTINCT_DIMENSIONS, get_distinct_store, initialize_distinct
+from core.clients import initialize_clients, accumulate_client, upsert_clients, build_clients_query
+from core.live_tail import get_tail_hub
+from core.hot_tier import get_hot_tier
+from core.dictionaries import code_column, get_log_dictionary, initialize_dictionaries
+from core.timestamps import to_micros, from_micros, format_timestamp, normalize_timestamp
+from core.archive_reader import iter_json_array, iter_reversed
 
 # Configura il logger interno
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("LogManager")
 
+# Colonne della tabella logs selezionabili tramite proiezione
+LOG_FIELDS = ["id", "timestamp", "project", "level", "module", "message", "details", "context", "fingerprint_id"]
+
+# Colonne mostrate nelle viste a elenco (modalità summary)
+SUMMARY_FIELDS = ["id", "timestamp", "project", "level", "module", "message"]
+
+# Dimensioni per cui è possibile calcolare i conteggi per faccetta
+FACET_FIELDS = ["level", "project", "module"]
+
+def parse_fields(fields: Optional[str] = None, summary: bool = False) -> Optional[List[str]]:
+    """
+    Converte i parametri di proiezione delle API in una lista di colonne.
+    
+    Args:
+        fields: Elenco di campi separati da virgola (es. "timestamp,level,message")
+        summary: Se True seleziona solo i campi delle viste a elenco
+        
+    Returns:
+        Lista ordinata di colonne da selezionare (sempre comprensiva di id),
+        oppure None per selezionare tutti i campi
+        
+    Raises:
+        ValueError: Se viene richiesto un campo inesistente
+    """
+    requested = []
+    if summary:
+        requested.extend(SUMMARY_FIELDS)
+    if fields:
+        requested.extend(field.strip() for field in fields.split(",") if field.strip())
+    
+    if not requested:
+        return None
+    
+    invalid = [field for field in requested if field not in LOG_FIELDS]
+    if invalid:
+        raise ValueError(f"Campi non validi: {', '.join(invalid)}. Valori ammessi: {', '.join(LOG_FIELDS)}")
+    
+    # L'id serve sempre per recuperare il log completo tramite /api/logs/{id}
+    requested.append("id")
+    return [field for field in LOG_FIELDS if field in requested]
+
 class LogManager:
     """
     Gestisce la memorizzazione e il recupero dei log.
@@ -35,18 +104,58 @@ class LogManager:
             # Assicurati che la directory logs esista
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             
+        from core.config import get_settings
+        
         self.db_path = db_path
         self.start_time = datetime.now()
+        
+        settings = get_settings()
+        
+        # Coppie (sorgente, chiave) indicizzate nella tabella log_attributes
+        self.indexed_attributes = parse_attribute_keys(settings.indexed_attribute_keys)
+        
+        # Coppie (sorgente, chiave) registrate nell'indice di correlazione
+        self.correlation_keys = parse_attribute_keys(settings.correlation_keys)
+        
+        # Modelli dei messaggi, condivisi dai LogManager dello stesso database
+        self.fingerprint_tree = get_fingerprint_tree(db_path)
+        
+        # Sketch top-K per finestra oraria, condivisi dai LogManager dello stesso database
+        self.sketches = get_sketch_store(db_path)
+        
+        # Sketch HyperLogLog dei valori distinti per ora, giorno e totale
+        self.distinct = get_distinct_store(db_path)
+        
+        # Distribuzione in tempo reale dei log scritti ai client del live tail
+        self.tail = get_tail_hub(db_path)
+        
+        # Log più recenti in memoria, usati da get_logs per il periodo coperto
+        self.hot_tier = get_hot_tier(db_path)
+        
+        # Codici di progetto, livello e modulo, condivisi dai LogManager dello stesso database
+        self.dictionary = get_log_dictionary(db_path)
+        
         self._initialize_database()
+        
+        if self.hot_tier.enabled and not self.hot_tier.loaded:
+            conn = self._get_connection()
+            try:
+                self.hot_tier.load(conn)
+            finally:
+                conn.close()
     
-    def _get_connection(self):
+    def _get_connection(self, check_same_thread: bool = True):
         """
         Ottiene una connessione al database.
         
+        Args:
+            check_same_thread: Se False la connessione può essere usata da thread diversi
+                (necessario per i generatori consumati da StreamingResponse)
+        
         Returns:
             Connessione a SQLite
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
         conn.row_factory = sqlite3.Row
         return conn
     
@@ -57,44 +166,127 @@ class LogManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        # Crea la tabella dei log
+        # Tabella dei log con progetto, livello e modulo codificati e vista logs con i nomi
+        initialize_dictionaries(cursor)
+        self.dictionary.load(cursor)
+        
+        # Indice invertito chiave/valore per le chiavi di context e details più usate nei filtri
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id TEXT PRIMARY KEY,
-            timestamp TEXT NOT NULL,
-            project TEXT NOT NULL,
-            level TEXT NOT NULL,
-            module TEXT NOT NULL,
-            message TEXT NOT NULL,
-            details TEXT,
-            context TEXT
+        CREATE TABLE IF NOT EXISTS log_attributes (
+            log_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL
         )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attributes_lookup ON log_attributes (source, key, value, log_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attributes_log ON log_attributes (log_id)')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_delete_attributes AFTER DELETE ON log_records
+        BEGIN
+            DELETE FROM log_attributes WHERE log_id = old.id;
+        END
+        ''')
+        self._sync_indexed_attributes(cursor)
+        
+        # Indice di correlazione request_id -> log (cronologia tra progetti)
+        initialize_correlation_index(cursor, self.correlation_keys)
+        
+        # Eventi del ciclo di vita dei documenti con colonne tipizzate
+        initialize_document_events(cursor)
+        
+        # Genealogia dei documenti (document_id, file_hash e file_name collegati)
+        initialize_document_lineage(cursor)
         
-        # Crea indici per migliorare le performance delle query
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON logs (timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_project ON logs (project)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_level ON logs (level)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_module ON logs (module)')
+        # Stato corrente di ogni documento (ultimo evento, conteggi, ultimo errore)
+        initialize_document_state(cursor)
+        
+        # Conteggi aggregati per minuto e per ora (statistiche e istogrammi)
+        initialize_rollups(cursor)
+        
+        # Modelli dei messaggi (fingerprint) e conteggi per minuto di ciascun modello
+        initialize_fingerprints(cursor)
+        
+        # Sketch top-K per finestra oraria
+        initialize_sketches(cursor)
+        
+        # Sketch dei valori distinti (client, moduli, documenti)
+        initialize_distinct(cursor, self.distinct)
+        
+        # Registro dei client (progetto, modulo, API key) aggiornato a ogni scrittura
+        initialize_clients(cursor)
         
         conn.commit()
         conn.close()
         
         logger.info(f"Database inizializzato: {self.db_path}")
     
-    def add_log(self, log_entry: LogEntry) -> str:
+    def _sync_indexed_attributes(self, cursor: sqlite3.Cursor):
         """
-        Aggiunge una voce di log al database.
+        Allinea la tabella log_attributes alle chiavi indicizzate configurate.
+        
+        Le chiavi aggiunte alla configurazione vengono popolate dai log esistenti,
+        quelle rimosse vengono eliminate dall'indice.
+        """
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indexed_attribute_keys (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            indexed_at TEXT NOT NULL,
+            PRIMARY KEY (source, key)
+        )
+        ''')
+        cursor.execute("SELECT source, key FROM indexed_attribute_keys")
+        registered = {(row["source"], row["key"]) for row in cursor.fetchall()}
+        
+        for source, key in registered - self.indexed_attributes:
+            cursor.execute("DELETE FROM log_attributes WHERE source = ? AND key = ?", (source, key))
+            cursor.execute("DELETE FROM indexed_attribute_keys WHERE source = ? AND key = ?", (source, key))
+            logger.info(f"Rimossa dall'indice la chiave {source}.{key}")
+        
+        for source, key in self.indexed_attributes - registered:
+            path = attribute_path(key)
+            cursor.execute(f'''
+            INSERT INTO log_attributes (log_id, source, key, value)
+            SELECT id, ?, ?, CAST(json_extract({source}, ?) AS TEXT)
+            FROM log_records
+            WHERE json_valid({source})
+              AND json_type({source}, ?) IN ('text', 'integer', 'real', 'true', 'false')
+            ''', (source, key, path, path))
+            backfilled = cursor.rowcount
+            cursor.execute(
+                "INSERT INTO indexed_attribute_keys (source, key, indexed_at) VALUES (?, ?, ?)",
+                (source, key, datetime.now().isoformat())
+            )
+            logger.info(f"Indicizzata la chiave {source}.{key} ({backfilled} log esistenti)")
+    
+    def _index_attributes(self, cursor: sqlite3.Cursor, log_entry: LogEntry):
+        """
+        Registra nella tabella log_attributes i valori delle chiavi indicizzate di un log.
+        """
+        attributes = []
+        for source, key in self.indexed_attributes:
+            data = log_entry.context if source == "context" else log_entry.details
+            value = attribute_value(extract_attribute(data, key))
+            if value is not None:
+                attributes.append((log_entry.id, source, key, value))
+        
+        if attributes:
+            cursor.executemany(
+                "INSERT INTO log_attributes (log_id, source, key, value) VALUES (?, ?, ?, ?)",
+                attributes
+            )
+    
+    def _serialize_entry(self, log_entry: LogEntry) -> Dict[str, Any]:
+        """
+        Converte una LogEntry nella riga da memorizzare nella tabella logs.
         
         Args:
-            log_entry: LogEntry da aggiungere
+            log_entry: LogEntry da convertire
             
         Returns:
-            ID del log aggiunto
+            Dizionario con i valori delle colonne della tabella logs
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         # Converti le strutture dati in JSON con gestione degli errori
         try:
             details_json = json.dumps(log_entry.details) if log_entry.details else None
@@ -109,33 +301,146 @@ class LogManager:
             logger.error(f"Errore durante la serializzazione JSON del contesto per il log {log_entry.id}: {str(e)}")
             context_json = json.dumps({"error": "Impossibile serializzare il contesto originale", "message": str(e)})
         
+        # Microsecondi UTC memorizzati e testo ISO locale restituito dalle API
+        timestamp_us = to_micros(log_entry.timestamp)
+        
+        return {
+            "id": log_entry.id,
+            "timestamp": format_timestamp(timestamp_us),
+            "timestamp_us": timestamp_us,
+            "project": log_entry.project.value if isinstance(log_entry.project, LogProject) else log_entry.project,
+            "level": log_entry.level.value if isinstance(log_entry.level, LogLevel) else log_entry.level,
+            "module": log_entry.module,
+            "message": log_entry.message,
+            "details": details_json,
+            "context": context_json
+        }
+    
+    def _store_entry(
+        self,
+        cursor: sqlite3.Cursor,
+        log_entry: LogEntry,
+        row: Dict[str, Any],
+        ingested: Dict[str, Tuple[str, str]]
+    ) -> Dict[str, Any]:
+        """
+        Inserisce una voce di log e aggiorna le tabelle ausiliarie nella transazione corrente.
+        
+        Args:
+            cursor: Cursore della transazione di scrittura
+            log_entry: LogEntry da inserire
+            row: Riga prodotta da _serialize_entry, con progetto, livello e modulo
+                già registrati nei dizionari
+            ingested: Intervalli di timestamp scritti per ambito, da passare a bump_generation
+            
+        Returns:
+            Riga memorizzata (con i nomi di progetto, livello e modulo)
+        """
+        row["fingerprint_id"] = index_fingerprint(cursor, self.fingerprint_tree, row)
+        codes = self.dictionary.encode(row)
+        
         # Inserisci il log
         cursor.execute('''
-        INSERT INTO logs (id, timestamp, project, level, module, message, details, context)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO log_records (id, timestamp_us, project_id, level_id, module_id, message, details, context, fingerprint_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
-            log_entry.id,
-            log_entry.timestamp.isoformat(),
-            log_entry.project,
-            log_entry.level,
-            log_entry.module,
-            log_entry.message,
-            details_json,
-            context_json
+            row["id"],
+            row["timestamp_us"],
+            codes["project_id"],
+            codes["level_id"],
+            codes["module_id"],
+            row["message"],
+            row["details"],
+            row["context"],
+            row["fingerprint_id"]
         ))
+        # Usato dall'hot tier per riconoscere le scritture di altri processi
+        row["rowid"] = cursor.lastrowid
+        
+        self._index_attributes(cursor, log_entry)
+        index_rollups(cursor, row)
+        index_correlations(cursor, log_entry, row["timestamp"], self.correlation_keys)
+        document_event = index_document_event(cursor, log_entry, row["timestamp"])
+        if document_event:
+            lineage_id, absorbed = link_document_event(cursor, document_event)
+            error = event_error(log_entry.details, document_event[4], log_entry.message)
+            apply_document_event(cursor, lineage_id, document_event, error, absorbed)
+            note_ingest(ingested, LIFECYCLE_SCOPE, row["timestamp"])
+        note_ingest(ingested, row["project"], row["timestamp"])
+        
+        return row
+    
+    def _sketch_values(self, log_entry: LogEntry, row: Dict[str, Any], api_key_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Valori delle dimensioni degli sketch top-K per un log scritto.
         
-        conn.commit()
-        conn.close()
+        Returns:
+            Tupla (timestamp, {dimensione: valore})
+        """
+        details = log_entry.details if isinstance(log_entry.details, dict) else {}
+        return row["timestamp"], {
+            "module": row["module"],
+            "fingerprint": row["fingerprint_id"],
+            "document": details.get("document_id"),
+            "api_key": api_key_id
+        }
+    
+    def _distinct_values(self, log_entry: LogEntry, row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Valori delle dimensioni degli sketch dei valori distinti per un log scritto.
+        
+        Returns:
+            Tupla (timestamp, {dimensione: valore})
+        """
+        details = log_entry.details if isinstance(log_entry.details, dict) else {}
+        return row["timestamp"], {
+            "client": f"{row['project']}:{row['module']}",
+            "module": row["module"],
+            "document": details.get("document_id")
+        }
+    
+    def add_log(self, log_entry: LogEntry, api_key_id: Optional[str] = None) -> str:
+        """
+        Aggiunge una voce di log al database.
+        
+        Args:
+            log_entry: LogEntry da aggiungere
+            api_key_id: Identificativo dell'API key che ha inviato il log (opzionale)
+            
+        Returns:
+            ID del log aggiunto
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        ingested = {}
+        try:
+            row = self._serialize_entry(log_entry)
+            self.dictionary.ensure(conn, [row])
+            row = self._store_entry(cursor, log_entry, row, ingested)
+            sketch_values = [self._sketch_values(log_entry, row, api_key_id)]
+            distinct_values = [self._distinct_values(log_entry, row)]
+            usage = {}
+            accumulate_client(usage, row, api_key_id)
+            upsert_clients(cursor, usage)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self._after_commit(ingested, [(log_entry, row)], sketch_values, distinct_values)
         
         logger.debug(f"Log aggiunto: {log_entry.id} - {log_entry.message}")
         return log_entry.id
     
-    def add_logs_batch(self, log_entries: List[LogEntry]) -> List[str]:
+    def add_logs_batch(self, log_entries: List[LogEntry], api_key_id: Optional[str] = None) -> List[str]:
         """
         Aggiunge più voci di log al database in un'unica transazione.
         
         Args:
             log_entries: Lista di LogEntry da aggiungere
+            api_key_id: Identificativo dell'API key che ha inviato i log (opzionale)
             
         Returns:
             Lista di ID dei log aggiunti
@@ -144,42 +449,27 @@ class LogManager:
         cursor = conn.cursor()
         
         log_ids = []
+        sketch_values = []
+        distinct_values = []
+        usage = {}
+        ingested = {}
+        written = []
         
         try:
-            for log_entry in log_entries:
-                # Converti le strutture dati in JSON con gestione degli errori
-                try:
-                    details_json = json.dumps(log_entry.details) if log_entry.details else None
-                except Exception as e:
-                    logger.error(f"Errore durante la serializzazione JSON dei dettagli per il log {log_entry.id}: {str(e)}")
-                    # Salva una versione semplificata che può essere serializzata
-                    details_json = json.dumps({"error": "Impossibile serializzare i dettagli originali", "message": str(e)})
-                    
-                try:    
-                    context_json = json.dumps(log_entry.context) if log_entry.context else None
-                except Exception as e:
-                    logger.error(f"Errore durante la serializzazione JSON del contesto per il log {log_entry.id}: {str(e)}")
-                    context_json = json.dumps({"error": "Impossibile serializzare il contesto originale", "message": str(e)})
-                
-                # Inserisci il log
-                cursor.execute('''
-                INSERT INTO logs (id, timestamp, project, level, module, message, details, context)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    log_entry.id,
-                    log_entry.timestamp.isoformat(),
-                    log_entry.project,
-                    log_entry.level,
-                    log_entry.module,
-                    log_entry.message,
-                    details_json,
-                    context_json
-                ))
-                
+            rows = [self._serialize_entry(log_entry) for log_entry in log_entries]
+            # Nuovi progetti, livelli e moduli registrati prima della transazione del batch
+            self.dictionary.ensure(conn, rows)
+            for log_entry, row in zip(log_entries, rows):
+                row = self._store_entry(cursor, log_entry, row, ingested)
                 log_ids.append(log_entry.id)
+                sketch_values.append(self._sketch_values(log_entry, row, api_key_id))
+                distinct_values.append(self._distinct_values(log_entry, row))
+                accumulate_client(usage, row, api_key_id)
+                written.append((log_entry, row))
             
+            # Una sola riga aggiornata per client, nella transazione del batch
+            upsert_clients(cursor, usage)
             conn.commit()
-            logger.info(f"Batch di {len(log_ids)} log aggiunto con successo")
         except Exception as e:
             conn.rollback()
             logger.error(f"Errore durante l'aggiunta del batch di log: {str(e)}")
@@ -187,75 +477,172 @@ class LogManager:
         finally:
             conn.close()
         
+        self._after_commit(ingested, written, sketch_values, distinct_values)
+        logger.info(f"Batch di {len(log_ids)} log aggiunto con successo")
         return log_ids
     
-    def get_logs(
+    def _after_commit(
+        self,
+        ingested: Dict[str, Tuple[str, str]],
+        written: List[Tuple[LogEntry, Dict[str, Any]]],
+        sketch_values: List[Tuple[str, Dict[str, Any]]],
+        distinct_values: List[Tuple[str, Dict[str, Any]]]
+    ):
+        """
+        Aggiorna le strutture in memoria dopo il commit di una scrittura.
+        
+        I log sono già salvati: un errore in uno di questi aggiornamenti viene
+        registrato senza essere propagato, altrimenti il client riceverebbe un
+        errore e ripetendo l'invio duplicherebbe i log. Gli aggiornamenti
+        successivi vengono comunque eseguiti; l'hot tier recupera le righe
+        mancanti alla lettura successiva (HotTier.sync).
+        
+        Args:
+            ingested: Intervalli scritti per progetto (per le cache)
+            written: Coppie (LogEntry, riga memorizzata)
+            sketch_values: Valori per gli sketch top-k
+            distinct_values: Valori per gli sketch dei valori distinti
+        """
+        for name, update in (
+            ("cache", lambda: bump_generation(ingested)),
+            ("hot tier", lambda: self.hot_tier.record([row for _, row in written])),
+            ("sketch top-k", lambda: self.sketches.record(sketch_values)),
+            ("valori distinti", lambda: self.distinct.record(distinct_values)),
+            ("live tail", lambda: self.tail.publish(written))
+        ):
+            try:
+                update()
+            except Exception as e:
+                logger.error(f"Errore durante l'aggiornamento di {name} dopo la scrittura: {str(e)}")
+    
+    def _build_filter_clauses(
         self,
         project: Optional[Union[LogProject, str]] = None,
         level: Optional[Union[LogLevel, str]] = None,
         module: Optional[str] = None,
-        document_id: Optional[str] = None,
-        file_name: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        sort_by: str = "timestamp",
-        sort_order: str = "desc",
-        limit: int = 100,
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None,
+        names: bool = False
+    ) -> Tuple[List[str], List[Any]]:
         """
-        Recupera i log in base ai filtri specificati.
+        Costruisce le condizioni SQL per i filtri che possono usare gli indici.
+        
+        Progetto, livello e modulo vengono confrontati con i codici dei
+        dizionari: le condizioni si applicano a log_records o alla vista log_rows.
         
         Args:
             project: Filtra per progetto
             level: Filtra per livello di log
             module: Filtra per modulo
-            document_id: Filtra per ID del documento
-            file_name: Filtra per nome del file
             start_date: Data di inizio per il filtro temporale
             end_date: Data di fine per il filtro temporale
-            sort_by: Campo per ordinare i risultati (timestamp, level, project, module)
-            sort_order: Ordine di ordinamento (asc, desc)
-            limit: Numero massimo di log da restituire
-            offset: Offset per la paginazione
+            context_filter: Filtri chiave/valore sul context (solo le chiavi indicizzate)
+            details_filter: Filtri chiave/valore sui details (solo le chiavi indicizzate)
+            names: Confronta i nomi invece dei codici (tabelle di aggregazione)
             
         Returns:
-            Lista di log che soddisfano i criteri di filtro
+            Tupla (lista di condizioni, lista di parametri)
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # Costruisci la query
-        query = "SELECT * FROM logs WHERE 1=1"
+        clauses = []
         params = []
         
         # Standardizza il valore di project a stringa
         project_str = project
         if isinstance(project, LogProject):
             project_str = project.value
-            
-        if project_str:
-            query += " AND project = ?"
-            params.append(project_str)
         
         # Standardizza il valore di level a stringa
         level_str = level
         if isinstance(level, LogLevel):
             level_str = level.value
+        
+        # Filtra per il valore specifico richiesto - NESSUNA gestione speciale del livello
+        for kind, value in (("project", project_str), ("level", level_str), ("module", module)):
+            if not value:
+                continue
+            if names:
+                clauses.append(f"{kind} = ?")
+                params.append(value)
+            else:
+                # Un nome mai registrato ha codice None e non trova alcun log
+                clauses.append(f"{code_column(kind)} = ?")
+                params.append(self.dictionary.code(kind, value))
+        
+        # Intervallo sui timestamp interi (le date senza fuso sono ora locale)
+        if start_date:
+            clauses.append("timestamp_us >= ?")
+            params.append(to_micros(start_date))
+        
+        if end_date:
+            clauses.append("timestamp_us <= ?")
+            params.append(to_micros(end_date))
+        
+        # Chiavi indicizzate: ricerca nella tabella log_attributes
+        for source, key, value in self._attribute_filters(context_filter, details_filter):
+            if (source, key) in self.indexed_attributes:
+                clauses.append("id IN (SELECT log_id FROM log_attributes WHERE source = ? AND key = ? AND value = ?)")
+                params.extend([source, key, value])
+        
+        return clauses, params
+    
+    def _attribute_filters(
+        self,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Valida e normalizza i filtri chiave/valore su context e details.
+        
+        Returns:
+            Lista di tuple (sorgente, chiave, valore testuale)
             
-        if level_str:
-            # Filtra per il livello specifico richiesto - NESSUNA gestione speciale
-            query += " AND level = ?"
-            params.append(level_str)
+        Raises:
+            ValueError: Se una chiave o un valore non sono ammessi
+        """
+        filters = []
+        for source, attribute_filter in (("context", context_filter), ("details", details_filter)):
+            for key, value in (attribute_filter or {}).items():
+                if not ATTRIBUTE_KEY_PATTERN.match(key):
+                    raise ValueError(f"Chiave di filtro non valida: {source}.{key}")
+                
+                normalized = attribute_value(value)
+                if normalized is None:
+                    raise ValueError(f"Valore non scalare per il filtro {source}.{key}")
+                
+                filters.append((source, key, normalized))
         
-        if module:
-            query += " AND module = ?"
-            params.append(module)
+        return filters
+    
+    def _build_text_filter_clauses(
+        self,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[str], List[Any]]:
+        """
+        Costruisce le condizioni SQL per i filtri testuali su details e context.
+        
+        Questi filtri usano LIKE o json_extract e non possono sfruttare gli indici.
+        
+        Args:
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            context_filter: Filtri chiave/valore sul context (solo le chiavi non indicizzate)
+            details_filter: Filtri chiave/valore sui details (solo le chiavi non indicizzate)
             
+        Returns:
+            Tupla (lista di condizioni, lista di parametri)
+        """
+        clauses = []
+        params = []
+        
         # Filtri per documento e file - Migliorata per cercare in più campi
         if document_id:
             # Cerca nei dettagli o contesto JSON contenenti document_id
-            query += " AND (details LIKE ? OR context LIKE ?)"
+            clauses.append("(details LIKE ? OR context LIKE ?)")
             doc_search = f"%{document_id}%"
             params.append(doc_search)
             params.append(doc_search)
@@ -263,7 +650,7 @@ class LogManager:
         if file_name:
             # Cerca nei dettagli o contesto JSON contenenti file_name
             # Cerca sia nei campi file_name che file_path o semplicemente come parte di qualsiasi stringa
-            query += " AND (details LIKE ? OR details LIKE ? OR details LIKE ? OR context LIKE ? OR context LIKE ? OR context LIKE ?)"
+            clauses.append("(details LIKE ? OR details LIKE ? OR details LIKE ? OR context LIKE ? OR context LIKE ? OR context LIKE ?)")
             
             # Ricerca per nome file in vari formati
             file_search1 = f"%\"file_name\":%{file_name}%"  # Nome file in campo file_name
@@ -277,72 +664,833 @@ class LogManager:
             params.append(file_search2)
             params.append(file_search3)
         
-        if start_date:
-            query += " AND timestamp >= ?"
-            params.append(start_date.isoformat())
+        # Chiavi non indicizzate: estrazione del valore dal JSON memorizzato
+        for source, key, value in self._attribute_filters(context_filter, details_filter):
+            if (source, key) not in self.indexed_attributes:
+                clauses.append(f"(CASE WHEN json_valid({source}) THEN CAST(json_extract({source}, ?) AS TEXT) END) = ?")
+                params.extend([attribute_path(key), value])
         
-        if end_date:
-            query += " AND timestamp <= ?"
-            params.append(end_date.isoformat())
+        return clauses, params
+    
+    def _build_logs_query(
+        self,
+        select: str = ", ".join(LOG_FIELDS),
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        sort_by: str = "timestamp",
+        sort_order: str = "desc",
+        limit: int = 100,
+        offset: int = 0,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, List[Any]]:
+        """
+        Costruisce la query paginata usata da get_logs e get_logs_json.
+        
+        Args:
+            select: Colonne da selezionare
+            (gli altri argomenti sono quelli di get_logs)
+            
+        Returns:
+            Tupla (query SQL, lista di parametri)
+        """
+        # Costruisci la query
+        clauses, params = self._build_filter_clauses(
+            project=project,
+            level=level,
+            module=module,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        text_clauses, text_params = self._build_text_filter_clauses(
+            document_id=document_id,
+            file_name=file_name,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        clauses += text_clauses
+        params += text_params
+        
+        query = f"SELECT {select} FROM log_rows WHERE 1=1"
+        for clause in clauses:
+            query += f" AND {clause}"
+        
+        # Validazione campi di ordinamento
+        valid_sort_fields = ["timestamp", "level", "project", "module", "message"]
+        valid_sort_orders = ["asc", "desc"]
+        
+        # Imposta i valori predefiniti se non validi
+        if sort_by not in valid_sort_fields:
+            sort_by = "timestamp"
+        
+        if sort_order.lower() not in valid_sort_orders:
+            sort_order = "desc"
+        
+        # Applica l'ordinamento (il timestamp sulla colonna intera indicizzata)
+        if sort_by == "timestamp":
+            sort_by = "timestamp_us"
+        query += f" ORDER BY {sort_by} {sort_order.upper()}"
+        
+        # Limita i risultati
+        query += " LIMIT ? OFFSET ?"
+        params.append(limit)
+        params.append(offset)
+        
+        return query, params
+    
+    def get_logs(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        sort_by: str = "timestamp",
+        sort_order: str = "desc",
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[List[str]] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recupera i log in base ai filtri specificati.
+        
+        Args:
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            start_date: Data di inizio per il filtro temporale
+            end_date: Data di fine per il filtro temporale
+            sort_by: Campo per ordinare i risultati (timestamp, level, project, module)
+            sort_order: Ordine di ordinamento (asc, desc)
+            limit: Numero massimo di log da restituire
+            offset: Offset per la paginazione
+            fields: Colonne da selezionare (vedi parse_fields); None per tutte
+            context_filter: Filtri chiave/valore sul context (es. {"request_id": "abc"})
+            details_filter: Filtri chiave/valore sui details (es. {"document_id": "123"})
+            
+        Returns:
+            Lista di log che soddisfano i criteri di filtro
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        rows = self._fetch_log_rows(
+            cursor,
+            select=", ".join(fields or LOG_FIELDS),
+            fields=fields,
+            project=project,
+            level=level,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_date,
+            end_date=end_date,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit,
+            offset=offset,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        
+        # Converti i risultati in dizionari
+        results = [self._row_to_dict(row) for row in rows]
+        
+        conn.close()
+        return results
+    
+    def get_logs_json(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        sort_by: str = "timestamp",
+        sort_order: str = "desc",
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[List[str]] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Come get_logs, ma restituisce direttamente l'array JSON dei log.
+        
+        Il testo JSON di details e context viene copiato nell'output senza essere
+        decodificato; solo le righe con JSON non valido vengono riparate.
+        
+        Returns:
+            Stringa con l'array JSON dei log
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        select = ", ".join(fields or LOG_FIELDS)
+        valid_columns = json_valid_columns(fields)
+        if valid_columns:
+            select += f", {valid_columns}"
+        
+        try:
+            rows = self._fetch_log_rows(
+                cursor,
+                select=select,
+                fields=fields,
+                project=project,
+                level=level,
+                module=module,
+                document_id=document_id,
+                file_name=file_name,
+                start_date=start_date,
+                end_date=end_date,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                limit=limit,
+                offset=offset,
+                context_filter=context_filter,
+                details_filter=details_filter
+            )
+            return render_rows(rows, self._row_to_dict)
+        finally:
+            conn.close()
+    
+    def _fetch_log_rows(self, cursor: sqlite3.Cursor, select: str, fields: Optional[List[str]], **query) -> List[Any]:
+        """
+        Esegue la query paginata di get_logs, rispondendo dall'hot tier per il periodo coperto.
+        
+        Le righe dell'hot tier precedono quelle lette su disco (ordine decrescente),
+        limitate alla fine della copertura con limit e offset residui.
+        
+        Args:
+            cursor: Cursore del database
+            select: Colonne da selezionare su disco
+            fields: Colonne richieste (None per tutte)
+            query: Filtri, ordinamento e paginazione di get_logs
+            
+        Returns:
+            Righe ordinate (dizionari per l'hot tier, sqlite3.Row per il disco)
+        """
+        # Log scritti da altri processi dopo l'ultima verifica
+        self.hot_tier.sync(cursor)
+        # Le colonne di validità del JSON servono a render_row (get_logs_json)
+        json_valid = "_valid" in select
+        selection = self.hot_tier.select(fields=fields, json_valid=json_valid, **query)
+        if selection is None:
+            sql, params = self._build_logs_query(select=select, **query)
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        
+        rows = selection.rows
+        if selection.disk_limit > 0:
+            sql, params = self._build_logs_query(
+                select=select,
+                **dict(query, end_date=selection.disk_end, limit=selection.disk_limit, offset=selection.disk_offset)
+            )
+            cursor.execute(sql, params)
+            rows += cursor.fetchall()
+        return rows
+    
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Converte una riga della tabella logs in dizionario, decodificando details e context.
+        
+        Args:
+            row: Riga restituita da SQLite
+            
+        Returns:
+            Dizionario del log con i campi JSON convertiti
+        """
+        log_dict = dict(row)
+        
+        # Converti JSON in dizionari con gestione degli errori
+        if log_dict.get("details"):
+            try:
+                log_dict["details"] = json.loads(log_dict["details"])
+            except Exception as e:
+                logger.error(f"Errore durante il parsing JSON dei dettagli per il log {log_dict['id']}: {str(e)}")
+                # Invece di avere valori undefined, manteniamo almeno i dati originali
+                log_dict["details"] = {"error": "Formato JSON non valido", "raw_data": log_dict["details"]}
+        
+        if log_dict.get("context"):
+            try:
+                log_dict["context"] = json.loads(log_dict["context"])
+            except Exception as e:
+                logger.error(f"Errore durante il parsing JSON del contesto per il log {log_dict['id']}: {str(e)}")
+                log_dict["context"] = {"error": "Formato JSON non valido", "raw_data": log_dict["context"]}
+        
+        return log_dict
+    
+    def iter_logs(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        sort_order: str = "asc",
+        include_archives: bool = True,
+        batch_size: int = 500,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Itera su tutti i log che soddisfano i filtri senza caricarli in memoria.
+        
+        Le righe vengono lette a pagine di batch_size con una query per pagina
+        (paginazione per chiave su timestamp_us), quindi la memoria usata non
+        dipende dal numero di log esportati e nessuna transazione di lettura resta
+        aperta mentre il client scarica i dati: un download lento non blocca il
+        writer. I log con lo stesso timestamp dell'ultimo della pagina vengono
+        letti insieme, così che la pagina successiva riparta dal timestamp
+        seguente senza saltarne o ripeterne. Se include_archives è True e
+        l'intervallo richiesto comprende log già compressi, questi vengono letti
+        dagli archivi ZIP (un log alla volta) prima o dopo i log del database,
+        secondo l'ordinamento richiesto.
+        
+        Args:
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            start_date: Data di inizio per il filtro temporale
+            end_date: Data di fine per il filtro temporale
+            sort_order: Ordine cronologico (asc, desc)
+            include_archives: Include i log presenti negli archivi compressi
+            batch_size: Numero di righe lette dal database per ogni blocco
+            context_filter: Filtri chiave/valore sul context
+            details_filter: Filtri chiave/valore sui details
+            
+        Yields:
+            Dizionari dei log nello stesso formato di get_logs
+        """
+        filters = {
+            "project": project.value if isinstance(project, LogProject) else project,
+            "level": level.value if isinstance(level, LogLevel) else level,
+            "module": module,
+            "document_id": document_id,
+            "file_name": file_name,
+            "start_date": start_date,
+            "end_date": end_date,
+            "attribute_filters": self._attribute_filters(context_filter, details_filter)
+        }
+        descending = sort_order.lower() == "desc"
+        
+        # Gli archivi contengono log più vecchi di quelli presenti nel database
+        if include_archives and not descending:
+            yield from self._iter_archived_logs(descending=False, **filters)
+        
+        clauses, params = self._build_filter_clauses(
+            project=project,
+            level=level,
+            module=module,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        text_clauses, text_params = self._build_text_filter_clauses(
+            document_id=document_id,
+            file_name=file_name,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        where = " AND ".join(clauses + text_clauses) if clauses or text_clauses else "1=1"
+        params = params + text_params
+        order = "DESC" if descending else "ASC"
+        after = "<" if descending else ">"
+        select = f"SELECT {', '.join(LOG_FIELDS)}, timestamp_us FROM log_rows WHERE {where}"
+        
+        # Il generatore può essere ripreso da thread diversi (StreamingResponse)
+        conn = self._get_connection(check_same_thread=False)
+        try:
+            cursor = conn.cursor()
+            last = None
+            while True:
+                if last is None:
+                    cursor.execute(f"{select} ORDER BY timestamp_us {order} LIMIT ?", params + [batch_size])
+                else:
+                    cursor.execute(
+                        f"{select} AND timestamp_us {after} ? ORDER BY timestamp_us {order} LIMIT ?",
+                        params + [last, batch_size]
+                    )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                if len(rows) == batch_size:
+                    # I log con l'ultimo timestamp possono continuare oltre la pagina
+                    boundary = rows[-1]["timestamp_us"]
+                    rows = [row for row in rows if row["timestamp_us"] != boundary]
+                    cursor.execute(f"{select} AND timestamp_us = ?", params + [boundary])
+                    rows += cursor.fetchall()
+                last = rows[-1]["timestamp_us"]
+                
+                for row in rows:
+                    log_dict = self._row_to_dict(row)
+                    del log_dict["timestamp_us"]
+                    yield log_dict
+        finally:
+            conn.close()
+        
+        if include_archives and descending:
+            yield from self._iter_archived_logs(descending=True, **filters)
+    
+    def _iter_archived_logs(
+        self,
+        project: Optional[str] = None,
+        level: Optional[str] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        attribute_filters: Optional[List[Tuple[str, str, str]]] = None,
+        descending: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Itera sui log compressi negli archivi ZIP che soddisfano i filtri.
+        
+        Vengono aperti solo gli archivi che, secondo la tabella compressed_logs,
+        contengono log nell'intervallo temporale richiesto. I file JSON degli
+        archivi vengono decodificati un log alla volta (iter_json_array) e i log
+        che soddisfano i filtri restituiti subito, nell'ordine in cui sono stati
+        archiviati (crescente per gli archivi scritti da compress_logs); in
+        ordine decrescente passano da un file temporaneo (iter_reversed).
+        
+        Yields:
+            Dizionari dei log archiviati
+        """
+        import zipfile
+        
+        # Stessa normalizzazione della query sui log: istanti confrontati come interi
+        start_us = to_micros(start_date) if start_date else None
+        end_us = to_micros(end_date) if end_date else None
+        
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='compressed_logs'")
+            if not cursor.fetchone():
+                return
+            
+            query = "SELECT archive_path, MIN(timestamp) as first_time FROM compressed_logs WHERE 1=1"
+            params = []
+            # compressed_logs memorizza il testo ISO locale, come le viste dei log
+            if start_date:
+                query += " AND timestamp >= ?"
+                params.append(normalize_timestamp(start_date))
+            if end_date:
+                query += " AND timestamp <= ?"
+                params.append(normalize_timestamp(end_date))
+            query += f" GROUP BY archive_path ORDER BY first_time {'DESC' if descending else 'ASC'}"
+            
+            cursor.execute(query, params)
+            archive_paths = [row["archive_path"] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        
+        for archive_path in archive_paths:
+            if not archive_path or not os.path.exists(archive_path):
+                logger.warning(f"Archivio non trovato durante l'esportazione: {archive_path}")
+                continue
+            
+            try:
+                with zipfile.ZipFile(archive_path, "r") as zip_file:
+                    members = zip_file.namelist()
+                    if descending:
+                        members = list(reversed(members))
+                    
+                    for member in members:
+                        with zip_file.open(member) as member_file:
+                            matching = (
+                                log for log in iter_json_array(member_file)
+                                if self._archived_log_matches(
+                                    log, project, level, module, document_id, file_name, start_us, end_us,
+                                    attribute_filters
+                                )
+                            )
+                            yield from (iter_reversed(matching) if descending else matching)
+            except Exception as e:
+                logger.error(f"Errore durante la lettura dell'archivio {archive_path}: {str(e)}")
+    
+    @staticmethod
+    def _archived_log_matches(
+        log: Dict[str, Any],
+        project: Optional[str],
+        level: Optional[str],
+        module: Optional[str],
+        document_id: Optional[str],
+        file_name: Optional[str],
+        start_us: Optional[int],
+        end_us: Optional[int],
+        attribute_filters: Optional[List[Tuple[str, str, str]]] = None
+    ) -> bool:
+        """
+        Applica in memoria ad un log archiviato gli stessi filtri usati in SQL.
+        
+        Il timestamp archiviato (testo ISO, con o senza fuso) viene confrontato
+        in microsecondi UTC con l'intervallo, come timestamp_us nella query.
+        """
+        if project and log.get("project") != project:
+            return False
+        if level and log.get("level") != level:
+            return False
+        if module and log.get("module") != module:
+            return False
+        
+        if start_us is not None or end_us is not None:
+            try:
+                timestamp_us = to_micros(datetime.fromisoformat(log.get("timestamp")))
+            except (TypeError, ValueError):
+                return False
+            if start_us is not None and timestamp_us < start_us:
+                return False
+            if end_us is not None and timestamp_us > end_us:
+                return False
+        
+        if document_id or file_name:
+            # Equivalente dei LIKE (non sensibili alle maiuscole) su details e context
+            searchable = (json.dumps(log.get("details")) + json.dumps(log.get("context"))).lower()
+            if document_id and document_id.lower() not in searchable:
+                return False
+            if file_name and file_name.lower() not in searchable:
+                return False
+        
+        for source, key, value in attribute_filters or []:
+            if attribute_value(extract_attribute(log.get(source), key)) != value:
+                return False
+        
+        return True
+    
+    def backfill_document_events(self) -> int:
+        """
+        Registra in document_events gli eventi dei log scritti prima della creazione della tabella.
+        
+        L'operazione riprende da dove era stata interrotta e non fa nulla se il
+        backfill è già stato completato. Gli eventi registrati (e quelli ancora
+        privi di genealogia) vengono poi collegati alla genealogia dei documenti
+        e, se qualcosa è cambiato, la tabella document_state viene ricostruita.
+        
+        Returns:
+            Numero di eventi registrati
+        """
+        conn = self._get_connection()
+        try:
+            backfilled = backfill_document_events(conn)
+            linked = backfill_document_lineage(conn)
+            if backfilled or linked:
+                documents = rebuild_document_state(conn.cursor())
+                conn.commit()
+                bump_generation()
+                logger.info(f"Stato dei documenti ricostruito: {documents} documenti")
+            return backfilled
+        finally:
+            conn.close()
+    
+    def backfill_fingerprints(self) -> int:
+        """
+        Assegna un modello di messaggio ai log scritti prima della creazione dei fingerprint.
+        
+        Returns:
+            Numero di log elaborati
+        """
+        conn = self._get_connection()
+        try:
+            total = backfill_fingerprints(conn, self.fingerprint_tree)
+        finally:
+            conn.close()
+        
+        if total:
+            bump_generation()
+        return total
+    
+    def get_groups(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Restituisce i modelli di messaggio più frequenti in un intervallo.
         
-        # Validazione campi di ordinamento
-        valid_sort_fields = ["timestamp", "level", "project", "module", "message"]
-        valid_sort_orders = ["asc", "desc"]
+        I conteggi vengono letti dalla tabella log_fingerprint_counts, con la
+        risoluzione di un minuto, senza leggere i messaggi; per ogni gruppo è
+        riportato anche l'ultimo messaggio dell'intervallo come esempio.
         
-        # Imposta i valori predefiniti se non validi
-        if sort_by not in valid_sort_fields:
-            sort_by = "timestamp"
+        Args:
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            start_date: Inizio dell'intervallo (predefinito: un'ora prima di end_date)
+            end_date: Fine dell'intervallo (predefinita: adesso)
+            limit: Numero massimo di gruppi restituiti
+            
+        Returns:
+            Dizionario con start, end e groups
+        """
+        end_date = end_date or datetime.now()
+        start_date = start_date or end_date - timedelta(hours=1)
+        
+        query, params = fingerprint_groups_query(
+            start_date=start_date,
+            end_date=end_date,
+            project=project.value if isinstance(project, LogProject) else project,
+            level=level.value if isinstance(level, LogLevel) else level,
+            module=module,
+            limit=limit
+        )
         
-        if sort_order.lower() not in valid_sort_orders:
-            sort_order = "desc"
+        # Filtri applicati anche all'esempio di ciascun gruppo
+        sample_clauses, sample_params = self._build_filter_clauses(project=project, level=level, module=module)
+        sample_where = "".join(f" AND {clause}" for clause in sample_clauses)
         
-        # Applica l'ordinamento
-        query += f" ORDER BY {sort_by} {sort_order.upper()}"
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            groups = [dict(row) for row in cursor.fetchall()]
+            
+            for group in groups:
+                # Esempio letto dall'indice (fingerprint_id, timestamp_us), fino alla fine dell'ultimo minuto
+                cursor.execute(f'''
+                SELECT id, timestamp, message FROM log_rows
+                WHERE fingerprint_id = ? AND timestamp_us >= ? AND timestamp_us < ?{sample_where}
+                ORDER BY timestamp_us DESC LIMIT 1
+                ''', [
+                    group["fingerprint_id"],
+                    to_micros(datetime.fromisoformat(group["first_bucket"])),
+                    to_micros(datetime.fromisoformat(group["last_bucket"]) + timedelta(minutes=1))
+                ] + sample_params)
+                sample = cursor.fetchone()
+                group["sample"] = dict(sample) if sample else None
+        finally:
+            conn.close()
         
-        # Limita i risultati
-        query += " LIMIT ? OFFSET ?"
-        params.append(limit)
-        params.append(offset)
+        return {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "groups": groups
+        }
+    
+    def get_top(
+        self,
+        dimension: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        k: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Restituisce i valori più frequenti di una dimensione stimati dagli sketch orari.
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        Il costo dipende dal numero di ore dell'intervallo e non dal numero di
+        log; i conteggi sono sovrastime con l'errore massimo indicato per ogni
+        valore. Le ore sono considerate per intero.
         
-        # Converti i risultati in dizionari
-        results = []
+        Args:
+            dimension: Dimensione (module, fingerprint, document, api_key)
+            start_date: Inizio dell'intervallo (predefinito: 24 ore prima di end_date)
+            end_date: Fine dell'intervallo (predefinita: adesso)
+            k: Numero di valori restituiti
+            
+        Returns:
+            Dizionario con dimension, start, end, total e items ([{value, count, error}])
+            
+        Raises:
+            ValueError: Se la dimensione non è valida
+        """
+        if dimension not in SKETCH_DIMENSIONS:
+            raise ValueError(f"Dimensione non valida: {dimension}. Valori ammessi: {', '.join(SKETCH_DIMENSIONS)}")
+        
+        # Gli sketch sono indicizzati per ora locale: gli estremi con fuso vengono convertiti
+        end_date = from_micros(to_micros(end_date)) if end_date else datetime.now()
+        start_date = from_micros(to_micros(start_date)) if start_date else end_date - timedelta(hours=24)
+        top = self.sketches.top(dimension, start_date, end_date, k)
+        
+        return {
+            "dimension": dimension,
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "approximate": True,
+            "total": top["total"],
+            "items": top["items"]
+        }
+    
+    def count_distinct(
+        self,
+        dimension: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Stima il numero di valori distinti di una dimensione dagli sketch HyperLogLog.
         
-        # Variabili per post-filtraggio
-        apply_document_filter = document_id is not None
-        apply_file_filter = file_name is not None
+        L'intervallo viene esteso alle ore intere che lo intersecano; senza
+        start_date ed end_date vengono contati tutti i valori mai ricevuti.
         
-        for row in rows:
-            log_dict = dict(row)
+        Args:
+            dimension: Dimensione (client, module, document)
+            start_date: Inizio dell'intervallo (predefinito: 24 ore prima di end_date)
+            end_date: Fine dell'intervallo (predefinita: adesso)
             
-            # Converti JSON in dizionari con gestione degli errori
-            details_obj = None
-            context_obj = None
+        Returns:
+            Dizionario con dimension, start, end, approximate e count
             
-            if log_dict["details"]:
-                try:
-                    details_obj = json.loads(log_dict["details"])
-                    log_dict["details"] = details_obj
-                except Exception as e:
-                    logger.error(f"Errore durante il parsing JSON dei dettagli per il log {log_dict['id']}: {str(e)}")
-                    # Invece di avere valori undefined, manteniamo almeno i dati originali
-                    log_dict["details"] = {"error": "Formato JSON non valido", "raw_data": log_dict["details"]}
+        Raises:
+            ValueError: Se la dimensione non è valida
+        """
+        if dimension not in DISTINCT_DIMENSIONS:
+            raise ValueError(f"Dimensione non valida: {dimension}. Valori ammessi: {', '.join(DISTINCT_DIMENSIONS)}")
+        
+        # I bucket degli sketch sono in ora locale: gli estremi con fuso vengono convertiti
+        start_date = from_micros(to_micros(start_date)) if start_date else None
+        end_date = from_micros(to_micros(end_date)) if end_date else None
+        
+        return {
+            "dimension": dimension,
+            "start": start_date.isoformat() if start_date else None,
+            "end": end_date.isoformat() if end_date else None,
+            "approximate": True,
+            "count": self.distinct.count(dimension, start_date, end_date)
+        }
+    
+    def get_clients(
+        self,
+        project: Optional[str] = None,
+        module: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+        active_since: Optional[datetime] = None,
+        sort_by: str = "last_seen",
+        sort_order: str = "desc",
+        limit: int = 100,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Legge una pagina del registro dei client con il totale dei client filtrati.
+        
+        Args:
+            project: Filtra per progetto
+            module: Filtra per modulo
+            api_key_id: Filtra per API key
+            active_since: Solo i client con un log successivo a questa data
+            sort_by: Campo di ordinamento (last_seen, first_seen, total_logs, bytes, project, module)
+            sort_order: asc o desc
+            limit: Numero massimo di client
+            offset: Offset per la paginazione
             
-            if log_dict["context"]:
-                try:
-                    context_obj = json.loads(log_dict["context"])
-                    log_dict["context"] = context_obj
-                except Exception as e:
-                    logger.error(f"Errore durante il parsing JSON del contesto per il log {log_dict['id']}: {str(e)}")
-                    log_dict["context"] = {"error": "Formato JSON non valido", "raw_data": log_dict["context"]}
+        Returns:
+            Dizionario con total, limit, offset e clients
             
-            # Aggiungi il log ai risultati senza alcun post-processing
-            results.append(log_dict)
+        Raises:
+            ValueError: Se il campo di ordinamento non è valido
+        """
+        query, params, count_query, count_params = build_clients_query(
+            project=project,
+            module=module,
+            api_key_id=api_key_id,
+            active_since=active_since,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit,
+            offset=offset
+        )
         
-        conn.close()
-        return results
+        conn = self._get_connection()
+        try:
+            total = conn.execute(count_query, count_params).fetchone()[0]
+            clients = [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+        
+        return {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "clients": clients
+        }
+    
+    def get_api_key_usage(self) -> Dict[str, Dict[str, str]]:
+        """
+        Restituisce l'ultimo utilizzo registrato per API key e per progetto.
+        
+        Returns:
+            Dizionario {"api_keys": {api_key_id: last_seen}, "projects": {project: last_seen}}
+        """
+        conn = self._get_connection()
+        try:
+            by_key = conn.execute(
+                "SELECT api_key_id, MAX(last_seen) FROM clients WHERE api_key_id != '' GROUP BY api_key_id"
+            ).fetchall()
+            by_project = conn.execute("SELECT project, MAX(last_seen) FROM clients GROUP BY project").fetchall()
+        finally:
+            conn.close()
+        
+        return {
+            "api_keys": {row[0]: row[1] for row in by_key},
+            "projects": {row[0]: row[1] for row in by_project}
+        }
+    
+    def get_trace(
+        self,
+        correlation_id: str,
+        correlation_key: Optional[str] = None,
+        limit: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Ricostruisce la cronologia di una richiesta attraverso tutti i progetti.
+        
+        La ricerca usa l'indice log_correlations, quindi il tempo di risposta
+        dipende dal numero di log correlati e non dalla dimensione della tabella.
+        
+        Args:
+            correlation_id: Identificativo di correlazione (es. request_id)
+            correlation_key: Limita la ricerca a una chiave (es. "context.request_id")
+            limit: Numero massimo di log restituiti
+            
+        Returns:
+            Dizionario con i log in ordine cronologico e un riepilogo della cronologia
+        """
+        conn = self._get_connection()
+        try:
+            rows = fetch_trace_rows(conn.cursor(), LOG_FIELDS + ["timestamp_us"], correlation_id, correlation_key, limit)
+        finally:
+            conn.close()
+        
+        logs = [self._row_to_dict(row) for row in rows]
+        
+        # La durata si calcola sugli istanti, non sull'ora locale testuale
+        micros = [log.pop("timestamp_us") for log in logs]
+        duration_ms = (micros[-1] - micros[0]) // 1000 if logs else None
+        
+        return {
+            "correlation_id": correlation_id,
+            "count": len(logs),
+            "projects": sorted({log["project"] for log in logs}),
+            "start": logs[0]["timestamp"] if logs else None,
+            "end": logs[-1]["timestamp"] if logs else None,
+            "duration_ms": duration_ms,
+            "logs": logs
+        }
     
     def get_stats(
         self,
@@ -364,59 +1512,35 @@ class LogManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        # Query base per il conteggio totale
-        query = "SELECT COUNT(*) as total FROM logs WHERE 1=1"
-        params = []
-        
-        # Aggiungi filtri
-        if project:
-            query += " AND project = ?"
-            params.append(project)
-        
-        if start_date:
-            query += " AND timestamp >= ?"
-            params.append(start_date.isoformat())
-        
-        if end_date:
-            query += " AND timestamp <= ?"
-            params.append(end_date.isoformat())
-        
-        # Esegui query per il conteggio totale
+        # Un'unica query sulle tabelle di aggregazione: ore intere, minuti interi
+        # ai bordi dell'intervallo e frazioni di minuto residue dalla tabella logs
+        query, params = rollup_counts_query(
+            project=project.value if isinstance(project, LogProject) else project,
+            start_date=start_date,
+            end_date=end_date
+        )
         cursor.execute(query, params)
-        total_logs = cursor.fetchone()["total"]
+        rows = cursor.fetchall()
         
-        # Query per conteggio per livello
-        level_query = query.replace("COUNT(*) as total", "level, COUNT(*) as count") + " GROUP BY level"
-        cursor.execute(level_query, params)
-        level_rows = cursor.fetchall()
+        total_logs = 0
         
         logs_by_level = {}
         for level in LogLevel:
             logs_by_level[level] = 0
-            
-        for row in level_rows:
-            logs_by_level[row["level"]] = row["count"]
-        
-        # Query per conteggio per progetto
-        project_query = query.replace("COUNT(*) as total", "project, COUNT(*) as count") + " GROUP BY project"
-        cursor.execute(project_query, params)
-        project_rows = cursor.fetchall()
         
         logs_by_project = {}
         for project_enum in LogProject:
             logs_by_project[project_enum] = 0
-            
-        for row in project_rows:
-            logs_by_project[row["project"]] = row["count"]
         
-        # Query per conteggio per modulo (top 10)
-        module_query = query.replace("COUNT(*) as total", "module, COUNT(*) as count") + " GROUP BY module ORDER BY count DESC LIMIT 10"
-        cursor.execute(module_query, params)
-        module_rows = cursor.fetchall()
+        module_counts = {}
+        for row in rows:
+            total_logs += row["count"]
+            logs_by_level[row["level"]] = logs_by_level.get(row["level"], 0) + row["count"]
+            logs_by_project[row["project"]] = logs_by_project.get(row["project"], 0) + row["count"]
+            module_counts[row["module"]] = module_counts.get(row["module"], 0) + row["count"]
         
-        logs_by_module = {}
-        for row in module_rows:
-            logs_by_module[row["module"]] = row["count"]
+        # Conteggio per modulo (top 10)
+        logs_by_module = dict(sorted(module_counts.items(), key=lambda item: item[1], reverse=True)[:10])
         
         # Determina il periodo di tempo
         time_period = {}
@@ -428,23 +1552,15 @@ class LogManager:
         
         if not start_date or not end_date:
             # Se non specificato, prendi il periodo effettivo dai dati
-            min_max_query = "SELECT MIN(timestamp) as min_time, MAX(timestamp) as max_time FROM logs"
+            min_max_query = "SELECT MIN(timestamp_us) as min_time, MAX(timestamp_us) as max_time FROM log_records"
             cursor.execute(min_max_query)
             time_row = cursor.fetchone()
             
-            if not start_date and time_row["min_time"]:
-                try:
-                    time_period["start"] = datetime.fromisoformat(time_row["min_time"])
-                except ValueError:
-                    # Fallback: utilizza la data corrente
-                    time_period["start"] = datetime.now()
+            if not start_date and time_row["min_time"] is not None:
+                time_period["start"] = from_micros(time_row["min_time"])
             
-            if not end_date and time_row["max_time"]:
-                try:
-                    time_period["end"] = datetime.fromisoformat(time_row["max_time"])
-                except ValueError:
-                    # Fallback: utilizza la data corrente
-                    time_period["end"] = datetime.now()
+            if not end_date and time_row["max_time"] is not None:
+                time_period["end"] = from_micros(time_row["max_time"])
         
         conn.close()
         
@@ -459,6 +1575,125 @@ class LogManager:
         
         return stats
     
+    def get_histogram(
+        self,
+        interval: str = "5m",
+        group_by: Optional[str] = None,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcola il volume dei log nel tempo come array densi pronti per un grafico.
+        
+        Con i soli filtri su progetto, livello, modulo e date l'istogramma viene
+        letto dalle tabelle di aggregazione; con i filtri testuali o su
+        context/details viene calcolato con un'unica GROUP BY sulla vista log_rows.
+        L'intervallo richiesto viene esteso ai bordi dei bucket.
+        
+        Args:
+            interval: Ampiezza dei bucket ("1m", "5m" o "1h")
+            group_by: Dimensione delle serie ("level", "project", "module") o None
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            start_date: Inizio dell'intervallo (predefinito: histogram_default_buckets bucket prima della fine)
+            end_date: Fine dell'intervallo (predefinita: ora)
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            context_filter: Filtri chiave/valore sul context
+            details_filter: Filtri chiave/valore sui details
+            
+        Returns:
+            Dizionario con i bucket, il totale per bucket e le serie per gruppo
+            
+        Raises:
+            ValueError: Se intervallo o raggruppamento non sono validi o se i bucket
+                richiesti superano histogram_max_buckets
+        """
+        from core.config import get_settings
+        
+        settings = get_settings()
+        if interval not in HISTOGRAM_INTERVALS:
+            raise ValueError(f"Intervallo non valido: {interval}. Valori ammessi: {', '.join(HISTOGRAM_INTERVALS)}")
+        step = HISTOGRAM_INTERVALS[interval]
+        
+        # I bucket sono in ora locale: gli estremi con fuso vengono convertiti come in rollup_sources
+        start_date = from_micros(to_micros(start_date)) if start_date else None
+        end_date = from_micros(to_micros(end_date)) if end_date else None
+        end_slot = histogram_slot(end_date or datetime.now(), interval)
+        start_slot = histogram_slot(start_date, interval) if start_date else end_slot - step * (settings.histogram_default_buckets - 1)
+        bucket_count = int((end_slot - start_slot) / step) + 1
+        if bucket_count < 1:
+            raise ValueError("start_date deve precedere end_date")
+        if bucket_count > settings.histogram_max_buckets:
+            raise ValueError(
+                f"L'intervallo richiede {bucket_count} bucket (massimo {settings.histogram_max_buckets}): "
+                f"usare un intervallo più ampio o un periodo più breve"
+            )
+        
+        # Le tabelle di aggregazione coprono solo project, level e module
+        use_rollups = not (document_id or file_name or context_filter or details_filter)
+        where, params = self._build_filter_clauses(
+            project=project,
+            level=level,
+            module=module,
+            context_filter=context_filter,
+            details_filter=details_filter,
+            names=use_rollups
+        )
+        if not use_rollups:
+            text_where, text_params = self._build_text_filter_clauses(document_id, file_name, context_filter, details_filter)
+            where += text_where
+            params += text_params
+        
+        query, query_params = histogram_query(interval, group_by, start_slot, end_slot, where, params, use_rollups)
+        
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(query, query_params).fetchall()
+        finally:
+            conn.close()
+        
+        slots = [start_slot + step * i for i in range(bucket_count)]
+        positions = {histogram_slot_key(slot, interval): i for i, slot in enumerate(slots)}
+        
+        total = [0] * bucket_count
+        series: Dict[str, List[int]] = {}
+        for row in rows:
+            position = positions.get(row["slot"])
+            if position is None:
+                continue
+            total[position] += row["count"]
+            if group_by:
+                series.setdefault(row["series"], [0] * bucket_count)[position] += row["count"]
+        
+        # Oltre histogram_max_series le serie minori vengono sommate in "(other)"
+        if len(series) > settings.histogram_max_series:
+            ranked = sorted(series.items(), key=lambda item: sum(item[1]), reverse=True)
+            kept = dict(ranked[:settings.histogram_max_series - 1])
+            other = [0] * bucket_count
+            for _, values in ranked[settings.histogram_max_series - 1:]:
+                other = [a + b for a, b in zip(other, values)]
+            kept["(other)"] = other
+            series = kept
+        
+        return {
+            "interval": interval,
+            "group_by": group_by,
+            "start": start_slot.isoformat(),
+            "end": (end_slot + step).isoformat(),
+            "buckets": [slot.isoformat() for slot in slots],
+            "total": total,
+            "series": series
+        }
+    
     def cleanup_logs(
         self,
         days_to_keep: int = 30,
@@ -480,19 +1715,12 @@ class LogManager:
         cursor = conn.cursor()
         
         # Calcola la data limite
-        cutoff_date = (datetime.now() - timedelta(days=days_to_keep)).isoformat()
+        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
         
         # Costruisci la query
-        query = "DELETE FROM logs WHERE timestamp < ?"
-        params = [cutoff_date]
-        
-        if project:
-            query += " AND project = ?"
-            params.append(project)
-        
-        if level:
-            query += " AND level = ?"
-            params.append(level)
+        clauses, params = self._build_filter_clauses(project=project, level=level)
+        query = " AND ".join(["DELETE FROM log_records WHERE timestamp_us < ?"] + clauses)
+        params = [to_micros(cutoff_date)] + params
         
         # Esegui la query
         cursor.execute(query, params)
@@ -500,6 +1728,7 @@ class LogManager:
         
         conn.commit()
         conn.close()
+        bump_generation()
         
         logger.info(f"Eliminati {deleted_count} log più vecchi di {days_to_keep} giorni")
         return deleted_count
@@ -523,12 +1752,9 @@ class LogManager:
         cursor = conn.cursor()
         
         # Costruisci la query
-        query = "DELETE FROM logs WHERE timestamp >= ?"
-        params = [cutoff_date.isoformat()]
-        
-        if project:
-            query += " AND project = ?"
-            params.append(project)
+        clauses, params = self._build_filter_clauses(project=project)
+        query = " AND ".join(["DELETE FROM log_records WHERE timestamp_us >= ?"] + clauses)
+        params = [to_micros(cutoff_date)] + params
         
         # Esegui la query
         cursor.execute(query, params)
@@ -536,6 +1762,7 @@ class LogManager:
         
         conn.commit()
         conn.close()
+        bump_generation()
         
         logger.info(f"Reset completato: eliminati {deleted_count} log più recenti della data {cutoff_date.isoformat()}")
         return deleted_count
@@ -565,34 +1792,331 @@ class LogManager:
         cursor = conn.cursor()
         
         # Costruisci la query
-        query = "SELECT COUNT(*) as count FROM logs WHERE 1=1"
-        params = []
+        clauses, params = self._build_filter_clauses(
+            project=project,
+            level=level,
+            module=module,
+            start_date=start_date,
+            end_date=end_date
+        )
+        query = " AND ".join(["SELECT COUNT(*) as count FROM log_records WHERE 1=1"] + clauses)
+        
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row["count"]
+    
+    def count_logs(
+        self,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Conta i log che soddisfano gli stessi filtri di get_logs.
         
-        if project:
-            query += " AND project = ?"
-            params.append(project)
+        Se i filtri usano solo colonne indicizzate il conteggio è sempre esatto
+        (l'indice composto idx_records_filters evita di leggere la tabella).
+        Con i filtri testuali su details/context il conteggio esatto viene
+        tentato entro count_time_budget_ms; oltre quel limite si restituisce una
+        stima ottenuta da un campione distribuito su tutto l'intervallo temporale.
+        I risultati sono mantenuti in cache fino alla successiva scrittura.
         
-        if level:
-            query += " AND level = ?"
-            params.append(level)
+        Args:
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            start_date: Data di inizio per il filtro temporale
+            end_date: Data di fine per il filtro temporale
+            context_filter: Filtri chiave/valore sul context
+            details_filter: Filtri chiave/valore sui details
+            
+        Returns:
+            Dizionario con "total" (numero di log) e "approximate" (True se stimato)
+        """
+        from core.config import get_settings
         
-        if module:
-            query += " AND module = ?"
-            params.append(module)
+        settings = get_settings()
+        cache = get_count_cache()
+        cache_key = filter_fingerprint(
+            db_path=self.db_path,
+            project=project,
+            level=level,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
         
-        if start_date:
-            query += " AND timestamp >= ?"
-            params.append(start_date.isoformat())
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        # La generazione va letta prima della query per non memorizzare risultati già superati
+        generation = get_generation()
+        
+        clauses, params = self._build_filter_clauses(
+            project=project,
+            level=level,
+            module=module,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        text_clauses, text_params = self._build_text_filter_clauses(
+            document_id=document_id,
+            file_name=file_name,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
         
-        if end_date:
-            query += " AND timestamp <= ?"
-            params.append(end_date.isoformat())
+        indexed_where = " AND ".join(clauses) if clauses else "1=1"
         
-        cursor.execute(query, params)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if not text_clauses:
+                # Solo filtri indicizzati: il conteggio esatto è economico
+                cursor.execute(f"SELECT COUNT(*) as count FROM log_records WHERE {indexed_where}", params)
+                result = {"total": cursor.fetchone()["count"], "approximate": False}
+            else:
+                full_where = " AND ".join(clauses + text_clauses)
+                deadline = time.monotonic() + settings.count_time_budget_ms / 1000.0
+                
+                # Interrompe la query se supera il tempo concesso
+                conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 1000)
+                try:
+                    cursor.execute(f"SELECT COUNT(*) as count FROM log_records WHERE {full_where}", params + text_params)
+                    result = {"total": cursor.fetchone()["count"], "approximate": False}
+                except sqlite3.OperationalError as e:
+                    if "interrupt" not in str(e):
+                        raise
+                    result = None
+                finally:
+                    conn.set_progress_handler(None, 0)
+                
+                if result is None:
+                    result = self._estimate_count(
+                        cursor,
+                        indexed_where,
+                        params,
+                        " AND ".join(text_clauses),
+                        text_params,
+                        settings.count_sample_size
+                    )
+        finally:
+            conn.close()
+        
+        cache.set(cache_key, result, generation=generation)
+        return dict(result)
+    
+    def _estimate_count(
+        self,
+        cursor: sqlite3.Cursor,
+        indexed_where: str,
+        indexed_params: List[Any],
+        text_where: str,
+        text_params: List[Any],
+        sample_size: int
+    ) -> Dict[str, Any]:
+        """
+        Stima il numero di log che soddisfano i filtri testuali.
+        
+        Conta esattamente le righe che soddisfano i filtri indicizzati e applica
+        la frazione di corrispondenze osservata su un campione sistematico:
+        una riga ogni indexed_total / sample_size nell'ordine dei timestamp.
+        Il campione copre così l'intero intervallo, anche quando la selettività
+        dei filtri testuali cambia nel tempo. Solo le righe campionate vengono
+        lette dalla tabella; la numerazione usa l'indice dei filtri.
+        
+        Returns:
+            Dizionario con "total" stimato e "approximate" impostato a True
+        """
+        cursor.execute(f"SELECT COUNT(*) as count FROM log_records WHERE {indexed_where}", indexed_params)
+        indexed_total = cursor.fetchone()["count"]
+        
+        if indexed_total == 0:
+            return {"total": 0, "approximate": False}
+        
+        # Passo tra le righe campionate (arrotondato per eccesso)
+        step = max(1, -(-indexed_total // max(1, sample_size)))
+        
+        cursor.execute(f"""
+            SELECT COUNT(*) as sampled,
+                   SUM(CASE WHEN {text_where} THEN 1 ELSE 0 END) as matched
+            FROM log_records
+            WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (ORDER BY timestamp_us, rowid) as position
+                    FROM log_records
+                    WHERE {indexed_where}
+                )
+                WHERE position % ? = 0
+            )
+        """, text_params + indexed_params + [step])
         row = cursor.fetchone()
         
-        conn.close()
-        return row["count"]
+        sampled = row["sampled"] or 0
+        matched = row["matched"] or 0
+        
+        if step == 1:
+            # Il campione copre tutte le righe: il conteggio è esatto
+            return {"total": matched, "approximate": False}
+        
+        if sampled == 0:
+            # Righe eliminate tra le due letture
+            return {"total": 0, "approximate": True}
+        
+        estimate = int(round(indexed_total * matched / sampled))
+        return {"total": estimate, "approximate": True}
+    
+    def get_facets(
+        self,
+        facets: Optional[List[str]] = None,
+        project: Optional[Union[LogProject, str]] = None,
+        level: Optional[Union[LogLevel, str]] = None,
+        module: Optional[str] = None,
+        document_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        context_filter: Optional[Dict[str, Any]] = None,
+        details_filter: Optional[Dict[str, Any]] = None,
+        facet_limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Calcola la ripartizione per livello, progetto e modulo dei log che soddisfano i filtri di get_logs.
+        
+        Tutte le faccette richieste vengono ricavate da un'unica GROUP BY sulle
+        colonne corrispondenti: dalle tabelle di aggregazione se i filtri
+        riguardano solo progetto, livello, modulo e date, altrimenti con una sola
+        scansione della tabella logs. I risultati sono mantenuti in cache fino
+        alla successiva scrittura.
+        
+        Args:
+            facets: Faccette da calcolare (vedi FACET_FIELDS, predefinite tutte)
+            project: Filtra per progetto
+            level: Filtra per livello di log
+            module: Filtra per modulo
+            document_id: Filtra per ID del documento
+            file_name: Filtra per nome del file
+            start_date: Data di inizio per il filtro temporale
+            end_date: Data di fine per il filtro temporale
+            context_filter: Filtri chiave/valore sul context
+            details_filter: Filtri chiave/valore sui details
+            facet_limit: Numero massimo di valori per faccetta (i più frequenti)
+            
+        Returns:
+            Dizionario con "total" e "facets" ({faccetta: {valore: conteggio}})
+            
+        Raises:
+            ValueError: Se viene richiesta una faccetta non valida
+        """
+        facets = facets or FACET_FIELDS
+        invalid = [facet for facet in facets if facet not in FACET_FIELDS]
+        if invalid:
+            raise ValueError(f"Faccette non valide: {', '.join(invalid)}. Valori ammessi: {', '.join(FACET_FIELDS)}")
+        # Ordine stabile, così che richieste equivalenti condividano la voce in cache
+        facets = [facet for facet in FACET_FIELDS if facet in facets]
+        
+        cache = get_facet_cache()
+        cache_key = filter_fingerprint(
+            db_path=self.db_path,
+            facets=facets,
+            facet_limit=facet_limit,
+            project=project,
+            level=level,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_date,
+            end_date=end_date,
+            context_filter=context_filter,
+            details_filter=details_filter
+        )
+        
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # La generazione va letta prima della query per non memorizzare risultati già superati
+        generation = get_generation()
+        columns = ", ".join(facets)
+        
+        if not (document_id or file_name or context_filter or details_filter):
+            # Le tabelle di aggregazione contengono già i conteggi per (project, level, module)
+            rollup_query, params = rollup_counts_query(
+                project=project.value if isinstance(project, LogProject) else project,
+                start_date=start_date,
+                end_date=end_date,
+                level=level.value if isinstance(level, LogLevel) else level,
+                module=module
+            )
+            query = f"SELECT {columns}, SUM(count) AS count FROM ({rollup_query}) GROUP BY {columns}"
+            coded = False
+        else:
+            clauses, params = self._build_filter_clauses(
+                project=project,
+                level=level,
+                module=module,
+                start_date=start_date,
+                end_date=end_date,
+                context_filter=context_filter,
+                details_filter=details_filter
+            )
+            text_clauses, text_params = self._build_text_filter_clauses(
+                document_id=document_id,
+                file_name=file_name,
+                context_filter=context_filter,
+                details_filter=details_filter
+            )
+            clauses += text_clauses
+            params += text_params
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            # Raggruppamento sui codici interi, convertiti nei nomi dopo la query
+            codes = ", ".join(f"{code_column(facet)} AS {facet}" for facet in facets)
+            query = f"SELECT {codes}, COUNT(*) AS count FROM log_records{where} GROUP BY {columns}"
+            coded = True
+        
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        
+        # Ogni faccetta è la somma delle righe raggruppate sulle sue colonne
+        total = 0
+        counts: Dict[str, Dict[str, int]] = {facet: {} for facet in facets}
+        for row in rows:
+            total += row["count"]
+            for facet in facets:
+                value = self.dictionary.name(facet, row[facet]) if coded else row[facet]
+                counts[facet][value] = counts[facet].get(value, 0) + row["count"]
+        
+        result = {
+            "total": total,
+            "facets": {
+                facet: dict(sorted(values.items(), key=lambda item: item[1], reverse=True)[:facet_limit])
+                for facet, values in counts.items()
+            }
+        }
+        
+        cache.set(cache_key, result, generation)
+        return result
     
     def get_db_size(self) -> str:
         """
@@ -637,7 +2161,7 @@ class LogManager:
         conn = None
         try:
             # Calcola la data soglia
-            threshold_date = (datetime.now() - timedelta(days=days_threshold)).isoformat()
+            threshold_date = datetime.now() - timedelta(days=days_threshold)
             
             # Ottieni i log da comprimere
             conn = self._get_connection()
@@ -654,8 +2178,13 @@ class LogManager:
             ''')
             conn.commit()
 
-            query = "SELECT * FROM logs WHERE timestamp < ? AND NOT EXISTS (SELECT 1 FROM compressed_logs WHERE compressed_logs.log_id = logs.id)"
-            cursor.execute(query, (threshold_date,))
+            # In ordine cronologico: l'esportazione legge gli archivi senza riordinarli
+            query = (
+                f"SELECT {', '.join(LOG_FIELDS)} FROM log_rows WHERE timestamp_us < ? "
+                "AND NOT EXISTS (SELECT 1 FROM compressed_logs WHERE compressed_logs.log_id = log_rows.id) "
+                "ORDER BY timestamp_us"
+            )
+            cursor.execute(query, (to_micros(threshold_date),))
             logs_to_compress = cursor.fetchall()
             
             if not logs_to_compress:
@@ -712,7 +2241,7 @@ class LogManager:
                 log_ids = [log["id"] for log in logs_to_compress]
                 # Usa una query parametrizzata con il numero corretto di placeholder
                 placeholders = ",".join(["?" for _ in log_ids])
-                delete_query = f"DELETE FROM logs WHERE id IN ({placeholders})"
+                delete_query = f"DELETE FROM log_records WHERE id IN ({placeholders})"
                 cursor.execute(delete_query, tuple(log_ids))
             except Exception as e:
                 # Se la cancellazione fallisce, rollback e logga
@@ -726,6 +2255,7 @@ class LogManager:
 
             conn.commit()
             conn.close()
+            bump_generation()
 
             logger.info(f"Compressi {len(logs_to_compress)} log nell'archivio {archive_path} e rimossi dalla tabella logs")
             return len(logs_to_compress)
@@ -823,6 +2353,26 @@ class LogManager:
         logger = logging.getLogger("LogManager")
         
         try:
+            # Completa la tabella document_events con i log precedenti alla sua creazione
+            backfilled = self.backfill_document_events()
+            if backfilled:
+                logger.info(f"Registrati {backfilled} eventi del ciclo di vita dai log esistenti")
+            
+            # Assegna un modello di messaggio ai log precedenti alla creazione dei fingerprint
+            fingerprinted = self.backfill_fingerprints()
+            if fingerprinted:
+                logger.info(f"Assegnato un modello di messaggio a {fingerprinted} log esistenti")
+            
+            # Salva gli sketch top-K in memoria ed elimina le finestre oltre la retention
+            self.sketches.flush()
+            pruned = self.sketches.prune(datetime.now() - timedelta(days=settings.retention_days))
+            if pruned:
+                logger.info(f"Eliminati {pruned} sketch top-K oltre la retention")
+            self.distinct.flush()
+            pruned = self.distinct.prune(datetime.now() - timedelta(days=settings.retention_days))
+            if pruned:
+                logger.info(f"Eliminati {pruned} sketch dei valori distinti oltre la retention")
+            
             # Elimina i log vecchi (questa operazione è più sicura)
             logger.info("Avvio pulizia log vecchi...")
             deleted_logs = self.cleanup_logs(days_to_keep=settings.retention_days)
@@ -68,6 +68,22 @@ class LogFilter(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     context_filter: Optional[Dict[str, Any]] = None
+    details_filter: Optional[Dict[str, Any]] = None
+    
+class LifecycleBatchRequest(BaseModel):
+    """
+    Modello per la ricerca del ciclo di vita di più documenti in una sola richiesta.
+    """
+    document_ids: List[str] = []
+    file_hashes: List[str] = []
+    file_names: List[str] = []
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    level: Optional[str] = None
+    limit: int = Field(100, ge=1, le=1000)  # Log per ciascun identificativo
+    offset: int = Field(0, ge=0)  # Offset all'interno di ciascun identificativo
+    fields: Optional[str] = None
+    summary: bool = False
     
 class LogStats(BaseModel):
     """
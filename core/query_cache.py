@@ -0,0 +1,417 @@
+"""
+Cache in memoria per i risultati delle query sui log.
+
+Le voci della cache sono legate a una "generazione" dei dati che viene
+incrementata a ogni scrittura o cancellazione: una voce calcolata con una
+generazione precedente viene considerata scaduta.
+
+La cache dei risultati di /api/logs usa invece una filigrana più fine: per
+ogni progetto viene registrato l'intervallo di timestamp delle scritture
+recenti, così un risultato resta valido finché non arrivano log del suo
+progetto che cadono nel suo intervallo temporale. Le query su intervalli già
+conclusi restano in cache indefinitamente, quelle sui log più recenti vengono
+invalidate solo dalle scritture che le riguardano. Cancellazioni e
+compressioni invalidano tutto.
+"""
+
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from enum import Enum
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# Generazione corrente dei dati (condivisa da tutte le istanze di LogManager)
+_generation = 0
+_generation_lock = threading.Lock()
+
+# Ambito delle scritture che riguardano tutti i progetti
+ALL_PROJECTS = "*"
+
+# Ambito delle scritture che contengono eventi del ciclo di vita dei documenti
+LIFECYCLE_SCOPE = "#lifecycle"
+
+# Scritture recenti mantenute per ambito: oltre, i risultati più vecchi sono scaduti
+INGEST_HISTORY_SIZE = 1024
+
+# Filigrana delle scritture: epoca (cambia con cancellazioni e compressioni),
+# sequenza delle scritture e, per ambito, (sequenza, timestamp minimo, massimo)
+_epoch = 0
+_ingest_sequence = 0
+_ingest_history: Dict[str, deque] = {}
+_ingest_dropped: Dict[str, int] = {}
+
+# Identificativo del processo: le versioni dei dati non sono confrontabili tra riavvii
+_boot_id = uuid.uuid4().hex[:8]
+
+
+def bump_generation(ingested: Optional[Dict[str, Tuple[str, str]]] = None) -> int:
+    """
+    Segnala che i dati sono cambiati (nuovi log, cancellazioni, compressione).
+
+    Args:
+        ingested: Solo per l'inserimento di nuovi log, intervallo di timestamp
+            (minimo, massimo) scritto per ciascun progetto. Se assente il
+            cambiamento invalida tutti i risultati in cache.
+
+    Returns:
+        Nuova generazione dei dati
+    """
+    global _generation, _epoch, _ingest_sequence
+    with _generation_lock:
+        _generation += 1
+        if ingested is None:
+            _epoch += 1
+        elif ingested:
+            _ingest_sequence += 1
+            overall = (min(bounds[0] for bounds in ingested.values()), max(bounds[1] for bounds in ingested.values()))
+            for scope, (lowest, highest) in list(ingested.items()) + [(ALL_PROJECTS, overall)]:
+                history = _ingest_history.setdefault(scope, deque())
+                if len(history) == INGEST_HISTORY_SIZE:
+                    _ingest_dropped[scope] = history.popleft()[0]
+                history.append((_ingest_sequence, lowest, highest))
+        return _generation
+
+
+def note_ingest(ingested: Dict[str, Tuple[str, str]], scope: str, timestamp: str):
+    """
+    Aggiunge il timestamp di un log scritto all'intervallo del suo ambito.
+
+    Args:
+        ingested: Intervalli del batch corrente da passare a bump_generation
+        scope: Progetto del log oppure LIFECYCLE_SCOPE
+        timestamp: Timestamp memorizzato del log
+    """
+    bounds = ingested.get(scope)
+    if bounds is None:
+        ingested[scope] = (timestamp, timestamp)
+    else:
+        ingested[scope] = (min(bounds[0], timestamp), max(bounds[1], timestamp))
+
+
+def get_watermark() -> Tuple[int, int]:
+    """
+    Restituisce la filigrana corrente delle scritture (epoca, sequenza).
+    """
+    return _epoch, _ingest_sequence
+
+
+def ingested_since(scope: str, sequence: int, start: Optional[str] = None, end: Optional[str] = None) -> bool:
+    """
+    Verifica se dopo una sequenza sono stati scritti log dell'ambito nell'intervallo.
+
+    Args:
+        scope: Progetto oppure ALL_PROJECTS
+        sequence: Sequenza delle scritture al momento del calcolo del risultato
+        start: Inizio dell'intervallo (ISO, opzionale)
+        end: Fine dell'intervallo (ISO, opzionale)
+
+    Returns:
+        True se il risultato potrebbe essere cambiato
+    """
+    with _generation_lock:
+        if _ingest_dropped.get(scope, 0) > sequence:
+            return True
+        for written, lowest, highest in reversed(_ingest_history.get(scope, ())):
+            if written <= sequence:
+                break
+            if (end is None or lowest <= end) and (start is None or highest >= start):
+                return True
+        return False
+
+
+def get_generation() -> int:
+    """
+    Restituisce la generazione corrente dei dati.
+    """
+    return _generation
+
+
+def get_epoch() -> int:
+    """
+    Restituisce il numero di invalidazioni complete (cancellazioni, compressione, ricostruzioni).
+    """
+    return _epoch
+
+
+def _normalize_value(value: Any) -> Any:
+    """
+    Normalizza un valore di filtro per il calcolo dell'impronta.
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def filter_fingerprint(**filters) -> str:
+    """
+    Calcola un'impronta stabile di una combinazione di filtri.
+
+    I filtri con valore None vengono ignorati, così che chiamate equivalenti
+    producano la stessa impronta.
+
+    Returns:
+        Stringa esadecimale che identifica i filtri
+    """
+    normalized = {
+        key: _normalize_value(value)
+        for key, value in filters.items()
+        if value is not None
+    }
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FilterCache:
+    """
+    Cache LRU indicizzata per impronta dei filtri e invalidata dalle scritture.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Inizializza la cache.
+
+        Args:
+            max_entries: Numero massimo di voci mantenute in memoria
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Restituisce il valore associato alla chiave se ancora valido.
+
+        Args:
+            key: Impronta dei filtri
+
+        Returns:
+            Valore in cache oppure None se assente o scaduto
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            generation, value = entry
+            if generation != get_generation():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None):
+        """
+        Memorizza un valore nella cache.
+
+        Args:
+            key: Impronta dei filtri
+            value: Valore da memorizzare
+            generation: Generazione dei dati con cui il valore è stato calcolato
+        """
+        if generation is None:
+            generation = get_generation()
+
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Svuota la cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+def data_version(scope: str = ALL_PROJECTS, start: Optional[str] = None, end: Optional[str] = None) -> str:
+    """
+    Restituisce una versione dei dati di un ambito e di un intervallo temporale.
+
+    La versione cambia solo se vengono scritti log dell'ambito nell'intervallo
+    (o con cancellazioni, compressioni e riavvii), senza eseguire query: è la
+    base degli ETag degli endpoint di interrogazione.
+
+    Args:
+        scope: Progetto, LIFECYCLE_SCOPE oppure ALL_PROJECTS
+        start: Inizio dell'intervallo (ISO, opzionale)
+        end: Fine dell'intervallo (ISO, opzionale)
+
+    Returns:
+        Stringa opaca che identifica la versione
+    """
+    with _generation_lock:
+        # Se la storia è stata troncata la versione avanza con essa (più risposte 200, mai 304 errati)
+        last = _ingest_dropped.get(scope, 0)
+        for written, lowest, highest in reversed(_ingest_history.get(scope, ())):
+            if (end is None or lowest <= end) and (start is None or highest >= start):
+                last = written
+                break
+        return f"{_boot_id}.{_epoch}.{last}"
+
+
+class ResultCache:
+    """
+    Cache LRU dei risultati delle query con limite in byte e invalidazione per filigrana.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Inizializza la cache.
+
+        Args:
+            max_bytes: Dimensione massima complessiva dei risultati in cache
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Restituisce il risultato associato alla chiave se nessuna scrittura lo ha modificato.
+
+        Args:
+            key: Impronta della query
+
+        Returns:
+            Valore in cache oppure None se assente o scaduto
+        """
+        epoch, sequence = get_watermark()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry["epoch"] != epoch or (
+                entry["sequence"] != sequence
+                and ingested_since(entry["scope"], entry["sequence"], entry["start"], entry["end"])
+            ):
+                self._discard(key)
+                return None
+
+            # Le scritture intermedie non lo riguardano: la verifica riparte da qui
+            entry["sequence"] = sequence
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int,
+        watermark: Tuple[int, int],
+        scope: str = ALL_PROJECTS,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ):
+        """
+        Memorizza un risultato nella cache.
+
+        Args:
+            key: Impronta della query
+            value: Risultato da memorizzare
+            size: Dimensione stimata del risultato in byte
+            watermark: Filigrana letta con get_watermark prima di eseguire la query
+            scope: Progetto filtrato dalla query oppure ALL_PROJECTS
+            start: Inizio dell'intervallo temporale della query (ISO, opzionale)
+            end: Fine dell'intervallo temporale della query (ISO, opzionale)
+        """
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = {
+                "epoch": watermark[0],
+                "sequence": watermark[1],
+                "scope": scope,
+                "start": start,
+                "end": end,
+                "size": size,
+                "value": value
+            }
+            self.size += size
+
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: str):
+        """
+        Rimuove una voce aggiornando la dimensione occupata.
+        """
+        self.size -= self._entries.pop(key)["size"]
+
+    def clear(self):
+        """
+        Svuota la cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# Singleton della cache dei conteggi
+_count_cache = None
+
+
+def get_count_cache() -> FilterCache:
+    """
+    Ottiene l'istanza singleton della cache dei conteggi filtrati.
+
+    Returns:
+        FilterCache
+    """
+    global _count_cache
+    if _count_cache is None:
+        from core.config import get_settings
+        _count_cache = FilterCache(max_entries=get_settings().count_cache_size)
+
+    return _count_cache
+
+
+# Singleton della cache dei conteggi per faccette
+_facet_cache = None
+
+
+def get_facet_cache() -> FilterCache:
+    """
+    Ottiene l'istanza singleton della cache dei conteggi per faccette.
+
+    Returns:
+        FilterCache
+    """
+    global _facet_cache
+    if _facet_cache is None:
+        from core.config import get_settings
+        _facet_cache = FilterCache(max_entries=get_settings().facet_cache_size)
+
+    return _facet_cache
+
+
+# Singleton della cache dei risultati di /api/logs
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Ottiene l'istanza singleton della cache dei risultati delle query sui log.
+
+    Returns:
+        ResultCache
+    """
+    global _result_cache
+    if _result_cache is None:
+        from core.config import get_settings
+        _result_cache = ResultCache(max_bytes=get_settings().result_cache_bytes)
+
+    return _result_cache
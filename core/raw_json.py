@@ -0,0 +1,109 @@
+"""
+Serializzazione dei log in JSON senza decodificare details e context.
+
+I campi details e context sono memorizzati come testo JSON: invece di convertirli
+in dizionari (json.loads) per poi riserializzarli nella risposta (json.dumps),
+il testo memorizzato viene inserito direttamente nell'output. La validità del
+testo viene verificata da SQLite con json_valid(), molto più economico del
+parsing in Python; le righe con JSON non valido passano dalla normale
+procedura di riparazione.
+"""
+
+import json
+import sqlite3
+from typing import Any, Callable, Collection, Dict, Iterable, Optional
+
+from fastapi.responses import Response
+
+# Colonne da aggiungere alla SELECT per ottenere la validità dei campi JSON
+JSON_VALID_COLUMNS = "json_valid(details) AS details_valid, json_valid(context) AS context_valid"
+
+# Campi che contengono testo JSON memorizzato
+RAW_JSON_FIELDS = ("details", "context")
+
+
+def json_valid_columns(fields: Optional[Iterable[str]] = None) -> str:
+    """
+    Restituisce le colonne json_valid() necessarie per i campi selezionati.
+
+    Args:
+        fields: Campi selezionati dalla query (None indica tutti i campi)
+
+    Returns:
+        Frammento SQL da aggiungere alla SELECT (stringa vuota se non serve)
+    """
+    if fields is None:
+        return JSON_VALID_COLUMNS
+
+    return ", ".join(
+        f"json_valid({field}) AS {field}_valid"
+        for field in RAW_JSON_FIELDS
+        if field in fields
+    )
+
+
+class RawJSONResponse(Response):
+    """
+    Risposta il cui contenuto è già una stringa JSON pronta per l'invio.
+    """
+    media_type = "application/json"
+
+
+def render_row(
+    row: sqlite3.Row,
+    repair: Callable[[sqlite3.Row], Dict[str, Any]],
+    exclude: Collection[str] = ()
+) -> str:
+    """
+    Serializza una riga della tabella logs in un oggetto JSON.
+
+    La riga deve contenere le colonne details_valid e context_valid
+    (vedi JSON_VALID_COLUMNS).
+
+    Args:
+        row: Riga restituita da SQLite
+        repair: Funzione che converte la riga in dizionario riparando il JSON non valido
+        exclude: Colonne ausiliarie della query da non includere nell'oggetto
+
+    Returns:
+        Stringa con l'oggetto JSON del log
+    """
+    keys = row.keys()
+
+    # Se un campo JSON non è valido si usa la conversione completa con riparazione
+    for field in RAW_JSON_FIELDS:
+        if field in keys and row[field] and not row[f"{field}_valid"]:
+            log_dict = repair(row)
+            for key in list(log_dict):
+                if key.endswith("_valid") or key in exclude:
+                    del log_dict[key]
+            return json.dumps(log_dict, default=str)
+
+    parts = []
+    for key in keys:
+        if key.endswith("_valid") or key in exclude:
+            continue
+
+        value = row[key]
+        if key in RAW_JSON_FIELDS:
+            # Il testo memorizzato è JSON valido: lo si inserisce così com'è
+            encoded = value if value else "null"
+        else:
+            encoded = json.dumps(value)
+        parts.append(f"{json.dumps(key)}: {encoded}")
+
+    return "{" + ", ".join(parts) + "}"
+
+
+def render_rows(rows: Iterable[sqlite3.Row], repair: Callable[[sqlite3.Row], Dict[str, Any]]) -> str:
+    """
+    Serializza più righe della tabella logs in un array JSON.
+
+    Args:
+        rows: Righe restituite da SQLite
+        repair: Funzione che converte la riga in dizionario riparando il JSON non valido
+
+    Returns:
+        Stringa con l'array JSON dei log
+    """
+    return "[" + ", ".join(render_row(row, repair) for row in rows) + "]"
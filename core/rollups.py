@@ -0,0 +1,335 @@
+"""
+Tabelle di aggregazione dei log per minuto e per ora.
+
+Le tabelle log_rollup_minute e log_rollup_hour contengono il numero di log per
+(bucket, project, level, module). Il bucket è il prefisso del timestamp
+memorizzato ("YYYY-MM-DDTHH:MM" per i minuti, "YYYY-MM-DDTHH" per le ore),
+quindi un log arrivato in ritardo viene contato nel bucket del proprio
+timestamp e non in quello di arrivo. I contatori vengono incrementati dal
+writer nella transazione di inserimento e decrementati da un trigger quando i
+log vengono eliminati (pulizia, compressione, reset).
+
+Le statistiche su un intervallo qualsiasi usano le ore interamente comprese
+nell'intervallo, i minuti interi ai bordi e solo le frazioni di minuto
+residue dalla tabella logs.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+
+from core.dictionaries import name_expression
+from core.timestamps import from_micros, sql_iso_timestamp, to_micros
+
+logger = logging.getLogger("LogManager")
+
+# Tabelle di aggregazione: (nome, lunghezza del prefisso del timestamp, durata del bucket)
+ROLLUP_MINUTE = ("log_rollup_minute", 16, timedelta(minutes=1))
+ROLLUP_HOUR = ("log_rollup_hour", 13, timedelta(hours=1))
+ROLLUP_TABLES = (ROLLUP_MINUTE, ROLLUP_HOUR)
+
+def initialize_rollups(cursor: sqlite3.Cursor):
+    """
+    Crea le tabelle di aggregazione e il trigger di eliminazione.
+    
+    Le tabelle create su un database che contiene già dei log vengono popolate
+    subito con un'unica aggregazione della tabella logs.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    for table, prefix, _ in ROLLUP_TABLES:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        created = cursor.fetchone() is None
+        
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TEXT NOT NULL,
+            project TEXT NOT NULL,
+            level TEXT NOT NULL,
+            module TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (bucket, project, level, module)
+        )
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_project ON {table} (project, bucket)')
+        
+        if created:
+            cursor.execute(f'''
+            INSERT INTO {table} (bucket, project, level, module, count)
+            SELECT substr(timestamp, 1, {prefix}), project, level, module, COUNT(*)
+            FROM logs
+            GROUP BY 1, 2, 3, 4
+            ''')
+            if cursor.rowcount:
+                logger.info(f"Tabella {table} popolata dai log esistenti: {cursor.rowcount} bucket")
+    
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_logs_delete_rollups AFTER DELETE ON log_records
+    BEGIN
+        {_decrement_statement(ROLLUP_MINUTE)}
+        {_decrement_statement(ROLLUP_HOUR)}
+        DELETE FROM {ROLLUP_MINUTE[0]} WHERE bucket = {_bucket_expression(ROLLUP_MINUTE)} AND count <= 0;
+        DELETE FROM {ROLLUP_HOUR[0]} WHERE bucket = {_bucket_expression(ROLLUP_HOUR)} AND count <= 0;
+    END
+    ''')
+
+def _bucket_expression(rollup: Tuple[str, int, timedelta]) -> str:
+    """
+    Espressione del trigger con il bucket del log eliminato (prefisso del timestamp ISO).
+    """
+    return f"substr({sql_iso_timestamp('old.timestamp_us')}, 1, {rollup[1]})"
+
+def _decrement_statement(rollup: Tuple[str, int, timedelta]) -> str:
+    """
+    Istruzione del trigger che decrementa il bucket di un log eliminato.
+    
+    Le tabelle di aggregazione memorizzano i nomi: i codici della riga
+    eliminata vengono convertiti con i dizionari.
+    """
+    return (
+        f"UPDATE {rollup[0]} SET count = count - 1 "
+        f"WHERE bucket = {_bucket_expression(rollup)} "
+        f"AND project = {name_expression('project', 'old.project_id')} "
+        f"AND level = {name_expression('level', 'old.level_id')} "
+        f"AND module = {name_expression('module', 'old.module_id')};"
+    )
+
+def index_rollups(cursor: sqlite3.Cursor, row: dict):
+    """
+    Incrementa i bucket di un log appena inserito.
+    
+    Args:
+        cursor: Cursore della transazione di scrittura
+        row: Riga memorizzata nella tabella logs
+    """
+    for table, prefix, _ in ROLLUP_TABLES:
+        cursor.execute(f'''
+        INSERT INTO {table} (bucket, project, level, module, count) VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT (bucket, project, level, module) DO UPDATE SET count = count + 1
+        ''', (row["timestamp"][:prefix], row["project"], row["level"], row["module"]))
+
+def _floor(moment: datetime, size: timedelta) -> datetime:
+    """
+    Arrotonda per difetto all'inizio del minuto o dell'ora.
+    """
+    if size == ROLLUP_HOUR[2]:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+def _ceil(moment: datetime, size: timedelta) -> datetime:
+    """
+    Arrotonda per eccesso all'inizio del minuto o dell'ora successivi.
+    """
+    floored = _floor(moment, size)
+    return floored if floored == moment else floored + size
+
+def rollup_sources(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Tuple[str, Optional[str], Optional[str], bool]]:
+    """
+    Scompone l'intervallo [start_date, end_date] nelle parti da leggere da ciascuna sorgente.
+    
+    Le ore interamente comprese vengono lette da log_rollup_hour, i minuti
+    interi dei bordi da log_rollup_minute e le frazioni di minuto residue
+    dalla tabella logs. Le parti sono disgiunte e coprono l'intero intervallo.
+    
+    Args:
+        start_date: Inizio dell'intervallo (incluso, None per nessun limite)
+        end_date: Fine dell'intervallo (inclusa, None per nessun limite)
+    
+    Returns:
+        Lista di tuple (sorgente, inizio, fine, fine_inclusa) con sorgente
+        "log_rollup_hour", "log_rollup_minute" o "logs"; inizio e fine sono
+        prefissi ISO da confrontare con bucket oppure, per "logs", microsecondi
+        da confrontare con timestamp_us (None per nessun limite)
+    """
+    hour, minute = ROLLUP_HOUR[2], ROLLUP_MINUTE[2]
+    parts: List[Tuple[str, Any, Any, bool]] = []
+    
+    # I bucket sono in ora locale: le date con fuso vengono convertite
+    start_date = from_micros(to_micros(start_date)) if start_date else None
+    end_date = from_micros(to_micros(end_date)) if end_date else None
+    
+    def add(source: str, low: Optional[datetime], high: Optional[datetime], inclusive: bool = False):
+        if low is not None and high is not None and (low > high or (low == high and not inclusive)):
+            return
+        if source == "logs":
+            parts.append((
+                source,
+                to_micros(low) if low is not None else None,
+                to_micros(high) if high is not None else None,
+                inclusive
+            ))
+            return
+        prefix = {table: length for table, length, _ in ROLLUP_TABLES}[source]
+        low_text = low.isoformat()[:prefix] if low is not None else None
+        high_text = high.isoformat()[:prefix] if high is not None else None
+        parts.append((source, low_text, high_text, inclusive))
+    
+    hour_start = _ceil(start_date, hour) if start_date else None
+    hour_end = _floor(end_date, hour) if end_date else None
+    
+    if hour_start is not None and hour_end is not None and hour_start >= hour_end:
+        # Nessuna ora intera: l'intervallo viene coperto da minuti e frazioni
+        minute_start = _ceil(start_date, minute)
+        minute_end = _floor(end_date, minute)
+        if minute_start >= minute_end:
+            add("logs", start_date, end_date, inclusive=True)
+            return parts
+        add("logs", start_date, minute_start)
+        add("log_rollup_minute", minute_start, minute_end)
+        add("logs", minute_end, end_date, inclusive=True)
+        return parts
+    
+    add("log_rollup_hour", hour_start, hour_end)
+    
+    if start_date is not None:
+        minute_start = _ceil(start_date, minute)
+        add("logs", start_date, minute_start)
+        add("log_rollup_minute", minute_start, hour_start)
+    
+    if end_date is not None:
+        minute_end = _floor(end_date, minute)
+        add("log_rollup_minute", hour_end, minute_end)
+        add("logs", minute_end, end_date, inclusive=True)
+    
+    return parts
+
+def rollup_counts_query(
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    level: Optional[str] = None,
+    module: Optional[str] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce la query che conta i log per (project, level, module) nell'intervallo indicato.
+    
+    Args:
+        project: Filtra per progetto
+        start_date: Inizio dell'intervallo (incluso)
+        end_date: Fine dell'intervallo (inclusa)
+        level: Filtra per livello di log
+        module: Filtra per modulo
+    
+    Returns:
+        Tupla (query SQL, parametri); la query restituisce project, level, module, count
+    """
+    selects = []
+    params: List[Any] = []
+    
+    for source, low, high, inclusive in rollup_sources(start_date, end_date):
+        column = "timestamp_us" if source == "logs" else "bucket"
+        count = "1" if source == "logs" else "count"
+        clauses = []
+        if low is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{column} {'<=' if inclusive else '<'} ?")
+            params.append(high)
+        for column, value in (("project", project), ("level", level), ("module", module)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Le frazioni di minuto vengono lette dai log tramite l'indice sui timestamp interi
+        table = "log_rows" if source == "logs" else source
+        selects.append(f"SELECT project, level, module, {count} AS count FROM {table}{where}")
+    
+    query = (
+        "SELECT project, level, module, SUM(count) AS count FROM ("
+        + " UNION ALL ".join(selects)
+        + ") GROUP BY project, level, module"
+    )
+    return query, params
+
+# Intervalli ammessi per gli istogrammi e dimensioni raggruppabili
+HISTOGRAM_INTERVALS = {
+    "1m": timedelta(minutes=1),
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1)
+}
+HISTOGRAM_GROUPS = ("level", "project", "module")
+
+def histogram_slot(moment: datetime, interval: str) -> datetime:
+    """
+    Restituisce l'inizio del bucket dell'istogramma che contiene moment.
+    
+    Args:
+        moment: Istante da allineare
+        interval: Intervallo dell'istogramma (vedi HISTOGRAM_INTERVALS)
+    
+    Returns:
+        Inizio del bucket
+    """
+    if interval == "1h":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    step = int(HISTOGRAM_INTERVALS[interval].total_seconds() // 60)
+    return moment.replace(minute=moment.minute - moment.minute % step, second=0, microsecond=0)
+
+def histogram_slot_key(slot: datetime, interval: str) -> str:
+    """
+    Chiave testuale di un bucket, nel formato prodotto da histogram_query.
+    """
+    return slot.isoformat()[:ROLLUP_HOUR[1] if interval == "1h" else ROLLUP_MINUTE[1]]
+
+def histogram_query(
+    interval: str,
+    group_by: Optional[str],
+    start_slot: datetime,
+    end_slot: datetime,
+    where: Optional[List[str]] = None,
+    params: Optional[List[Any]] = None,
+    use_rollups: bool = True
+) -> Tuple[str, List[Any]]:
+    """
+    Costruisce la query che conta i log per bucket dell'istogramma (ed eventualmente per gruppo).
+    
+    Con use_rollups la query legge log_rollup_minute (1m, 5m) o log_rollup_hour
+    (1h); le condizioni in where possono riguardare solo project, level e
+    module (confrontati per nome). Altrimenti la query legge la vista log_rows
+    con le condizioni indicate, usando gli indici sui codici di log_records.
+    
+    Args:
+        interval: Intervallo dell'istogramma (vedi HISTOGRAM_INTERVALS)
+        group_by: Dimensione di raggruppamento (vedi HISTOGRAM_GROUPS) o None
+        start_slot: Inizio del primo bucket
+        end_slot: Inizio dell'ultimo bucket
+        where: Condizioni SQL aggiuntive
+        params: Parametri delle condizioni aggiuntive
+        use_rollups: Legge dalle tabelle di aggregazione invece che dalla vista log_rows
+    
+    Returns:
+        Tupla (query SQL, parametri); la query restituisce slot, series, count
+    """
+    if interval not in HISTOGRAM_INTERVALS:
+        raise ValueError(f"Intervallo non valido: {interval}. Valori ammessi: {', '.join(HISTOGRAM_INTERVALS)}")
+    if group_by is not None and group_by not in HISTOGRAM_GROUPS:
+        raise ValueError(f"Raggruppamento non valido: {group_by}. Valori ammessi: {', '.join(HISTOGRAM_GROUPS)}")
+    
+    table, prefix, _ = ROLLUP_HOUR if interval == "1h" else ROLLUP_MINUTE
+    end_limit = end_slot + HISTOGRAM_INTERVALS[interval]
+    
+    if use_rollups:
+        source, column, count = table, "bucket", "SUM(count)"
+        low, high = start_slot.isoformat()[:prefix], end_limit.isoformat()[:prefix]
+    else:
+        source, column, count = "log_rows", "timestamp_us", "COUNT(*)"
+        low, high = to_micros(start_slot), to_micros(end_limit)
+    
+    slot = column if use_rollups else f"substr(timestamp, 1, {prefix})"
+    if interval == "5m":
+        # Minuti arrotondati al multiplo di 5 inferiore
+        slot = f"substr({slot}, 1, 14) || printf('%02d', CAST(substr({slot}, 15, 2) AS INTEGER) / 5 * 5)"
+    
+    clauses = [f"{column} >= ?", f"{column} < ?"] + list(where or [])
+    query = (
+        f"SELECT {slot} AS slot, {group_by or 'NULL'} AS series, {count} AS count "
+        f"FROM {source} WHERE {' AND '.join(clauses)} "
+        f"GROUP BY slot, series"
+    )
+    return query, [low, high] + list(params or [])
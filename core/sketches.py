@@ -0,0 +1,418 @@
+"""
+Sketch approssimati per i valori più frequenti (top-K) per finestra oraria.
+
+Per ogni dimensione (modulo, modello di messaggio, documento, API key) e per
+ogni ora viene mantenuto un riepilogo Space-Saving, che conserva i valori
+candidati a essere i più frequenti con un limite superiore all'errore, e uno
+sketch Count-Min, che stima la frequenza di un valore qualsiasi. Entrambi sono
+unibili: i top-K di un intervallo si ottengono unendo gli sketch delle ore che
+lo compongono, con un costo che non dipende dal numero di log.
+
+Gli sketch vengono aggiornati in memoria dopo il commit di ogni scrittura e
+riversati periodicamente nella tabella log_sketches, unendoli a quelli già
+memorizzati (così più processi possono scrivere sullo stesso database). Le
+interrogazioni uniscono gli sketch memorizzati con quelli non ancora riversati.
+Le cancellazioni non vengono sottratte: le finestre più vecchie della
+retention vengono eliminate dalla manutenzione.
+"""
+
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("LogManager")
+
+# Dimensioni per cui vengono mantenuti gli sketch
+SKETCH_DIMENSIONS = ("module", "fingerprint", "document", "api_key")
+
+# Lunghezza del prefisso del timestamp usato come finestra degli sketch (ora)
+SKETCH_WINDOW_PREFIX = 13
+
+class SpaceSaving:
+    """
+    Riepilogo Space-Saving: al più capacity contatori (valore -> [conteggio, errore]).
+    
+    Il conteggio di ogni valore è una sovrastima di al più errore. I valori
+    con il conteggio minimo vengono cercati una volta sola e sostituiti uno
+    alla volta, così che un flusso di valori tutti diversi non richieda una
+    scansione dei contatori per ogni log.
+    """
+    __slots__ = ("capacity", "counters", "_victims")
+    
+    def __init__(self, capacity: int, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.counters = counters or {}
+        self._victims: List[Tuple[str, int]] = []
+    
+    def add(self, item: str, count: int = 1):
+        """
+        Conta un'occorrenza di item, sostituendo il valore meno frequente se il riepilogo è pieno.
+        """
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            victim, floor = self._next_victim()
+            del self.counters[victim]
+            self.counters[item] = [floor + count, floor]
+    
+    def _next_victim(self) -> Tuple[str, int]:
+        """
+        Restituisce un valore con il conteggio minimo e il suo conteggio.
+        """
+        while self._victims:
+            victim, count = self._victims.pop()
+            counter = self.counters.get(victim)
+            # I candidati incrementati o già sostituiti non sono più validi
+            if counter is not None and counter[0] == count:
+                return victim, count
+        floor = min(counter[0] for counter in self.counters.values())
+        self._victims = [(key, floor) for key, counter in self.counters.items() if counter[0] == floor]
+        return self._victims.pop()
+    
+    def floor(self) -> int:
+        """
+        Conteggio massimo di un valore non presente nel riepilogo.
+        """
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+    
+    def merge(self, other: "SpaceSaving"):
+        """
+        Unisce un altro riepilogo (algoritmo dei riepiloghi unibili).
+        
+        I valori assenti da uno dei due riepiloghi ricevono il suo conteggio
+        minimo come sovrastima; restano i capacity valori più frequenti.
+        """
+        own_floor, other_floor = self.floor(), other.floor()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            own = self.counters.get(item, [own_floor, own_floor])
+            theirs = other.counters.get(item, [other_floor, other_floor])
+            merged[item] = [own[0] + theirs[0], own[1] + theirs[1]]
+        top = sorted(merged.items(), key=lambda entry: entry[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(top)
+        self._victims = []
+
+class CountMinSketch:
+    """
+    Sketch Count-Min: depth righe di width contatori; la stima è il minimo tra le righe.
+    """
+    __slots__ = ("width", "depth", "table")
+    
+    def __init__(self, width: int, depth: int, table: Optional[array] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array("q", bytes(8 * width * depth))
+    
+    def _positions(self, item: str) -> Iterable[int]:
+        """
+        Posizioni di item nelle righe (doppio hashing su un digest stabile tra processi).
+        """
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for row in range(self.depth):
+            yield row * self.width + (first + row * second) % self.width
+    
+    def add(self, item: str, count: int = 1):
+        for position in self._positions(item):
+            self.table[position] += count
+    
+    def estimate(self, item: str) -> int:
+        return min(self.table[position] for position in self._positions(item))
+    
+    def merge(self, other: "CountMinSketch"):
+        for position, value in enumerate(other.table):
+            self.table[position] += value
+
+class WindowSketch:
+    """
+    Sketch di una dimensione in una finestra oraria.
+    """
+    __slots__ = ("total", "summary", "cms")
+    
+    def __init__(self, capacity: int, width: int, depth: int):
+        self.total = 0
+        self.summary = SpaceSaving(capacity)
+        self.cms = CountMinSketch(width, depth)
+    
+    def add(self, item: str):
+        self.total += 1
+        self.summary.add(item)
+        self.cms.add(item)
+    
+    def merge(self, other: "WindowSketch"):
+        self.total += other.total
+        self.summary.merge(other.summary)
+        if self.cms is not None:
+            self.cms.merge(other.cms)
+
+class SketchStore:
+    """
+    Sketch per dimensione e finestra di un database, con gli aggiornamenti non ancora riversati.
+    """
+    
+    def __init__(self, db_path: str, capacity: int = 200, width: int = 1024, depth: int = 4, flush_seconds: int = 30):
+        """
+        Inizializza l'archivio degli sketch.
+        
+        Args:
+            db_path: Percorso del database
+            capacity: Contatori di ogni riepilogo Space-Saving
+            width: Colonne di ogni sketch Count-Min
+            depth: Righe di ogni sketch Count-Min
+            flush_seconds: Intervallo minimo tra due scritture su database
+        """
+        self.db_path = db_path
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[Tuple[str, str], WindowSketch] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _new_sketch(self) -> WindowSketch:
+        return WindowSketch(self.capacity, self.width, self.depth)
+    
+    def record(self, values: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Aggiorna gli sketch con i log appena scritti e li riversa se è trascorso flush_seconds.
+        
+        Args:
+            values: Coppie (timestamp, {dimensione: valore}) dei log scritti
+        """
+        with self._lock:
+            for timestamp, dimensions in values:
+                window = timestamp[:SKETCH_WINDOW_PREFIX]
+                for dimension, value in dimensions.items():
+                    if value is None or value == "":
+                        continue
+                    key = (dimension, window)
+                    sketch = self._pending.get(key)
+                    if sketch is None:
+                        sketch = self._pending[key] = self._new_sketch()
+                    sketch.add(str(value))
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """
+        Unisce gli sketch in memoria a quelli memorizzati nella tabella log_sketches.
+        
+        Returns:
+            Numero di finestre scritte
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for (dimension, window), sketch in pending.items():
+                stored = self._load(cursor, dimension, [window]).get(window)
+                if stored is not None:
+                    stored.merge(sketch)
+                    sketch = stored
+                cursor.execute('''
+                INSERT OR REPLACE INTO log_sketches (dimension, bucket, total, summary, cms, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    dimension,
+                    window,
+                    sketch.total,
+                    json.dumps(sketch.summary.counters),
+                    sketch.cms.table.tobytes() if sketch.cms is not None else b"",
+                    datetime.now().isoformat()
+                ))
+            conn.commit()
+            return len(pending)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Errore durante il salvataggio degli sketch: {str(e)}")
+            # Gli aggiornamenti non salvati tornano in memoria per il prossimo tentativo
+            with self._lock:
+                for key, sketch in pending.items():
+                    if key in self._pending:
+                        sketch.merge(self._pending[key])
+                    self._pending[key] = sketch
+            return 0
+        finally:
+            conn.close()
+    
+    def _load(self, cursor: sqlite3.Cursor, dimension: str, windows: List[str]) -> Dict[str, WindowSketch]:
+        """
+        Legge gli sketch memorizzati di una dimensione per le finestre indicate.
+        """
+        if not windows:
+            return {}
+        placeholders = ", ".join("?" for _ in windows)
+        cursor.execute(
+            f"SELECT bucket, total, summary, cms FROM log_sketches WHERE dimension = ? AND bucket IN ({placeholders})",
+            [dimension] + windows
+        )
+        sketches = {}
+        for window, total, summary, cms in cursor.fetchall():
+            sketch = self._new_sketch()
+            sketch.total = total
+            sketch.summary.counters = json.loads(summary)
+            table = array("q")
+            table.frombytes(cms)
+            if len(table) == len(sketch.cms.table):
+                sketch.cms.table = table
+            else:
+                # Sketch creato con dimensioni diverse (o già scartato): per questa
+                # finestra le stime si basano sul solo riepilogo Space-Saving
+                sketch.cms = None
+            sketches[window] = sketch
+        return sketches
+    
+    def top(
+        self,
+        dimension: str,
+        start_date: datetime,
+        end_date: datetime,
+        k: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Restituisce i k valori più frequenti di una dimensione nelle finestre che intersecano l'intervallo.
+        
+        Args:
+            dimension: Dimensione (vedi SKETCH_DIMENSIONS)
+            start_date: Inizio dell'intervallo
+            end_date: Fine dell'intervallo
+            k: Numero di valori restituiti
+        
+        Returns:
+            Dizionario con total (log contati) e items ([{value, count, error}])
+        """
+        windows = []
+        moment = start_date.replace(minute=0, second=0, microsecond=0)
+        while moment <= end_date:
+            windows.append(moment.isoformat()[:SKETCH_WINDOW_PREFIX])
+            moment += timedelta(hours=1)
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            sketches = list(self._load(conn.cursor(), dimension, windows).values())
+        finally:
+            conn.close()
+        
+        # Aggiornamenti non ancora riversati (copiati per non modificarli)
+        with self._lock:
+            for window in windows:
+                pending = self._pending.get((dimension, window))
+                if pending is not None:
+                    copy = self._new_sketch()
+                    copy.merge(pending)
+                    sketches.append(copy)
+        
+        merged = self._new_sketch()
+        exact_cms = True
+        for sketch in sketches:
+            merged.total += sketch.total
+            merged.summary.merge(sketch.summary)
+            if sketch.cms is None:
+                exact_cms = False
+            else:
+                merged.cms.merge(sketch.cms)
+        
+        items = []
+        for value, (count, error) in merged.summary.counters.items():
+            # La stima Count-Min è anch'essa una sovrastima: si tiene la più stretta
+            estimate = min(count, merged.cms.estimate(value)) if exact_cms else count
+            items.append({"value": value, "count": estimate, "error": min(error, estimate)})
+        items.sort(key=lambda item: (-item["count"], item["value"]))
+        
+        return {"total": merged.total, "items": items[:k]}
+    
+    def prune(self, before: datetime) -> int:
+        """
+        Elimina gli sketch delle finestre precedenti a before.
+        
+        Returns:
+            Numero di sketch eliminati
+        """
+        window = before.isoformat()[:SKETCH_WINDOW_PREFIX]
+        with self._lock:
+            for key in [key for key in self._pending if key[1] < window]:
+                del self._pending[key]
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute("DELETE FROM log_sketches WHERE bucket < ?", (window,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+# Archivi degli sketch, uno per database
+_stores: Dict[str, SketchStore] = {}
+_stores_lock = threading.Lock()
+
+@atexit.register
+def _flush_stores():
+    """
+    Riversa su database gli sketch ancora in memoria alla chiusura del processo.
+    """
+    for store in list(_stores.values()):
+        store.flush()
+
+def get_sketch_store(db_path: str) -> SketchStore:
+    """
+    Ottiene l'archivio degli sketch condiviso dai LogManager dello stesso database.
+    
+    Args:
+        db_path: Percorso del database
+    
+    Returns:
+        SketchStore
+    """
+    with _stores_lock:
+        if db_path not in _stores:
+            from core.config import get_settings
+            settings = get_settings()
+            _stores[db_path] = SketchStore(
+                db_path,
+                capacity=settings.sketch_capacity,
+                width=settings.sketch_cms_width,
+                depth=settings.sketch_cms_depth,
+                flush_seconds=settings.sketch_flush_seconds
+            )
+        return _stores[db_path]
+
+def initialize_sketches(cursor: sqlite3.Cursor):
+    """
+    Crea la tabella degli sketch per finestra.
+    
+    Args:
+        cursor: Cursore della transazione di inizializzazione
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_sketches (
+        dimension TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        summary TEXT NOT NULL,
+        cms BLOB NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (dimension, bucket)
+    )
+    ''')
@@ -0,0 +1,198 @@
+"""
+Snapshot delle viste della dashboard aggiornati in background.
+
+La pagina principale e la vista iniziale della ricerca eseguono sempre le stesse
+query (statistiche, ultimi log, conteggi) a ogni aggiornamento del browser. Lo
+SnapshotCache mantiene l'ultimo risultato di ciascuna vista e un thread lo
+ricalcola ogni snapshot_refresh_seconds finché la vista viene richiesta: le
+richieste leggono lo snapshot senza toccare il database.
+
+Se lo snapshot manca o è più vecchio di snapshot_max_age_seconds (thread
+fermo o aggiornamento lento) la richiesta lo ricalcola, e le richieste
+concorrenti sulla stessa vista attendono un unico calcolo (single-flight).
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger("PramaIA-LogService.Snapshots")
+
+
+class _Flight:
+    """
+    Calcolo in corso di uno snapshot, condiviso dalle richieste concorrenti.
+    """
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class _Snapshot:
+    """
+    Ultimo valore calcolato di una vista e funzione per ricalcolarlo.
+    """
+    
+    def __init__(self, loader: Callable[[], Any], value: Any, loaded_at: float):
+        self.loader = loader
+        self.value = value
+        self.loaded_at = loaded_at
+        self.accessed_at = loaded_at
+
+
+class SnapshotCache:
+    """
+    Cache di snapshot con aggiornamento in background e calcolo single-flight.
+    """
+    
+    def __init__(self, refresh_seconds: float = 5, max_age_seconds: float = 15, idle_seconds: float = 300):
+        """
+        Inizializza la cache.
+        
+        Args:
+            refresh_seconds: Intervallo di aggiornamento degli snapshot richiesti
+            max_age_seconds: Età massima di uno snapshot servito a una richiesta
+            idle_seconds: Inattività dopo cui uno snapshot viene scartato
+        """
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.idle_seconds = idle_seconds
+        self._snapshots: Dict[Hashable, _Snapshot] = {}
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+    
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Restituisce lo snapshot di una vista, calcolandolo se mancante o scaduto.
+        
+        Args:
+            key: Identificativo della vista (deve includere il database)
+            loader: Funzione senza argomenti che calcola la vista
+        
+        Returns:
+            Valore dello snapshot
+        """
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                snapshot.accessed_at = now
+                if now - snapshot.loaded_at <= self.max_age_seconds:
+                    return snapshot.value
+        
+        self._ensure_running()
+        return self._load(key, loader)
+    
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Calcola lo snapshot di una vista: se un calcolo è già in corso ne attende il risultato.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+        
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        
+        try:
+            flight.value = loader()
+            loaded_at = time.monotonic()
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+                if snapshot is None:
+                    self._snapshots[key] = _Snapshot(loader, flight.value, loaded_at)
+                else:
+                    snapshot.loader = loader
+                    snapshot.value = flight.value
+                    snapshot.loaded_at = loaded_at
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def refresh(self):
+        """
+        Ricalcola gli snapshot richiesti di recente e scarta quelli inattivi.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, snapshot in self._snapshots.items() if now - snapshot.accessed_at > self.idle_seconds]:
+                del self._snapshots[key]
+            pending = [(key, snapshot.loader) for key, snapshot in self._snapshots.items()]
+        
+        for key, loader in pending:
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                logger.error(f"Errore nell'aggiornamento dello snapshot {key}: {str(e)}")
+    
+    def _ensure_running(self):
+        """
+        Avvia il thread di aggiornamento alla prima richiesta.
+        """
+        with self._lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+            self.thread.start()
+    
+    def _run(self):
+        """
+        Ciclo del thread di aggiornamento.
+        """
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+    
+    def stop(self):
+        """
+        Ferma il thread di aggiornamento (gli snapshot restano disponibili).
+        """
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=1)
+    
+    def clear(self):
+        """
+        Scarta tutti gli snapshot.
+        """
+        with self._lock:
+            self._snapshots.clear()
+
+
+# Singleton della cache degli snapshot
+_snapshot_cache = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """
+    Ottiene l'istanza singleton della cache degli snapshot della dashboard.
+    
+    Returns:
+        SnapshotCache
+    """
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        from core.config import get_settings
+        settings = get_settings()
+        _snapshot_cache = SnapshotCache(
+            refresh_seconds=settings.snapshot_refresh_seconds,
+            max_age_seconds=settings.snapshot_max_age_seconds,
+            idle_seconds=settings.snapshot_idle_seconds
+        )
+    
+    return _snapshot_cache
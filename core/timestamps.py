@@ -0,0 +1,80 @@
+"""
+Conversione dei timestamp dei log tra datetime, interi e testo ISO.
+
+La tabella log_records memorizza il timestamp come intero: microsecondi UTC
+dall'epoch Unix (timestamp_us). Filtri per intervallo, ordinamenti e
+MIN/MAX confrontano interi, indipendentemente dal fuso orario e dalla
+precisione con cui il log è stato inviato.
+
+Il testo ISO resta il formato delle API: è l'ora locale senza fuso (come
+datetime.now().isoformat()) ed è prodotto solo ai bordi, dalle viste logs e
+log_rows (sql_iso_timestamp) o dal writer per le righe appena scritte
+(format_timestamp). Le due conversioni producono lo stesso testo. I
+datetime senza fuso ricevuti dalle API sono interpretati come ora locale.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# Origine dei timestamp interi
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_MICROSECOND = timedelta(microseconds=1)
+
+def to_micros(moment: datetime) -> int:
+    """
+    Converte un datetime in microsecondi UTC dall'epoch.
+    
+    Args:
+        moment: Istante da convertire (senza fuso: ora locale)
+    
+    Returns:
+        Microsecondi dall'epoch
+    """
+    return (moment.astimezone(timezone.utc) - EPOCH) // _MICROSECOND
+
+def from_micros(micros: int) -> datetime:
+    """
+    Converte microsecondi UTC dall'epoch in un datetime locale senza fuso.
+    """
+    return datetime.fromtimestamp(micros // 1000000).replace(microsecond=micros % 1000000)
+
+def format_timestamp(micros: int) -> str:
+    """
+    Testo ISO di un timestamp intero, identico a quello delle viste logs e log_rows.
+    """
+    return from_micros(micros).isoformat()
+
+def normalize_timestamp(moment: datetime) -> str:
+    """
+    Testo ISO locale di un datetime, con o senza fuso.
+    """
+    return format_timestamp(to_micros(moment))
+
+def sql_iso_timestamp(column: str) -> str:
+    """
+    Espressione SQL che converte una colonna di microsecondi nel testo ISO locale.
+    
+    Come datetime.isoformat(), le frazioni di secondo sono omesse se nulle.
+    
+    Args:
+        column: Espressione SQL con i microsecondi (es. r.timestamp_us)
+    """
+    return (
+        f"(strftime('%Y-%m-%dT%H:%M:%S', {column} / 1000000, 'unixepoch', 'localtime')"
+        f" || CASE WHEN {column} % 1000000 THEN printf('.%06d', {column} % 1000000) ELSE '' END)"
+    )
+
+def sql_micros(column: str) -> str:
+    """
+    Espressione SQL che converte un testo ISO (senza fuso: ora locale) in microsecondi UTC.
+    
+    Usata dalla migrazione dei timestamp testuali; le frazioni di secondo
+    sono lette come microsecondi a sei cifre (il formato di isoformat).
+    
+    Args:
+        column: Espressione SQL con il testo ISO (es. l.timestamp)
+    """
+    return (
+        f"(CAST(strftime('%s', {column}, 'utc') AS INTEGER) * 1000000"
+        f" + CASE WHEN substr({column}, 20, 1) = '.' THEN CAST(substr({column}, 21, 6) AS INTEGER) ELSE 0 END)"
+    )
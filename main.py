@@ -13,6 +13,7 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
 from api.log_router import router as log_router
 from api.document_lifecycle_router import router as lifecycle_router
+from api.client_router import router as client_router
 from core.config import get_settings, configure_service_logging
 from core.maintenance import get_maintenance_scheduler
 from core.middleware import setup_middleware
@@ -41,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Approximate", "ETag"],
 )
 
 # Configura il middleware di logging
@@ -61,6 +63,7 @@ register_lifecycle_event(
 # Inclusione dei router
 app.include_router(log_router, prefix="/api/logs", tags=["logs"])
 app.include_router(lifecycle_router, prefix="/api/lifecycle", tags=["lifecycle"])
+app.include_router(client_router, prefix="/api/clients", tags=["clients"])
 app.include_router(settings_router, prefix="/api/settings", tags=["settings"])
 app.include_router(search_router, prefix="/dashboard", tags=["search"])
 app.include_router(web_lifecycle_router, prefix="/dashboard", tags=["lifecycle"])
@@ -0,0 +1,19 @@
+"""
+Registra nella tabella document_events gli eventi del ciclo di vita dei log
+scritti prima della sua creazione.
+
+Il backfill viene eseguito anche dalla manutenzione programmata; questo script
+permette di completarlo subito. Può essere interrotto e rilanciato: riprende
+dall'ultimo blocco di log completato.
+
+Uso: python scripts/backfill_document_events.py [percorso_database]
+"""
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.log_manager import LogManager
+
+db_path = sys.argv[1] if len(sys.argv) > 1 else None
+log_manager = LogManager(db_path=db_path)
+print('DB path:', log_manager.db_path)
+print('eventi registrati:', log_manager.backfill_document_events())
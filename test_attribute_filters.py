@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test per verificare i filtri chiave/valore su context e details (indicizzati e tramite json_extract)
+"""
+
+import sys
+import os
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries():
+    """Log di esempio con attributi in context e details"""
+    return [
+        LogEntry(
+            project=LogProject.SERVER,
+            level=LogLevel.INFO,
+            module="api",
+            message=f"Richiesta {i}",
+            details={"document_id": f"doc-{i % 3}", "attempt": i % 2, "meta": {"tenant": "acme" if i < 4 else "other"}},
+            context={"request_id": f"req-{i}", "user_id": "admin" if i % 2 == 0 else "guest"}
+        )
+        for i in range(6)
+    ]
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager temporaneo con i log di esempio"""
+    log_manager.add_logs_batch(_entries())
+    return log_manager
+
+
+def test_indexed_attribute_filter(log_manager):
+    """Le chiavi indicizzate vengono risolte tramite la tabella log_attributes"""
+    print("=== TEST FILTRO CHIAVE INDICIZZATA ===")
+    assert ("context", "user_id") in log_manager.indexed_attributes
+
+    logs = log_manager.get_logs(context_filter={"user_id": "admin"})
+    print(f"context.user_id=admin: {len(logs)} log")
+    assert len(logs) == 3
+    assert all(log["context"]["user_id"] == "admin" for log in logs)
+
+    logs = log_manager.get_logs(context_filter={"user_id": "admin"}, details_filter={"document_id": "doc-0"})
+    assert [log["context"]["request_id"] for log in logs] == ["req-0"]
+
+    count = log_manager.count_logs(details_filter={"document_id": "doc-1"})
+    assert count == {"total": 2, "approximate": False}
+
+
+def test_json_extract_fallback_filter(log_manager):
+    """Le chiavi non indicizzate (anche annidate) usano json_extract"""
+    print("=== TEST FILTRO CON JSON_EXTRACT ===")
+    logs = log_manager.get_logs(details_filter={"meta.tenant": "acme"})
+    print(f"details.meta.tenant=acme: {len(logs)} log")
+    assert len(logs) == 4
+
+    # I valori numerici vengono confrontati come testo
+    logs = log_manager.get_logs(details_filter={"attempt": "1"})
+    assert len(logs) == 3
+
+
+def test_invalid_attribute_key(log_manager):
+    """Le chiavi con caratteri non ammessi vengono rifiutate"""
+    with pytest.raises(ValueError):
+        log_manager.get_logs(context_filter={"user_id') OR 1=1 --": "x"})
+
+
+def test_backfill_new_indexed_key(monkeypatch, make_log_manager):
+    """Aggiungendo una chiave indicizzata i log esistenti vengono indicizzati"""
+    monkeypatch.setenv("PRAMAIALOG_INDEXED_ATTRIBUTE_KEYS", "[]")
+    previous = make_log_manager()
+    previous.add_logs_batch(_entries())
+
+    print("=== TEST BACKFILL CHIAVE INDICIZZATA ===")
+    monkeypatch.setenv("PRAMAIALOG_INDEXED_ATTRIBUTE_KEYS", '["details.meta.tenant"]')
+    log_manager = make_log_manager(previous.db_path)
+    assert log_manager.indexed_attributes == {("details", "meta.tenant")}
+
+    conn = log_manager._get_connection()
+    indexed = conn.execute("SELECT COUNT(*) FROM log_attributes WHERE key = 'meta.tenant'").fetchone()[0]
+    conn.close()
+    print(f"Attributi indicizzati dai log esistenti: {indexed}")
+    assert indexed == 6
+
+    logs = log_manager.get_logs(details_filter={"meta.tenant": "other"})
+    assert len(logs) == 2
+
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test per verificare il registro dei client aggiornato a ogni scrittura
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries(start):
+    """Log di due moduli con context e details"""
+    return [
+        LogEntry(
+            timestamp=start + timedelta(minutes=i),
+            project=LogProject.SERVER,
+            level=LogLevel.INFO,
+            module="upload" if i % 3 else "worker",
+            message=f"Documento ricevuto {i}",
+            details={"document_id": f"doc-{i}"},
+            context={"request_id": f"req-{i}"}
+        )
+        for i in range(12)
+    ]
+
+
+def _size(entry):
+    """Dimensione memorizzata di un log (messaggio, details e context)"""
+    return sum(len(text.encode("utf-8")) for text in (entry.message, json.dumps(entry.details), json.dumps(entry.context)))
+
+
+def test_registry_updated_on_ingest(log_manager):
+    """Ogni batch aggiorna prima/ultima occorrenza, numero di log e dimensione per client"""
+    start = datetime(2026, 4, 1, 9, 0, 0)
+    entries = _entries(start)
+    log_manager.add_logs_batch(entries[:6], api_key_id="server_key")
+    log_manager.add_logs_batch(entries[6:], api_key_id="server_key")
+    log_manager.add_log(LogEntry(
+        timestamp=start - timedelta(hours=1),
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="upload",
+        message="Log interno"
+    ))
+
+    print("=== TEST REGISTRO CLIENT ===")
+    clients = log_manager.get_clients(sort_by="total_logs")
+    for client in clients["clients"]:
+        print(client)
+    assert clients["total"] == 3
+
+    upload = log_manager.get_clients(module="upload", api_key_id="server_key")["clients"][0]
+    upload_entries = [entry for entry in entries if entry.module == "upload"]
+    assert upload["total_logs"] == len(upload_entries) == 8
+    assert upload["first_seen"] == upload_entries[0].timestamp.isoformat()
+    assert upload["last_seen"] == upload_entries[-1].timestamp.isoformat()
+    assert upload["bytes"] == sum(_size(entry) for entry in upload_entries)
+
+    internal = log_manager.get_clients(api_key_id="")["clients"]
+    assert [(client["module"], client["total_logs"]) for client in internal] == [("upload", 1)]
+
+    active = log_manager.get_clients(active_since=start + timedelta(minutes=10))
+    assert [client["module"] for client in active["clients"]] == ["upload"]
+
+    try:
+        log_manager.get_clients(sort_by="message")
+        assert False, "Un ordinamento non valido deve sollevare ValueError"
+    except ValueError:
+        pass
+
+
+def test_registry_backfilled_from_existing_logs(log_manager, make_log_manager):
+    """Alla creazione della tabella il registro viene popolato dai log esistenti"""
+    entries = _entries(datetime(2026, 4, 1, 9, 0, 0))
+    log_manager.add_logs_batch(entries)
+    conn = log_manager._get_connection()
+    conn.execute("DROP TABLE clients")
+    conn.commit()
+    conn.close()
+
+    print("=== TEST BACKFILL REGISTRO CLIENT ===")
+    restarted = make_log_manager(log_manager.db_path)
+    clients = {client["module"]: client for client in restarted.get_clients()["clients"]}
+    assert clients["worker"]["total_logs"] == 4
+    assert clients["worker"]["api_key_id"] == ""
+    assert clients["upload"]["bytes"] == sum(_size(entry) for entry in entries if entry.module == "upload")
+
+
+def test_clients_endpoint_and_page(client, headers):
+    """I log inviati tramite API sono attribuiti alla chiave; pagina ed endpoint leggono il registro"""
+    entry = {"project": "PramaIA-PDK", "level": "info", "module": "pipeline", "message": "Elaborazione"}
+    assert client.post("/api/logs/batch", json=[entry] * 2, headers=headers).status_code == 201
+
+    print("=== TEST ENDPOINT CLIENT ===")
+    response = client.get("/api/clients/", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["clients"][0]["api_key_id"] == "admin_key"
+    assert data["clients"][0]["total_logs"] == 2
+
+    assert client.get("/api/clients/?sort_by=message", headers=headers).status_code == 400
+
+    page = client.get("/dashboard/logservice")
+    assert page.status_code == 200
+    assert "pipeline" in page.text
+
+
+def test_active_since_with_timezone(log_manager, client, headers, aware_iso):
+    """active_since con fuso (Z o offset) viene confrontato con l'ora locale del registro"""
+    start = datetime(2026, 4, 1, 9, 0, 0)
+    log_manager.add_logs_batch(_entries(start))
+
+    print("=== TEST CLIENT ATTIVI CON FUSO ===")
+    response = client.get("/api/clients/", params={"active_since": aware_iso(start + timedelta(minutes=10))}, headers=headers)
+    assert response.status_code == 200
+    assert [client["module"] for client in response.json()["clients"]] == ["upload"]
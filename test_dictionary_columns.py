@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test per verificare i dizionari di progetto, livello e modulo: codici memorizzati, API invariate e migrazione
+"""
+
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.dictionaries import LogDictionary
+
+BASE = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager senza hot tier, per leggere da SQLite"""
+    return make_log_manager(hot_tier_bytes=0)
+
+
+def _entries(count):
+    """Log con progetti, livelli e moduli alternati"""
+    return [
+        LogEntry(
+            timestamp=BASE + timedelta(seconds=i),
+            project=LogProject.SERVER if i % 2 else LogProject.PDK,
+            level=LogLevel.ERROR if i % 3 == 0 else LogLevel.INFO,
+            module="upload" if i % 4 else "indexer",
+            message=f"Log {i}",
+            details={"document_id": f"DOC-{i % 5}"}
+        )
+        for i in range(count)
+    ]
+
+
+def test_codes_stored_and_api_unchanged(log_manager):
+    """log_records contiene codici interi, le letture restituiscono i nomi"""
+    log_manager.add_logs_batch(_entries(30))
+
+    conn = log_manager._get_connection()
+    record = conn.execute("SELECT project_id, level_id, module_id FROM log_records LIMIT 1").fetchone()
+    projects = dict(conn.execute("SELECT name, id FROM log_projects").fetchall())
+    conn.close()
+
+    print("=== TEST CODICI E API ===")
+    print(f"Progetti registrati: {projects}")
+    assert all(isinstance(value, int) for value in record)
+    assert set(projects) == {"PramaIAServer", "PramaIA-PDK"}
+
+    logs = log_manager.get_logs(project=LogProject.SERVER, level="error", limit=100)
+    assert [log["message"] for log in logs] == [f"Log {i}" for i in range(29, -1, -1) if i % 2 and i % 3 == 0]
+    assert set(logs[0]) == {"id", "timestamp", "project", "level", "module", "message", "details", "context", "fingerprint_id"}
+    assert logs[0]["project"] == "PramaIAServer" and logs[0]["module"] in ("upload", "indexer")
+
+    assert log_manager.count_logs(module="indexer")["total"] == 8
+    assert log_manager.get_logs_count(project=LogProject.PDK) == 15
+    # Un valore mai registrato non trova log
+    assert log_manager.count_logs(module="sconosciuto")["total"] == 0
+    assert log_manager.get_logs(module="sconosciuto") == []
+
+    # Faccette calcolate sui codici (filtro testuale) e convertite nei nomi
+    facets = log_manager.get_facets(document_id="DOC-1", start_date=BASE, end_date=BASE + timedelta(minutes=1))
+    assert facets["total"] == 6
+    assert facets["facets"]["project"] == {"PramaIAServer": 3, "PramaIA-PDK": 3}
+    assert sum(facets["facets"]["module"].values()) == 6
+
+    stats = log_manager.get_stats()
+    assert stats.total_logs == 30
+    assert stats.logs_by_module == {"upload": 22, "indexer": 8}
+
+
+def test_view_read_only(log_manager):
+    """La vista logs rifiuta inserimenti e modifiche; le cancellazioni aggiornano le tabelle derivate"""
+    log_manager.add_logs_batch(_entries(4))
+
+    conn = log_manager._get_connection()
+    print("=== TEST VISTA IN SOLA LETTURA ===")
+    for statement in (
+        "INSERT INTO logs (id, timestamp, project, level, module, message) "
+        f"VALUES ('esterno', '{BASE.isoformat()}', 'PramaIAServer', 'warning', 'script', 'Scritto a mano')",
+        "UPDATE logs SET module = 'manutenzione'"
+    ):
+        try:
+            conn.execute(statement)
+            assert False, f"La vista non deve accettare: {statement}"
+        except sqlite3.OperationalError as e:
+            print(f"Rifiutato: {e}")
+
+    conn.execute("DELETE FROM logs WHERE module = 'indexer'")
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM log_records").fetchone()[0] == 3
+    conn.close()
+    stats = log_manager.get_stats()
+    assert stats.total_logs == 3
+    assert stats.logs_by_module == {"upload": 3}
+
+
+def test_unknown_values_lookup(log_manager):
+    """I valori mai registrati non ricaricano il dizionario; quelli di altri processi vengono letti"""
+    log_manager.add_logs_batch(_entries(4))
+    dictionary = log_manager.dictionary
+
+    loads = []
+    original_load = dictionary.load
+    dictionary.load = lambda cursor: loads.append(cursor) or original_load(cursor)
+    try:
+        print("=== TEST VALORI SCONOSCIUTI ===")
+        for i in range(20):
+            assert dictionary.code("module", f"inesistente-{i}") is None
+        assert log_manager.count_logs(module="inesistente")["total"] == 0
+        assert loads == []
+
+        # Un altro processo registra un modulo con il proprio dizionario
+        other = LogDictionary(log_manager.db_path)
+        conn = log_manager._get_connection()
+        other.ensure(conn, [{"project": "PramaIAServer", "level": "info", "module": "nuovo"}])
+        conn.close()
+        code = dictionary.code("module", "nuovo")
+        print(f"Codice letto dal database: {code}")
+        assert code == other.code("module", "nuovo")
+        assert dictionary.name("module", code) == "nuovo"
+        assert loads == []
+    finally:
+        dictionary.load = original_load
+
+
+def test_legacy_table_migration(make_log_manager, tmp_path):
+    """Un database con la vecchia tabella logs viene convertito mantenendo i log"""
+    db_path = str(tmp_path / "test_logs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+    CREATE TABLE logs (
+        id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        project TEXT NOT NULL,
+        level TEXT NOT NULL,
+        module TEXT NOT NULL,
+        message TEXT NOT NULL,
+        details TEXT,
+        context TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX idx_project ON logs (project)')
+    conn.executemany(
+        "INSERT INTO logs (id, timestamp, project, level, module, message, details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (f"old-{i}", (BASE + timedelta(minutes=i)).isoformat(), "PramaIAServer", "info" if i % 2 else "error",
+             f"modulo-{i % 3}", f"Log vecchio {i}", '{"document_id": "DOC-1"}')
+            for i in range(12)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+    log_manager = make_log_manager(db_path, hot_tier_bytes=0)
+    conn = log_manager._get_connection()
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'logs'").fetchone()[0]
+    conn.close()
+
+    print("=== TEST MIGRAZIONE ===")
+    print(f"logs è ora: {kind}")
+    assert kind == "view"
+    logs = log_manager.get_logs(limit=100, sort_order="asc")
+    assert [log["id"] for log in logs] == [f"old-{i}" for i in range(12)]
+    assert logs[1]["module"] == "modulo-1" and logs[1]["level"] == "info"
+
+    # Fingerprint e aggregazioni ricostruiti sui log migrati
+    log_manager.backfill_fingerprints()
+    assert all(log["fingerprint_id"] for log in log_manager.get_logs(limit=100))
+    assert log_manager.get_stats().total_logs == 12
+
+    # Le cancellazioni aggiornano le tabelle di aggregazione tramite i trigger su log_records
+    deleted = log_manager.reset_logs(BASE + timedelta(minutes=6), project=LogProject.SERVER)
+    assert deleted == 6
+    stats = log_manager.get_stats()
+    assert stats.total_logs == 6
+    assert stats.logs_by_module == {"modulo-0": 2, "modulo-1": 2, "modulo-2": 2}
+
+    # Le nuove scritture riusano i codici dei valori migrati
+    log_manager.add_log(LogEntry(
+        timestamp=BASE + timedelta(hours=1),
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="modulo-1",
+        message="Log nuovo"
+    ))
+    conn = log_manager._get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM log_modules").fetchone()[0] == 3
+    conn.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test per verificare i conteggi dei valori distinti con gli sketch HyperLogLog
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core import hyperloglog
+from core.hyperloglog import distinct_buckets
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries(start, count, days=3):
+    """Log distribuiti su più giorni con molti documenti e pochi client"""
+    projects = [LogProject.SERVER, LogProject.PDK, LogProject.AGENTS]
+    step = timedelta(days=days) / count
+    return [
+        LogEntry(
+            timestamp=start + step * i,
+            project=projects[i % 3],
+            level=LogLevel.INFO,
+            module=f"modulo-{i % 4}",
+            message=f"Documento elaborato {i}",
+            details={"document_id": f"doc-{i}"}
+        )
+        for i in range(count)
+    ]
+
+
+def test_distinct_buckets():
+    """Le ore di giorni interamente compresi vengono sostituite dal bucket del giorno"""
+    print("=== TEST SCOMPOSIZIONE INTERVALLO ===")
+    buckets = distinct_buckets(datetime(2026, 2, 1, 22, 30), datetime(2026, 2, 4, 1, 10))
+    print(buckets)
+    assert buckets == ["2026-02-01T22", "2026-02-01T23", "2026-02-02", "2026-02-03", "2026-02-04T00", "2026-02-04T01"]
+    assert distinct_buckets(datetime(2026, 2, 1, 0, 0), datetime(2026, 2, 1, 22, 59)) == [
+        f"2026-02-01T{hour:02d}" for hour in range(23)
+    ]
+
+
+def test_distinct_counts(log_manager):
+    """Le stime sono esatte per pochi valori e vicine al valore reale per molti"""
+    start = datetime(2026, 2, 1, 0, 0)
+    entries = _entries(start, 6000)
+    log_manager.add_logs_batch(entries[:3000])
+    log_manager.distinct.flush()
+    log_manager.add_logs_batch(entries[3000:])
+
+    print("=== TEST VALORI DISTINTI ===")
+    clients = log_manager.count_distinct("client")
+    documents = log_manager.count_distinct("document")
+    print(f"Client: {clients['count']}, documenti: {documents['count']}")
+    # 3 progetti x 4 moduli, con i = modulo (mod 4) e progetto (mod 3): 12 combinazioni
+    assert clients["count"] == 12
+    assert log_manager.count_distinct("module")["count"] == 4
+    assert abs(documents["count"] - 6000) <= 6000 * 0.05
+
+    # Primo giorno: un terzo dei documenti
+    first_day = log_manager.count_distinct("document", start_date=start, end_date=start + timedelta(hours=23, minutes=59))
+    print(f"Documenti del primo giorno: {first_day['count']}")
+    assert abs(first_day["count"] - 2000) <= 2000 * 0.05
+
+    try:
+        log_manager.count_distinct("level")
+        assert False, "Una dimensione non valida deve sollevare ValueError"
+    except ValueError:
+        pass
+
+
+def test_backfill_and_endpoint(log_manager, make_log_manager, use_log_manager, headers):
+    """Gli sketch vengono popolati dai log esistenti quando la tabella viene creata"""
+    log_manager.add_logs_batch(_entries(datetime(2026, 2, 1, 0, 0), 300))
+    conn = log_manager._get_connection()
+    conn.execute("DROP TABLE log_distinct")
+    conn.commit()
+    conn.close()
+    hyperloglog._stores.pop(log_manager.db_path)
+
+    print("=== TEST BACKFILL VALORI DISTINTI ===")
+    restarted = make_log_manager(log_manager.db_path)
+    assert restarted.count_distinct("client")["count"] == 12
+    assert abs(restarted.count_distinct("document")["count"] - 300) <= 15
+
+    client = use_log_manager(restarted)
+    response = client.get(
+        "/api/logs/distinct/module?start_date=2026-02-01T00:00:00&end_date=2026-02-01T05:00:00",
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 4
+    assert client.get("/api/logs/distinct/level", headers=headers).status_code == 400
+
+
+def test_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso (Z o offset) vengono riportati ai bucket in ora locale"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_entries(now - timedelta(minutes=30), 8, days=0))
+
+    print("=== TEST VALORI DISTINTI CON FUSO ===")
+    response = client.get("/api/logs/distinct/module", params={"start_date": aware_iso(now - timedelta(hours=2))}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["count"] == 4
+
+    response = client.get("/api/logs/distinct/document", params={
+        "start_date": aware_iso(now - timedelta(hours=1)),
+        "end_date": aware_iso(now)
+    }, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    print(data)
+    assert data["start"] == (now - timedelta(hours=1)).isoformat()
+    assert data["count"] == 8
+
+    # Un intervallo precedente ai log, espresso con fuso, non li conta
+    response = client.get("/api/logs/distinct/document", params={
+        "start_date": aware_iso(now - timedelta(hours=5)),
+        "end_date": aware_iso(now - timedelta(hours=3))
+    }, headers=headers)
+    assert response.json()["count"] == 0
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la tabella document_events e gli endpoint del ciclo di vita che la interrogano
+"""
+
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries():
+    """Eventi di un documento rinominato più log che non devono essere registrati"""
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    return [
+        LogEntry(
+            timestamp=start,
+            project=LogProject.SERVER,
+            level=LogLevel.LIFECYCLE,
+            module="upload",
+            message="Documento caricato",
+            details={"document_id": "doc-1", "file_hash": "abc", "file_name": "report.pdf", "lifecycle_event": "CREATED"}
+        ),
+        LogEntry(
+            timestamp=start + timedelta(minutes=5),
+            project=LogProject.PDK,
+            level=LogLevel.INFO,
+            module="monitor",
+            message="Documento rinominato",
+            details={"log_type": "lifecycle", "file_hash": "abc", "file_name": "report_v2.pdf", "lifecycle_event": "RENAMED"}
+        ),
+        LogEntry(
+            timestamp=start + timedelta(minutes=10),
+            project=LogProject.SERVER,
+            level=LogLevel.ERROR,
+            module="upload",
+            message="Errore generico",
+            details={"document_id": "doc-1"}
+        ),
+        LogEntry(
+            timestamp=start + timedelta(minutes=15),
+            project=LogProject.SERVER,
+            level=LogLevel.LIFECYCLE,
+            module="system_events",
+            message="LogService avviato",
+            details={"log_type": "lifecycle"}
+        ),
+    ]
+
+
+def test_lifecycle_events_materialised_at_ingest(log_manager):
+    """Solo gli eventi del ciclo di vita con un identificativo vengono registrati"""
+    log_manager.add_logs_batch(_entries())
+
+    print("=== TEST REGISTRAZIONE EVENTI ===")
+    conn = log_manager._get_connection()
+    rows = conn.execute(
+        "SELECT document_id, file_hash, file_name, lifecycle_event FROM document_events ORDER BY timestamp"
+    ).fetchall()
+    conn.close()
+    print(f"Eventi registrati: {[tuple(row) for row in rows]}")
+    assert [tuple(row) for row in rows] == [
+        ("doc-1", "abc", "report.pdf", "CREATED"),
+        (None, "abc", "report_v2.pdf", "RENAMED"),
+    ]
+
+
+def test_backfill_existing_logs(log_manager, make_log_manager):
+    """I log scritti prima della creazione della tabella vengono registrati dal backfill"""
+    log_manager.add_logs_batch(_entries())
+
+    # Simula un database creato prima dell'introduzione di document_events
+    conn = sqlite3.connect(log_manager.db_path)
+    conn.execute("DROP TABLE document_events")
+    conn.execute("DROP TABLE document_events_backfill")
+    conn.commit()
+    conn.close()
+
+    print("=== TEST BACKFILL ===")
+    log_manager = make_log_manager(log_manager.db_path)
+    assert log_manager.backfill_document_events() == 2
+    # Il backfill completato non viene ripetuto
+    assert log_manager.backfill_document_events() == 0
+
+
+def test_lifecycle_endpoints_read_document_events(log_manager, client, headers):
+    """Gli endpoint del ciclo di vita trovano gli eventi tramite document_events"""
+    log_manager.add_logs_batch(_entries())
+
+    print("=== TEST ENDPOINT CICLO DI VITA ===")
+    logs = client.get("/api/lifecycle/document/doc-1", headers=headers).json()
+    # L'evento di rinomina non riporta il document_id
+    assert [log["message"] for log in logs] == ["Documento caricato"]
+
+    logs = client.get("/api/lifecycle/hash/abc", headers=headers).json()
+    assert [log["details"]["lifecycle_event"] for log in logs] == ["CREATED", "RENAMED"]
+
+    logs = client.get("/api/lifecycle/file/report_v2.pdf?summary=true", headers=headers).json()
+    assert len(logs) == 1 and "details" not in logs[0]
+
+    logs = client.get("/api/lifecycle/hash/abc?start_date=2025-01-01T09:01:00", headers=headers).json()
+    assert len(logs) == 1
+
+
+def test_lifecycle_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso vengono confrontati con l'ora locale degli eventi"""
+    log_manager.add_logs_batch(_entries())
+
+    print("=== TEST CICLO DI VITA CON FUSO ===")
+    dates = {
+        "start_date": aware_iso(datetime(2025, 1, 1, 9, 1)),
+        "end_date": aware_iso(datetime(2025, 1, 1, 9, 10))
+    }
+    logs = client.get("/api/lifecycle/hash/abc", params=dates, headers=headers).json()
+    assert [log["details"]["lifecycle_event"] for log in logs] == ["RENAMED"]
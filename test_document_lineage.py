@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la genealogia dei documenti (rinomine collegate tramite file_hash)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.document_lineage import backfill_document_lineage, find_lineages, lineage_identifiers
+
+
+def _event(minutes, event, **identifiers):
+    """Crea un evento del ciclo di vita"""
+    return LogEntry(
+        timestamp=datetime(2025, 3, 1, 8, 0, 0) + timedelta(minutes=minutes),
+        project=LogProject.PDK,
+        level=LogLevel.LIFECYCLE,
+        module="monitor",
+        message=f"Evento {event}",
+        details=dict(identifiers, lifecycle_event=event)
+    )
+
+
+def _entries():
+    """Due storie separate che un evento successivo collega, più un documento estraneo"""
+    return [
+        _event(0, "CREATED", document_id="doc-1", file_name="bozza.pdf"),
+        _event(1, "HASHED", file_hash="h-1", file_name="relazione.pdf"),
+        _event(2, "LINKED", document_id="doc-1", file_hash="h-1"),
+        _event(3, "RENAMED", file_hash="h-1", file_name="relazione_finale.pdf"),
+        _event(4, "CREATED", document_id="doc-9", file_name="altro.pdf"),
+    ]
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager con gli eventi di esempio"""
+    log_manager.add_logs_batch(_entries())
+    return log_manager
+
+
+def _lineage_of(log_manager, identifier):
+    """Restituisce gli identificativi collegati a un identificativo"""
+    conn = log_manager._get_connection()
+    cursor = conn.cursor()
+    identifiers = lineage_identifiers(cursor, find_lineages(cursor, identifier))
+    conn.close()
+    return identifiers
+
+
+def test_lineage_merges_connected_identifiers(log_manager):
+    """Un evento che collega due storie le unisce in un'unica genealogia"""
+    print("=== TEST UNIONE GENEALOGIE ===")
+    identifiers = _lineage_of(log_manager, "bozza.pdf")
+    print(f"Identificativi collegati: {identifiers}")
+    assert identifiers == {
+        "document_id": ["doc-1"],
+        "file_hash": ["h-1"],
+        "file_name": ["bozza.pdf", "relazione.pdf", "relazione_finale.pdf"],
+    }
+    assert _lineage_of(log_manager, "doc-9")["file_name"] == ["altro.pdf"]
+
+    conn = log_manager._get_connection()
+    lineages = conn.execute("SELECT COUNT(DISTINCT lineage_id) FROM document_events").fetchone()[0]
+    conn.close()
+    assert lineages == 2
+
+
+def test_lineage_backfill(log_manager):
+    """Gli eventi senza genealogia vengono collegati dal backfill"""
+    conn = log_manager._get_connection()
+    conn.execute("DELETE FROM document_lineage_nodes")
+    conn.execute("UPDATE document_events SET lineage_id = NULL")
+    conn.commit()
+
+    print("=== TEST BACKFILL GENEALOGIA ===")
+    assert backfill_document_lineage(conn, batch_size=2) == 5
+    conn.close()
+    assert _lineage_of(log_manager, "relazione_finale.pdf")["document_id"] == ["doc-1"]
+
+
+def test_lineage_endpoint(client, headers):
+    """L'endpoint restituisce l'intera storia a partire da un identificativo qualsiasi"""
+    print("=== TEST ENDPOINT GENEALOGIA ===")
+    response = client.get("/api/lifecycle/lineage/relazione_finale.pdf", headers=headers)
+    assert response.status_code == 200
+    lineage = response.json()
+    assert lineage["identifiers"]["document_id"] == ["doc-1"]
+    assert [event["details"]["lifecycle_event"] for event in lineage["events"]] == [
+        "CREATED", "HASHED", "LINKED", "RENAMED"
+    ]
+
+    response = client.get("/api/lifecycle/lineage/sconosciuto", headers=headers)
+    assert response.status_code == 404
+
+
+def test_lineage_timezone_aware_range(client, headers, aware_iso):
+    """Gli estremi con fuso vengono confrontati con l'ora locale degli eventi"""
+    print("=== TEST GENEALOGIA CON FUSO ===")
+    response = client.get("/api/lifecycle/lineage/relazione_finale.pdf", params={
+        "start_date": aware_iso(datetime(2025, 3, 1, 8, 1)),
+        "end_date": aware_iso(datetime(2025, 3, 1, 8, 2))
+    }, headers=headers)
+    assert response.status_code == 200
+    assert [event["details"]["lifecycle_event"] for event in response.json()["events"]] == ["HASHED", "LINKED"]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la tabella document_state (stato corrente per documento) e i relativi endpoint
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.document_state import rebuild_document_state, state_to_dict, STATE_FIELDS
+
+
+def _event(timestamp, event, details=None, message=None, **identifiers):
+    """Crea un evento del ciclo di vita"""
+    return LogEntry(
+        timestamp=timestamp,
+        project=LogProject.SERVER,
+        level=LogLevel.LIFECYCLE,
+        module="documents",
+        message=message or f"Evento {event}",
+        details=dict(details or {}, lifecycle_event=event, **identifiers)
+    )
+
+
+def _documents(now):
+    """Documenti fermi da tempi diversi, in fasi intermedie e completate"""
+    return [
+        _event(now - timedelta(hours=2), "upload_started", document_id="doc-old"),
+        _event(now - timedelta(minutes=1), "upload_started", document_id="doc-new"),
+        _event(now - timedelta(hours=3), "delete_requested", document_id="doc-del"),
+        _event(now - timedelta(hours=3), "stored", document_id="doc-done"),
+    ]
+
+
+def _states(log_manager):
+    """Restituisce gli stati dei documenti indicizzati per document_id"""
+    conn = log_manager._get_connection()
+    rows = conn.execute(f"SELECT {', '.join(STATE_FIELDS)} FROM document_state").fetchall()
+    conn.close()
+    return {row["document_id"]: state_to_dict(row) for row in rows}
+
+
+def test_state_updated_per_event(log_manager):
+    """Lo stato riporta l'ultimo evento, i conteggi e l'ultimo errore anche con eventi in ritardo"""
+    start = datetime(2025, 5, 1, 10, 0, 0)
+    log_manager.add_log(_event(start, "upload_started", document_id="doc-1", file_name="a.pdf"))
+    log_manager.add_log(_event(start + timedelta(minutes=2), "processed", document_id="doc-1"))
+    # Evento in ritardo: non deve diventare l'ultimo evento
+    log_manager.add_log(_event(
+        start + timedelta(minutes=1), "upload_failed", details={"error": "timeout"}, document_id="doc-1"
+    ))
+
+    print("=== TEST STATO PER DOCUMENTO ===")
+    state = _states(log_manager)["doc-1"]
+    print(f"Stato: {state}")
+    assert state["last_event"] == "processed"
+    assert state["event_count"] == 3
+    assert state["event_counts"] == {"processed": 1, "upload_failed": 1, "upload_started": 1}
+    assert state["file_name"] == "a.pdf"
+    assert state["last_error"] == "timeout"
+    assert state["first_timestamp"] == start.isoformat()
+
+
+def test_state_merged_with_lineage_and_rebuilt(log_manager):
+    """Gli stati di due genealogie unite vengono combinati e la ricostruzione dà lo stesso risultato"""
+    start = datetime(2025, 5, 1, 10, 0, 0)
+    log_manager.add_logs_batch([
+        _event(start, "detected", document_id="doc-2", file_name="b.pdf"),
+        _event(start + timedelta(minutes=1), "hashed", file_hash="h-2"),
+        _event(start + timedelta(minutes=2), "stored", document_id="doc-2", file_hash="h-2"),
+    ])
+
+    print("=== TEST UNIONE E RICOSTRUZIONE STATI ===")
+    states = _states(log_manager)
+    assert list(states) == ["doc-2"]
+    assert states["doc-2"]["event_count"] == 3
+    assert states["doc-2"]["last_event"] == "stored"
+
+    conn = log_manager._get_connection()
+    rebuild_document_state(conn.cursor())
+    conn.commit()
+    conn.close()
+    assert _states(log_manager) == states
+
+
+def test_stuck_documents_endpoint(log_manager, client, headers):
+    """L'endpoint segnala solo i documenti fermi in una fase intermedia da troppo tempo"""
+    log_manager.add_logs_batch(_documents(datetime.now()))
+
+    print("=== TEST DOCUMENTI BLOCCATI ===")
+    result = client.get("/api/lifecycle/documents/stuck?minutes=30", headers=headers).json()
+    print(f"Documenti bloccati: {[doc['document_id'] for doc in result['documents']]}")
+    assert result["total"] == 2
+    assert [doc["document_id"] for doc in result["documents"]] == ["doc-del", "doc-old"]
+
+    result = client.get("/api/lifecycle/documents?limit=2&sort_order=asc", headers=headers).json()
+    assert result["total"] == 4 and len(result["documents"]) == 2
+
+    response = client.get("/api/lifecycle/documents?sort_by=message", headers=headers)
+    assert response.status_code == 400
+
+
+def test_documents_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso vengono confrontati con l'ora locale dello stato"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_documents(now))
+
+    print("=== TEST DOCUMENTI CON FUSO ===")
+    result = client.get("/api/lifecycle/documents", params={
+        "updated_after": aware_iso(now - timedelta(hours=2, minutes=30)),
+        "updated_before": aware_iso(now - timedelta(minutes=30))
+    }, headers=headers).json()
+    assert [doc["document_id"] for doc in result["documents"]] == ["doc-old"]
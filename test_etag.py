@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test per verificare gli ETag e le richieste condizionali (If-None-Match) degli endpoint di interrogazione
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entry(project, message, timestamp=None, level=LogLevel.INFO, details=None):
+    """Log minimo di un progetto"""
+    return LogEntry(
+        timestamp=timestamp or datetime.now(),
+        project=project,
+        level=level,
+        module="upload",
+        message=message,
+        details=details or {}
+    )
+
+
+def _conditional(client, headers, url, etag, params=None):
+    """GET condizionale con l'ETag ricevuto in precedenza"""
+    return client.get(url, params=params, headers=dict(headers, **{"If-None-Match": etag}))
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("Una richiesta con ETag corrente non deve eseguire query")
+
+
+def test_logs_and_stats_not_modified(log_manager, client, headers):
+    """GET /api/logs e /api/logs/stats rispondono 304 finché non arrivano log rilevanti"""
+    log_manager.add_log(_entry(LogProject.SERVER, "Primo"))
+    url = "/api/logs/?project=PramaIAServer"
+    response = client.get(url, headers=headers)
+    etag = response.headers["ETag"]
+    stats_url = "/api/logs/stats?project=PramaIAServer"
+    stats_etag = client.get(stats_url, headers=headers).headers["ETag"]
+
+    print("=== TEST 304 SU /api/logs E /stats ===")
+    log_manager.count_logs = log_manager.get_logs_json = log_manager.get_stats = _fail
+    response = _conditional(client, headers, url, etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert _conditional(client, headers, stats_url, stats_etag).status_code == 304
+    assert _conditional(client, headers, url, f'"altro", {etag}').status_code == 304
+    del log_manager.count_logs, log_manager.get_logs_json, log_manager.get_stats
+
+    # Un log di un altro progetto non cambia la versione, uno del progetto sì
+    log_manager.add_log(_entry(LogProject.PDK, "Altro progetto"))
+    assert _conditional(client, headers, url, etag).status_code == 304
+    log_manager.add_log(_entry(LogProject.SERVER, "Secondo"))
+    response = _conditional(client, headers, url, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert {log["message"] for log in response.json()} == {"Primo", "Secondo"}
+    assert _conditional(client, headers, stats_url, stats_etag).status_code == 200
+
+    # Un intervallo concluso non cambia con i log nuovi
+    past_url = "/api/logs/?start_date=2026-01-01T00:00:00&end_date=2026-01-02T00:00:00"
+    past_etag = client.get(past_url, headers=headers).headers["ETag"]
+    log_manager.add_log(_entry(LogProject.SERVER, "Terzo"))
+    assert _conditional(client, headers, past_url, past_etag).status_code == 304
+
+    log_manager.reset_logs(datetime.now() - timedelta(days=1))
+    assert _conditional(client, headers, past_url, past_etag).status_code == 200
+
+
+def test_lifecycle_not_modified(log_manager, client, headers):
+    """Gli endpoint del ciclo di vita cambiano ETag solo con nuovi eventi di documento"""
+    event = {"document_id": "doc-1", "file_name": "report.pdf", "lifecycle_event": "upload"}
+    log_manager.add_log(_entry(LogProject.SERVER, "Upload", level=LogLevel.LIFECYCLE, details=event))
+    urls = [
+        "/api/lifecycle/document/doc-1",
+        "/api/lifecycle/lineage/report.pdf",
+        "/api/lifecycle/documents",
+        "/api/lifecycle/documents/stuck?minutes=30"
+    ]
+    etags = {}
+    for url in urls:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        etags[url] = response.headers["ETag"]
+
+    print("=== TEST 304 SUL CICLO DI VITA ===")
+    log_manager.add_log(_entry(LogProject.SERVER, "Log applicativo"))
+    for url in urls:
+        assert _conditional(client, headers, url, etags[url]).status_code == 304, url
+
+    processed = dict(event, lifecycle_event="processed")
+    log_manager.add_log(_entry(LogProject.SERVER, "Elaborato", level=LogLevel.LIFECYCLE, details=processed))
+    for url in urls[:3]:
+        assert _conditional(client, headers, url, etags[url]).status_code == 200, url
+    assert len(client.get(urls[0], headers=headers).json()) == 2
+
+
+def test_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Un intervallo con fuso viene invalidato dai log scritti al suo interno"""
+    now = datetime.now()
+    dates = {
+        "start_date": aware_iso(now - timedelta(hours=1)),
+        "end_date": aware_iso(now + timedelta(hours=1))
+    }
+    event = {"document_id": "doc-1", "file_name": "report.pdf", "lifecycle_event": "upload"}
+    urls = ["/api/logs/", "/api/logs/stats", "/api/lifecycle/document/doc-1"]
+    etags = {}
+    for url in urls:
+        response = client.get(url, params=dates, headers=headers)
+        assert response.status_code == 200, url
+        etags[url] = response.headers["ETag"]
+    assert client.get(urls[0], params=dates, headers=headers).json() == []
+
+    print("=== TEST INTERVALLO CON FUSO ===")
+    log_manager.add_log(_entry(LogProject.SERVER, "Nel mezzo", level=LogLevel.LIFECYCLE, details=event))
+    for url in urls:
+        response = _conditional(client, headers, url, etags[url], params=dates)
+        print(f"{url}: {response.status_code}")
+        assert response.status_code == 200, url
+        assert response.headers["ETag"] != etags[url]
+    assert [log["message"] for log in client.get(urls[0], params=dates, headers=headers).json()] == ["Nel mezzo"]
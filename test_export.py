@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test per verificare l'esportazione in streaming: NDJSON, CSV, filtri, archivi e lettura a pagine
+"""
+
+import sys
+import os
+import io
+import csv
+import gzip
+import json
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api import log_router
+from core.models import LogEntry, LogLevel, LogProject
+from core.archive_reader import iter_json_array, iter_reversed
+
+BASE = datetime(2026, 5, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager senza hot tier, per leggere da SQLite"""
+    return make_log_manager(hot_tier_bytes=0)
+
+
+def _entries(count, start=0):
+    """Log con timestamp crescenti, progetti e livelli alternati"""
+    return [
+        LogEntry(
+            timestamp=BASE + timedelta(seconds=i),
+            project=LogProject.SERVER if i % 2 else LogProject.PDK,
+            level=LogLevel.ERROR if i % 3 == 0 else LogLevel.INFO,
+            module="upload",
+            message=f"Log {i}",
+            details={"document_id": f"DOC-{i % 4}"}
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def _archive(log_manager, count):
+    """Scrive un archivio ZIP con log precedenti a BASE e lo registra in compressed_logs"""
+    archived = [
+        {
+            "id": f"archiviato-{i}",
+            "timestamp": (BASE - timedelta(days=1) + timedelta(seconds=i)).isoformat(),
+            "project": "PramaIAServer",
+            "level": "info",
+            "module": "upload",
+            "message": f"Archiviato {i}",
+            "details": {"document_id": f"DOC-{i % 4}"},
+            "context": None,
+            "fingerprint_id": None
+        }
+        for i in range(count)
+    ]
+    archive_path = os.path.join(os.path.dirname(log_manager.db_path), "logs_archive.zip")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(f"logs_{count}.json", json.dumps(archived, indent=2))
+
+    conn = log_manager._get_connection()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS compressed_logs (
+        log_id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        archive_path TEXT NOT NULL,
+        compressed_at TEXT NOT NULL
+    )
+    ''')
+    conn.executemany(
+        "INSERT INTO compressed_logs (log_id, timestamp, archive_path, compressed_at) VALUES (?, ?, ?, ?)",
+        [(log["id"], log["timestamp"], archive_path, BASE.isoformat()) for log in archived]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _export(client, headers, query=""):
+    """Esegue GET /api/logs/export e restituisce la risposta"""
+    response = client.get(f"/api/logs/export{query}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def _ndjson(content):
+    """Decodifica un corpo NDJSON"""
+    return [json.loads(line) for line in content.decode("utf-8").splitlines()]
+
+
+def test_ndjson_csv_and_filters(log_manager, client, headers):
+    """Formati NDJSON, CSV e gzip con i filtri di GET /api/logs"""
+    log_manager.add_logs_batch(_entries(30))
+
+    print("=== TEST FORMATI E FILTRI ===")
+    response = _export(client, headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    logs = _ndjson(response.content)
+    assert [log["message"] for log in logs] == [f"Log {i}" for i in range(30)]
+    assert logs[0]["details"] == {"document_id": "DOC-0"}
+
+    logs = _ndjson(_export(client, headers, "?project=PramaIAServer&level=error&sort_order=desc").content)
+    assert [log["message"] for log in logs] == [f"Log {i}" for i in range(29, -1, -1) if i % 2 and i % 3 == 0]
+
+    query = f"?details.document_id=DOC-1&start_date={(BASE + timedelta(seconds=10)).isoformat()}"
+    logs = _ndjson(_export(client, headers, query).content)
+    assert [log["message"] for log in logs] == ["Log 13", "Log 17", "Log 21", "Log 25", "Log 29"]
+
+    response = _export(client, headers, "?format=csv&module=upload&level=error")
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8"))))
+    print(f"Righe CSV: {len(rows)}")
+    assert rows[0] == log_router.EXPORT_CSV_FIELDS
+    assert len(rows) == 1 + 10
+    assert json.loads(rows[1][rows[0].index("details")]) == {"document_id": "DOC-0"}
+
+    response = _export(client, headers, "?compress=true")
+    assert response.headers["content-type"] == "application/gzip"
+    assert len(_ndjson(gzip.decompress(response.content))) == 30
+
+    response = client.get("/api/logs/export?format=xml", headers=headers)
+    assert response.status_code == 400
+
+
+def test_archived_and_live_logs(log_manager, client, headers):
+    """I log archiviati precedono quelli del database (ordine crescente) e li seguono in ordine decrescente"""
+    log_manager.add_logs_batch(_entries(5))
+    _archive(log_manager, 4)
+
+    print("=== TEST ARCHIVI E DATABASE ===")
+    logs = _ndjson(_export(client, headers).content)
+    print(f"Log esportati: {[log['message'] for log in logs]}")
+    assert [log["message"] for log in logs] == [f"Archiviato {i}" for i in range(4)] + [f"Log {i}" for i in range(5)]
+
+    logs = _ndjson(_export(client, headers, "?sort_order=desc").content)
+    assert [log["message"] for log in logs] == [f"Log {i}" for i in range(4, -1, -1)] + [f"Archiviato {i}" for i in range(3, -1, -1)]
+
+    # Gli stessi filtri si applicano agli archivi
+    logs = _ndjson(_export(client, headers, "?project=PramaIAServer&details.document_id=DOC-1").content)
+    assert [log["message"] for log in logs] == ["Archiviato 1", "Log 1"]
+    end_date = (BASE - timedelta(days=1) + timedelta(seconds=2)).isoformat()
+    logs = _ndjson(_export(client, headers, f"?end_date={end_date}").content)
+    assert [log["message"] for log in logs] == ["Archiviato 0", "Archiviato 1", "Archiviato 2"]
+
+    logs = _ndjson(_export(client, headers, "?include_archives=false").content)
+    assert [log["message"] for log in logs] == [f"Log {i}" for i in range(5)]
+
+
+def test_large_export_streamed(log_manager, client, headers):
+    """Un'esportazione grande viene inviata a blocchi e letta a pagine senza bloccare il writer"""
+    total = 3 * log_router.EXPORT_CHUNK_SIZE + 7
+    log_manager.add_logs_batch(_entries(total))
+    logs = _ndjson(_export(client, headers).content)
+    assert len(logs) == total
+    assert len({log["id"] for log in logs}) == total
+
+    # Il corpo della risposta è prodotto a blocchi di EXPORT_CHUNK_SIZE log
+    chunks = log_router._export_ndjson(log_manager.iter_logs(batch_size=100))
+    first_chunk = next(chunks)
+    print("=== TEST ESPORTAZIONE GRANDE ===")
+    assert len(_ndjson(first_chunk)) == log_router.EXPORT_CHUNK_SIZE
+    sizes = [len(_ndjson(chunk)) for chunk in chunks]
+    print(f"Log per blocco: {[log_router.EXPORT_CHUNK_SIZE] + sizes}")
+    assert sizes == [log_router.EXPORT_CHUNK_SIZE, log_router.EXPORT_CHUNK_SIZE, 7]
+
+    # Tra una pagina e l'altra non resta aperta alcuna lettura: il writer scrive subito
+    logs = log_manager.iter_logs(batch_size=100)
+    first = [next(logs) for _ in range(150)]
+    log_manager.add_logs_batch(_entries(1, start=total))
+    rest = list(logs)
+    assert [log["message"] for log in first + rest] == [f"Log {i}" for i in range(total + 1)]
+
+
+def test_archive_reader():
+    """Gli array JSON degli archivi vengono decodificati e invertiti un log alla volta"""
+    logs = [{"id": f"log-{i}", "message": "]" * (i % 7), "details": {"n": [i, "},"]}} for i in range(300)]
+    content = json.dumps(logs, indent=2).encode("utf-8")
+
+    print("=== TEST LETTURA INCREMENTALE ===")
+    for chunk_size in (1, 13, 4096):
+        assert list(iter_json_array(io.BytesIO(content), chunk_size)) == logs
+        assert list(iter_reversed(iter(logs), chunk_size)) == logs[::-1]
+
+    # La decodifica avanza con la lettura: il primo log è disponibile prima della fine del file
+    content = json.dumps(logs * 20).encode("utf-8")
+    stream = io.BytesIO(content)
+    assert next(iter_json_array(stream, 256)) == logs[0]
+    assert stream.tell() < len(content) // 10
+
+    try:
+        list(iter_json_array(io.BytesIO(b'{"id": 1}')))
+        assert False, "Un oggetto non è un array di log"
+    except ValueError:
+        pass
+
+
+def test_export_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso selezionano gli stessi log del database e degli archivi"""
+    log_manager.add_logs_batch(_entries(5))
+    _archive(log_manager, 4)
+
+    print("=== TEST ESPORTAZIONE CON FUSO ===")
+    dates = {
+        "start_date": aware_iso(BASE - timedelta(days=1) + timedelta(seconds=2)),
+        "end_date": aware_iso(BASE + timedelta(seconds=1))
+    }
+    response = client.get("/api/logs/export", params=dates, headers=headers)
+    assert response.status_code == 200, response.text
+    assert [log["message"] for log in _ndjson(response.content)] == ["Archiviato 2", "Archiviato 3", "Log 0", "Log 1"]
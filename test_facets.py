@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test per verificare i conteggi per faccetta (livello, progetto, modulo) e la loro cache
+"""
+
+import sys
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _populate(log_manager):
+    """Inserisce un insieme noto di log distribuito su più ore"""
+    start = datetime(2026, 3, 1, 8, 0, 0)
+    entries = []
+    for i in range(120):
+        entries.append(LogEntry(
+            timestamp=start + timedelta(minutes=7 * i, seconds=i % 50),
+            project=LogProject.SERVER if i % 2 == 0 else LogProject.PDK,
+            level=LogLevel.ERROR if i % 3 == 0 else LogLevel.INFO,
+            module=["upload", "worker", "api"][i % 3 if i % 4 else 1],
+            message=f"Messaggio {i}",
+            details={"document_id": f"doc-{i % 5}"}
+        ))
+    log_manager.add_logs_batch(entries)
+    return start
+
+
+def _expected(log_manager, **filters):
+    """Calcola le faccette attese contando i log restituiti da get_logs"""
+    logs = log_manager.get_logs(limit=10000, **filters)
+    return len(logs), {
+        facet: dict(Counter(log[facet] for log in logs))
+        for facet in ("level", "project", "module")
+    }
+
+
+def test_facets_match_filtered_logs(log_manager):
+    """Le faccette coincidono con i conteggi dei log filtrati, con e senza aggregati"""
+    start = _populate(log_manager)
+
+    print("=== TEST FACCETTE ===")
+    cases = [
+        {},
+        {"level": "error"},
+        {"project": "PramaIA-PDK", "module": "worker"},
+        {"start_date": start + timedelta(minutes=95, seconds=13), "end_date": start + timedelta(hours=9, minutes=2)},
+        {"document_id": "doc-3"},
+        {"document_id": "doc-1", "level": "info", "start_date": start + timedelta(hours=2)},
+    ]
+    for filters in cases:
+        result = log_manager.get_facets(**filters)
+        total, facets = _expected(log_manager, **filters)
+        print(f"{filters}: {result['total']} log")
+        assert result["total"] == total
+        assert result["total"] == log_manager.count_logs(**filters)["total"]
+        assert result["facets"] == facets
+
+    only_level = log_manager.get_facets(facets=["level"], project="PramaIAServer")
+    assert list(only_level["facets"]) == ["level"]
+
+    limited = log_manager.get_facets(facet_limit=1)
+    assert all(len(values) == 1 for values in limited["facets"].values())
+
+    try:
+        log_manager.get_facets(facets=["message"])
+        assert False, "Una faccetta non valida deve sollevare ValueError"
+    except ValueError:
+        pass
+
+
+def test_facet_cache_invalidated_by_ingest(log_manager):
+    """Una nuova scrittura invalida i conteggi in cache"""
+    _populate(log_manager)
+
+    print("=== TEST CACHE FACCETTE ===")
+    before = log_manager.get_facets(module="upload")
+    assert log_manager.get_facets(module="upload") == before
+
+    log_manager.add_log(LogEntry(
+        project=LogProject.AGENTS,
+        level=LogLevel.WARNING,
+        module="upload",
+        message="Nuovo log"
+    ))
+    after = log_manager.get_facets(module="upload")
+    print(f"Prima: {before['total']}, dopo: {after['total']}")
+    assert after["total"] == before["total"] + 1
+    assert after["facets"]["project"]["PramaIA-Agents"] == 1
+
+
+def test_facets_endpoint(log_manager, client, headers):
+    """L'endpoint accetta l'elenco delle faccette e i filtri su context e details"""
+    _populate(log_manager)
+
+    print("=== TEST ENDPOINT FACCETTE ===")
+    response = client.get("/api/logs/facets?facets=level,module&details.document_id=doc-2", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    total, facets = _expected(log_manager, document_id="doc-2")
+    assert data["total"] == total
+    assert data["facets"] == {"level": facets["level"], "module": facets["module"]}
+
+    response = client.get("/api/logs/facets?facets=timestamp", headers=headers)
+    assert response.status_code == 400
+
+
+def test_facets_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso contano gli stessi log dell'intervallo in ora locale"""
+    start = _populate(log_manager)
+    start_date, end_date = start + timedelta(minutes=95, seconds=13), start + timedelta(hours=9, minutes=2)
+
+    print("=== TEST FACCETTE CON FUSO ===")
+    response = client.get("/api/logs/facets", params={
+        "start_date": aware_iso(start_date),
+        "end_date": aware_iso(end_date)
+    }, headers=headers)
+    assert response.status_code == 200
+    total, facets = _expected(log_manager, start_date=start_date, end_date=end_date)
+    assert response.json()["total"] == total
+    assert response.json()["facets"] == facets
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la proiezione dei campi e la modalità summary nelle query dei log
+"""
+
+import sys
+import os
+import json
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.log_manager import parse_fields, SUMMARY_FIELDS
+from core.models import LogEntry, LogLevel, LogProject
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager con alcuni log"""
+    log_manager.add_logs_batch([
+        LogEntry(
+            project=LogProject.SERVER,
+            level=LogLevel.INFO,
+            module="upload",
+            message=f"Messaggio {i}",
+            details={"document_id": f"doc-{i}"},
+            context={"request_id": f"req-{i}"}
+        )
+        for i in range(5)
+    ])
+    return log_manager
+
+
+def test_parse_fields():
+    """La proiezione include sempre l'id e rifiuta i campi inesistenti"""
+    print("=== TEST PARSING CAMPI ===")
+    assert parse_fields() is None
+    assert parse_fields("message, level") == ["id", "level", "message"]
+    assert parse_fields(summary=True) == SUMMARY_FIELDS
+
+    with pytest.raises(ValueError):
+        parse_fields("message,password")
+
+
+def test_summary_mode_skips_json_fields(log_manager):
+    """In modalità summary details e context non vengono selezionati"""
+    print("=== TEST MODALITÀ SUMMARY ===")
+    logs = log_manager.get_logs(fields=parse_fields(summary=True))
+    print(f"Campi restituiti: {sorted(logs[0].keys())}")
+    assert len(logs) == 5
+    assert set(logs[0].keys()) == set(SUMMARY_FIELDS)
+
+
+def test_raw_json_projection_matches_parsed(log_manager):
+    """Il percorso JSON grezzo deve produrre lo stesso risultato della conversione completa"""
+    print("=== TEST PROIEZIONE JSON GREZZO ===")
+    fields = parse_fields("details")
+    raw_logs = json.loads(log_manager.get_logs_json(fields=fields))
+    parsed_logs = log_manager.get_logs(fields=fields)
+    assert raw_logs == parsed_logs
+    assert set(raw_logs[0].keys()) == {"id", "details"}
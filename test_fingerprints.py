@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test per verificare l'estrazione dei modelli di messaggio e i gruppi di errori
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries(now):
+    """Errori ripetuti che differiscono solo per identificativi e percorsi"""
+    entries = []
+    for i in range(30):
+        entries.append(LogEntry(
+            timestamp=now - timedelta(minutes=i),
+            project=LogProject.SERVER,
+            level=LogLevel.ERROR,
+            module="upload",
+            message=f"Impossibile leggere il file /data/docs/report_{i}.pdf per il documento {1000 + i}"
+        ))
+    for i in range(10):
+        entries.append(LogEntry(
+            timestamp=now - timedelta(minutes=i),
+            project=LogProject.PDK,
+            level=LogLevel.ERROR,
+            module="worker",
+            message=f"Timeout della connessione verso vectorstore dopo {i * 100} ms"
+        ))
+    for i in range(5):
+        entries.append(LogEntry(
+            timestamp=now - timedelta(minutes=i),
+            project=LogProject.PDK,
+            level=LogLevel.ERROR,
+            module="worker",
+            message=f"Errore di autenticazione per utente {['mario', 'anna', 'luca', 'sara', 'paolo'][i]}"
+        ))
+    # Errori fuori dall'ultima ora e log informativi
+    for i in range(8):
+        entries.append(LogEntry(
+            timestamp=now - timedelta(hours=3, minutes=i),
+            project=LogProject.SERVER,
+            level=LogLevel.ERROR,
+            module="upload",
+            message=f"Coda dei job piena: {i} elementi in attesa"
+        ))
+    entries.append(LogEntry(
+        timestamp=now,
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="upload",
+        message="Upload completato per il documento 42"
+    ))
+    return entries
+
+
+def test_groups_by_template(log_manager):
+    """I messaggi che differiscono solo per le parti variabili finiscono nello stesso gruppo"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_entries(now))
+
+    print("=== TEST GRUPPI DI ERRORI ===")
+    result = log_manager.get_groups(level="error", end_date=now)
+    for group in result["groups"]:
+        print(f"{group['count']:>4}  {group['template']}")
+    groups = result["groups"]
+    assert [group["count"] for group in groups] == [30, 10, 5]
+    assert groups[0]["template"] == "Impossibile leggere il file <*> per il documento <*>"
+    assert groups[1]["template"] == "Timeout della connessione verso vectorstore dopo <*> ms"
+    assert groups[2]["template"] == "Errore di autenticazione per utente <*>"
+    assert groups[0]["sample"]["message"].startswith("Impossibile leggere il file")
+
+    # Ogni log riporta il modello assegnato
+    logs = log_manager.get_logs(module="worker", level="error", limit=100)
+    assert {log["fingerprint_id"] for log in logs} == {groups[1]["fingerprint_id"], groups[2]["fingerprint_id"]}
+
+    # Intervallo più ampio: compaiono anche gli errori più vecchi
+    wide = log_manager.get_groups(level="error", start_date=now - timedelta(hours=4), end_date=now)
+    assert len(wide["groups"]) == 4
+    assert sum(group["count"] for group in wide["groups"]) == 53
+
+
+def test_templates_survive_restart_and_deletes(log_manager, make_log_manager):
+    """Un nuovo LogManager riusa i modelli salvati e le cancellazioni aggiornano i conteggi"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_entries(now)[:30])
+
+    from core import fingerprints
+    fingerprints._trees.pop(log_manager.db_path, None)
+    log_manager = make_log_manager(log_manager.db_path)
+    log_manager.add_log(LogEntry(
+        timestamp=now,
+        project=LogProject.SERVER,
+        level=LogLevel.ERROR,
+        module="upload",
+        message="Impossibile leggere il file /tmp/x.pdf per il documento 7"
+    ))
+
+    print("=== TEST PERSISTENZA MODELLI ===")
+    groups = log_manager.get_groups(end_date=now)["groups"]
+    assert len(groups) == 1
+    assert groups[0]["count"] == 31
+
+    conn = log_manager._get_connection()
+    conn.execute("DELETE FROM logs WHERE timestamp < ?", ((now - timedelta(minutes=9, seconds=30)).isoformat(),))
+    conn.commit()
+    conn.close()
+    groups = log_manager.get_groups(end_date=now)["groups"]
+    print(f"Dopo la cancellazione: {groups[0]['count']}")
+    assert groups[0]["count"] == 11
+
+
+def test_backfill_and_endpoint(log_manager, client, headers):
+    """I log scritti prima dei fingerprint vengono elaborati dalla manutenzione"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_entries(now))
+
+    conn = log_manager._get_connection()
+    conn.execute("UPDATE log_records SET fingerprint_id = NULL")
+    conn.execute("DELETE FROM log_fingerprint_counts")
+    conn.execute("DELETE FROM log_fingerprints")
+    conn.commit()
+    conn.close()
+
+    print("=== TEST BACKFILL MODELLI ===")
+    assert log_manager.backfill_fingerprints() == 54
+    assert log_manager.backfill_fingerprints() == 0
+
+    response = client.get("/api/logs/groups?level=error&limit=2", headers=headers)
+    assert response.status_code == 200
+    groups = response.json()["groups"]
+    assert [group["count"] for group in groups] == [30, 10]
+
+
+
+def test_groups_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Lo stesso intervallo espresso con un fuso conta gli stessi minuti"""
+    now = datetime.now()
+    log_manager.add_logs_batch(_entries(now))
+    wide = log_manager.get_groups(level="error", start_date=now - timedelta(hours=4), end_date=now)
+
+    print("=== TEST GRUPPI CON FUSO ===")
+    response = client.get("/api/logs/groups", params={
+        "level": "error",
+        "start_date": aware_iso(now - timedelta(hours=4)),
+        "end_date": aware_iso(now)
+    }, headers=headers)
+    assert response.status_code == 200
+    assert [group["count"] for group in response.json()["groups"]] == [group["count"] for group in wide["groups"]]
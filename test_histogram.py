@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test per verificare l'istogramma del volume dei log (GET /api/logs/histogram)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+BASE = datetime(2025, 8, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager con un log al minuto per due ore"""
+    log_manager.add_logs_batch([
+        LogEntry(
+            timestamp=BASE + timedelta(minutes=i, seconds=30),
+            project=LogProject.SERVER if i % 2 == 0 else LogProject.PDK,
+            level=LogLevel.ERROR if i % 3 == 0 else LogLevel.INFO,
+            module="upload",
+            message=f"Messaggio {i}",
+            details={"document_id": f"doc-{i % 4}"}
+        )
+        for i in range(120)
+    ])
+    return log_manager
+
+
+def test_dense_histogram_from_rollups(log_manager):
+    """I bucket sono densi e le serie coincidono con i conteggi per livello"""
+    print("=== TEST ISTOGRAMMA DA AGGREGAZIONI ===")
+    histogram = log_manager.get_histogram(
+        interval="5m",
+        group_by="level",
+        start_date=BASE - timedelta(minutes=10),
+        end_date=BASE + timedelta(minutes=29)
+    )
+    print(f"Bucket: {len(histogram['buckets'])}, totali: {histogram['total']}")
+    assert len(histogram["buckets"]) == 8
+    assert histogram["buckets"][0] == (BASE - timedelta(minutes=10)).isoformat()
+    assert histogram["total"] == [0, 0, 5, 5, 5, 5, 5, 5]
+    assert sum(histogram["series"]["error"]) == 10
+    assert sum(histogram["series"]["info"]) == 20
+
+    histogram = log_manager.get_histogram(interval="1h", project="PramaIA-PDK", start_date=BASE, end_date=BASE + timedelta(hours=1))
+    assert histogram["total"] == [30, 30]
+    assert histogram["series"] == {}
+
+
+def test_histogram_with_text_filter_matches_rollups(log_manager):
+    """Il calcolo sulla tabella logs (filtri testuali) usa gli stessi bucket"""
+    print("=== TEST ISTOGRAMMA CON FILTRO DOCUMENTO ===")
+    histogram = log_manager.get_histogram(
+        interval="1m",
+        group_by="project",
+        document_id="doc-1",
+        start_date=BASE,
+        end_date=BASE + timedelta(minutes=9)
+    )
+    assert histogram["total"] == [0, 1, 0, 0, 0, 1, 0, 0, 0, 1]
+    assert histogram["series"] == {"PramaIA-PDK": [0, 1, 0, 0, 0, 1, 0, 0, 0, 1]}
+
+
+def test_histogram_bucket_limit(client, headers):
+    """Richieste con troppi bucket o parametri non validi vengono rifiutate"""
+    print("=== TEST LIMITI ISTOGRAMMA ===")
+    response = client.get("/api/logs/histogram?interval=1m&start_date=2025-01-01T00:00:00&end_date=2025-02-01T00:00:00", headers=headers)
+    assert response.status_code == 400
+
+    response = client.get("/api/logs/histogram?interval=2m", headers=headers)
+    assert response.status_code == 400
+
+    response = client.get("/api/logs/histogram?interval=1h&group_by=module&start_date=2025-08-01T10:00:00&end_date=2025-08-01T11:59:00", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["series"] == {"upload": [60, 60]}
+
+
+def test_histogram_timezone_aware_range(client, headers, aware_iso):
+    """Gli estremi con fuso (Z o offset) sono riportati ai bucket in ora locale"""
+    print("=== TEST ISTOGRAMMA CON FUSO ===")
+    # Senza end_date la fine è l'ora corrente (senza fuso)
+    start = (datetime.now() - timedelta(hours=2)).replace(minute=0, second=0, microsecond=0)
+    response = client.get("/api/logs/histogram", params={"interval": "1h", "start_date": aware_iso(start)}, headers=headers)
+    assert response.status_code == 200
+    histogram = response.json()
+    assert histogram["buckets"] == [(start + timedelta(hours=i)).isoformat() for i in range(3)]
+
+    response = client.get("/api/logs/histogram", params={
+        "interval": "1h",
+        "start_date": aware_iso(BASE),
+        "end_date": aware_iso(BASE + timedelta(minutes=59))
+    }, headers=headers)
+    assert response.status_code == 200
+    histogram = response.json()
+    print(f"Bucket: {histogram['buckets']}, totali: {histogram['total']}")
+    assert histogram["buckets"] == [BASE.isoformat()]
+    assert histogram["total"] == [60]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test per verificare l'hot tier: query servite dalla memoria, unione con il disco e budget
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.hot_tier import HotTier
+from core.models import LogEntry, LogLevel, LogProject
+from core.timestamps import to_micros
+
+BASE = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager con un hot tier di 20 KB, che non contiene tutti i log dei test"""
+    return make_log_manager(hot_tier_bytes=20 * 1024)
+
+
+def _entries(count, start=0):
+    """Log con timestamp crescenti, progetti e livelli alternati"""
+    return [
+        LogEntry(
+            timestamp=BASE + timedelta(seconds=i),
+            project=LogProject.SERVER if i % 2 else LogProject.PDK,
+            level=LogLevel.ERROR if i % 3 == 0 else LogLevel.INFO,
+            module="upload",
+            message=f"Log {i}",
+            details={"document_id": f"DOC-{i % 4}", "file_name": f"report_{i}.pdf"}
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def _from_disk(log_manager, **query):
+    """Stessa query di get_logs letta solo da SQLite"""
+    hot_tier = log_manager.hot_tier
+    log_manager.hot_tier = HotTier(max_bytes=0)
+    try:
+        return log_manager.get_logs(**query)
+    finally:
+        log_manager.hot_tier = hot_tier
+
+
+def _from_disk_json(log_manager, **query):
+    """Stessa query di get_logs_json letta solo da SQLite"""
+    hot_tier = log_manager.hot_tier
+    log_manager.hot_tier = HotTier(max_bytes=0)
+    try:
+        return log_manager.get_logs_json(**query)
+    finally:
+        log_manager.hot_tier = hot_tier
+
+
+def test_queries_match_disk(log_manager):
+    """Le query servite in memoria, anche unite al disco, coincidono con quelle su SQLite"""
+    log_manager.add_logs_batch(_entries(120))
+    hot_tier = log_manager.hot_tier
+
+    print("=== TEST QUERY IN MEMORIA ===")
+    print(f"Log in memoria: {len(hot_tier)}, coperti dopo {hot_tier.covered_after}")
+    assert 0 < len(hot_tier) < 120
+    assert hot_tier.size <= hot_tier.max_bytes
+
+    queries = [
+        {"limit": 10},
+        {"limit": 30, "offset": len(hot_tier) - 10},
+        {"limit": 20, "offset": 150},
+        {"project": "PramaIAServer", "level": "error", "limit": 50},
+        {"document_id": "doc-1", "limit": 40},
+        {"file_name": "REPORT_11", "limit": 5},
+        {"start_date": BASE + timedelta(seconds=110), "sort_order": "asc", "limit": 5},
+        {"start_date": BASE + timedelta(seconds=10), "end_date": BASE + timedelta(seconds=20), "limit": 100},
+        {"end_date": BASE + timedelta(seconds=115), "limit": 100},
+        {"fields": ["id", "timestamp", "message"], "limit": 15}
+    ]
+    for query in queries:
+        assert log_manager.get_logs(**query) == _from_disk(log_manager, **query), query
+
+    # Stesso risultato anche per la serializzazione JSON diretta
+    assert json.loads(log_manager.get_logs_json(limit=50)) == _from_disk(log_manager, limit=50)
+
+
+def test_recent_window_served_from_memory(log_manager):
+    """Una finestra recente coperta dalla memoria non legge il disco"""
+    log_manager.add_logs_batch(_entries(120))
+    hot_tier = log_manager.hot_tier
+
+    selection = hot_tier.select(start_date=BASE + timedelta(seconds=115), limit=100)
+    print("=== TEST FINESTRA RECENTE ===")
+    assert [row["message"] for row in selection.rows] == [f"Log {i}" for i in range(119, 114, -1)]
+    assert selection.disk_limit == 0
+
+    selection = hot_tier.select(limit=200)
+    assert len(selection.rows) == len(hot_tier)
+    assert selection.disk_limit == 200 - len(hot_tier)
+    assert to_micros(selection.disk_end) == hot_tier.covered_after
+
+    # Filtri non supportati e finestre sotto la copertura passano dal disco
+    assert hot_tier.select(details_filter={"document_id": "DOC-1"}) is None
+    assert hot_tier.select(sort_by="level") is None
+    assert hot_tier.select(end_date=BASE, limit=10) is None
+
+
+def test_backdated_logs_and_interning(log_manager):
+    """I log retrodatati restano su disco; progetto, livello e modulo sono condivisi"""
+    log_manager.add_logs_batch(_entries(120))
+    hot_tier = log_manager.hot_tier
+    count = len(hot_tier)
+
+    backdated = _entries(1, start=-10)[0]
+    log_manager.add_log(backdated)
+    print("=== TEST LOG RETRODATATI ===")
+    assert len(hot_tier) == count
+    assert log_manager.get_logs(limit=200)[-1]["message"] == "Log -10"
+
+    # Un log fuori ordine nel periodo coperto viene inserito al suo posto
+    late = _entries(1, start=118)[0]
+    late.timestamp = BASE + timedelta(seconds=117, milliseconds=500)
+    log_manager.add_log(late)
+    assert [log["message"] for log in log_manager.get_logs(limit=4)] == ["Log 119", "Log 118", "Log 118", "Log 117"]
+
+    records = hot_tier._records[hot_tier._head:]
+    assert records[0].module is records[-1].module
+
+
+def test_warm_load_and_invalidation(log_manager):
+    """Il livello si carica dai log esistenti e si svuota dopo una cancellazione"""
+    log_manager.add_logs_batch(_entries(120))
+
+    # Nuovo livello caricato dal database (come all'avvio del servizio)
+    log_manager.hot_tier = HotTier(max_bytes=20 * 1024)
+    conn = log_manager._get_connection()
+    log_manager.hot_tier.load(conn)
+    conn.close()
+    print("=== TEST CARICAMENTO E INVALIDAZIONE ===")
+    print(f"Log caricati: {len(log_manager.hot_tier)}")
+    assert len(log_manager.hot_tier) > 0
+    assert log_manager.hot_tier.covered_after is not None
+    assert log_manager.get_logs(limit=200) == _from_disk(log_manager, limit=200)
+
+    log_manager.reset_logs(BASE + timedelta(seconds=100))
+    assert len(log_manager.get_logs(limit=200)) == 100
+    # Il rowid massimo è diminuito: il livello è stato ricaricato senza i log cancellati
+    hot_tier = log_manager.hot_tier
+    assert all(record.message != "Log 100" for record in hot_tier._records[hot_tier._head:])
+    assert hot_tier.rowid_mark == 100
+    assert log_manager.get_logs(limit=200) == _from_disk(log_manager, limit=200)
+
+
+def test_invalid_json_loaded_from_disk(log_manager):
+    """Le righe caricate con JSON non valido vengono riparate come quelle lette su disco"""
+    log_manager.add_logs_batch(_entries(3))
+    conn = log_manager._get_connection()
+    conn.execute("UPDATE log_records SET details = '{not json' WHERE rowid = (SELECT MAX(rowid) FROM log_records)")
+    conn.commit()
+
+    log_manager.hot_tier = HotTier(max_bytes=20 * 1024)
+    log_manager.hot_tier.load(conn)
+    conn.close()
+    print("=== TEST JSON NON VALIDO NELL'HOT TIER ===")
+    assert log_manager.hot_tier.select(limit=10) is not None
+
+    logs = json.loads(log_manager.get_logs_json(limit=10))
+    print(f"Dettagli riparati: {logs[0]['details']}")
+    assert logs[0]["details"] == {"error": "Formato JSON non valido", "raw_data": "{not json"}
+    assert logs[1]["details"] == {"document_id": "DOC-1", "file_name": "report_1.pdf"}
+    assert logs == json.loads(_from_disk_json(log_manager, limit=10))
+
+
+def test_writes_from_other_processes(log_manager, make_log_manager):
+    """I log scritti da un'altra connessione vengono letti da sync prima della query"""
+    log_manager.add_logs_batch(_entries(10))
+    hot_tier = log_manager.hot_tier
+    assert hot_tier.rowid_mark == 10
+
+    # Scrittura di un altro worker: un LogManager che non registra nel livello di questo
+    other = make_log_manager(log_manager.db_path, hot_tier_bytes=0)
+    external = _entries(1, start=20)[0]
+    external.message = "Scritto da fuori"
+    other.add_log(external)
+    # Il writer di questo processo scrive dopo la riga esterna: il rowid non avanza
+    log_manager.add_logs_batch(_entries(2, start=30))
+    assert hot_tier.rowid_mark == 10
+
+    print("=== TEST SCRITTURE DI ALTRI PROCESSI ===")
+    logs = log_manager.get_logs(limit=100)
+    print(f"Log restituiti: {len(logs)}, rowid noto: {hot_tier.rowid_mark}")
+    assert len(logs) == log_manager.count_logs()["total"] == 13
+    assert logs[2]["message"] == "Scritto da fuori"
+    assert hot_tier.rowid_mark == 13
+    assert len(hot_tier) == 13
+    assert logs == _from_disk(log_manager, limit=100)
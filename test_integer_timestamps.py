@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test per verificare i timestamp interi: memorizzazione in microsecondi UTC, fusi orari e migrazione
+"""
+
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.timestamps import format_timestamp, from_micros, sql_iso_timestamp, sql_micros, to_micros
+
+BASE = datetime(2026, 4, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager senza hot tier, per leggere da SQLite"""
+    return make_log_manager(hot_tier_bytes=0)
+
+
+def _entry(timestamp, message):
+    """Log di prova con il timestamp indicato"""
+    return LogEntry(
+        timestamp=timestamp,
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="upload",
+        message=message
+    )
+
+
+def test_conversions():
+    """Le conversioni Python e SQL producono lo stesso testo ISO locale"""
+    conn = sqlite3.connect(":memory:")
+
+    print("=== TEST CONVERSIONI ===")
+    for moment in (BASE, BASE + timedelta(microseconds=120), datetime(2026, 10, 25, 2, 30, 0, 5)):
+        micros = to_micros(moment)
+        text = conn.execute(f"SELECT {sql_iso_timestamp('?1')}", (micros,)).fetchone()[0]
+        back = conn.execute(f"SELECT {sql_micros('?1')}", (moment.isoformat(),)).fetchone()[0]
+        print(f"{moment.isoformat()} -> {micros} -> {text}")
+        assert text == format_timestamp(micros) == from_micros(micros).isoformat()
+        assert back == micros
+
+    # Un istante con fuso viene riportato all'ora locale
+    aware = datetime(2026, 4, 1, 10, 0, tzinfo=timezone.utc)
+    assert to_micros(from_micros(to_micros(aware))) == to_micros(aware)
+    conn.close()
+
+
+def test_integer_storage_and_timezones(log_manager):
+    """log_records contiene interi; log con fusi diversi sono ordinati per istante"""
+    utc_moment = to_micros(BASE + timedelta(minutes=1))
+    offset = timezone(timedelta(hours=5))
+    log_manager.add_logs_batch([
+        _entry(BASE, "Locale"),
+        # Stesso istante di BASE + 1 minuto, espresso con un altro fuso
+        _entry(from_micros(utc_moment).astimezone(offset), "Con fuso"),
+        _entry(BASE + timedelta(minutes=2, microseconds=500), "Frazione")
+    ])
+
+    conn = log_manager._get_connection()
+    rows = conn.execute("SELECT timestamp_us, ingested_us FROM log_records ORDER BY timestamp_us").fetchall()
+    conn.close()
+
+    print("=== TEST MEMORIZZAZIONE INTERA ===")
+    print(f"Timestamp memorizzati: {[row[0] for row in rows]}")
+    assert all(isinstance(row[0], int) and isinstance(row[1], int) for row in rows)
+    assert rows[1][0] == utc_moment
+
+    logs = log_manager.get_logs(limit=10, sort_order="asc")
+    assert [log["message"] for log in logs] == ["Locale", "Con fuso", "Frazione"]
+    # Le API restituiscono l'ora locale senza fuso, come prima
+    assert [log["timestamp"] for log in logs] == [
+        BASE.isoformat(),
+        (BASE + timedelta(minutes=1)).isoformat(),
+        (BASE + timedelta(minutes=2, microseconds=500)).isoformat()
+    ]
+
+    # Filtri con e senza fuso sullo stesso istante
+    start = from_micros(utc_moment)
+    assert log_manager.count_logs(start_date=start)["total"] == 2
+    assert log_manager.count_logs(start_date=start.astimezone(offset))["total"] == 2
+
+    stats = log_manager.get_stats()
+    assert stats.time_period["start"] == BASE
+    assert stats.time_period["end"] == BASE + timedelta(minutes=2, microseconds=500)
+
+
+def test_text_timestamp_migration(make_log_manager, tmp_path):
+    """Un database con log_records a timestamp testuali viene convertito"""
+    db_path = str(tmp_path / "test_logs.db")
+    conn = sqlite3.connect(db_path)
+    for table in ("log_projects", "log_levels", "log_modules"):
+        conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("INSERT INTO log_projects (id, name) VALUES (1, 'PramaIAServer')")
+    conn.execute("INSERT INTO log_levels (id, name) VALUES (1, 'info')")
+    conn.execute("INSERT INTO log_modules (id, name) VALUES (1, 'upload')")
+    conn.execute('''
+    CREATE TABLE log_records (
+        id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        project_id INTEGER NOT NULL,
+        level_id INTEGER NOT NULL,
+        module_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        details TEXT,
+        context TEXT,
+        fingerprint_id TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX idx_records_timestamp ON log_records (timestamp)')
+    conn.executemany(
+        "INSERT INTO log_records (id, timestamp, project_id, level_id, module_id, message) VALUES (?, ?, 1, 1, 1, ?)",
+        [(f"old-{i}", (BASE + timedelta(seconds=i, microseconds=i)).isoformat(), f"Log vecchio {i}") for i in range(5)]
+    )
+    conn.commit()
+    conn.close()
+
+    log_manager = make_log_manager(db_path, hot_tier_bytes=0)
+    conn = log_manager._get_connection()
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(log_records)").fetchall()}
+    stored = [row[0] for row in conn.execute("SELECT timestamp_us FROM log_records ORDER BY rowid").fetchall()]
+    conn.close()
+
+    print("=== TEST MIGRAZIONE TIMESTAMP ===")
+    print(f"Colonne di log_records: {sorted(columns)}")
+    assert "timestamp" not in columns and {"timestamp_us", "ingested_us"} <= columns
+    assert stored == [to_micros(BASE + timedelta(seconds=i, microseconds=i)) for i in range(5)]
+
+    logs = log_manager.get_logs(limit=10, sort_order="asc")
+    assert [log["timestamp"] for log in logs] == [(BASE + timedelta(seconds=i, microseconds=i)).isoformat() for i in range(5)]
+    assert log_manager.count_logs(end_date=BASE + timedelta(seconds=2))["total"] == 2
+
+
+def test_lifecycle_order_across_dst_fallback(log_manager, client, headers, local_timezone):
+    """Al ritorno dall'ora solare gli eventi restano in ordine di istante, non di ora locale"""
+    local_timezone("Europe/Rome")
+    # 26 ottobre 2025: le 03:00 CEST tornano alle 02:00 CET, le 02:xx si ripetono
+    events = [
+        ("Prima", datetime(2025, 10, 26, 0, 45, tzinfo=timezone.utc)),   # 02:45 CEST
+        ("Dopo", datetime(2025, 10, 26, 1, 15, tzinfo=timezone.utc))     # 02:15 CET
+    ]
+    log_manager.add_logs_batch([
+        LogEntry(
+            timestamp=moment,
+            project=LogProject.SERVER,
+            level=LogLevel.LIFECYCLE,
+            module="upload",
+            message=message,
+            details={"document_id": "doc-dst", "lifecycle_event": message}
+        )
+        for message, moment in events
+    ])
+
+    print("=== TEST ORDINE CON CAMBIO DI ORA ===")
+    logs = client.get("/api/lifecycle/document/doc-dst", headers=headers).json()
+    print([(log["message"], log["timestamp"]) for log in logs])
+    assert [log["timestamp"] for log in logs] == ["2025-10-26T02:45:00", "2025-10-26T02:15:00"]
+    assert [log["message"] for log in logs] == ["Prima", "Dopo"]
+
+    # Il filtro per livello usa i codici del dizionario
+    url = "/api/lifecycle/document/doc-dst?level="
+    assert len(client.get(url + "lifecycle", headers=headers).json()) == 2
+    assert client.get(url + "error", headers=headers).json() == []
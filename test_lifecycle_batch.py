@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la ricerca del ciclo di vita di più documenti (POST /api/lifecycle/documents/batch)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager con quattro eventi per ciascuno di tre documenti"""
+    start = datetime(2025, 6, 1, 12, 0, 0)
+    entries = []
+    for doc in range(3):
+        for step in range(4):
+            entries.append(LogEntry(
+                timestamp=start + timedelta(minutes=doc * 10 + step),
+                project=LogProject.SERVER,
+                level=LogLevel.LIFECYCLE,
+                module="documents",
+                message=f"doc-{doc} passo {step}",
+                details={
+                    "document_id": f"doc-{doc}",
+                    "file_hash": f"hash-{doc}",
+                    "file_name": f"file-{doc}.pdf",
+                    "lifecycle_event": f"STEP_{step}"
+                }
+            ))
+    log_manager.add_logs_batch(entries)
+    return log_manager
+
+
+def test_batch_grouped_and_paginated(client, headers):
+    """I risultati sono raggruppati per identificativo con paginazione per gruppo"""
+    print("=== TEST RICERCA BATCH ===")
+    response = client.post("/api/lifecycle/documents/batch", headers=headers, json={
+        "document_ids": ["doc-0", "doc-9"],
+        "file_hashes": ["hash-1"],
+        "file_names": ["file-2.pdf"],
+        "limit": 2,
+        "offset": 1,
+        "summary": True
+    })
+    assert response.status_code == 200
+    results = response.json()["results"]
+    print(f"Gruppi: {[(group['identifier'], group['total'], len(group['logs'])) for group in results]}")
+
+    assert [(group["type"], group["identifier"]) for group in results] == [
+        ("document_id", "doc-0"), ("document_id", "doc-9"), ("file_hash", "hash-1"), ("file_name", "file-2.pdf")
+    ]
+    assert [group["total"] for group in results] == [4, 0, 4, 4]
+    assert [log["message"] for log in results[0]["logs"]] == ["doc-0 passo 1", "doc-0 passo 2"]
+    assert set(results[2]["logs"][0].keys()) == {"id", "timestamp", "project", "level", "module", "message"}
+
+
+def test_batch_limits(client, headers):
+    """Le richieste vuote o con troppi identificativi vengono rifiutate"""
+    print("=== TEST LIMITI BATCH ===")
+    response = client.post("/api/lifecycle/documents/batch", headers=headers, json={})
+    assert response.status_code == 400
+
+    response = client.post("/api/lifecycle/documents/batch", headers=headers, json={
+        "document_ids": [f"doc-{i}" for i in range(1000)]
+    })
+    assert response.status_code == 400
+
+
+def test_batch_timezone_aware_range(client, headers, aware_iso):
+    """Gli estremi con fuso vengono confrontati con l'ora locale degli eventi"""
+    print("=== TEST RICERCA BATCH CON FUSO ===")
+    response = client.post("/api/lifecycle/documents/batch", headers=headers, json={
+        "document_ids": ["doc-1"],
+        "start_date": aware_iso(datetime(2025, 6, 1, 12, 11)),
+        "end_date": aware_iso(datetime(2025, 6, 1, 12, 12))
+    })
+    assert response.status_code == 200
+    group = response.json()["results"][0]
+    print([log["message"] for log in group["logs"]])
+    assert [log["message"] for log in group["logs"]] == ["doc-1 passo 1", "doc-1 passo 2"]
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test per verificare il live tail: filtri compilati, code limitate e stream SSE
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api import log_router
+from core.live_tail import TailHub
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entry(project, level, module, message, document_id=None):
+    """Log con document_id opzionale nei details"""
+    return LogEntry(
+        project=project,
+        level=level,
+        module=module,
+        message=message,
+        details={"document_id": document_id} if document_id else {}
+    )
+
+
+def _messages(subscription):
+    """Messaggi in coda per una sottoscrizione"""
+    payloads, _ = subscription.drain()
+    return [json.loads(payload)["message"] for payload in payloads]
+
+
+class _FakeRequest:
+    """Richiesta minima per il generatore SSE: si disconnette a comando"""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_filters_are_matched_once_per_log(log_manager):
+    """Ogni sottoscrizione riceve solo i log che soddisfano tutti i suoi filtri"""
+    async def run():
+        hub = log_manager.tail
+        everything = hub.subscribe({})
+        errors = hub.subscribe({"level": "error"})
+        server_upload = hub.subscribe({"project": "PramaIAServer", "module": "upload"})
+        document = hub.subscribe({"document_id": "doc-7"}, text="COMPLETATO")
+
+        log_manager.add_logs_batch([
+            _entry(LogProject.SERVER, LogLevel.INFO, "upload", "Upload avviato", "doc-7"),
+            _entry(LogProject.SERVER, LogLevel.ERROR, "worker", "Elaborazione fallita", "doc-7"),
+            _entry(LogProject.PDK, LogLevel.INFO, "upload", "Upload completato", "doc-8"),
+            _entry(LogProject.SERVER, LogLevel.INFO, "upload", "Upload completato", "doc-7")
+        ])
+
+        print("=== TEST FILTRI DEL LIVE TAIL ===")
+        assert len(_messages(everything)) == 4
+        assert _messages(errors) == ["Elaborazione fallita"]
+        assert _messages(server_upload) == ["Upload avviato", "Upload completato"]
+        assert _messages(document) == ["Upload completato"]
+
+        # Il cambio dei filtri ricompila l'indice
+        hub.update(errors, {"level": "info", "module": "upload"})
+        log_manager.add_log(_entry(LogProject.PDK, LogLevel.INFO, "upload", "Nuovo upload"))
+        assert _messages(errors) == ["Nuovo upload"]
+
+        try:
+            hub.update(errors, {"message": "x"})
+            assert False, "Un filtro non valido deve sollevare ValueError"
+        except ValueError:
+            pass
+
+        for subscription in (everything, errors, server_upload, document):
+            hub.unsubscribe(subscription)
+        assert hub.subscriber_count == 0
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_drops_oldest(log_manager):
+    """Un client lento perde i log più vecchi e riceve il numero di log scartati"""
+    async def run():
+        log_manager.tail = TailHub(queue_size=3)
+        subscription = log_manager.tail.subscribe({})
+        log_manager.add_logs_batch([
+            _entry(LogProject.SERVER, LogLevel.INFO, "upload", f"Messaggio {i}") for i in range(10)
+        ])
+
+        print("=== TEST CODA LIMITATA ===")
+        payloads, dropped = subscription.drain()
+        print(f"Ricevuti: {len(payloads)}, scartati: {dropped}")
+        assert [json.loads(payload)["message"] for payload in payloads] == ["Messaggio 7", "Messaggio 8", "Messaggio 9"]
+        assert dropped == 7
+        assert subscription.describe()["dropped"] == 7
+        assert subscription.drain() == ([], 0)
+
+    asyncio.run(run())
+
+
+def test_sse_stream(log_manager, monkeypatch):
+    """Lo stream SSE invia la sottoscrizione, i log filtrati e termina alla disconnessione"""
+    monkeypatch.setattr(log_router, "log_manager", log_manager)
+
+    async def run():
+        request = _FakeRequest()
+        response = await log_router.tail_logs(request, module="upload", api_key="test")
+        assert response.media_type == "text/event-stream"
+        events = response.body_iterator
+
+        print("=== TEST STREAM SSE ===")
+        subscribed = await events.__anext__()
+        assert subscribed.startswith("event: subscribed\n")
+        assert log_manager.tail.subscriber_count == 1
+
+        log_manager.add_log(_entry(LogProject.SERVER, LogLevel.INFO, "worker", "Ignorato"))
+        log_manager.add_log(_entry(LogProject.SERVER, LogLevel.INFO, "upload", "In diretta"))
+        chunk = await asyncio.wait_for(events.__anext__(), 5)
+        print(chunk)
+        assert chunk.startswith("event: log\ndata: ")
+        assert json.loads(chunk.split("data: ", 1)[1])["message"] == "In diretta"
+
+        request.disconnected = True
+        try:
+            await events.__anext__()
+            assert False, "Lo stream deve terminare alla disconnessione"
+        except StopAsyncIteration:
+            pass
+        assert log_manager.tail.subscriber_count == 0
+
+    asyncio.run(run())
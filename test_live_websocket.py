@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test per verificare le sottoscrizioni WebSocket del live tail: frame a blocchi, cambio filtri e coalescenza
+"""
+
+import sys
+import os
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from core.models import LogEntry, LogLevel, LogProject
+
+WS_URL = "/api/logs/ws?api_key=pramaiaadmin_api_key_123456"
+
+
+def _entries(module, count, level=LogLevel.INFO):
+    """Serie di log di un modulo del server"""
+    return [
+        LogEntry(project=LogProject.SERVER, level=level, module=module, message=f"{module} {i}")
+        for i in range(count)
+    ]
+
+
+def test_batched_frames_and_filter_update(log_manager, client):
+    """I log arrivano in un unico frame e i filtri cambiano sulla stessa connessione"""
+    with client.websocket_connect(WS_URL) as websocket:
+        websocket.send_json({"action": "subscribe", "id": "upload", "filters": {"module": "upload"}, "batch_ms": 1000, "batch_size": 5})
+        subscribed = websocket.receive_json()
+        print("=== TEST FRAME A BLOCCHI ===")
+        assert subscribed["type"] == "subscribed"
+        assert subscribed["subscription"]["filters"] == {"module": "upload"}
+        assert subscribed["options"] == {"batch_ms": 1000, "batch_size": 5, "coalesce": False}
+
+        log_manager.add_logs_batch(_entries("worker", 2) + _entries("upload", 5))
+        frame = websocket.receive_json()
+        assert frame["type"] == "logs" and frame["id"] == "upload"
+        assert [log["message"] for log in frame["logs"]] == [f"upload {i}" for i in range(5)]
+        assert frame["dropped"] == 0 and frame["coalesced"] == 0
+
+        # Nuovi filtri senza riconnettersi
+        websocket.send_json({"action": "update", "id": "upload", "filters": {"module": "worker", "level": "error"}, "batch_size": 1})
+        updated = websocket.receive_json()
+        assert updated["type"] == "updated"
+        assert updated["options"]["batch_size"] == 1
+
+        log_manager.add_logs_batch(_entries("upload", 1) + _entries("worker", 1, LogLevel.ERROR))
+        frame = websocket.receive_json()
+        assert [log["message"] for log in frame["logs"]] == ["worker 0"]
+
+        websocket.send_json({"action": "unsubscribe", "id": "upload"})
+        assert websocket.receive_json() == {"type": "unsubscribed", "id": "upload"}
+
+    assert log_manager.tail.subscriber_count == 0
+
+
+def test_coalesced_frames(log_manager, client):
+    """Con la coalescenza il client riceve solo gli ultimi batch_size log e il numero di quelli saltati"""
+    with client.websocket_connect(WS_URL) as websocket:
+        websocket.send_json({"action": "subscribe", "id": "metrics", "batch_ms": 1000, "batch_size": 2, "coalesce": True})
+        assert websocket.receive_json()["type"] == "subscribed"
+
+        log_manager.add_logs_batch(_entries("metrics", 5))
+        frame = websocket.receive_json()
+        print("=== TEST COALESCENZA ===")
+        assert [log["message"] for log in frame["logs"]] == ["metrics 3", "metrics 4"]
+        assert frame["coalesced"] == 3
+
+
+def test_invalid_requests(client):
+    """Le richieste non valide ricevono un frame di errore senza chiudere la connessione"""
+    with client.websocket_connect(WS_URL) as websocket:
+        print("=== TEST RICHIESTE NON VALIDE ===")
+        websocket.send_text("non json")
+        assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_json({"action": "pause", "id": "a"})
+        assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_json({"action": "subscribe", "id": "a", "batch_ms": 1})
+        error = websocket.receive_json()
+        assert error["type"] == "error" and error["id"] == "a"
+
+        websocket.send_json({"action": "update", "id": "missing", "filters": {}})
+        assert websocket.receive_json()["type"] == "error"
+
+        # La connessione resta utilizzabile
+        websocket.send_json({"action": "subscribe", "id": "a", "filters": {"level": "error"}})
+        assert websocket.receive_json()["type"] == "subscribed"
+
+
+def test_invalid_api_key(client):
+    """Una API key non valida chiude la connessione"""
+    print("=== TEST API KEY NON VALIDA ===")
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/logs/ws?api_key=chiave_errata") as websocket:
+            websocket.receive_json()
+
+
+def test_pages_include_client(client):
+    """Le pagine di ricerca e del ciclo di vita caricano il client del live tail"""
+    print("=== TEST PAGINE ===")
+    for path in ("/dashboard/", "/dashboard/lifecycle"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert "/static/js/live_tail.js" in response.text
+    assert client.get("/static/js/live_tail.js").status_code == 200
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la serializzazione dei log senza decodifica di details e context (render_row, render_rows)
+"""
+
+import sys
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api.document_lifecycle_router import _repair_row
+from core.hot_tier import HotTier
+from core.models import LogEntry, LogLevel, LogProject
+from core.query_cache import get_result_cache
+from core.raw_json import JSON_VALID_COLUMNS, render_row, render_rows
+
+# Testo JSON con spaziatura, ordine delle chiavi e caratteri che json.dumps riscriverebbe
+VALID_DETAILS = '{"z": 1,   "a": "città", "n": [1.50, {"k": null}]}'
+VALID_CONTEXT = '{"request_id":"abc"}'
+
+
+def _rows(values):
+    """Righe sqlite3.Row con le colonne di validità, come le query delle API"""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE logs (id TEXT, message TEXT, details TEXT, context TEXT)")
+    conn.executemany("INSERT INTO logs VALUES (?, ?, ?, ?)", values)
+    rows = conn.execute(f"SELECT *, {JSON_VALID_COLUMNS} FROM logs ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_valid_rows_copied():
+    """Il JSON valido viene copiato byte per byte e la risposta è JSON valido"""
+    rows = _rows([
+        ("1", 'Messaggio con "virgolette"', VALID_DETAILS, VALID_CONTEXT),
+        ("2", "Senza dettagli", None, None)
+    ])
+
+    print("=== TEST COPIA DEL JSON VALIDO ===")
+    rendered = render_row(rows[0], _repair_row)
+    print(rendered)
+    assert f'"details": {VALID_DETAILS}' in rendered
+    assert f'"context": {VALID_CONTEXT}' in rendered
+    assert "_valid" not in rendered
+    assert json.loads(rendered) == {
+        "id": "1",
+        "message": 'Messaggio con "virgolette"',
+        "details": json.loads(VALID_DETAILS),
+        "context": {"request_id": "abc"}
+    }
+
+    content = render_rows(rows, _repair_row)
+    assert json.loads(content)[1] == {"id": "2", "message": "Senza dettagli", "details": None, "context": None}
+    assert render_rows([], _repair_row) == "[]"
+    assert json.loads(render_row(rows[0], _repair_row, exclude=("message",))).keys() == {"id", "details", "context"}
+
+
+def test_invalid_rows_repaired():
+    """Le righe con details o context non validi vengono sostituite dall'oggetto di riparazione"""
+    rows = _rows([
+        ("1", "Dettagli rotti", '{"a": 1', VALID_CONTEXT),
+        ("2", "Contesto rotto", VALID_DETAILS, "non json"),
+        ("3", "Valido", VALID_DETAILS, None)
+    ])
+
+    print("=== TEST RIPARAZIONE ===")
+    logs = json.loads(render_rows(rows, _repair_row))
+    print(logs[0])
+    assert logs[0]["details"] == {"error": "Invalid JSON", "raw": '{"a": 1'}
+    assert logs[0]["context"] == {"request_id": "abc"}
+    assert logs[1]["details"] == json.loads(VALID_DETAILS)
+    assert logs[1]["context"] == {"error": "Invalid JSON", "raw": "non json"}
+    assert all(not key.endswith("_valid") for log in logs for key in log)
+    assert logs[2]["details"] == json.loads(VALID_DETAILS)
+
+
+def test_api_responses_repaired(make_log_manager, use_log_manager, headers):
+    """GET /api/logs e /api/logs/{id} restituiscono JSON valido anche con righe rotte, da disco e dall'hot tier"""
+    log_manager = make_log_manager(hot_tier_bytes=0)
+    log_id = log_manager.add_log(LogEntry(
+        timestamp=datetime(2026, 6, 1, 8, 0, 0),
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="upload",
+        message="Riga rotta",
+        details={"document_id": "DOC-1"}
+    ))
+    conn = log_manager._get_connection()
+    conn.execute("UPDATE log_records SET details = '{not json', context = ? WHERE id = ?", (VALID_CONTEXT, log_id))
+    conn.commit()
+    conn.close()
+
+    client = use_log_manager(log_manager)
+
+    print("=== TEST RIPARAZIONE NELLE API ===")
+    repaired = {"error": "Formato JSON non valido", "raw_data": "{not json"}
+    for tier in (HotTier(max_bytes=0), HotTier(max_bytes=1024 * 1024)):
+        conn = log_manager._get_connection()
+        tier.load(conn)
+        conn.close()
+        log_manager.hot_tier = tier
+        get_result_cache().clear()
+
+        response = client.get("/api/logs/", headers=headers)
+        assert response.status_code == 200
+        logs = json.loads(response.content)
+        print(f"Hot tier attivo: {tier.enabled}, dettagli: {logs[0]['details']}")
+        assert logs[0]["details"] == repaired
+        assert logs[0]["context"] == {"request_id": "abc"}
+
+    response = client.get(f"/api/logs/{log_id}", headers=headers)
+    assert json.loads(response.content)["details"] == repaired
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test per verificare la cache dei risultati di /api/logs e la sua invalidazione
+"""
+
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.query_cache import ResultCache, get_watermark
+from core.timestamps import to_micros
+
+@pytest.fixture
+def log_manager(make_log_manager):
+    """LogManager senza hot tier (i log scritti con _sneak devono essere letti da disco)"""
+    return make_log_manager(hot_tier_bytes=0)
+
+
+def _entry(project, timestamp, message):
+    """Log minimo di un progetto"""
+    return LogEntry(
+        timestamp=timestamp,
+        project=project,
+        level=LogLevel.INFO,
+        module="upload",
+        message=message
+    )
+
+
+def _sneak(log_manager, project, timestamp, message):
+    """Scrive un log direttamente su SQLite, senza avvisare le cache"""
+    conn = log_manager._get_connection()
+    conn.execute(
+        "INSERT INTO log_records (id, timestamp_us, project_id, level_id, module_id, message) "
+        "VALUES (?, ?, (SELECT id FROM log_projects WHERE name = ?), "
+        "(SELECT id FROM log_levels WHERE name = 'info'), (SELECT id FROM log_modules WHERE name = 'upload'), ?)",
+        (str(uuid.uuid4()), to_micros(timestamp), project.value, message)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _messages(client, headers, **params):
+    """Messaggi restituiti da GET /api/logs"""
+    response = client.get("/api/logs/", params=params, headers=headers)
+    assert response.status_code == 200
+    return {log["message"] for log in response.json()}
+
+
+def test_byte_budget_evicts_least_recently_used():
+    """Oltre il limite in byte vengono scartati i risultati usati meno di recente"""
+    cache = ResultCache(max_bytes=100)
+    watermark = get_watermark()
+    cache.set("a", "A", size=40, watermark=watermark)
+    cache.set("b", "B", size=40, watermark=watermark)
+    assert cache.get("a") == "A"
+    cache.set("c", "C", size=40, watermark=watermark)
+
+    print("=== TEST LIMITE IN BYTE ===")
+    print(f"Occupazione: {cache.size} byte")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.size == 80
+
+    cache.set("grande", "G", size=101, watermark=watermark)
+    assert cache.get("grande") is None
+
+
+def test_latest_queries_invalidated_by_matching_project(log_manager, client, headers):
+    """Le query sui log più recenti sono invalidate solo dalle scritture del loro progetto"""
+    now = datetime.now()
+    log_manager.add_log(_entry(LogProject.SERVER, now, "Primo"))
+    params = {"project": "PramaIAServer"}
+    assert _messages(client, headers, **params) == {"Primo"}
+
+    # Un log scritto senza avvisare le cache rivela se la risposta viene dalla cache
+    _sneak(log_manager, LogProject.SERVER, now, "Nascosto")
+
+    print("=== TEST INVALIDAZIONE PER PROGETTO ===")
+    assert _messages(client, headers, **params) == {"Primo"}
+    log_manager.add_log(_entry(LogProject.PDK, now, "Altro progetto"))
+    assert _messages(client, headers, **params) == {"Primo"}
+    assert "Nascosto" in _messages(client, headers)
+
+    log_manager.add_log(_entry(LogProject.SERVER, now, "Secondo"))
+    assert _messages(client, headers, **params) == {"Primo", "Nascosto", "Secondo"}
+
+
+def test_past_ranges_cached_until_backdated_ingest(log_manager, client, headers):
+    """Le query su intervalli conclusi ignorano i log nuovi ma non quelli retrodatati"""
+    day = datetime(2026, 2, 1, 12, 0, 0)
+    log_manager.add_log(_entry(LogProject.SERVER, day, "Storico"))
+    params = {"start_date": "2026-02-01T00:00:00", "end_date": "2026-02-02T00:00:00"}
+    assert _messages(client, headers, **params) == {"Storico"}
+    _sneak(log_manager, LogProject.SERVER, day, "Nascosto")
+
+    print("=== TEST INTERVALLI CONCLUSI ===")
+    log_manager.add_logs_batch([_entry(LogProject.SERVER, datetime.now(), f"Nuovo {i}") for i in range(3)])
+    assert _messages(client, headers, **params) == {"Storico"}
+
+    log_manager.add_log(_entry(LogProject.PDK, day + timedelta(hours=1), "Retrodatato"))
+    assert _messages(client, headers, **params) == {"Storico", "Nascosto", "Retrodatato"}
+
+    _sneak(log_manager, LogProject.SERVER, day, "Dopo la cancellazione")
+    log_manager.reset_logs(datetime.now() - timedelta(minutes=5))
+    assert "Dopo la cancellazione" in _messages(client, headers, **params)
+
+
+
+def test_timezone_aware_range_invalidated_by_backdated_ingest(log_manager, client, headers, aware_iso):
+    """Un intervallo concluso espresso con fuso viene invalidato dai log retrodatati al suo interno"""
+    day = datetime(2026, 2, 1, 12, 0, 0)
+    log_manager.add_log(_entry(LogProject.SERVER, day, "Storico"))
+    params = {"start_date": aware_iso(day - timedelta(hours=1)), "end_date": aware_iso(day + timedelta(hours=2))}
+    assert _messages(client, headers, **params) == {"Storico"}
+    _sneak(log_manager, LogProject.SERVER, day, "Nascosto")
+
+    print("=== TEST INTERVALLI CON FUSO ===")
+    log_manager.add_log(_entry(LogProject.SERVER, datetime.now(), "Nuovo"))
+    assert _messages(client, headers, **params) == {"Storico"}
+
+    log_manager.add_log(_entry(LogProject.PDK, day + timedelta(hours=1), "Retrodatato"))
+    assert _messages(client, headers, **params) == {"Storico", "Nascosto", "Retrodatato"}
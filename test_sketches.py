@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test per verificare gli sketch top-K (Space-Saving e Count-Min) per finestra oraria
+"""
+
+import sys
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core import sketches
+from core.models import LogEntry, LogLevel, LogProject
+from core.sketches import SketchStore
+
+
+def _skewed_modules(count, seed=7):
+    """Moduli con distribuzione molto sbilanciata più una coda di moduli rari"""
+    rng = random.Random(seed)
+    heavy = ["upload"] * 40 + ["worker"] * 25 + ["api"] * 15 + ["scheduler"] * 8
+    return [rng.choice(heavy) if rng.random() < 0.8 else f"modulo-{rng.randint(0, 500)}" for _ in range(count)]
+
+
+def test_heavy_hitters_with_small_summary(log_manager):
+    """Con pochi contatori i valori frequenti restano nel riepilogo con un errore limitato"""
+    store = SketchStore(log_manager.db_path, capacity=20, width=256, depth=4, flush_seconds=3600)
+    start = datetime(2026, 5, 1, 10, 0, 0)
+
+    modules = _skewed_modules(5000)
+    store.record((
+        (start + timedelta(seconds=i)).isoformat(), {"module": module}
+    ) for i, module in enumerate(modules))
+
+    print("=== TEST HEAVY HITTERS ===")
+    exact = Counter(modules)
+    top = store.top("module", start, start + timedelta(hours=2), k=4)
+    print(top["items"])
+    assert top["total"] == 5000
+    assert [item["value"] for item in top["items"]] == [value for value, _ in exact.most_common(4)]
+    for item in top["items"]:
+        assert item["count"] >= exact[item["value"]]
+        assert item["count"] - item["error"] <= exact[item["value"]]
+
+
+def test_top_merges_stored_and_pending_windows(log_manager, make_log_manager):
+    """Le finestre salvate e quelle ancora in memoria vengono unite; un nuovo processo legge quelle salvate"""
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+    modules = _skewed_modules(600, seed=3)
+
+    first = [
+        LogEntry(timestamp=start + timedelta(seconds=10 * i), project=LogProject.SERVER,
+                 level=LogLevel.INFO, module=module, message=f"Operazione {i}",
+                 details={"document_id": f"doc-{i % 3}"})
+        for i, module in enumerate(modules[:300])
+    ]
+    second = [
+        LogEntry(timestamp=start + timedelta(hours=1, seconds=10 * i), project=LogProject.PDK,
+                 level=LogLevel.ERROR, module=module, message=f"Errore di rete {i}")
+        for i, module in enumerate(modules[300:])
+    ]
+    log_manager.add_logs_batch(first)
+    assert log_manager.sketches.flush() >= 2
+    log_manager.add_logs_batch(second)
+
+    print("=== TEST UNIONE FINESTRE ===")
+    exact = Counter(modules)
+    top = log_manager.get_top("module", start_date=start, end_date=datetime.now(), k=3)
+    print(top["items"])
+    assert top["total"] == 600
+    assert [(item["value"], item["count"]) for item in top["items"]] == exact.most_common(3)
+
+    documents = log_manager.get_top("document", start_date=start, k=5)
+    assert {item["value"]: item["count"] for item in documents["items"]} == {"doc-0": 100, "doc-1": 100, "doc-2": 100}
+
+    fingerprints = log_manager.get_top("fingerprint", start_date=start, k=5)
+    assert [item["count"] for item in fingerprints["items"]] == [300, 300]
+
+    # Un nuovo archivio (come dopo un riavvio) vede le finestre salvate
+    log_manager.sketches.flush()
+    sketches._stores.pop(log_manager.db_path)
+    restarted = make_log_manager(log_manager.db_path)
+    assert restarted.get_top("module", start_date=start, k=3)["items"] == top["items"]
+
+    try:
+        log_manager.get_top("message")
+        assert False, "Una dimensione non valida deve sollevare ValueError"
+    except ValueError:
+        pass
+
+
+def test_top_api_keys_endpoint(log_manager, client, headers):
+    """I log inviati tramite API vengono attribuiti all'identificativo della chiave"""
+    entry = {"project": "PramaIAServer", "level": "info", "module": "api", "message": "Richiesta ricevuta"}
+    assert client.post("/api/logs/batch", json=[entry] * 3, headers=headers).status_code == 201
+    assert client.post("/api/logs/", json=entry, headers=headers).status_code == 201
+
+    print("=== TEST ENDPOINT TOP-K ===")
+    response = client.get("/api/logs/top/api_key", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["approximate"] is True
+    assert data["items"] == [{"value": "admin_key", "count": 4, "error": 0}]
+
+    assert client.get("/api/logs/top/project", headers=headers).status_code == 400
+
+
+def test_top_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso (Z o offset) vengono riportati alle ore locali degli sketch"""
+    now = datetime.now()
+    log_manager.add_logs_batch([
+        LogEntry(timestamp=now - timedelta(minutes=30), project=LogProject.SERVER,
+                 level=LogLevel.INFO, module="upload", message=f"Upload {i}")
+        for i in range(3)
+    ])
+
+    print("=== TEST TOP-K CON FUSO ===")
+    response = client.get("/api/logs/top/module", params={"start_date": aware_iso(now - timedelta(hours=2))}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["items"] == [{"value": "upload", "count": 3, "error": 0}]
+
+    response = client.get("/api/logs/top/module", params={
+        "start_date": aware_iso(now - timedelta(hours=1)),
+        "end_date": aware_iso(now)
+    }, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    print(data)
+    assert data["start"] == (now - timedelta(hours=1)).isoformat()
+    assert data["items"] == [{"value": "upload", "count": 3, "error": 0}]
+
+
+def test_side_effect_errors_after_commit(log_manager, client, headers):
+    """Un errore degli aggiornamenti in memoria dopo il commit non fa fallire la scrittura"""
+
+    def _broken(values):
+        raise RuntimeError("sketch non disponibile")
+
+    log_manager.sketches.record = _broken
+    entry = {"project": "PramaIAServer", "level": "info", "module": "api", "message": "Richiesta ricevuta"}
+
+    print("=== TEST ERRORI DOPO IL COMMIT ===")
+    response = client.post("/api/logs/batch", json=[entry] * 3, headers=headers)
+    assert response.status_code == 201
+    assert client.post("/api/logs/", json=entry, headers=headers).status_code == 201
+    log_manager.add_log(LogEntry(project=LogProject.PDK, level=LogLevel.INFO, module="api", message="Diretto"))
+
+    # I log sono salvati una sola volta e gli aggiornamenti successivi vengono eseguiti
+    assert log_manager.count_logs()["total"] == 5
+    assert len(log_manager.get_logs(limit=10)) == 5
+    assert log_manager.count_distinct("module")["count"] == 1
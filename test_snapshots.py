@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test per verificare gli snapshot della dashboard aggiornati in background
+"""
+
+import sys
+import os
+import time
+import threading
+from datetime import datetime
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.snapshots import SnapshotCache, get_snapshot_cache
+
+
+def _entry(message):
+    """Log minimo del server"""
+    return LogEntry(
+        timestamp=datetime.now(),
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="upload",
+        message=message
+    )
+
+
+def test_concurrent_misses_are_coalesced():
+    """Le richieste concorrenti su uno snapshot mancante eseguono un solo calcolo"""
+    cache = SnapshotCache(refresh_seconds=60, max_age_seconds=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": len(calls)}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("vista", loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print("=== TEST SINGLE-FLIGHT ===")
+    print(f"Calcoli: {len(calls)}, risposte: {len(results)}")
+    assert len(calls) == 1
+    assert results == [{"value": 1}] * 8
+    assert cache.get("vista", loader) == {"value": 1}
+    cache.stop()
+
+
+def test_refresh_and_staleness_bound():
+    """Il thread aggiorna gli snapshot richiesti; oltre l'età massima la richiesta ricalcola"""
+    cache = SnapshotCache(refresh_seconds=0.05, max_age_seconds=60)
+    counter = {"value": 0}
+
+    def loader():
+        counter["value"] += 1
+        return counter["value"]
+
+    print("=== TEST AGGIORNAMENTO IN BACKGROUND ===")
+    assert cache.get("vista", loader) == 1
+    deadline = time.time() + 2
+    while counter["value"] < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    assert cache.get("vista", loader) >= 3
+    cache.stop()
+
+    stale = SnapshotCache(refresh_seconds=60, max_age_seconds=0)
+    assert stale.get("vista", loader) + 1 == stale.get("vista", loader)
+    stale.stop()
+
+    idle = SnapshotCache(refresh_seconds=60, max_age_seconds=60, idle_seconds=0)
+    idle.get("vista", loader)
+    time.sleep(0.01)
+    idle.refresh()
+    assert idle._snapshots == {}
+    idle.stop()
+
+    failing = SnapshotCache(refresh_seconds=60, max_age_seconds=60)
+    try:
+        failing.get("vista", lambda: 1 / 0)
+        assert False, "L'errore del calcolo deve arrivare alla richiesta"
+    except ZeroDivisionError:
+        pass
+    assert failing._snapshots == {} and failing._flights == {}
+    failing.stop()
+
+
+def test_search_landing_served_from_snapshot(log_manager, client):
+    """La vista iniziale della ricerca usa lo snapshot, le ricerche filtrate no"""
+    log_manager.add_log(_entry("Primo messaggio"))
+    assert "Primo messaggio" in client.get("/dashboard/").text
+
+    log_manager.add_log(_entry("Secondo messaggio"))
+
+    print("=== TEST VISTA INIZIALE DA SNAPSHOT ===")
+    assert "Secondo messaggio" not in client.get("/dashboard/").text
+    assert "Secondo messaggio" in client.get("/dashboard/?module=upload").text
+
+    get_snapshot_cache().refresh()
+    assert "Secondo messaggio" in client.get("/dashboard/").text
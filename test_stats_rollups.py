@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test per verificare le tabelle di aggregazione per minuto/ora e le statistiche calcolate su di esse
+"""
+
+import sys
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+from core.rollups import rollup_sources
+
+BASE = datetime(2025, 7, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def log_manager(log_manager):
+    """LogManager con log distribuiti su alcune ore, inseriti in ordine casuale"""
+    rng = random.Random(7)
+    entries = [
+        LogEntry(
+            timestamp=BASE + timedelta(seconds=rng.randint(0, 4 * 3600)),
+            project=rng.choice([LogProject.SERVER, LogProject.PDK]),
+            level=rng.choice([LogLevel.INFO, LogLevel.ERROR]),
+            module=rng.choice(["upload", "worker", "api"]),
+            message="Messaggio"
+        )
+        for _ in range(400)
+    ]
+    # I log arrivano in ordine casuale (timestamp in ritardo rispetto all'arrivo)
+    log_manager.add_logs_batch(entries)
+    return log_manager
+
+
+def _raw_stats(log_manager, project=None, start_date=None, end_date=None):
+    """Calcola le statistiche direttamente dalla tabella logs"""
+    query = "SELECT level, project, module FROM logs WHERE 1=1"
+    params = []
+    if project:
+        query += " AND project = ?"
+        params.append(project)
+    if start_date:
+        query += " AND timestamp >= ?"
+        params.append(start_date.isoformat())
+    if end_date:
+        query += " AND timestamp <= ?"
+        params.append(end_date.isoformat())
+    conn = log_manager._get_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    by_level = {}
+    for row in rows:
+        by_level[row["level"]] = by_level.get(row["level"], 0) + 1
+    return len(rows), by_level
+
+
+def test_stats_match_raw_counts(log_manager):
+    """Le statistiche dalle aggregazioni coincidono con il conteggio diretto per ogni intervallo"""
+    print("=== TEST STATISTICHE DA AGGREGAZIONI ===")
+    ranges = [
+        (None, None),
+        (BASE + timedelta(minutes=17, seconds=30), None),
+        (None, BASE + timedelta(hours=2, minutes=5, seconds=12)),
+        (BASE + timedelta(minutes=59, seconds=59), BASE + timedelta(hours=3, minutes=1)),
+        (BASE + timedelta(minutes=10, seconds=5), BASE + timedelta(minutes=12, seconds=40)),
+        (BASE + timedelta(minutes=10, seconds=5), BASE + timedelta(minutes=10, seconds=40)),
+        (BASE + timedelta(hours=1), BASE + timedelta(hours=2)),
+    ]
+    for start_date, end_date in ranges:
+        for project in (None, "PramaIA-PDK"):
+            stats = log_manager.get_stats(project=project, start_date=start_date, end_date=end_date)
+            total, by_level = _raw_stats(log_manager, project, start_date, end_date)
+            print(f"{start_date} - {end_date} ({project}): {stats.total_logs} / {total}")
+            assert stats.total_logs == total
+            assert stats.logs_by_level[LogLevel.ERROR] == by_level.get("error", 0)
+
+
+def test_rollups_follow_deletes(log_manager):
+    """L'eliminazione dei log decrementa le aggregazioni"""
+    print("=== TEST AGGREGAZIONI DOPO ELIMINAZIONE ===")
+    conn = log_manager._get_connection()
+    conn.execute("DELETE FROM logs WHERE timestamp < ?", ((BASE + timedelta(hours=1, minutes=30)).isoformat(),))
+    conn.commit()
+    conn.close()
+
+    stats = log_manager.get_stats()
+    total, _ = _raw_stats(log_manager)
+    assert stats.total_logs == total
+
+    conn = log_manager._get_connection()
+    empty = conn.execute("SELECT COUNT(*) FROM log_rollup_minute WHERE count <= 0").fetchone()[0]
+    conn.close()
+    assert empty == 0
+
+
+def test_range_decomposition():
+    """Gli intervalli vengono scomposti in ore intere, minuti interi e frazioni di minuto"""
+    sources = rollup_sources(BASE + timedelta(minutes=10, seconds=30), BASE + timedelta(hours=2, minutes=3, seconds=5))
+    assert [source for source, _, _, _ in sources] == [
+        "log_rollup_hour", "logs", "log_rollup_minute", "log_rollup_minute", "logs"
+    ]
+    assert sources[0][1:3] == ("2025-07-01T09", "2025-07-01T10")
+
+
+def test_stats_route_not_shadowed(client, headers):
+    """/api/logs/stats non viene intercettato da /api/logs/{log_id}"""
+    print("=== TEST ROUTE STATISTICHE ===")
+    response = client.get("/api/logs/stats", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total_logs"] == 400
+
+
+def test_stats_timezone_aware_range(log_manager, client, headers, aware_iso):
+    """Gli estremi con fuso contano gli stessi log dell'intervallo in ora locale"""
+    start_date, end_date = BASE + timedelta(minutes=59, seconds=59), BASE + timedelta(hours=3, minutes=1)
+    total, by_level = _raw_stats(log_manager, start_date=start_date, end_date=end_date)
+
+    print("=== TEST STATISTICHE CON FUSO ===")
+    response = client.get("/api/logs/stats", params={
+        "start_date": aware_iso(start_date),
+        "end_date": aware_iso(end_date)
+    }, headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["total_logs"] == total
+    assert stats["logs_by_level"]["error"] == by_level["error"]
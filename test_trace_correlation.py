@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test per verificare l'indice di correlazione e la ricostruzione della cronologia di una richiesta
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Aggiungi il percorso corrente al PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.models import LogEntry, LogLevel, LogProject
+
+
+def _entries():
+    """Una richiesta che attraversa server, PDK e agent, più log non correlati"""
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    hops = [
+        (LogProject.SERVER, "api", "Richiesta ricevuta"),
+        (LogProject.PDK, "pipeline", "Elaborazione documento"),
+        (LogProject.AGENTS, "monitor", "Documento indicizzato"),
+        (LogProject.SERVER, "api", "Risposta inviata"),
+    ]
+    entries = [
+        LogEntry(
+            timestamp=start + timedelta(milliseconds=250 * i),
+            project=project,
+            level=LogLevel.INFO,
+            module=module,
+            message=message,
+            context={"request_id": "req-42"}
+        )
+        for i, (project, module, message) in enumerate(hops)
+    ]
+    entries.append(LogEntry(
+        timestamp=start,
+        project=LogProject.SERVER,
+        level=LogLevel.INFO,
+        module="api",
+        message="Altra richiesta",
+        context={"request_id": "req-7", "trace_id": "req-42-bis"}
+    ))
+    return entries
+
+
+def test_trace_across_projects(log_manager):
+    """La cronologia include i log di tutti i progetti in ordine temporale"""
+    # Inserimento in ordine inverso: l'ordinamento deve dipendere dal timestamp
+    log_manager.add_logs_batch(list(reversed(_entries())))
+
+    print("=== TEST CRONOLOGIA RICHIESTA ===")
+    trace = log_manager.get_trace("req-42")
+    print(f"Log correlati: {trace['count']}, durata: {trace['duration_ms']} ms")
+    assert trace["count"] == 4
+    assert [log["message"] for log in trace["logs"]] == [
+        "Richiesta ricevuta", "Elaborazione documento", "Documento indicizzato", "Risposta inviata"
+    ]
+    assert trace["projects"] == ["PramaIA-Agents", "PramaIA-PDK", "PramaIAServer"]
+    assert trace["duration_ms"] == 750
+
+    assert log_manager.get_trace("req-42", correlation_key="context.trace_id")["count"] == 0
+    assert log_manager.get_trace("inesistente")["count"] == 0
+
+
+def test_trace_index_follows_deletes(log_manager):
+    """Eliminando i log vengono rimosse anche le voci dell'indice"""
+    log_manager.add_logs_batch(_entries())
+
+    print("=== TEST PULIZIA INDICE DI CORRELAZIONE ===")
+    conn = log_manager._get_connection()
+    conn.execute("DELETE FROM logs WHERE module = 'pipeline'")
+    conn.commit()
+    remaining = conn.execute("SELECT COUNT(*) FROM log_correlations WHERE correlation_id = 'req-42'").fetchone()[0]
+    conn.close()
+    print(f"Voci rimaste nell'indice: {remaining}")
+    assert remaining == 3
+    assert log_manager.get_trace("req-42")["count"] == 3
+
+
+def test_trace_order_across_dst_fallback(log_manager, local_timezone):
+    """Al ritorno dall'ora solare la cronologia segue gli istanti, non l'ora locale"""
+    local_timezone("Europe/Rome")
+    # 26 ottobre 2025: 02:45 CEST e, mezz'ora dopo, 02:15 CET
+    log_manager.add_logs_batch([
+        LogEntry(
+            timestamp=moment,
+            project=LogProject.SERVER,
+            level=LogLevel.INFO,
+            module="api",
+            message=message,
+            context={"request_id": "req-dst"}
+        )
+        for message, moment in (
+            ("Richiesta ricevuta", datetime(2025, 10, 26, 0, 45, tzinfo=timezone.utc)),
+            ("Risposta inviata", datetime(2025, 10, 26, 1, 15, tzinfo=timezone.utc))
+        )
+    ])
+
+    print("=== TEST CRONOLOGIA CON CAMBIO DI ORA ===")
+    trace = log_manager.get_trace("req-dst")
+    print(f"Log: {[(log['message'], log['timestamp']) for log in trace['logs']]}, durata: {trace['duration_ms']} ms")
+    assert [log["message"] for log in trace["logs"]] == ["Richiesta ricevuta", "Risposta inviata"]
+    assert trace["duration_ms"] == 30 * 60 * 1000
+    assert "timestamp_us" not in trace["logs"][0]
@@ -11,7 +11,8 @@ from typing import Optional
 
 from core.auth import get_api_key
 from core.models import LogLevel, LogProject
-from core.log_manager import LogManager
+from core.log_manager import LogManager, SUMMARY_FIELDS
+from core.snapshots import get_snapshot_cache
 
 # Inizializza il router
 router = search_router = APIRouter()
@@ -76,21 +77,60 @@ async def search_logs(
         except ValueError:
             end_datetime = None
     
-    # Ottieni log filtrati
-    logs = log_manager.get_logs(
-        project=project_param,
-        level=level_param,
-        module=module,
-        document_id=document_id,
-        file_name=file_name,
-        start_date=start_datetime,
-        end_date=end_datetime,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        limit=limit,
-        offset=offset
+    # La vista iniziale (nessun filtro, prima pagina) è servita da uno snapshot
+    # aggiornato in background: i refresh del browser non interrogano il database
+    is_landing = (
+        not any((project, level, module, document_id, file_name, start_date, end_date))
+        and sort_by == "timestamp" and sort_order == "desc" and limit == 100 and offset == 0
     )
     
+    def load_results():
+        # Ottieni log filtrati
+        logs = log_manager.get_logs(
+            project=project_param,
+            level=level_param,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_datetime,
+            end_date=end_datetime,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit,
+            offset=offset,
+            # La tabella mostra solo le colonne principali: i dettagli sono caricati su richiesta
+            fields=SUMMARY_FIELDS
+        )
+        
+        # Calcola pagination: conteggio esatto sugli indici o stima entro il tempo concesso
+        count = log_manager.count_logs(
+            project=project_param,
+            level=level_param,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_datetime,
+            end_date=end_datetime
+        )
+        
+        # Ripartizione dei risultati per livello, progetto e modulo (una sola query, in cache)
+        facets = log_manager.get_facets(
+            project=project_param,
+            level=level_param,
+            module=module,
+            document_id=document_id,
+            file_name=file_name,
+            start_date=start_datetime,
+            end_date=end_datetime,
+            facet_limit=10
+        )
+        return logs, count, facets
+    
+    if is_landing:
+        logs, count, facets = get_snapshot_cache().get(("search_landing", log_manager.db_path), load_results)
+    else:
+        logs, count, facets = load_results()
+    
     # Se i filtri non restituiscono risultati, mostra lista vuota (comportamento corretto)
     # Non fare fallback a tutti i log - se un utente filtra e non trova nulla, deve vedere lista vuota
     
@@ -106,8 +146,7 @@ async def search_logs(
         # Se c'è un filtro per nome file ma non per document_id, ordina cronologicamente (dal più vecchio)
         logs = sorted(logs, key=lambda x: x["timestamp"])
     
-    # Calcola pagination
-    total_logs = len(logs)  # Questo è una semplificazione, in realtà dovremmo contare tutti i log che corrispondono al filtro
+    total_logs = count["total"]
     
     return templates.TemplateResponse(
         "search.html",
@@ -115,6 +154,8 @@ async def search_logs(
             "request": request,
             "logs": logs,
             "total": total_logs,
+            "total_approximate": count["approximate"],
+            "facets": facets["facets"],
             "limit": limit,
             "offset": offset,
             "project": project,
@@ -158,20 +199,14 @@ async def logservice_page(
     uptime = dt.datetime.now() - log_manager.start_time if hasattr(log_manager, 'start_time') else "N/A"
     uptime_str = str(uptime).split('.')[0] if isinstance(uptime, dt.timedelta) else uptime
     
-    # Recupera le statistiche sui client dal database
-    conn = log_manager._get_connection()
-    cursor = conn.cursor()
-    
-    # Ottieni il numero di connessioni attive e totali (stimato dai log recenti)
-    cursor.execute("""
-        SELECT COUNT(DISTINCT project || ':' || module) as active_connections
-        FROM logs
-        WHERE timestamp >= ?
-    """, ((dt.datetime.now() - dt.timedelta(hours=1)).isoformat(),))
-    active_connections = cursor.fetchone()["active_connections"]
-    
-    cursor.execute("SELECT COUNT(DISTINCT project || ':' || module) as total_connections FROM logs")
-    total_connections = cursor.fetchone()["total_connections"]
+    # Numero di client (progetto:modulo) attivi nell'ultima ora e totali, stimato
+    # dagli sketch HyperLogLog senza leggere la tabella dei log
+    active_connections = log_manager.count_distinct(
+        "client",
+        start_date=dt.datetime.now() - dt.timedelta(hours=1),
+        end_date=dt.datetime.now()
+    )["count"]
+    total_connections = log_manager.count_distinct("client")["count"]
     
     # Dati di stato del servizio
     service_status = {
@@ -186,38 +221,27 @@ async def logservice_page(
         "total_logs": log_manager.get_logs_count()
     }
     
-    # Ottieni dati reali sui client attivi dal database
-    cursor.execute("""
-        SELECT 
-            project,
-            module,
-            MAX(timestamp) as last_log_time,
-            COUNT(*) as logs_sent
-        FROM logs
-        GROUP BY project, module
-        ORDER BY last_log_time DESC
-        LIMIT 10
-    """)
-    client_data = cursor.fetchall()
+    # Client attivi dal registro aggiornato a ogni scrittura
+    client_data = log_manager.get_clients(limit=10)["clients"]
     
     # Crea la lista dei client attivi con dati reali
     active_clients = []
     for i, client in enumerate(client_data):
         # Calcola lo stato in base all'ultima attività
-        last_log_time = dt.datetime.fromisoformat(client["last_log_time"])
+        last_log_time = dt.datetime.fromisoformat(client["last_seen"])
         status = "online" if (dt.datetime.now() - last_log_time) < dt.timedelta(hours=1) else "idle"
         
         active_clients.append({
             "id": f"client-{i+1:03d}",
             "project": client["project"],
             "module": client["module"],
-            "last_log_time": client["last_log_time"],
-            "logs_sent": client["logs_sent"],
+            "api_key_id": client["api_key_id"],
+            "last_log_time": client["last_seen"],
+            "logs_sent": client["total_logs"],
+            "bytes": client["bytes"],
             "status": status
         })
     
-    # Non chiudere ancora la connessione, verrà usata più avanti
-    
     # Ottieni le chiavi API reali dal file di configurazione
     import os
     import json
@@ -230,18 +254,8 @@ async def logservice_page(
             with open(api_keys_path, "r") as f:
                 api_keys_data = json.load(f)
                 
-            # Ottieni i timestamp dell'ultimo utilizzo di ciascuna chiave
-            last_used_query = """
-                SELECT project, MAX(timestamp) as last_used 
-                FROM logs 
-                GROUP BY project
-            """
-            cursor.execute(last_used_query)
-            # Ottieni e archivia i risultati prima di chiudere la connessione
-            last_used_data = {row["project"]: row["last_used"] for row in cursor.fetchall()}
-            
-            # Ora che abbiamo finito con il database, possiamo chiudere la connessione
-            conn.close()
+            # Ultimo utilizzo di ciascuna chiave (o, se non registrato, del suo progetto)
+            usage = log_manager.get_api_key_usage()
             
             # Formatta le chiavi API per la visualizzazione
             for key_name, key_info in api_keys_data.items():
@@ -260,7 +274,7 @@ async def logservice_page(
                     key_masked = f"{api_key[:8]}{'*' * 8}" if len(api_key) > 8 else f"{api_key[:4]}{'*' * 4}"
                     
                     # Ottieni l'ultimo utilizzo, se disponibile
-                    last_used = last_used_data.get(project, "Mai utilizzata")
+                    last_used = usage["api_keys"].get(key_name) or usage["projects"].get(project, "Mai utilizzata")
                     
                     api_keys.append({
                         "id": key_name,  # Aggiungiamo l'ID della chiave (il nome nel dizionario)
@@ -0,0 +1,127 @@
+/**
+ * Client WebSocket del live tail (/api/logs/ws)
+ *
+ * Mantiene una sottoscrizione su una sola connessione: i filtri si cambiano
+ * con update() senza riconnettersi e i log arrivano a blocchi (onLogs).
+ * Se la connessione cade viene riaperta finché il tail è attivo.
+ */
+
+class LiveTail {
+    /**
+     * @param {string} apiKey - API key passata nel parametro api_key
+     * @param {Object} options - batchMs, batchSize, coalesce, onLogs(logs, frame), onStatus(stato, dettaglio)
+     */
+    constructor(apiKey, options = {}) {
+        this.apiKey = apiKey;
+        this.options = options;
+        this.socket = null;
+        this.active = false;
+        this.filters = {};
+        this.text = null;
+    }
+
+    /**
+     * Avvia il tail con i filtri indicati (project, level, module, document_id).
+     */
+    start(filters = {}, text = null) {
+        this.active = true;
+        this.filters = LiveTail.clean(filters);
+        this.text = text || null;
+        this.connect();
+    }
+
+    /**
+     * Cambia i filtri della sottoscrizione sulla connessione aperta.
+     */
+    update(filters = {}, text = null) {
+        this.filters = LiveTail.clean(filters);
+        this.text = text || null;
+        this.send({action: 'update', id: 'page', filters: this.filters, text: this.text});
+    }
+
+    /**
+     * Chiude la sottoscrizione e la connessione.
+     */
+    stop() {
+        this.active = false;
+        if (this.socket) {
+            this.send({action: 'unsubscribe', id: 'page'});
+            this.socket.close();
+            this.socket = null;
+        }
+        this.status('stopped');
+    }
+
+    connect() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const url = `${protocol}//${window.location.host}/api/logs/ws?api_key=${encodeURIComponent(this.apiKey)}`;
+        const socket = new WebSocket(url);
+        this.socket = socket;
+
+        socket.addEventListener('open', () => {
+            this.send({
+                action: 'subscribe',
+                id: 'page',
+                filters: this.filters,
+                text: this.text,
+                batch_ms: this.options.batchMs,
+                batch_size: this.options.batchSize,
+                coalesce: this.options.coalesce
+            });
+        });
+
+        socket.addEventListener('message', event => {
+            const frame = JSON.parse(event.data);
+            if (frame.type === 'logs') {
+                if (this.options.onLogs) {
+                    this.options.onLogs(frame.logs, frame);
+                }
+            } else if (frame.type === 'subscribed' || frame.type === 'updated') {
+                this.status('live');
+            } else if (frame.type === 'error') {
+                this.status('error', frame.detail);
+            }
+        });
+
+        socket.addEventListener('close', () => {
+            if (this.socket !== socket) {
+                return;
+            }
+            this.socket = null;
+            if (this.active) {
+                // Riconnessione dopo una chiusura inattesa
+                this.status('reconnecting');
+                setTimeout(() => {
+                    if (this.active && !this.socket) {
+                        this.connect();
+                    }
+                }, 3000);
+            }
+        });
+    }
+
+    send(message) {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify(message));
+        }
+    }
+
+    status(state, detail) {
+        if (this.options.onStatus) {
+            this.options.onStatus(state, detail);
+        }
+    }
+
+    /**
+     * Rimuove i filtri vuoti.
+     */
+    static clean(filters) {
+        const cleaned = {};
+        for (const [key, value] of Object.entries(filters)) {
+            if (value) {
+                cleaned[key] = value;
+            }
+        }
+        return cleaned;
+    }
+}